@@ -0,0 +1,380 @@
+"""
+Активность профилей winws: какие блоки --new срабатывают и какие записи hostlist совпадают
+
+Разбирает отладочный вывод winws (--debug) построчно - на лету из журнала
+или из сохраненного файла.
+"""
+
+import collections
+import gzip
+import os
+import re
+import sys
+import threading
+import time
+
+from compiler import read_hostlist
+
+# winws нумерует профили (блоки --new) с единицы; профиль 0 - пустой профиль
+# по умолчанию, его выбор означает, что ни один блок не подошел
+PROFILE_BASE = 1
+DEFAULT_PROFILE = 0
+# Счетчики по минутам хранятся за последние сутки
+ROLLUP_MINUTES = 24 * 60
+# Больше разных имен хостов на блок не запоминается, остальные считаются вместе
+MAX_HOSTS = 10000
+OTHER_HOSTS = "(прочие)"
+
+# Строки winws --debug (форматы из winws.exe):
+#   desync profile search for %s target=%s l7proto=%s ssid='%s' hostname='%s'
+#   * hostlist check for profile %d
+#   [%s] exclude / [%s] include - перед первой проверкой каждого списка, в той же строке
+#   hostlist check for %s : positive|negative - для имени и каждого родительского домена
+#   desync profile %d matches / desync profile not found
+SEARCH_RE = re.compile(r"desync profile search for (\w+)")
+# target=1.2.3.4:443 или target=[2001:db8::1]:443
+TARGET_RE = re.compile(r"target=\S*:(\d+)")
+HOSTNAME_RE = re.compile(r"hostname='([^']*)'")
+MATCH_RE = re.compile(r"desync profile (\d+) matches")
+NOT_FOUND = "desync profile not found"
+PROFILE_CHECK_RE = re.compile(r"\* hostlist check for profile (\d+)")
+HOSTLIST_RE = re.compile(r"hostlist check for (\S+) : (positive|negative)")
+LIST_MODE_RE = re.compile(r"\[[^\]]*\] (include|exclude) hostlist check")
+# Строка сохраненного журнала программы: "12:03:04 winws: текст"
+LOG_LINE_RE = re.compile(r"^(\d\d:\d\d):\d\d (\w+): (.*)$")
+MINUTES_PER_DAY = 24 * 60
+
+
+def local_minute(timestamp):
+    """Номер минуты от начала эпохи по местному времени: остаток от деления на сутки - ЧЧ:ММ"""
+    return int((timestamp + time.localtime(timestamp).tm_gmtoff) // 60)
+
+
+def minute_label(minute):
+    if minute is None:
+        return None
+    return f"{minute // 60 % 24:02d}:{minute % 60:02d}"
+
+
+class LogClock:
+    """Переводит "ЧЧ:ММ" журнала без дат в номера минут: время пошло назад - начались новые сутки"""
+
+    def __init__(self):
+        self.day = 0
+        self.previous = None
+
+    def minute(self, label):
+        if label is None:
+            return None
+        hours, minutes = label.split(":")
+        minute = int(hours) * 60 + int(minutes)
+        if self.previous is not None and minute < self.previous:
+            self.day += 1
+        self.previous = minute
+        return self.day * MINUTES_PER_DAY + minute
+
+
+def block_summary(block):
+    """Короткое описание блока: порты, протокол, списки"""
+    parts = []
+    if block.tcp_ports:
+        parts.append(f"tcp {block.tcp_ports}")
+    if block.udp_ports:
+        parts.append(f"udp {block.udp_ports}")
+    if block.l7:
+        parts.append(block.l7)
+    for name in ("hostlist", "hostlist-exclude", "ipset", "ipset-exclude"):
+        for value in block.get_all(name):
+            parts.append(f"{name}={os.path.basename(value)}")
+    domains = block.get("hostlist-domains")
+    if domains:
+        parts.append(f"hostlist-domains={domains}")
+    return ", ".join(parts) or "без фильтров"
+
+
+def block_entries(block):
+    """Записи hostlist блока (без ^), которые могут совпасть"""
+    entries = []
+    for path in block.get_all("hostlist"):
+        try:
+            entries.extend(read_hostlist(path))
+        except OSError:
+            continue
+    for value in block.get_all("hostlist-domains"):
+        entries.extend(domain.strip().lower() for domain in (value or "").split(",") if domain.strip())
+    return list(dict.fromkeys(entry.lstrip("^") for entry in entries))
+
+
+class ProfileActivity:
+    """Счетчики срабатываний блоков стратегии по отладочному выводу winws
+
+    Для каждого соединения winws печатает строку поиска профиля (протокол,
+    адрес с портом, имя хоста), проверки hostlist по профилям и итог: номер
+    подошедшего профиля, профиль 0 или "not found". Совпавшая запись
+    hostlist - положительная проверка включающего списка подошедшего
+    профиля; совпадения исключающих списков записями не считаются.
+    Счетчики растут только с числом блоков, записей, портов и (до
+    MAX_HOSTS) хостов, а не с длиной журнала.
+
+    feed() можно вызывать из потока чтения вывода winws, а snapshot() и
+    остальные запросы - из интерфейса.
+    """
+
+    def __init__(self, profile=None):
+        self.profile = profile
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.lines = 0
+            self.events = 0
+            self.unmatched = 0
+            self.block_hits = collections.Counter()
+            self.entry_hits = collections.defaultdict(collections.Counter)
+            self.host_hits = collections.defaultdict(collections.Counter)
+            # Номер блока (None - без профиля) -> Counter(порт)
+            self.port_hits = collections.defaultdict(collections.Counter)
+            self.last_hit = {}
+            # Номер минуты (local_minute) -> Counter(номер блока или None для "not found");
+            # хранятся только минуты не старше ROLLUP_MINUTES от последней
+            self.minutes = collections.OrderedDict()
+            self.first_at = None
+            self.last_at = None
+            self._pending = None
+
+    # Разбор
+
+    def feed(self, text, minute=None):
+        """Учитывает одну строку вывода winws; minute - номер минуты строки, если известен"""
+        # Быстрый отсев: почти все строки --debug не относятся к выбору профиля
+        if "profile" not in text and "hostlist" not in text:
+            with self._lock:
+                self.lines += 1
+            return
+        with self._lock:
+            self.lines += 1
+            self._feed(text, minute)
+
+    def feed_entry(self, entry):
+        """Строка буфера журнала (время, источник, текст)"""
+        timestamp, source, text = entry
+        if source == "winws":
+            self.feed(text, local_minute(timestamp))
+
+    def _feed(self, text, minute):
+        match = SEARCH_RE.search(text)
+        if match is not None:
+            target = TARGET_RE.search(text)
+            hostname = HOSTNAME_RE.search(text)
+            self._pending = {
+                "proto": match.group(1),
+                "port": int(target.group(1)) if target else None,
+                "host": hostname.group(1).lower() if hostname and hostname.group(1) else None,
+                # Номер профиля winws -> запись включающего списка, давшая совпадение
+                "entries": {},
+                "profile": None,
+                "mode": None,
+            }
+            return
+        pending = self._pending
+        if pending is None:
+            return
+
+        match = PROFILE_CHECK_RE.search(text)
+        if match is not None:
+            pending["profile"] = int(match.group(1))
+            pending["mode"] = None
+            return
+        match = HOSTLIST_RE.search(text)
+        if match is not None:
+            mode = LIST_MODE_RE.search(text)
+            if mode is not None:
+                pending["mode"] = mode.group(1)
+            # Родительские домены проверяются следующими строками без [список]
+            if match.group(2) == "positive" and pending["mode"] == "include":
+                pending["entries"].setdefault(pending["profile"], match.group(1).lower())
+            return
+
+        match = MATCH_RE.search(text)
+        if match is not None:
+            number = int(match.group(1))
+            block = number - PROFILE_BASE
+            if number == DEFAULT_PROFILE or block < 0 or (
+                    self.profile is not None and block >= len(self.profile.blocks)):
+                block = None
+            self._record(block, pending, minute, pending["entries"].get(number))
+        elif NOT_FOUND in text:
+            self._record(None, pending, minute)
+
+    def _record(self, block, pending, minute, entry=None):
+        self._pending = None
+        self.events += 1
+        if pending["port"] is not None:
+            self.port_hits[block][pending["port"]] += 1
+        if minute is not None:
+            if self.first_at is None:
+                self.first_at = minute
+            self.last_at = minute if self.last_at is None else max(self.last_at, minute)
+            cutoff = self.last_at - ROLLUP_MINUTES
+            if minute > cutoff:
+                counter = self.minutes.get(minute)
+                if counter is None:
+                    counter = self.minutes[minute] = collections.Counter()
+                    # Минуты добавляются по порядку: самые старые - в начале
+                    while next(iter(self.minutes)) <= cutoff:
+                        self.minutes.popitem(last=False)
+                counter[block] += 1
+        if block is None:
+            self.unmatched += 1
+            return
+        self.block_hits[block] += 1
+        self.last_hit[block] = minute
+        if entry:
+            self.entry_hits[block][entry] += 1
+        host = pending["host"]
+        if host:
+            hosts = self.host_hits[block]
+            if host not in hosts and len(hosts) >= MAX_HOSTS:
+                host = OTHER_HOSTS
+            hosts[host] += 1
+
+    # Запросы
+
+    def block_count(self):
+        if self.profile is not None:
+            return len(self.profile.blocks)
+        return max(self.block_hits, default=-1) + 1
+
+    def rollup(self, block=None, minutes=60):
+        """Срабатывания блока (или всех, block=None) за последние minutes минут: [(минута, число)]"""
+        with self._lock:
+            if self.last_at is None:
+                return []
+            cutoff = self.last_at - minutes
+            items = sorted((minute, counter) for minute, counter in self.minutes.items() if minute > cutoff)
+        if block is None:
+            return [(minute_label(minute), sum(counter.values())) for minute, counter in items]
+        return [(minute_label(minute), counter.get(block, 0)) for minute, counter in items]
+
+    def snapshot(self):
+        """Состояние по блокам для отображения: список словарей в порядке блоков"""
+        with self._lock:
+            last_minute = self.minutes.get(self.last_at, collections.Counter())
+            rows = []
+            for index in range(self.block_count()):
+                block = self.profile.blocks[index] if self.profile is not None else None
+                rows.append({
+                    "index": index,
+                    "summary": block_summary(block) if block is not None else "",
+                    "hits": self.block_hits.get(index, 0),
+                    "last_minute": last_minute.get(index, 0),
+                    "last_hit": minute_label(self.last_hit.get(index)),
+                    "top_entries": self.entry_hits[index].most_common(5) if index in self.entry_hits else [],
+                    "top_hosts": self.host_hits[index].most_common(5) if index in self.host_hits else [],
+                    "top_ports": self.port_hits[index].most_common(5) if index in self.port_hits else [],
+                })
+            return rows
+
+    def prune_candidates(self, index):
+        """Записи hostlist блока, ни разу не совпавшие за время наблюдения"""
+        if self.profile is None or index >= len(self.profile.blocks):
+            return []
+        with self._lock:
+            matched = set(self.entry_hits.get(index, ()))
+        return [entry for entry in block_entries(self.profile.blocks[index]) if entry not in matched]
+
+    def summary(self):
+        period = ""
+        if self.first_at is not None:
+            period = f", {minute_label(self.first_at)}-{minute_label(self.last_at)}"
+        return (f"Соединений: {self.events}, без профиля: {self.unmatched}, "
+                f"строк журнала: {self.lines}{period}")
+
+
+def read_log(path):
+    """Строки сохраненного журнала (.log или .gz): [(минута или None, текст winws)]"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            match = LOG_LINE_RE.match(line)
+            if match is None:
+                # Вывод winws --debug=@файл: без времени и источника
+                yield None, line
+            elif match.group(2) == "winws":
+                yield match.group(1), match.group(3)
+
+
+def analyze(paths, profile=None):
+    """Разбирает сохраненные журналы; возвращает ProfileActivity"""
+    activity = ProfileActivity(profile)
+    # Журналы идут по порядку: переход через полночь продолжается и в следующем файле
+    clock = LogClock()
+    for path in paths:
+        for label, text in read_log(path):
+            activity.feed(text, clock.minute(label))
+    return activity
+
+
+def format_report(activity, prune=False):
+    lines = [activity.summary()]
+    unmatched_ports = activity.port_hits.get(None)
+    if unmatched_ports:
+        lines.append("  без профиля, порты: " + ", ".join(
+            f"{port} {count}" for port, count in unmatched_ports.most_common(5)))
+    for row in activity.snapshot():
+        summary = f" ({row['summary']})" if row["summary"] else ""
+        lines.append(f"Блок {row['index'] + 1}: {row['hits']}{summary}")
+        if row["top_entries"]:
+            lines.append("  записи: " + ", ".join(f"{entry} {count}" for entry, count in row["top_entries"]))
+        elif row["top_hosts"]:
+            lines.append("  хосты: " + ", ".join(f"{host} {count}" for host, count in row["top_hosts"]))
+        if row["top_ports"]:
+            lines.append("  порты: " + ", ".join(f"{port} {count}" for port, count in row["top_ports"]))
+        candidates = activity.prune_candidates(row["index"])
+        if candidates:
+            lines.append(f"  не совпали ни разу: {len(candidates)} записей")
+            if prune:
+                lines.extend(f"    {entry}" for entry in candidates)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Использование:\n"
+             "  python activity.py <журнал> [журнал...] [--strategy ИМЯ] [--prune]")
+    paths = [arg for arg in argv if not arg.startswith("--")]
+    if "--strategy" in argv:
+        index = argv.index("--strategy")
+        name = argv[index + 1] if index + 1 < len(argv) else None
+        if name in paths:
+            paths.remove(name)
+    else:
+        name = None
+    if not paths:
+        print(usage)
+        return 2
+
+    profile = None
+    if name:
+        from catalog import StrategyCatalog
+        from strategy import StrategyError
+        catalog = StrategyCatalog()
+        catalog.scan()
+        try:
+            profile = catalog.profile(name)
+        except StrategyError as e:
+            print(f"Ошибка: {e}")
+            return 1
+    try:
+        activity = analyze(paths, profile)
+    except OSError as e:
+        print(f"Ошибка: {e}")
+        return 1
+    print(format_report(activity, prune="--prune" in argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
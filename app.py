@@ -1,1097 +1,2485 @@
-import sys
-import os
-import subprocess
-import time
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                             QHBoxLayout, QLabel, QPushButton, QFrame, QMessageBox,
-                             QComboBox, QTabWidget, QTextEdit, QGroupBox)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QPainter, QColor, QBrush, QFont, QPen
-
-class ModernButton(QPushButton):
-    """Круглая кнопка с современными анимациями"""
-    
-    def __init__(self, text, parent=None):
-        super().__init__(text, parent)
-        self.setFixedSize(150, 150)
-        self.setCursor(Qt.PointingHandCursor)
-        
-        font = QFont("Segoe UI", 12, QFont.Medium)
-        self.setFont(font)
-        
-        self.normal_color = QColor("#2196F3")
-        self.hover_color = QColor("#1976D2")
-        self.pressed_color = QColor("#0D47A1")
-        self.success_color = QColor("#4CAF50")
-        self.disconnect_color = QColor("#F44336")
-        self.current_color = self.normal_color
-        
-        self.is_connected = False
-        self.is_hovered = False
-        self.is_pressed = False
-    
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        painter.setBrush(QBrush(self.current_color))
-        painter.setPen(Qt.NoPen)
-        painter.drawEllipse(10, 10, 130, 130)
-        
-        painter.setPen(Qt.white)
-        painter.setFont(self.font())
-        
-        if self.is_connected:
-            font = QFont("Arial", 36, QFont.Bold)
-            painter.setFont(font)
-            painter.drawText(self.rect(), Qt.AlignCenter, "✕")
-        else:
-            painter.drawText(self.rect(), Qt.AlignCenter, self.text())
-        
-        if self.is_hovered or self.is_pressed:
-            painter.setBrush(QBrush(QColor(255, 255, 255, 30 if self.is_hovered else 50)))
-            painter.drawEllipse(10, 10, 130, 130)
-    
-    def enterEvent(self, event):
-        self.is_hovered = True
-        if self.is_connected:
-            self.current_color = self.disconnect_color
-        else:
-            self.current_color = self.hover_color
-        self.update()
-        super().enterEvent(event)
-    
-    def leaveEvent(self, event):
-        self.is_hovered = False
-        if self.is_connected:
-            self.current_color = self.success_color
-        else:
-            self.current_color = self.normal_color
-        self.update()
-        super().leaveEvent(event)
-    
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.is_pressed = True
-            if self.is_connected:
-                self.current_color = self.disconnect_color
-            else:
-                self.current_color = self.pressed_color
-            self.update()
-        super().mousePressEvent(event)
-    
-    def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.is_pressed = False
-            if self.is_connected:
-                self.current_color = self.disconnect_color if self.is_hovered else self.success_color
-            else:
-                self.current_color = self.hover_color if self.is_hovered else self.normal_color
-            self.update()
-        super().mouseReleaseEvent(event)
-    
-    def set_connected(self, connected):
-        self.is_connected = connected
-        if connected:
-            self.current_color = self.success_color
-            self.setText("ОТКЛЮЧИТЬ")
-        else:
-            self.current_color = self.normal_color
-            self.setText("ПОДКЛЮЧИТЬ")
-        self.update()
-
-
-class StatusIndicator(QWidget):
-    """Индикатор статуса с анимацией"""
-    
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setFixedSize(20, 20)
-        self.status = "disconnected"
-        
-        self.rotation_angle = 0
-        self.rotation_timer = QTimer()
-        self.rotation_timer.timeout.connect(self.update_rotation)
-        
-    def update_rotation(self):
-        self.rotation_angle = (self.rotation_angle + 30) % 360
-        self.update()
-        
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        if self.status == "connected":
-            painter.setBrush(QBrush(QColor("#4CAF50")))
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(0, 0, 20, 20)
-            
-            painter.setPen(QPen(Qt.white, 2))
-            painter.drawLine(5, 10, 9, 14)
-            painter.drawLine(9, 14, 15, 6)
-        
-        elif self.status == "connecting":
-            painter.setBrush(QBrush(QColor("#FF9800")))
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(0, 0, 20, 20)
-            
-            painter.setPen(QPen(Qt.white, 2))
-            painter.save()
-            painter.translate(10, 10)
-            painter.rotate(self.rotation_angle)
-            painter.drawArc(-6, -6, 12, 12, 45 * 16, 270 * 16)
-            painter.restore()
-        
-        else:
-            painter.setBrush(QBrush(QColor("#F44336")))
-            painter.setPen(Qt.NoPen)
-            painter.drawEllipse(0, 0, 20, 20)
-            
-            painter.setPen(QPen(Qt.white, 2))
-            painter.drawLine(5, 5, 15, 15)
-            painter.drawLine(15, 5, 5, 15)
-    
-    def set_status(self, status):
-        self.status = status
-        if status == "connecting":
-            self.rotation_timer.start(50)
-        else:
-            self.rotation_timer.stop()
-        self.update()
-
-
-class ListEditorTab(QWidget):
-    """Вкладка для редактирования списка доменов"""
-    
-    def __init__(self, file_path, title, description="", parent=None):
-        super().__init__(parent)
-        self.file_path = file_path
-        self.title = title
-        self.description = description
-        self.setup_ui()
-        self.load_file()
-    
-    def setup_ui(self):
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(15, 15, 15, 15)
-        layout.setSpacing(10)
-        
-        # Заголовок
-        title_label = QLabel(self.title)
-        title_label.setObjectName("editorTitle")
-        title_label.setAlignment(Qt.AlignCenter)
-        
-        # Описание (если есть)
-        if self.description:
-            description_label = QLabel(self.description)
-            description_label.setWordWrap(True)
-            description_label.setObjectName("editorDescription")
-            description_label.setAlignment(Qt.AlignCenter)
-            layout.addWidget(description_label)
-        
-        # Группа для добавления доменов
-        add_group = QGroupBox("Добавить домены")
-        add_group.setObjectName("addGroup")
-        add_layout = QVBoxLayout(add_group)
-        add_layout.setSpacing(8)
-        
-        # Текстовое поле для ввода новых доменов
-        self.domain_input = QTextEdit()
-        self.domain_input.setObjectName("domainInput")
-        self.domain_input.setPlaceholderText("example.com\nsub.example.com")
-        self.domain_input.setMaximumHeight(70)
-        
-        # Кнопки добавления
-        button_layout = QHBoxLayout()
-        self.add_button = QPushButton("Добавить")
-        self.add_button.setObjectName("addButton")
-        self.add_button.clicked.connect(self.add_domains)
-        self.add_button.setFixedWidth(120)
-        
-        self.clear_input_button = QPushButton("Очистить")
-        self.clear_input_button.setObjectName("clearInputButton")
-        self.clear_input_button.clicked.connect(self.clear_input)
-        self.clear_input_button.setFixedWidth(120)
-        
-        button_layout.addStretch()
-        button_layout.addWidget(self.add_button)
-        button_layout.addWidget(self.clear_input_button)
-        button_layout.addStretch()
-        
-        add_layout.addWidget(self.domain_input)
-        add_layout.addLayout(button_layout)
-        
-        # Группа для просмотра и редактирования
-        view_group = QGroupBox("Текущий список")
-        view_group.setObjectName("viewGroup")
-        view_layout = QVBoxLayout(view_group)
-        view_layout.setSpacing(8)
-        
-        # Текстовое поле для просмотра текущего списка
-        self.domain_view = QTextEdit()
-        self.domain_view.setObjectName("domainView")
-        self.domain_view.setMinimumHeight(300)
-        
-        # Кнопки управления списком
-        list_button_layout = QHBoxLayout()
-        self.refresh_button = QPushButton("Обновить")
-        self.refresh_button.setObjectName("refreshButton")
-        self.refresh_button.clicked.connect(self.load_file)
-        self.refresh_button.setFixedWidth(100)
-        
-        self.clear_list_button = QPushButton("Очистить")
-        self.clear_list_button.setObjectName("clearListButton")
-        self.clear_list_button.clicked.connect(self.clear_list)
-        self.clear_list_button.setFixedWidth(100)
-        
-        self.save_button = QPushButton("Сохранить")
-        self.save_button.setObjectName("saveButton")
-        self.save_button.clicked.connect(self.save_file)
-        self.save_button.setFixedWidth(100)
-        
-        list_button_layout.addStretch()
-        list_button_layout.addWidget(self.refresh_button)
-        list_button_layout.addWidget(self.clear_list_button)
-        list_button_layout.addWidget(self.save_button)
-        list_button_layout.addStretch()
-        
-        view_layout.addWidget(self.domain_view)
-        view_layout.addLayout(list_button_layout)
-        
-        # Добавление виджетов в основной layout
-        layout.addWidget(title_label)
-        if self.description:
-            layout.addWidget(description_label)
-        layout.addWidget(add_group)
-        layout.addWidget(view_group)
-        layout.addStretch()
-    
-    def load_file(self):
-        """Загружает содержимое файла"""
-        try:
-            # Получаем директорию из пути
-            directory = os.path.dirname(self.file_path)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory)
-            
-            if os.path.exists(self.file_path):
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                self.domain_view.setText(content)
-            else:
-                # Создаем пустой файл
-                with open(self.file_path, 'w', encoding='utf-8') as f:
-                    pass
-                self.domain_view.setText("")
-                
-        except Exception as e:
-            QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить файл:\n{str(e)}")
-    
-    def add_domains(self):
-        """Добавляет новые домены в список"""
-        input_text = self.domain_input.toPlainText().strip()
-        if not input_text:
-            QMessageBox.warning(self, "Предупреждение", "Введите домены для добавления.")
-            return
-        
-        new_domains = [d.strip() for d in input_text.split('\n') if d.strip()]
-        
-        if not new_domains:
-            return
-        
-        existing_domains = []
-        if os.path.exists(self.file_path):
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                existing_domains = [d.strip() for d in f.read().split('\n') if d.strip()]
-        
-        added_count = 0
-        duplicate_count = 0
-        
-        for domain in new_domains:
-            if not self.is_valid_domain(domain):
-                QMessageBox.warning(self, "Предупреждение", f"Неверный формат: {domain}")
-                continue
-                
-            if domain not in existing_domains:
-                existing_domains.append(domain)
-                added_count += 1
-            else:
-                duplicate_count += 1
-        
-        try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(existing_domains))
-            
-            self.load_file()
-            self.domain_input.clear()
-            
-            msg = f"Добавлено: {added_count}"
-            if duplicate_count > 0:
-                msg += f"\nДубликатов: {duplicate_count}"
-            
-            QMessageBox.information(self, "Успех", msg)
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить:\n{str(e)}")
-    
-    def is_valid_domain(self, domain):
-        """Проверяет, является ли строка валидным доменом"""
-        if not domain or not domain.strip():
-            return False
-        
-        domain = domain.strip()
-        
-        # Допускаем IP-адреса
-        if domain.replace('.', '').isdigit():
-            # Это может быть IP адрес
-            parts = domain.split('.')
-            if len(parts) == 4 and all(part.isdigit() for part in parts):
-                return True
-        
-        if '.' not in domain:
-            return False
-        
-        if ' ' in domain or '\t' in domain:
-            return False
-        
-        allowed_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-_')
-        return all(c in allowed_chars for c in domain)
-    
-    def clear_input(self):
-        """Очищает поле ввода"""
-        self.domain_input.clear()
-    
-    def clear_list(self):
-        """Очищает весь список"""
-        reply = QMessageBox.question(
-            self, "Подтверждение",
-            "Очистить весь список?",
-            QMessageBox.Yes | QMessageBox.No,
-            QMessageBox.No
-        )
-        
-        if reply == QMessageBox.Yes:
-            try:
-                with open(self.file_path, 'w', encoding='utf-8') as f:
-                    pass
-                self.load_file()
-                QMessageBox.information(self, "Успех", "Список очищен.")
-            except Exception as e:
-                QMessageBox.critical(self, "Ошибка", f"Ошибка:\n{str(e)}")
-    
-    def save_file(self):
-        """Сохраняет изменения в файле"""
-        current_content = self.domain_view.toPlainText()
-        
-        domains = [d.strip() for d in current_content.split('\n') if d.strip()]
-        invalid_domains = []
-        
-        for domain in domains:
-            if not self.is_valid_domain(domain):
-                invalid_domains.append(domain)
-        
-        if invalid_domains:
-            reply = QMessageBox.warning(
-                self, "Неверные домены",
-                f"Неверные домены:\n\n" +
-                "\n".join(invalid_domains) +
-                "\n\nПродолжить без них?",
-                QMessageBox.Yes | QMessageBox.No,
-                QMessageBox.No
-            )
-            
-            if reply == QMessageBox.Yes:
-                domains = [d for d in domains if self.is_valid_domain(d)]
-                current_content = '\n'.join(domains)
-            else:
-                return
-        
-        try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                f.write(current_content)
-            
-            QMessageBox.information(self, "Успех", f"Сохранено.\nДоменов: {len(domains)}")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка сохранения:\n{str(e)}")
-
-
-class ModernWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        
-        self.bat_files = {
-            "general (ALT)": "general (ALT).bat",
-            "general (ALT2)": "general (ALT2).bat",
-            "general (ALT3)": "general (ALT3).bat",
-            "general (ALT4)": "general (ALT4).bat",
-            "general (ALT5)": "general (ALT5).bat",
-            "general (ALT6)": "general (ALT6).bat",
-            "general (ALT7)": "general (ALT7).bat",
-            "general (ALT8)": "general (ALT8).bat",
-            "general (ALT9)": "general (ALT9).bat",
-            "general (ALT10)": "general (ALT10).bat",
-            "general (ALT11)": "general (ALT11).bat"
-        }
-        
-        self.current_bat_file = list(self.bat_files.values())[0]
-        self.process = None
-        self.is_connected = False
-        
-        self.setup_ui()
-        self.setup_styles()
-        self.check_bat_files_existence()
-        self.create_directories()
-    
-    def setup_ui(self):
-        self.setWindowTitle("CrystalDPI")
-        self.setFixedSize(900, 750)
-        
-        self.tab_widget = QTabWidget()
-        self.setCentralWidget(self.tab_widget)
-        
-        # Вкладка подключения
-        self.connection_tab = QWidget()
-        self.setup_connection_tab()
-        self.tab_widget.addTab(self.connection_tab, "Подключение")
-        
-        # Вкладка основного списка
-        self.general_list_tab = ListEditorTab(
-            "lists/list-general.txt",
-            "Основной список доменов",
-            "Домены для стандартной фильтрации (каждый с новой строки)"
-        )
-        self.tab_widget.addTab(self.general_list_tab, "Основной список")
-        
-        # Вкладка списка исключений
-        self.exclude_list_tab = ListEditorTab(
-            "lists/list-exclude.txt",
-            "Список исключений",
-            "Домены которые нужно исключить из фильтрации (каждый с новой строки)"
-        )
-        self.tab_widget.addTab(self.exclude_list_tab, "Исключения")
-    
-    def setup_connection_tab(self):
-        """Настройка вкладки подключения"""
-        layout = QVBoxLayout(self.connection_tab)
-        layout.setContentsMargins(30, 30, 30, 30)
-        layout.setSpacing(15)
-        
-        title_label = QLabel("Подключение к системе")
-        title_label.setAlignment(Qt.AlignCenter)
-        title_label.setObjectName("title")
-        
-        subtitle_label = QLabel("Выберите конфигурацию и установите соединение")
-        subtitle_label.setAlignment(Qt.AlignCenter)
-        subtitle_label.setObjectName("subtitle")
-        
-        # Выбор конфигурации
-        config_layout = QHBoxLayout()
-        config_label = QLabel("Конфигурация:")
-        config_label.setObjectName("configLabel")
-        
-        self.config_combo = QComboBox()
-        self.config_combo.setObjectName("configCombo")
-        
-        for display_name, filename in self.bat_files.items():
-            self.config_combo.addItem(display_name, filename)
-        
-        self.config_combo.currentIndexChanged.connect(self.on_config_changed)
-        
-        config_layout.addStretch()
-        config_layout.addWidget(config_label)
-        config_layout.addSpacing(8)
-        config_layout.addWidget(self.config_combo)
-        config_layout.addStretch()
-        
-        # Кнопка подключения
-        self.connect_button = ModernButton("ПОДКЛЮЧИТЬ")
-        self.connect_button.clicked.connect(self.toggle_connection)
-        
-        # Статус
-        self.status_label = QLabel("Ожидание подключения...")
-        self.status_label.setAlignment(Qt.AlignCenter)
-        self.status_label.setObjectName("status")
-        
-        # Индикатор статуса
-        self.status_indicator = StatusIndicator()
-        
-        # Layout для индикатора
-        status_layout = QHBoxLayout()
-        status_layout.addStretch()
-        status_layout.addWidget(self.status_indicator)
-        status_layout.addSpacing(8)
-        status_layout.addWidget(self.status_label)
-        status_layout.addStretch()
-        
-        # Информационная панель
-        info_frame = QFrame()
-        info_frame.setObjectName("infoFrame")
-        info_layout = QVBoxLayout(info_frame)
-        info_layout.setContentsMargins(15, 15, 15, 15)
-        info_layout.setSpacing(8)
-        
-        info_title = QLabel("Информация")
-        info_title.setObjectName("infoTitle")
-        
-        self.info_text = QLabel(
-            f"Выбран файл: {self.current_bat_file}\n"
-            "Нажмите кнопку для подключения"
-        )
-        self.info_text.setWordWrap(True)
-        self.info_text.setObjectName("infoText")
-        
-        info_layout.addWidget(info_title)
-        info_layout.addWidget(self.info_text)
-        
-        # Добавление виджетов
-        layout.addStretch()
-        layout.addWidget(title_label)
-        layout.addWidget(subtitle_label)
-        layout.addLayout(config_layout)
-        layout.addStretch()
-        layout.addWidget(self.connect_button, 0, Qt.AlignCenter)
-        layout.addSpacing(15)
-        layout.addLayout(status_layout)
-        layout.addStretch()
-        layout.addWidget(info_frame)
-        layout.addStretch()
-    
-    def setup_styles(self):
-        self.setStyleSheet("""
-            QMainWindow {
-                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
-                    stop:0 #667eea, stop:1 #764ba2);
-            }
-            
-            QTabWidget::pane {
-                border: none;
-                background: transparent;
-            }
-            
-            QTabBar::tab {
-                background: rgba(255, 255, 255, 0.1);
-                color: white;
-                padding: 8px 12px;
-                margin-right: 2px;
-                border-top-left-radius: 4px;
-                border-top-right-radius: 4px;
-                font-family: 'Segoe UI';
-                font-size: 11px;
-                min-width: 70px;
-            }
-            
-            QTabBar::tab:selected {
-                background: rgba(255, 255, 255, 0.2);
-                font-weight: bold;
-            }
-            
-            QTabBar::tab:hover {
-                background: rgba(255, 255, 255, 0.15);
-            }
-            
-            #title {
-                font-family: 'Segoe UI';
-                font-size: 24px;
-                font-weight: bold;
-                color: white;
-                padding: 5px;
-            }
-            
-            #subtitle {
-                font-family: 'Segoe UI';
-                font-size: 13px;
-                color: rgba(255, 255, 255, 0.9);
-                padding: 3px;
-            }
-            
-            #configLabel {
-                font-family: 'Segoe UI';
-                font-size: 14px;
-                font-weight: medium;
-                color: white;
-            }
-            
-            #configCombo {
-                font-family: 'Segoe UI';
-                font-size: 13px;
-                padding: 6px 12px;
-                border-radius: 6px;
-                background-color: white;
-                border: 1px solid rgba(0, 0, 0, 0.3);
-                color: #333;
-                min-width: 180px;
-            }
-            
-            #configCombo::drop-down {
-                border: none;
-            }
-            
-            #configCombo QAbstractItemView {
-                background-color: white;
-                color: #333;
-                border-radius: 6px;
-                border: 1px solid rgba(0, 0, 0, 0.1);
-                font-size: 12px;
-            }
-            
-            #status {
-                font-family: 'Segoe UI';
-                font-size: 14px;
-                font-weight: medium;
-                color: white;
-                padding: 3px;
-            }
-            
-            #infoFrame {
-                background-color: rgba(255, 255, 255, 0.1);
-                border-radius: 10px;
-                border: 1px solid rgba(255, 255, 255, 0.2);
-            }
-            
-            #infoTitle {
-                font-family: 'Segoe UI';
-                font-size: 14px;
-                font-weight: bold;
-                color: white;
-            }
-            
-            #infoText {
-                font-family: 'Segoe UI';
-                font-size: 12px;
-                color: rgba(255, 255, 255, 0.9);
-                line-height: 1.4;
-            }
-            
-            /* Стили для редактора списков */
-            #editorTitle {
-                font-family: 'Segoe UI';
-                font-size: 18px;
-                font-weight: bold;
-                color: white;
-                padding: 3px;
-            }
-            
-            #editorDescription {
-                font-family: 'Segoe UI';
-                font-size: 11px;
-                color: rgba(255, 255, 255, 0.8);
-                padding: 3px;
-            }
-            
-            QGroupBox {
-                font-family: 'Segoe UI';
-                font-size: 13px;
-                font-weight: bold;
-                color: white;
-                border: 1px solid rgba(255, 255, 255, 0.3);
-                border-radius: 8px;
-                margin-top: 10px;
-                padding-top: 10px;
-            }
-            
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 5px 0 5px;
-            }
-            
-            #domainInput, #domainView {
-                font-family: 'Consolas', 'Monospace';
-                font-size: 11px;
-                padding: 6px;
-                border-radius: 5px;
-                background-color: rgba(255, 255, 255, 0.95);
-                border: 1px solid rgba(0, 0, 0, 0.2);
-                color: #333;
-            }
-            
-            #domainInput:focus, #domainView:focus {
-                border: 1px solid #2196F3;
-            }
-            
-            QPushButton {
-                font-family: 'Segoe UI';
-                font-size: 12px;
-                padding: 6px 12px;
-                border-radius: 5px;
-                border: none;
-                min-height: 25px;
-            }
-            
-            #addButton {
-                background-color: #4CAF50;
-                color: white;
-            }
-            
-            #addButton:hover {
-                background-color: #45a049;
-            }
-            
-            #clearInputButton {
-                background-color: #FF9800;
-                color: white;
-            }
-            
-            #clearInputButton:hover {
-                background-color: #F57C00;
-            }
-            
-            #refreshButton {
-                background-color: #2196F3;
-                color: white;
-            }
-            
-            #refreshButton:hover {
-                background-color: #1976D2;
-            }
-            
-            #clearListButton {
-                background-color: #F44336;
-                color: white;
-            }
-            
-            #clearListButton:hover {
-                background-color: #D32F2F;
-            }
-            
-            #saveButton {
-                background-color: #673AB7;
-                color: white;
-            }
-            
-            #saveButton:hover {
-                background-color: #5E35B1;
-            }
-        """)
-    
-    def create_directories(self):
-        """Создает необходимые директории"""
-        directories = ['bin', 'lists']
-        for dir_name in directories:
-            if not os.path.exists(dir_name):
-                os.makedirs(dir_name)
-                print(f"Создана директория: {dir_name}")
-    
-    def check_bat_files_existence(self):
-        """Проверяет существование всех .bat файлов"""
-        print("Проверка существования .bat файлов...")
-        missing_files = []
-        for display_name, filename in self.bat_files.items():
-            if os.path.exists(filename):
-                print(f"✓ Файл найден: {filename}")
-            else:
-                print(f"✗ Файл отсутствует: {filename}")
-                missing_files.append((display_name, filename))
-        
-        if missing_files:
-            msg = "Не найдены файлы:\n\n"
-            for display_name, filename in missing_files:
-                msg += f"• {display_name} ({filename})\n"
-            msg += "\nПроверьте наличие файлов."
-            
-            QMessageBox.warning(self, "Файлы не найдены", msg)
-    
-    def on_config_changed(self, index):
-        """Обработчик изменения выбранной конфигурации"""
-        self.current_bat_file = self.config_combo.currentData()
-        self.info_text.setText(
-            f"Выбран файл: {self.current_bat_file}\n"
-            "Нажмите кнопку для подключения"
-        )
-        print(f"Выбрана конфигурация: {self.config_combo.currentText()}, файл: {self.current_bat_file}")
-    
-    def run_bat_file(self):
-        """Запускает выбранный .bat файл"""
-        try:
-            if not os.path.exists(self.current_bat_file):
-                QMessageBox.critical(self, "Ошибка", 
-                    f"Файл {self.current_bat_file} не найден!")
-                raise FileNotFoundError(f"Файл {self.current_bat_file} не найден")
-            
-            bat_path = os.path.abspath(self.current_bat_file)
-            bat_dir = os.path.dirname(bat_path)
-            
-            print(f"Запуск файла: {bat_path}")
-            print(f"Рабочая директория: {bat_dir}")
-            
-            command = f'cmd /c "{bat_path}"'
-            
-            self.process = subprocess.Popen(
-                command,
-                shell=True,
-                cwd=bat_dir,
-                creationflags=subprocess.CREATE_NEW_CONSOLE
-            )
-            
-            print(f"Конфигурация {self.config_combo.currentText()} запущена (PID: {self.process.pid})")
-            
-        except Exception as e:
-            print(f"Ошибка при запуске скрипта: {e}")
-            QMessageBox.warning(self, "Ошибка", 
-                f"Не удалось запустить скрипт:\n{str(e)}")
-            raise
-    
-    def kill_winws_process(self):
-        """Завершает все процессы winws.exe"""
-        try:
-            result = subprocess.run(
-                'tasklist /FI "IMAGENAME eq winws.exe"',
-                shell=True,
-                capture_output=True,
-                text=True,
-                encoding='cp866'
-            )
-            
-            if "winws.exe" in result.stdout:
-                print("Обнаружен процесс winws.exe. Завершаем...")
-                
-                subprocess.run(
-                    'taskkill /F /IM winws.exe',
-                    shell=True,
-                    capture_output=True,
-                    text=True
-                )
-                
-                time.sleep(1)
-                
-                result_check = subprocess.run(
-                    'tasklist /FI "IMAGENAME eq winws.exe"',
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    encoding='cp866'
-                )
-                
-                if "winws.exe" not in result_check.stdout:
-                    print("Процесс winws.exe успешно завершен.")
-                    return True
-                else:
-                    print("Не удалось завершить процесс winws.exe.")
-                    return False
-            else:
-                print("Процесс winws.exe не найден.")
-                return True
-                
-        except Exception as e:
-            print(f"Ошибка при завершении процесса winws.exe: {e}")
-            return False
-    
-    def stop_bat_file(self):
-        """Останавливает запущенный .bat файл и все связанные процессы"""
-        stopped_successfully = True
-        
-        if not self.kill_winws_process():
-            stopped_successfully = False
-        
-        if self.process:
-            try:
-                try:
-                    subprocess.run(f'taskkill /F /T /PID {self.process.pid}', 
-                                  shell=True, check=True, capture_output=True)
-                    print(f"Процесс bat-файла завершен (PID: {self.process.pid})")
-                except subprocess.CalledProcessError as e:
-                    print(f"Taskkill вернул ошибку для bat-файла: {e}")
-                    try:
-                        self.process.terminate()
-                        print(f"Попытка завершить процесс bat-файла через terminate (PID: {self.process.pid})")
-                    except:
-                        print(f"Не удалось завершить процесс bat-файла (PID: {self.process.pid})")
-                        stopped_successfully = False
-                
-                try:
-                    self.process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    try:
-                        self.process.kill()
-                        self.process.wait()
-                        print(f"Процесс bat-файла принудительно завершен (PID: {self.process.pid})")
-                    except:
-                        print(f"Не удалось принудительно завершить процесс bat-файла (PID: {self.process.pid})")
-                        stopped_successfully = False
-                
-                self.process = None
-                
-            except Exception as e:
-                print(f"Ошибка при остановке процесса bat-файла: {e}")
-                stopped_successfully = False
-        
-        try:
-            subprocess.run('taskkill /F /IM cmd.exe', 
-                          shell=True, capture_output=True)
-            print("Завершены все процессы cmd.exe")
-        except:
-            pass
-        
-        return stopped_successfully
-    
-    def toggle_connection(self):
-        if not self.is_connected:
-            self.connect()
-        else:
-            self.disconnect()
-    
-    def connect(self):
-        if not self.is_connected:
-            self.status_indicator.set_status("connecting")
-            self.status_label.setText(f"Подключение: {self.config_combo.currentText()}...")
-            self.connect_button.setEnabled(False)
-            self.config_combo.setEnabled(False)
-            
-            QTimer.singleShot(1500, self.complete_connection)
-    
-    def complete_connection(self):
-        try:
-            self.run_bat_file()
-            self.is_connected = True
-            self.connect_button.set_connected(True)
-            self.status_indicator.set_status("connected")
-            self.status_label.setText(f"Подключено: {self.config_combo.currentText()}")
-            self.connect_button.setEnabled(True)
-            self.show_success_message()
-        except Exception as e:
-            self.is_connected = False
-            self.connect_button.set_connected(False)
-            self.status_indicator.set_status("disconnected")
-            self.status_label.setText("Ожидание подключения...")
-            self.connect_button.setEnabled(True)
-            self.config_combo.setEnabled(True)
-    
-    def disconnect(self):
-        if self.is_connected:
-            reply = QMessageBox.question(
-                self, 'Отключение',
-                f'Отключиться от "{self.config_combo.currentText()}"?\n'
-                f'Будут завершены все связанные процессы.',
-                QMessageBox.Yes | QMessageBox.No,
-                QMessageBox.No
-            )
-            
-            if reply == QMessageBox.Yes:
-                self.status_indicator.set_status("connecting")
-                self.status_label.setText("Выполняется отключение...")
-                self.connect_button.setEnabled(False)
-                
-                stopped = self.stop_bat_file()
-                
-                QTimer.singleShot(1000, lambda: self.complete_disconnection(stopped))
-    
-    def complete_disconnection(self, stopped):
-        self.is_connected = False
-        
-        self.connect_button.set_connected(False)
-        self.status_indicator.set_status("disconnected")
-        self.status_label.setText("Ожидание подключения...")
-        self.connect_button.setEnabled(True)
-        self.config_combo.setEnabled(True)
-        
-        if stopped:
-            self.show_disconnect_message()
-        else:
-            QMessageBox.warning(self, "Внимание", 
-                "Не удалось полностью остановить процесс.\n"
-                "Проверьте диспетчер задач.")
-    
-    def show_success_message(self):
-        msg_box = QMessageBox()
-        msg_box.setWindowTitle("Подключение установлено")
-        msg_box.setText(f"✓ Соединение установлено!\nКонфигурация: {self.config_combo.currentText()}")
-        msg_box.setIcon(QMessageBox.Information)
-        msg_box.setStandardButtons(QMessageBox.Ok)
-        
-        msg_box.setStyleSheet("""
-            QMessageBox {
-                background-color: white;
-                font-family: 'Segoe UI';
-                border-radius: 8px;
-                font-size: 12px;
-            }
-            QMessageBox QLabel {
-                font-size: 12px;
-                color: #333;
-                padding: 8px;
-            }
-            QMessageBox QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                border: none;
-                padding: 6px 15px;
-                border-radius: 4px;
-                font-size: 12px;
-                min-width: 70px;
-            }
-            QMessageBox QPushButton:hover {
-                background-color: #45a049;
-            }
-        """)
-        
-        msg_box.exec_()
-    
-    def show_disconnect_message(self):
-        msg_box = QMessageBox()
-        msg_box.setWindowTitle("Отключение выполнено")
-        msg_box.setText(
-            f"✓ Соединение разорвано!\n"
-            f"Конфигурация: {self.config_combo.currentText()}"
-        )
-        msg_box.setIcon(QMessageBox.Information)
-        msg_box.setStandardButtons(QMessageBox.Ok)
-        
-        msg_box.setStyleSheet("""
-            QMessageBox {
-                background-color: white;
-                font-family: 'Segoe UI';
-                border-radius: 8px;
-                font-size: 12px;
-            }
-            QMessageBox QLabel {
-                font-size: 12px;
-                color: #333;
-                padding: 8px;
-            }
-            QMessageBox QPushButton {
-                background-color: #2196F3;
-                color: white;
-                border: none;
-                padding: 6px 15px;
-                border-radius: 4px;
-                font-size: 12px;
-                min-width: 70px;
-            }
-            QMessageBox QPushButton:hover {
-                background-color: #1976D2;
-            }
-        """)
-        
-        msg_box.exec_()
-    
-    def closeEvent(self, event):
-        if self.is_connected:
-            reply = QMessageBox.question(
-                self, 'Подтверждение',
-                f'Закрыть приложение?\n'
-                f'Конфигурация "{self.config_combo.currentText()}" будет отключена.',
-                QMessageBox.Yes | QMessageBox.No,
-                QMessageBox.No
-            )
-            
-            if reply == QMessageBox.Yes:
-                self.stop_bat_file()
-                event.accept()
-            else:
-                event.ignore()
-        else:
-            event.accept()
-
-
-def main():
-    app = QApplication(sys.argv)
-    app.setStyle('Fusion')
-    
-    window = ModernWindow()
-    window.show()
-    
-    sys.exit(app.exec_())
-
-if __name__ == "__main__":
+import sys
+import os
+import threading
+import time
+
+# Начало импорта для --profile-startup
+STARTED_AT = time.perf_counter()
+
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
+                             QHBoxLayout, QLabel, QPushButton, QFrame, QMessageBox,
+                             QComboBox, QTabWidget, QTextEdit, QGroupBox,
+                             QDialog, QTableWidget, QTableWidgetItem, QHeaderView,
+                             QListView, QLineEdit, QAbstractItemView, QFileDialog,
+                             QPlainTextEdit, QCheckBox)
+from PyQt5.QtCore import (Qt, QTimer, QObject, pyqtSignal, QAbstractListModel, QModelIndex,
+                          QFileSystemWatcher)
+from PyQt5.QtGui import QPainter, QColor, QBrush, QFont, QPen
+
+# Здесь только то, что нужно для первой отрисовки окна. Остальные модули
+# импортируются в диалогах и фоновых потоках, которые ими пользуются
+from system import is_admin, run_as_admin
+from strategy import parse_strategy, prepare_strategy, StrategyError
+from supervisor import WinwsSupervisor, ReadyStats
+from liststore import ListStore, atomic_write, file_signature, list_kind
+from validator import check
+from winwslog import (LogBuffer, LogWriter, LOG_FILE, format_entry, rotation_enabled,
+                      set_rotation_enabled, debug_enabled, set_debug_enabled)
+
+STARTUP_TIMES = os.path.join("utils", "startup_times.json")
+
+class ModernButton(QPushButton):
+    """Круглая кнопка с современными анимациями"""
+    
+    def __init__(self, text, parent=None):
+        super().__init__(text, parent)
+        self.setFixedSize(150, 150)
+        self.setCursor(Qt.PointingHandCursor)
+        
+        font = QFont("Segoe UI", 12, QFont.Medium)
+        self.setFont(font)
+        
+        self.normal_color = QColor("#2196F3")
+        self.hover_color = QColor("#1976D2")
+        self.pressed_color = QColor("#0D47A1")
+        self.success_color = QColor("#4CAF50")
+        self.disconnect_color = QColor("#F44336")
+        self.current_color = self.normal_color
+        
+        self.is_connected = False
+        self.is_hovered = False
+        self.is_pressed = False
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        
+        painter.setBrush(QBrush(self.current_color))
+        painter.setPen(Qt.NoPen)
+        painter.drawEllipse(10, 10, 130, 130)
+        
+        painter.setPen(Qt.white)
+        painter.setFont(self.font())
+        
+        if self.is_connected:
+            font = QFont("Arial", 36, QFont.Bold)
+            painter.setFont(font)
+            painter.drawText(self.rect(), Qt.AlignCenter, "✕")
+        else:
+            painter.drawText(self.rect(), Qt.AlignCenter, self.text())
+        
+        if self.is_hovered or self.is_pressed:
+            painter.setBrush(QBrush(QColor(255, 255, 255, 30 if self.is_hovered else 50)))
+            painter.drawEllipse(10, 10, 130, 130)
+    
+    def enterEvent(self, event):
+        self.is_hovered = True
+        if self.is_connected:
+            self.current_color = self.disconnect_color
+        else:
+            self.current_color = self.hover_color
+        self.update()
+        super().enterEvent(event)
+    
+    def leaveEvent(self, event):
+        self.is_hovered = False
+        if self.is_connected:
+            self.current_color = self.success_color
+        else:
+            self.current_color = self.normal_color
+        self.update()
+        super().leaveEvent(event)
+    
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.is_pressed = True
+            if self.is_connected:
+                self.current_color = self.disconnect_color
+            else:
+                self.current_color = self.pressed_color
+            self.update()
+        super().mousePressEvent(event)
+    
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.is_pressed = False
+            if self.is_connected:
+                self.current_color = self.disconnect_color if self.is_hovered else self.success_color
+            else:
+                self.current_color = self.hover_color if self.is_hovered else self.normal_color
+            self.update()
+        super().mouseReleaseEvent(event)
+    
+    def set_connected(self, connected):
+        self.is_connected = connected
+        if connected:
+            self.current_color = self.success_color
+            self.setText("ОТКЛЮЧИТЬ")
+        else:
+            self.current_color = self.normal_color
+            self.setText("ПОДКЛЮЧИТЬ")
+        self.update()
+
+
+class StatusIndicator(QWidget):
+    """Индикатор статуса с анимацией"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedSize(20, 20)
+        self.status = "disconnected"
+        
+        self.rotation_angle = 0
+        self.rotation_timer = QTimer()
+        self.rotation_timer.timeout.connect(self.update_rotation)
+        
+    def update_rotation(self):
+        self.rotation_angle = (self.rotation_angle + 30) % 360
+        self.update()
+        
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        
+        if self.status == "connected":
+            painter.setBrush(QBrush(QColor("#4CAF50")))
+            painter.setPen(Qt.NoPen)
+            painter.drawEllipse(0, 0, 20, 20)
+            
+            painter.setPen(QPen(Qt.white, 2))
+            painter.drawLine(5, 10, 9, 14)
+            painter.drawLine(9, 14, 15, 6)
+        
+        elif self.status == "connecting":
+            painter.setBrush(QBrush(QColor("#FF9800")))
+            painter.setPen(Qt.NoPen)
+            painter.drawEllipse(0, 0, 20, 20)
+            
+            painter.setPen(QPen(Qt.white, 2))
+            painter.save()
+            painter.translate(10, 10)
+            painter.rotate(self.rotation_angle)
+            painter.drawArc(-6, -6, 12, 12, 45 * 16, 270 * 16)
+            painter.restore()
+        
+        else:
+            painter.setBrush(QBrush(QColor("#F44336")))
+            painter.setPen(Qt.NoPen)
+            painter.drawEllipse(0, 0, 20, 20)
+            
+            painter.setPen(QPen(Qt.white, 2))
+            painter.drawLine(5, 5, 15, 15)
+            painter.drawLine(15, 5, 5, 15)
+    
+    def set_status(self, status):
+        self.status = status
+        if status == "connecting":
+            self.rotation_timer.start(50)
+        else:
+            self.rotation_timer.stop()
+        self.update()
+
+
+class ListModel(QAbstractListModel):
+    """Модель строк ListStore для QListView
+    
+    Представление запрашивает только видимые строки, поэтому список на
+    сотни тысяч записей не декодируется и не проверяется целиком.
+    """
+    
+    modified = pyqtSignal()
+    
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.filter_text = ""
+        # Номера строк хранилища, прошедших фильтр; None - показываются все
+        self.rows = None
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows) if self.rows is not None else len(self.store)
+    
+    def store_row(self, row):
+        return self.rows[row] if self.rows is not None else row
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        text = self.store.row(self.store_row(index.row()))
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return text
+        if role in (Qt.ForegroundRole, Qt.BackgroundRole, Qt.ToolTipRole):
+            error = self.store.validator(text)
+            if error is None:
+                return None
+            if role == Qt.ForegroundRole:
+                return QColor("#D32F2F")
+            if role == Qt.BackgroundRole:
+                return QColor(255, 205, 210)
+            return error
+        return None
+    
+    def flags(self, index):
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+    
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        value = value.strip()
+        # IDN сразу записывается в punycode, подсети - в каноническом виде
+        normalized, error = check(value, self.store.kind) if value else (None, None)
+        self.store.set(self.store_row(index.row()), normalized if error is None and normalized else value)
+        self.dataChanged.emit(index, index)
+        self.modified.emit()
+        return True
+    
+    def _refilter(self):
+        self.rows = self.store.find(self.filter_text) if self.filter_text.strip() else None
+    
+    def set_filter(self, text):
+        self.beginResetModel()
+        self.filter_text = text
+        self._refilter()
+        self.endResetModel()
+    
+    def reload(self):
+        self.beginResetModel()
+        self.store.load()
+        self._refilter()
+        self.endResetModel()
+    
+    def append(self, lines):
+        self.beginResetModel()
+        self.store.append(lines)
+        self._refilter()
+        self.endResetModel()
+        self.modified.emit()
+    
+    def remove(self, rows):
+        """Удаляет строки по номерам в представлении"""
+        self.remove_store_rows([self.store_row(row) for row in rows])
+    
+    def remove_store_rows(self, rows):
+        """Удаляет строки по номерам в хранилище"""
+        self.beginResetModel()
+        self.store.remove_rows(rows)
+        self._refilter()
+        self.endResetModel()
+        self.modified.emit()
+    
+    def clear(self):
+        self.beginResetModel()
+        self.store.clear()
+        self._refilter()
+        self.endResetModel()
+        self.modified.emit()
+
+
+class ImportWorker(QObject):
+    """Импортирует записи в фоновом потоке и сообщает о ходе через сигналы"""
+    
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(object)
+    
+    def __init__(self, existing, kind, source, parent=None):
+        super().__init__(parent)
+        self.existing = existing
+        self.kind = kind
+        # source() возвращает итератор строк; читается уже в фоновом потоке
+        self.source = source
+    
+    def start(self):
+        threading.Thread(target=self.run, name="list-import", daemon=True).start()
+    
+    def run(self):
+        from importer import BulkImporter
+        try:
+            importer = BulkImporter(self.existing, self.kind, on_progress=self.progress.emit)
+            report = importer.run(self.source())
+        except Exception as e:
+            print(f"Ошибка импорта: {e}")
+            report = None
+        self.finished.emit(report)
+
+
+class ListWatcher(QObject):
+    """Сообщает об изменении файлов списков другими программами
+    
+    Наблюдается и сам файл, и его каталог: после замены файла переименованием
+    QFileSystemWatcher перестает следить за путем, поэтому он добавляется
+    заново. События собираются таймером, а изменение определяется по размеру
+    и времени изменения файла - так собственные сохранения редактора
+    (note_saved) не вызывают перечитывания.
+    """
+    
+    changed = pyqtSignal(str)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.signatures = {}
+        self.pending = set()
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_event)
+        self.watcher.directoryChanged.connect(self.on_directory_event)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(300)
+        self.timer.timeout.connect(self.check)
+    
+    def watch(self, path):
+        path = os.path.abspath(path)
+        self.signatures[path] = file_signature(path)
+        directory = os.path.dirname(path)
+        if directory not in self.watcher.directories():
+            self.watcher.addPath(directory)
+        self._watch_file(path)
+    
+    def _watch_file(self, path):
+        if os.path.exists(path) and path not in self.watcher.files():
+            self.watcher.addPath(path)
+    
+    def note_saved(self, path):
+        """Запоминает подпись файла после собственного сохранения"""
+        self.signatures[os.path.abspath(path)] = file_signature(path)
+    
+    def on_file_event(self, path):
+        self.pending.add(os.path.abspath(path))
+        self.timer.start()
+    
+    def on_directory_event(self, directory):
+        directory = os.path.abspath(directory)
+        for path in self.signatures:
+            if os.path.dirname(path) == directory:
+                self.pending.add(path)
+        self.timer.start()
+    
+    def check(self):
+        pending, self.pending = self.pending, set()
+        for path in pending:
+            self._watch_file(path)
+            signature = file_signature(path)
+            if signature != self.signatures.get(path):
+                self.signatures[path] = signature
+                self.changed.emit(path)
+
+
+class ListEditorTab(QWidget):
+    """Вкладка для редактирования списка доменов или IP-адресов
+    
+    Правки сохраняются сами через короткую паузу: снимок хранилища
+    записывается в фоновом потоке во временный файл, который затем
+    переименовывается поверх списка, так что winws никогда не читает
+    наполовину записанный файл.
+    
+    Файл читается и виджеты создаются при первом открытии вкладки
+    (ensure_loaded), а не при запуске окна.
+    """
+    
+    saved = pyqtSignal(object)
+    # Список записан на диск: (путь, time.monotonic() до записи)
+    list_saved = pyqtSignal(str, float)
+    ipset_finished = pyqtSignal(object)
+    
+    def __init__(self, file_path, title, description="", watcher=None, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self.title = title
+        self.description = description
+        self.kind = list_kind(file_path)
+        self.loaded = False
+        self.store = None
+        self.model = None
+        self.import_worker = None
+        self.import_clear_input = False
+        self.save_thread = None
+        self.save_requested = False
+        self.watcher = watcher
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(500)
+        self.save_timer.timeout.connect(self.flush_save)
+        self.saved.connect(self.on_saved)
+        self.ipset = None
+        self.ipset_finished.connect(self.on_ipset_finished)
+    
+    def ensure_loaded(self):
+        """Читает файл и строит вкладку при первом открытии"""
+        if self.loaded:
+            return
+        self.loaded = True
+        if self.kind == "ipset":
+            from ipset import IpsetManager
+            self.ipset = IpsetManager(self.file_path)
+        self.store = ListStore(self.file_path, self.kind)
+        self.model = ListModel(self.store, self)
+        self.model.modified.connect(self.schedule_save)
+        self.setup_ui()
+        self.load_file()
+        if self.watcher is not None:
+            self.watcher.watch(self.file_path)
+            self.watcher.changed.connect(self.on_disk_changed)
+    
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        layout.setSpacing(10)
+        is_ipset = self.kind == "ipset"
+        
+        # Заголовок
+        title_label = QLabel(self.title)
+        title_label.setObjectName("editorTitle")
+        title_label.setAlignment(Qt.AlignCenter)
+        
+        # Описание (если есть)
+        if self.description:
+            description_label = QLabel(self.description)
+            description_label.setWordWrap(True)
+            description_label.setObjectName("editorDescription")
+            description_label.setAlignment(Qt.AlignCenter)
+            layout.addWidget(description_label)
+        
+        # Группа для добавления записей
+        add_group = QGroupBox("Добавить адреса" if is_ipset else "Добавить домены")
+        add_group.setObjectName("addGroup")
+        add_layout = QVBoxLayout(add_group)
+        add_layout.setSpacing(8)
+        
+        # Текстовое поле для ввода новых записей
+        self.domain_input = QTextEdit()
+        self.domain_input.setObjectName("domainInput")
+        if is_ipset:
+            self.domain_input.setPlaceholderText("192.0.2.0/24\n2001:db8::/32")
+        else:
+            self.domain_input.setPlaceholderText("example.com\nsub.example.com")
+        self.domain_input.setMaximumHeight(70)
+        
+        # Кнопки добавления
+        button_layout = QHBoxLayout()
+        self.add_button = QPushButton("Добавить")
+        self.add_button.setObjectName("addButton")
+        self.add_button.clicked.connect(self.add_domains)
+        self.add_button.setFixedWidth(120)
+        
+        self.clear_input_button = QPushButton("Очистить")
+        self.clear_input_button.setObjectName("clearInputButton")
+        self.clear_input_button.clicked.connect(self.clear_input)
+        self.clear_input_button.setFixedWidth(120)
+        
+        self.import_button = QPushButton("Из файла...")
+        self.import_button.setObjectName("refreshButton")
+        self.import_button.clicked.connect(self.import_files)
+        self.import_button.setFixedWidth(120)
+        
+        self.clipboard_button = QPushButton("Из буфера")
+        self.clipboard_button.setObjectName("refreshButton")
+        self.clipboard_button.clicked.connect(self.import_clipboard)
+        self.clipboard_button.setFixedWidth(120)
+        
+        button_layout.addStretch()
+        button_layout.addWidget(self.add_button)
+        button_layout.addWidget(self.import_button)
+        button_layout.addWidget(self.clipboard_button)
+        button_layout.addWidget(self.clear_input_button)
+        button_layout.addStretch()
+        
+        add_layout.addWidget(self.domain_input)
+        add_layout.addLayout(button_layout)
+        
+        # Группа для просмотра и редактирования
+        view_group = QGroupBox("Текущий список")
+        view_group.setObjectName("viewGroup")
+        view_layout = QVBoxLayout(view_group)
+        view_layout.setSpacing(8)
+        
+        # Поиск по списку
+        self.search_input = QLineEdit()
+        self.search_input.setObjectName("domainSearch")
+        self.search_input.setPlaceholderText("Поиск...")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.apply_filter)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        
+        # Список: строки запрашиваются у модели только для видимой области
+        self.domain_view = QListView()
+        self.domain_view.setObjectName("domainView")
+        self.domain_view.setModel(self.model)
+        self.domain_view.setUniformItemSizes(True)
+        self.domain_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.domain_view.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed)
+        self.domain_view.setMinimumHeight(260)
+        
+        self.status_label = QLabel()
+        self.status_label.setObjectName("editorDescription")
+        
+        # Кнопки управления списком
+        list_button_layout = QHBoxLayout()
+        self.refresh_button = QPushButton("Обновить")
+        self.refresh_button.setObjectName("refreshButton")
+        self.refresh_button.clicked.connect(self.load_file)
+        self.refresh_button.setFixedWidth(100)
+        
+        self.remove_button = QPushButton("Удалить")
+        self.remove_button.setObjectName("clearInputButton")
+        self.remove_button.clicked.connect(self.remove_selected)
+        self.remove_button.setFixedWidth(100)
+        
+        self.clear_list_button = QPushButton("Очистить")
+        self.clear_list_button.setObjectName("clearListButton")
+        self.clear_list_button.clicked.connect(self.clear_list)
+        self.clear_list_button.setFixedWidth(100)
+        
+        self.save_button = QPushButton("Сохранить")
+        self.save_button.setObjectName("saveButton")
+        self.save_button.clicked.connect(self.save_file)
+        self.save_button.setFixedWidth(100)
+        
+        list_button_layout.addStretch()
+        list_button_layout.addWidget(self.refresh_button)
+        list_button_layout.addWidget(self.remove_button)
+        list_button_layout.addWidget(self.clear_list_button)
+        list_button_layout.addWidget(self.save_button)
+        list_button_layout.addStretch()
+        
+        view_layout.addWidget(self.search_input)
+        view_layout.addWidget(self.domain_view)
+        view_layout.addWidget(self.status_label)
+        view_layout.addLayout(list_button_layout)
+        
+        # Загрузка ipset из сети и режимы loaded / none / any (как в service.bat)
+        if is_ipset:
+            ipset_layout = QHBoxLayout()
+            self.ipset_mode_label = QLabel()
+            self.ipset_mode_label.setObjectName("editorDescription")
+            
+            self.ipset_update_button = QPushButton("Загрузить из сети")
+            self.ipset_update_button.setObjectName("refreshButton")
+            self.ipset_update_button.clicked.connect(self.update_ipset)
+            self.ipset_update_button.setFixedWidth(150)
+            
+            self.ipset_switch_button = QPushButton("Сменить режим")
+            self.ipset_switch_button.setObjectName("refreshButton")
+            self.ipset_switch_button.clicked.connect(self.switch_ipset)
+            self.ipset_switch_button.setFixedWidth(150)
+            
+            ipset_layout.addWidget(self.ipset_mode_label)
+            ipset_layout.addStretch()
+            ipset_layout.addWidget(self.ipset_update_button)
+            ipset_layout.addWidget(self.ipset_switch_button)
+            view_layout.addLayout(ipset_layout)
+            self.update_ipset_mode()
+        
+        # Добавление виджетов в основной layout
+        layout.addWidget(title_label)
+        if self.description:
+            layout.addWidget(description_label)
+        layout.addWidget(add_group)
+        layout.addWidget(view_group)
+        layout.addStretch()
+    
+    def load_file(self):
+        """Загружает содержимое файла"""
+        try:
+            # Получаем директорию из пути
+            directory = os.path.dirname(self.file_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            
+            if not os.path.exists(self.file_path):
+                # Создаем пустой файл
+                with open(self.file_path, 'w', encoding='utf-8') as f:
+                    pass
+            
+            self.save_timer.stop()
+            self.model.reload()
+            if self.watcher is not None:
+                self.watcher.note_saved(self.file_path)
+            self.update_status()
+                
+        except Exception as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить файл:\n{str(e)}")
+    
+    def update_status(self, note=""):
+        """Показывает число строк и несохраненные изменения"""
+        text = f"Строк: {len(self.store)}"
+        if self.model.rows is not None:
+            text += f", найдено: {len(self.model.rows)}"
+        if self.save_thread is not None:
+            text += " (сохранение...)"
+        elif self.store.dirty:
+            text += " (не сохранено)"
+        if note:
+            text += f" - {note}"
+        self.status_label.setText(text)
+    
+    def apply_filter(self):
+        self.model.set_filter(self.search_input.text())
+        self.update_status()
+    
+    def add_domains(self):
+        """Добавляет новые домены из поля ввода"""
+        input_text = self.domain_input.toPlainText().strip()
+        if not input_text:
+            QMessageBox.warning(self, "Предупреждение", "Введите домены для добавления.")
+            return
+        
+        from importer import read_text
+        self.start_import(lambda: read_text(input_text), clear_input=True)
+    
+    def import_files(self):
+        """Импорт из текстовых файлов, HAR и экспорта закладок/истории браузера"""
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "Импорт в список", "",
+            "Списки и экспорт браузера (*.txt *.csv *.har *.json *.html *.htm);;Все файлы (*)"
+        )
+        if paths:
+            from importer import read_source
+            self.start_import(lambda: (line for path in paths for line in read_source(path)))
+    
+    def import_clipboard(self):
+        """Импорт из буфера обмена"""
+        text = QApplication.clipboard().text()
+        if not text.strip():
+            QMessageBox.information(self, "Импорт", "Буфер обмена пуст.")
+            return
+        from importer import read_text
+        self.start_import(lambda: read_text(text))
+    
+    def start_import(self, source, clear_input=False):
+        """Запускает импорт в фоновом потоке; в список попадут только новые записи"""
+        if self.import_worker is not None:
+            return
+        if not self.confirm_changes():
+            return
+        
+        self.set_import_running(True)
+        self.import_clear_input = clear_input
+        self.import_worker = ImportWorker(self.store.lines(), self.store.kind, source, self)
+        self.import_worker.progress.connect(self.on_import_progress)
+        self.import_worker.finished.connect(self.on_import_finished)
+        self.import_worker.start()
+    
+    def set_import_running(self, running):
+        for button in (self.add_button, self.import_button, self.clipboard_button,
+                       self.save_button, self.clear_list_button, self.refresh_button):
+            button.setEnabled(not running)
+    
+    def on_import_progress(self, count):
+        self.status_label.setText(f"Импорт: обработано строк {count}...")
+    
+    def on_import_finished(self, report):
+        self.import_worker = None
+        self.set_import_running(False)
+        if report is None:
+            self.update_status()
+            QMessageBox.critical(self, "Ошибка", "Не удалось выполнить импорт.")
+            return
+        
+        if report.added:
+            # В хранилище добавляется только новый фрагмент, файл не разбирается заново;
+            # запись на диск и пересборка списков идут в фоне (schedule_save)
+            self.model.append(report.added)
+        self.update_status()
+        if self.import_clear_input:
+            self.domain_input.clear()
+        
+        msg = report.summary() + f"\nВремя: {report.elapsed_ms} мс"
+        # Один отчет на весь импорт: неверные строки - в подробностях
+        box = QMessageBox(QMessageBox.Information, "Импорт", msg, QMessageBox.Ok, self)
+        if report.errors:
+            box.setIcon(QMessageBox.Warning)
+            box.setDetailedText(report.error_report())
+        box.exec_()
+    
+    def refresh_compiled(self):
+        """Пересобирает скомпилированные списки, собранные из этого файла"""
+        from compiler import ListCompiler, format_report
+        try:
+            results = ListCompiler().refresh(self.file_path)
+            if results:
+                print(format_report(results))
+        except OSError as e:
+            print(f"Ошибка компиляции списков: {e}")
+    
+    def compile_lists(self):
+        """Пересобирает скомпилированные списки; возвращает число избыточных записей"""
+        from cidr import coalesce, read_networks
+        from compiler import minimize_domains, read_hostlist
+        self.refresh_compiled()
+        try:
+            if self.store.kind == "ipset":
+                networks, _ = read_networks(self.file_path)
+                return len(networks) - len(coalesce(networks))
+            _, redundant = minimize_domains(read_hostlist(self.file_path))
+            return redundant
+        except OSError as e:
+            print(f"Ошибка чтения {self.file_path}: {e}")
+            return 0
+    
+    def clear_input(self):
+        """Очищает поле ввода"""
+        self.domain_input.clear()
+    
+    def remove_selected(self):
+        """Удаляет выделенные строки"""
+        rows = [index.row() for index in self.domain_view.selectionModel().selectedRows()]
+        if rows:
+            self.model.remove(rows)
+    
+    def clear_list(self):
+        """Очищает весь список"""
+        reply = QMessageBox.question(
+            self, "Подтверждение",
+            "Очистить весь список?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        
+        if reply == QMessageBox.Yes:
+            self.model.clear()
+    
+    def invalid_changes(self):
+        """Неверные строки среди измененных после сохранения"""
+        return [(row, text) for row, text in self.store.changed_rows()
+                if self.store.validator(text) is not None]
+    
+    def confirm_changes(self):
+        """Проверяет измененные строки; False - пользователь отменил сохранение"""
+        # Проверяются только строки, измененные после сохранения
+        invalid_rows = self.invalid_changes()
+        
+        if invalid_rows:
+            shown = "\n".join(text for _, text in invalid_rows[:20])
+            if len(invalid_rows) > 20:
+                shown += f"\n... и еще {len(invalid_rows) - 20}"
+            reply = QMessageBox.warning(
+                self, "Неверные записи",
+                f"Неверные записи ({len(invalid_rows)}):\n\n" + shown +
+                "\n\nПродолжить без них?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
+            )
+            
+            if reply != QMessageBox.Yes:
+                return False
+            self.model.remove_store_rows(row for row, _ in invalid_rows)
+        return True
+    
+    def save_file(self):
+        """Сохраняет изменения сразу и показывает итог"""
+        if not self.confirm_changes():
+            return
+        self.flush_save(explicit=True)
+    
+    def schedule_save(self):
+        """Откладывает запись: серия правок сохраняется одной записью"""
+        self.update_status()
+        self.save_timer.start()
+    
+    def flush_save(self, explicit=False):
+        """Записывает снимок списка в фоновом потоке"""
+        self.save_timer.stop()
+        if self.save_thread is not None:
+            # Следующая запись начнется после текущей (on_saved)
+            self.save_requested = self.save_requested or explicit
+            return
+        if not explicit:
+            if not self.store.dirty:
+                return
+            invalid_rows = self.invalid_changes()
+            if invalid_rows:
+                # Неверные строки не попадают в файл без подтверждения (кнопка "Сохранить")
+                self.update_status(f"неверных записей: {len(invalid_rows)}")
+                return
+        
+        generation = self.store.generation
+        chunks = self.store.snapshot() if self.store.dirty else None
+        self.save_thread = threading.Thread(
+            target=self.write_snapshot, args=(chunks, generation, explicit),
+            name="list-save", daemon=True
+        )
+        self.save_thread.start()
+        self.update_status()
+    
+    def write_snapshot(self, chunks, generation, explicit):
+        """Выполняется в фоновом потоке: запись файла и пересборка скомпилированных списков"""
+        written_at = time.monotonic()
+        try:
+            if chunks is not None:
+                atomic_write(self.file_path, chunks)
+            redundant = self.compile_lists() if explicit else self.refresh_compiled()
+            self.saved.emit((generation, explicit, redundant, written_at, None))
+        except Exception as e:
+            self.saved.emit((generation, explicit, 0, written_at, e))
+    
+    def on_saved(self, result):
+        generation, explicit, redundant, written_at, error = result
+        self.save_thread.join()
+        self.save_thread = None
+        if error is None:
+            self.store.mark_saved(generation)
+            if self.watcher is not None:
+                self.watcher.note_saved(self.file_path)
+            self.list_saved.emit(self.file_path, written_at)
+        
+        if self.save_requested:
+            self.save_requested = False
+            self.flush_save(explicit=True)
+        elif self.store.dirty and error is None:
+            # Пока шла запись, список успели изменить
+            self.save_timer.start()
+        self.update_status("" if error is None else "ошибка сохранения")
+        
+        if error is not None:
+            print(f"Ошибка сохранения {self.file_path}: {error}")
+            if explicit:
+                QMessageBox.critical(self, "Ошибка", f"Ошибка сохранения:\n{str(error)}")
+        elif explicit:
+            msg = f"Сохранено.\nСтрок: {len(self.store)}"
+            if redundant:
+                msg += f"\nИзбыточных записей: {redundant} (не попадут в winws)"
+            QMessageBox.information(self, "Успех", msg)
+    
+    def flush_pending(self):
+        """Синхронно дописывает отложенные правки (при закрытии окна)"""
+        if not self.loaded:
+            return
+        self.save_timer.stop()
+        if self.save_thread is not None:
+            self.save_thread.join()
+        if self.store.dirty and not self.invalid_changes():
+            try:
+                self.store.save()
+                self.refresh_compiled()
+            except OSError as e:
+                print(f"Ошибка сохранения {self.file_path}: {e}")
+    
+    def update_ipset_mode(self):
+        self.ipset_mode_label.setText(f"Режим ipset: {self.ipset.mode()}")
+    
+    def update_ipset(self):
+        """Загружает ipset из сети, если список на сервере изменился"""
+        self.run_ipset(self.ipset.update, "Загрузка ipset...")
+    
+    def switch_ipset(self):
+        """Переключает режим ipset: loaded -> none -> any -> loaded"""
+        self.run_ipset(self.ipset.switch, "Переключение режима ipset...")
+    
+    def run_ipset(self, action, message):
+        """Выполняет действие с ipset в фоновом потоке"""
+        from ipset import DownloadError
+        # Несохраненные правки записываются до замены файла
+        self.flush_pending()
+        self.ipset_update_button.setEnabled(False)
+        self.ipset_switch_button.setEnabled(False)
+        self.update_status(message)
+        
+        def run():
+            written_at = time.monotonic()
+            before = file_signature(self.file_path)
+            try:
+                result = action()
+                changed = file_signature(self.file_path) != before
+                if changed:
+                    self.refresh_compiled()
+                self.ipset_finished.emit((result, changed, written_at, None))
+            except (DownloadError, OSError) as e:
+                self.ipset_finished.emit((None, False, written_at, e))
+        
+        threading.Thread(target=run, name="ipset-update", daemon=True).start()
+    
+    def on_ipset_finished(self, payload):
+        from ipset import UpdateResult
+        result, changed, written_at, error = payload
+        self.ipset_update_button.setEnabled(True)
+        self.ipset_switch_button.setEnabled(True)
+        self.update_ipset_mode()
+        if error is not None:
+            self.update_status()
+            QMessageBox.warning(self, "Ошибка", f"ipset не изменен:\n{str(error)}")
+            return
+        
+        if changed:
+            self.model.reload()
+            if self.watcher is not None:
+                self.watcher.note_saved(self.file_path)
+            self.list_saved.emit(self.file_path, written_at)
+        if isinstance(result, UpdateResult):
+            self.update_status()
+            QMessageBox.information(self, "ipset", result.summary() + f"\nВремя: {result.elapsed_ms} мс")
+        else:
+            self.update_status(f"режим ipset: {result}")
+    
+    def on_disk_changed(self, path):
+        """Файл списка изменила другая программа (например, обновление ipset)"""
+        if path != os.path.abspath(self.file_path) or self.save_thread is not None:
+            return
+        if self.store.dirty:
+            # Несохраненные правки не затираются: пользователь решает сам ("Обновить")
+            self.update_status("файл изменен другой программой")
+            return
+        self.model.reload()
+        if self.ipset is not None:
+            self.update_ipset_mode()
+        self.update_status("файл обновлен с диска")
+
+
+class LogTab(QWidget):
+    """Журнал winws и программы
+    
+    Строки забираются из кольцевого буфера по таймеру одной порцией, а не
+    по сигналу на каждую строку, и только пока вкладка видна; окно хранит
+    не больше VIEW_LINES строк. Поэтому вывод winws --debug с тысячами
+    строк в секунду не тормозит интерфейс и не расходует память без меры;
+    все строки остаются в буфере и в файле журнала.
+    """
+    
+    VIEW_LINES = 5000
+    POLL_INTERVAL = 250
+    # Больше строк за раз не показывается: при таком потоке их все равно не прочитать
+    BATCH_LINES = 1000
+    
+    def __init__(self, log, activity=None, parent=None):
+        super().__init__(parent)
+        self.log = log
+        # Функция, возвращающая ProfileActivity текущего подключения
+        self.activity = activity
+        self.seq = 0
+        self.setup_ui()
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(self.POLL_INTERVAL)
+        self.poll_timer.timeout.connect(self.poll)
+    
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(15, 15, 15, 15)
+        layout.setSpacing(10)
+        
+        title_label = QLabel("Журнал winws")
+        title_label.setObjectName("editorTitle")
+        title_label.setAlignment(Qt.AlignCenter)
+        
+        self.log_view = QPlainTextEdit()
+        self.log_view.setObjectName("domainInput")
+        self.log_view.setReadOnly(True)
+        self.log_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.log_view.setMaximumBlockCount(self.VIEW_LINES)
+        self.log_view.setFont(QFont("Consolas", 9))
+        
+        self.status_label = QLabel()
+        self.status_label.setObjectName("editorDescription")
+        
+        button_layout = QHBoxLayout()
+        self.pause_check = QCheckBox("Пауза")
+        self.disk_check = QCheckBox("Сохранять на диск")
+        self.disk_check.setToolTip(f"Писать журнал в {LOG_FILE} со сжатием старых частей")
+        self.disk_check.setChecked(rotation_enabled())
+        self.disk_check.toggled.connect(self.toggle_disk_log)
+        
+        self.debug_check = QCheckBox("Отладка winws")
+        self.debug_check.setToolTip("Запускать winws с --debug: нужно для активности профилей, "
+                                    "действует со следующего подключения")
+        self.debug_check.setChecked(debug_enabled())
+        self.debug_check.toggled.connect(self.toggle_debug)
+        
+        self.activity_button = QPushButton("Активность...")
+        self.activity_button.setObjectName("refreshButton")
+        self.activity_button.setToolTip("Какие блоки стратегии и записи списков срабатывают")
+        self.activity_button.clicked.connect(self.show_activity)
+        self.activity_button.setFixedWidth(110)
+        
+        self.clear_button = QPushButton("Очистить")
+        self.clear_button.setObjectName("clearInputButton")
+        self.clear_button.clicked.connect(self.clear_log)
+        self.clear_button.setFixedWidth(100)
+        
+        self.save_button = QPushButton("Сохранить...")
+        self.save_button.setObjectName("saveButton")
+        self.save_button.clicked.connect(self.save_log)
+        self.save_button.setFixedWidth(100)
+        
+        button_layout.addWidget(self.pause_check)
+        button_layout.addWidget(self.disk_check)
+        button_layout.addWidget(self.debug_check)
+        button_layout.addStretch()
+        button_layout.addWidget(self.activity_button)
+        button_layout.addWidget(self.clear_button)
+        button_layout.addWidget(self.save_button)
+        
+        layout.addWidget(title_label)
+        layout.addWidget(self.log_view)
+        layout.addWidget(self.status_label)
+        layout.addLayout(button_layout)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.poll()
+        self.poll_timer.start()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.poll_timer.stop()
+    
+    def poll(self):
+        """Добавляет новые строки буфера одной порцией"""
+        if self.pause_check.isChecked():
+            return
+        entries, self.seq, dropped = self.log.since(self.seq, limit=self.BATCH_LINES)
+        if not entries and not dropped:
+            return
+        
+        scrollbar = self.log_view.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        lines = [format_entry(entry) for entry in entries]
+        if dropped:
+            lines.insert(0, f"... пропущено строк: {dropped}")
+        self.log_view.appendPlainText("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+        self.status_label.setText(f"Строк в буфере: {len(self.log)} из {self.log.capacity}")
+    
+    def clear_log(self):
+        self.log.clear()
+        self.seq = self.log.seq
+        self.log_view.clear()
+        self.status_label.setText("")
+    
+    def toggle_disk_log(self, enabled):
+        try:
+            set_rotation_enabled(enabled)
+            self.log.set_rotation(LOG_FILE if enabled else None)
+        except OSError as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось включить запись журнала:\n{str(e)}")
+            self.disk_check.setChecked(False)
+    
+    def toggle_debug(self, enabled):
+        try:
+            set_debug_enabled(enabled)
+        except OSError as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось изменить настройку:\n{str(e)}")
+    
+    def show_activity(self):
+        activity = self.activity() if self.activity is not None else None
+        if activity is None or activity.profile is None:
+            QMessageBox.information(self, "Активность", "Сначала подключитесь.")
+            return
+        if not activity.events and activity.profile.get_global("debug") is None:
+            QMessageBox.information(self, "Активность",
+                "winws запущен без отладочного вывода.\n"
+                "Включите \"Отладка winws\" и переподключитесь.")
+            return
+        ActivityDialog(activity, self).exec_()
+    
+    def save_log(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Сохранить журнал", "winws.log",
+                                              "Журнал (*.log *.txt)")
+        if not path:
+            return
+        try:
+            data = "\n".join(format_entry(entry) for entry in self.log.lines()) + "\n"
+            atomic_write(path, [data.encode("utf-8")])
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Ошибка сохранения:\n{str(e)}")
+
+
+class ActivityDialog(QDialog):
+    """Активность профилей: срабатывания блоков стратегии и совпадения записей списков"""
+    
+    def __init__(self, activity, parent=None):
+        super().__init__(parent)
+        self.activity = activity
+        self.setWindowTitle(f"Активность профилей: {activity.profile.name}")
+        self.resize(820, 560)
+        
+        layout = QVBoxLayout(self)
+        
+        self.summary_label = QLabel()
+        
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Блок", "Фильтр", "Всего", "За минуту", "Частые записи"])
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.itemSelectionChanged.connect(self.update_candidates)
+        
+        self.candidates_label = QLabel("Выберите блок, чтобы увидеть записи, которые ни разу не совпали")
+        self.candidates_text = QPlainTextEdit()
+        self.candidates_text.setReadOnly(True)
+        self.candidates_text.setMaximumHeight(140)
+        
+        button_layout = QHBoxLayout()
+        reset_button = QPushButton("Сбросить")
+        reset_button.clicked.connect(self.reset)
+        close_button = QPushButton("Закрыть")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(reset_button)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+        
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.table)
+        layout.addWidget(self.candidates_label)
+        layout.addWidget(self.candidates_text)
+        layout.addLayout(button_layout)
+        
+        # Счетчики копятся в потоке чтения вывода winws, окно лишь перечитывает их
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+        self.refresh()
+    
+    def refresh(self):
+        rows = self.activity.snapshot()
+        self.summary_label.setText(self.activity.summary())
+        self.table.setRowCount(len(rows))
+        for row in rows:
+            top = row["top_entries"] or row["top_hosts"]
+            values = [
+                str(row["index"] + 1),
+                row["summary"],
+                str(row["hits"]),
+                str(row["last_minute"]),
+                ", ".join(f"{name} ({count})" for name, count in top) or "—",
+            ]
+            ports = ", ".join(f"{port} ({count})" for port, count in row["top_ports"])
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column == 1:
+                    item.setToolTip(value)
+                elif column == 4 and ports:
+                    item.setToolTip(f"Порты: {ports}")
+                self.table.setItem(row["index"], column, item)
+    
+    def update_candidates(self):
+        selected = self.table.selectionModel().selectedRows()
+        if not selected:
+            return
+        index = selected[0].row()
+        candidates = self.activity.prune_candidates(index)
+        self.candidates_label.setText(
+            f"Блок {index + 1}: записей, которые ни разу не совпали - {len(candidates)} "
+            "(кандидаты на удаление, если наблюдение было достаточно долгим)"
+        )
+        self.candidates_text.setPlainText("\n".join(candidates[:5000]))
+    
+    def reset(self):
+        self.activity.reset()
+        self.refresh()
+
+
+class SupervisorBridge(QObject):
+    """Передает события супервизора winws в поток интерфейса через сигналы Qt"""
+    
+    started = pyqtSignal(int)
+    ready = pyqtSignal(int)
+    stopped = pyqtSignal(bool)
+    exited = pyqtSignal(int)
+    applied = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, supervisor, parent=None):
+        super().__init__(parent)
+        self.supervisor = supervisor
+        supervisor.add_listener(self.dispatch)
+    
+    def dispatch(self, event, value):
+        getattr(self, event).emit(value)
+
+
+class RankingWorker(QObject):
+    """Ранжирует стратегии в фоновом потоке и сообщает о ходе через сигналы"""
+    
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(list)
+    
+    def __init__(self, profiles, targets, log=None, parent=None):
+        from ranking import StrategyRanker
+        super().__init__(parent)
+        self.profiles = profiles
+        self.targets = targets
+        self.stop_requested = False
+        self.supervisor = WinwsSupervisor(log=log)
+        self.ranker = StrategyRanker(
+            self.supervisor, targets,
+            prepare=prepare_strategy,
+            on_progress=self.progress.emit,
+            should_stop=lambda: self.stop_requested
+        )
+    
+    def start(self):
+        threading.Thread(target=self.run, name="strategy-ranking", daemon=True).start()
+    
+    def run(self):
+        try:
+            scores = self.ranker.rank(self.profiles)
+        except Exception as e:
+            print(f"Ошибка автовыбора: {e}")
+            scores = []
+        self.finished.emit(scores)
+    
+    def stop(self):
+        self.stop_requested = True
+        self.supervisor.shutdown(timeout=5)
+
+
+class RankingReportDialog(QDialog):
+    """Таблица результатов автовыбора стратегии"""
+    
+    def __init__(self, scores, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Результаты автовыбора")
+        self.resize(640, 420)
+        
+        layout = QVBoxLayout(self)
+        
+        table = QTableWidget(len(scores), 5)
+        table.setHorizontalHeaderLabels(["Стратегия", "Успешно", "p50, мс", "p95, мс", "Запуск, мс"])
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        
+        for row, score in enumerate(scores):
+            if score.error:
+                success = score.error
+            else:
+                success = f"{score.ok}/{score.total} ({score.success_rate:.0%})"
+            values = [score.name, success, score.p50_ms, score.p95_ms, score.ready_ms]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem("—" if value is None else str(value))
+                if score.failed_targets:
+                    item.setToolTip("Недоступны: " + ", ".join(score.failed_targets))
+                table.setItem(row, column, item)
+        
+        close_button = QPushButton("Закрыть")
+        close_button.clicked.connect(self.accept)
+        
+        layout.addWidget(table)
+        layout.addWidget(close_button, 0, Qt.AlignRight)
+
+
+class StrategyDiffDialog(QDialog):
+    """Различия между двумя стратегиями и список дубликатов"""
+    
+    def __init__(self, catalog, current=None, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.setWindowTitle("Сравнение конфигураций")
+        self.resize(720, 520)
+        
+        layout = QVBoxLayout(self)
+        
+        combo_layout = QHBoxLayout()
+        self.first_combo = QComboBox()
+        self.second_combo = QComboBox()
+        names = list(catalog.entries)
+        for combo in (self.first_combo, self.second_combo):
+            combo.addItems(names)
+        if current in names:
+            self.first_combo.setCurrentText(current)
+            index = names.index(current)
+            self.second_combo.setCurrentIndex(index + 1 if index + 1 < len(names) else 0)
+        self.first_combo.currentIndexChanged.connect(self.update_diff)
+        self.second_combo.currentIndexChanged.connect(self.update_diff)
+        combo_layout.addWidget(self.first_combo)
+        combo_layout.addWidget(QLabel("↔"))
+        combo_layout.addWidget(self.second_combo)
+        
+        groups = catalog.duplicate_groups()
+        duplicates_label = QLabel(
+            "Дубликаты (проверяются один раз):\n" + "\n".join(group.summary() for group in groups)
+            if groups else "Дубликатов нет"
+        )
+        duplicates_label.setWordWrap(True)
+        
+        self.diff_text = QTextEdit()
+        self.diff_text.setReadOnly(True)
+        self.diff_text.setLineWrapMode(QTextEdit.NoWrap)
+        self.diff_text.setFont(QFont("Consolas", 9))
+        
+        close_button = QPushButton("Закрыть")
+        close_button.clicked.connect(self.accept)
+        
+        layout.addLayout(combo_layout)
+        layout.addWidget(duplicates_label)
+        layout.addWidget(self.diff_text)
+        layout.addWidget(close_button, 0, Qt.AlignRight)
+        self.update_diff()
+    
+    def update_diff(self):
+        first, second = self.first_combo.currentText(), self.second_combo.currentText()
+        if not first or not second:
+            return
+        try:
+            lines = self.catalog.diff(first, second)
+        except StrategyError as e:
+            self.diff_text.setPlainText(f"Ошибка: {e}")
+            return
+        self.diff_text.setPlainText("\n".join(lines) if lines else "Стратегии не различаются")
+
+
+class RouteDialog(QDialog):
+    """Какой блок стратегии обработает соединение хост:порт"""
+    
+    def __init__(self, catalog, current=None, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.router = None
+        self.setWindowTitle("Маршрут соединения")
+        self.resize(720, 460)
+        
+        layout = QVBoxLayout(self)
+        
+        self.strategy_combo = QComboBox()
+        names = list(catalog.entries)
+        self.strategy_combo.addItems(names)
+        if current in names:
+            self.strategy_combo.setCurrentText(current)
+        self.strategy_combo.currentIndexChanged.connect(self.load_router)
+        
+        query_layout = QHBoxLayout()
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("discord.media:2053, host@1.2.3.4:443/udp, 1.2.3.4:50010/udp/stun")
+        self.query_edit.returnPressed.connect(self.lookup)
+        lookup_button = QPushButton("Проверить")
+        lookup_button.clicked.connect(self.lookup)
+        query_layout.addWidget(self.query_edit)
+        query_layout.addWidget(lookup_button)
+        
+        self.result_text = QTextEdit()
+        self.result_text.setReadOnly(True)
+        self.result_text.setLineWrapMode(QTextEdit.NoWrap)
+        self.result_text.setFont(QFont("Consolas", 9))
+        
+        # Порты, которые перехватывает WinDivert, и блоки, которые не сработают никогда
+        from wfilter import minimal_enabled
+        filter_group = QGroupBox("Фильтр WinDivert")
+        filter_layout = QVBoxLayout(filter_group)
+        self.filter_label = QLabel()
+        self.filter_label.setWordWrap(True)
+        self.filter_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.minimal_check = QCheckBox("Перехватывать только порты, которые обрабатывают блоки")
+        self.minimal_check.setToolTip("--wf-tcp/--wf-udp сужаются при каждом подключении")
+        self.minimal_check.setChecked(minimal_enabled())
+        self.minimal_check.toggled.connect(self.toggle_minimal)
+        filter_layout.addWidget(self.filter_label)
+        filter_layout.addWidget(self.minimal_check)
+        
+        close_button = QPushButton("Закрыть")
+        close_button.clicked.connect(self.accept)
+        
+        layout.addWidget(self.strategy_combo)
+        layout.addLayout(query_layout)
+        layout.addWidget(self.result_text)
+        layout.addWidget(filter_group)
+        layout.addWidget(close_button, 0, Qt.AlignRight)
+        self.load_router()
+    
+    def load_router(self):
+        from router import Router
+        from wfilter import FilterPlan
+        name = self.strategy_combo.currentText()
+        if not name:
+            return
+        try:
+            profile = self.catalog.profile(name)
+        except StrategyError as e:
+            self.router = None
+            self.result_text.setPlainText(f"Ошибка: {e}")
+            self.filter_label.clear()
+            return
+        self.router = Router(profile)
+        self.filter_label.setText("\n".join(FilterPlan(profile).report()))
+        if self.query_edit.text().strip():
+            self.lookup()
+    
+    def lookup(self):
+        from router import format_route, parse_query
+        if self.router is None:
+            return
+        results = []
+        for text in self.query_edit.text().replace(",", " ").split():
+            try:
+                route = self.router.route(parse_query(text), explain=True)
+            except ValueError as e:
+                results.append(f"{text}: {e}")
+                continue
+            results.append(format_route(route, self.router, explain=True))
+        self.result_text.setPlainText("\n\n".join(results))
+    
+    def toggle_minimal(self, enabled):
+        from wfilter import set_minimal_enabled
+        try:
+            set_minimal_enabled(enabled)
+        except OSError as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось изменить настройку:\n{str(e)}")
+
+
+class StartupProfile:
+    """Время этапов запуска окна (--profile-startup)
+
+    Каждый этап отсчитывается от конца предыдущего, первый - от начала
+    импорта. Замеры копятся в utils/startup_times.json, чтобы сравнивать
+    медианы между версиями.
+    """
+
+    def __init__(self, started_at=STARTED_AT):
+        self.started_at = started_at
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def report(self):
+        stats = ReadyStats(STARTUP_TIMES)
+        previous = self.started_at
+        print("Профиль запуска:")
+        for name, at in self.marks:
+            elapsed_ms = int((at - previous) * 1000)
+            stats.record(name, elapsed_ms)
+            print(f"  {name}: {elapsed_ms} мс (медиана {stats.median(name)} мс)")
+            previous = at
+        total_ms = int((previous - self.started_at) * 1000)
+        stats.record("всего", total_ms)
+        print(f"  всего: {total_ms} мс (медиана {stats.median('всего')} мс)")
+
+
+class ModernWindow(QMainWindow):
+    # Подписки обновлены в фоне: (результаты, time.monotonic() до пересборки)
+    subscriptions_updated = pyqtSignal(object)
+    # Каталог стратегий и остальное, что не нужно до первой отрисовки, загружено в фоне
+    features_loaded = pyqtSignal(object)
+    # План запуска стратегии готов: (профиль, задания, исходные глобальные опции, ошибка)
+    launch_prepared = pyqtSignal(object)
+    # Консольный экземпляр остановлен перед подключением: (состояние, ошибка)
+    daemon_stopped = pyqtSignal(object)
+    # Окно отрисовано в первый раз
+    first_painted = pyqtSignal()
+    
+    def __init__(self, log=None):
+        super().__init__()
+        self.painted = False
+        # Общий журнал winws и программы; на диск пишется, если это включено
+        self.log = log if log is not None else LogBuffer()
+        if rotation_enabled():
+            try:
+                self.log.set_rotation(LOG_FILE)
+            except OSError as e:
+                print(f"Не удалось открыть {LOG_FILE}: {e}")
+        
+        # Стратегии ищутся в фоне после запуска (см. load_features): сборке не нужно
+        # править этот список; разбор файлов кэшируется в utils/strategies.json
+        self.strategy_catalog = None
+        self.bat_files = {}
+        
+        self.current_bat_file = ""
+        self.is_connected = False
+        self.ranking_worker = None
+        # Запущенная стратегия: (профиль со скомпилированными списками, задания, before_start,
+        # исходные глобальные опции)
+        self.running = None
+        self.ranking_cache = None
+        # Кэш подписок добавляется к спискам при компиляции
+        self.subscriptions = None
+        self.list_compiler = None
+        self.subscription_scheduler = None
+        self.subscriptions_updated.connect(self.on_subscriptions_updated)
+        self.list_watcher = ListWatcher(self)
+        
+        self.supervisor = WinwsSupervisor(log=self.log)
+        # Срабатывания блоков стратегии по отладочному выводу winws (см. activity.py);
+        # до первого подключения не нужны
+        self.activity = None
+        self.log.add_listener(self.feed_activity)
+        self.ready_stats = ReadyStats(os.path.join("utils", "ready_times.json"))
+        self.supervisor_bridge = SupervisorBridge(self.supervisor, self)
+        self.supervisor_bridge.started.connect(self.on_winws_started)
+        self.supervisor_bridge.ready.connect(self.on_winws_ready)
+        self.supervisor_bridge.stopped.connect(self.on_winws_stopped)
+        self.supervisor_bridge.exited.connect(self.on_winws_exited)
+        self.supervisor_bridge.applied.connect(self.on_lists_applied)
+        self.supervisor_bridge.failed.connect(self.on_winws_failed)
+        self.features_loaded.connect(self.on_features_loaded)
+        self.launch_prepared.connect(self.on_launch_prepared)
+        self.daemon_stopped.connect(self.on_daemon_stopped)
+        
+        # Стили задаются до создания виджетов: каждый виджет получает их один раз
+        self.setup_styles()
+        self.setup_ui()
+        self.create_directories()
+        self.load_features()
+    
+    def feed_activity(self, entry):
+        activity = self.activity
+        if activity is not None:
+            activity.feed_entry(entry)
+    
+    def setup_ui(self):
+        self.setWindowTitle("CrystalDPI")
+        self.setFixedSize(900, 750)
+        
+        self.tab_widget = QTabWidget()
+        self.setCentralWidget(self.tab_widget)
+        
+        # Вкладка подключения
+        self.connection_tab = QWidget()
+        self.setup_connection_tab()
+        self.tab_widget.addTab(self.connection_tab, "Подключение")
+        
+        # Вкладка основного списка
+        self.general_list_tab = ListEditorTab(
+            "lists/list-general.txt",
+            "Основной список доменов",
+            "Домены для стандартной фильтрации (каждый с новой строки)",
+            watcher=self.list_watcher
+        )
+        self.tab_widget.addTab(self.general_list_tab, "Основной список")
+        
+        # Вкладка списка исключений
+        self.exclude_list_tab = ListEditorTab(
+            "lists/list-exclude.txt",
+            "Список исключений",
+            "Домены которые нужно исключить из фильтрации (каждый с новой строки)",
+            watcher=self.list_watcher
+        )
+        self.tab_widget.addTab(self.exclude_list_tab, "Исключения")
+        
+        # Вкладка IP-адресов
+        self.ipset_list_tab = ListEditorTab(
+            "lists/ipset-all.txt",
+            "IP-адреса и подсети",
+            "Адреса и подсети CIDR для фильтрации по IP (каждый с новой строки)",
+            watcher=self.list_watcher
+        )
+        self.tab_widget.addTab(self.ipset_list_tab, "IPSet")
+        
+        # Вкладка журнала
+        self.log_tab = LogTab(self.log, lambda: self.activity)
+        self.tab_widget.addTab(self.log_tab, "Журнал")
+        
+        for tab in (self.general_list_tab, self.exclude_list_tab, self.ipset_list_tab):
+            tab.list_saved.connect(self.apply_list_changes)
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
+    
+    def on_tab_changed(self, index):
+        tab = self.tab_widget.widget(index)
+        if isinstance(tab, ListEditorTab):
+            tab.ensure_loaded()
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            self.first_painted.emit()
+    
+    def setup_connection_tab(self):
+        """Настройка вкладки подключения"""
+        layout = QVBoxLayout(self.connection_tab)
+        layout.setContentsMargins(30, 30, 30, 30)
+        layout.setSpacing(15)
+        
+        title_label = QLabel("Подключение к системе")
+        title_label.setAlignment(Qt.AlignCenter)
+        title_label.setObjectName("title")
+        
+        subtitle_label = QLabel("Выберите конфигурацию и установите соединение")
+        subtitle_label.setAlignment(Qt.AlignCenter)
+        subtitle_label.setObjectName("subtitle")
+        
+        # Выбор конфигурации
+        config_layout = QHBoxLayout()
+        config_label = QLabel("Конфигурация:")
+        config_label.setObjectName("configLabel")
+        
+        self.config_combo = QComboBox()
+        self.config_combo.setObjectName("configCombo")
+        self.config_combo.currentIndexChanged.connect(self.on_config_changed)
+        
+        config_layout.addStretch()
+        config_layout.addWidget(config_label)
+        config_layout.addSpacing(8)
+        config_layout.addWidget(self.config_combo)
+        config_layout.addSpacing(8)
+        
+        self.auto_button = QPushButton("Автовыбор")
+        self.auto_button.setObjectName("autoButton")
+        self.auto_button.setToolTip("Проверить все конфигурации и выбрать лучшую")
+        self.auto_button.clicked.connect(self.toggle_auto_select)
+        config_layout.addWidget(self.auto_button)
+        
+        self.diff_button = QPushButton("Сравнить")
+        self.diff_button.setObjectName("autoButton")
+        self.diff_button.setToolTip("Показать различия между конфигурациями и дубликаты")
+        self.diff_button.clicked.connect(self.show_strategy_diff)
+        config_layout.addWidget(self.diff_button)
+        
+        self.route_button = QPushButton("Маршрут")
+        self.route_button.setObjectName("autoButton")
+        self.route_button.setToolTip("Какой блок конфигурации обработает соединение хост:порт")
+        self.route_button.clicked.connect(self.show_route)
+        config_layout.addWidget(self.route_button)
+        config_layout.addStretch()
+        
+        # Кнопка подключения
+        self.connect_button = ModernButton("ПОДКЛЮЧИТЬ")
+        self.connect_button.clicked.connect(self.toggle_connection)
+        
+        # Статус
+        self.status_label = QLabel("Ожидание подключения...")
+        self.status_label.setAlignment(Qt.AlignCenter)
+        self.status_label.setObjectName("status")
+        
+        # Индикатор статуса
+        self.status_indicator = StatusIndicator()
+        
+        # Layout для индикатора
+        status_layout = QHBoxLayout()
+        status_layout.addStretch()
+        status_layout.addWidget(self.status_indicator)
+        status_layout.addSpacing(8)
+        status_layout.addWidget(self.status_label)
+        status_layout.addStretch()
+        
+        # Информационная панель
+        info_frame = QFrame()
+        info_frame.setObjectName("infoFrame")
+        info_layout = QVBoxLayout(info_frame)
+        info_layout.setContentsMargins(15, 15, 15, 15)
+        info_layout.setSpacing(8)
+        
+        info_title = QLabel("Информация")
+        info_title.setObjectName("infoTitle")
+        
+        self.info_text = QLabel(
+            f"Выбран файл: {self.current_bat_file}\n"
+            "Нажмите кнопку для подключения"
+        )
+        self.info_text.setWordWrap(True)
+        self.info_text.setObjectName("infoText")
+        
+        info_layout.addWidget(info_title)
+        info_layout.addWidget(self.info_text)
+        
+        # Добавление виджетов
+        layout.addStretch()
+        layout.addWidget(title_label)
+        layout.addWidget(subtitle_label)
+        layout.addLayout(config_layout)
+        layout.addStretch()
+        layout.addWidget(self.connect_button, 0, Qt.AlignCenter)
+        layout.addSpacing(15)
+        layout.addLayout(status_layout)
+        layout.addStretch()
+        layout.addWidget(info_frame)
+        layout.addStretch()
+    
+    def setup_styles(self):
+        self.setStyleSheet("""
+            QMainWindow {
+                background: qlineargradient(x1:0, y1:0, x2:1, y2:1,
+                    stop:0 #667eea, stop:1 #764ba2);
+            }
+            
+            QTabWidget::pane {
+                border: none;
+                background: transparent;
+            }
+            
+            QTabBar::tab {
+                background: rgba(255, 255, 255, 0.1);
+                color: white;
+                padding: 8px 12px;
+                margin-right: 2px;
+                border-top-left-radius: 4px;
+                border-top-right-radius: 4px;
+                font-family: 'Segoe UI';
+                font-size: 11px;
+                min-width: 70px;
+            }
+            
+            QTabBar::tab:selected {
+                background: rgba(255, 255, 255, 0.2);
+                font-weight: bold;
+            }
+            
+            QTabBar::tab:hover {
+                background: rgba(255, 255, 255, 0.15);
+            }
+            
+            #title {
+                font-family: 'Segoe UI';
+                font-size: 24px;
+                font-weight: bold;
+                color: white;
+                padding: 5px;
+            }
+            
+            #subtitle {
+                font-family: 'Segoe UI';
+                font-size: 13px;
+                color: rgba(255, 255, 255, 0.9);
+                padding: 3px;
+            }
+            
+            #configLabel {
+                font-family: 'Segoe UI';
+                font-size: 14px;
+                font-weight: medium;
+                color: white;
+            }
+            
+            #configCombo {
+                font-family: 'Segoe UI';
+                font-size: 13px;
+                padding: 6px 12px;
+                border-radius: 6px;
+                background-color: white;
+                border: 1px solid rgba(0, 0, 0, 0.3);
+                color: #333;
+                min-width: 180px;
+            }
+            
+            #configCombo::drop-down {
+                border: none;
+            }
+            
+            #configCombo QAbstractItemView {
+                background-color: white;
+                color: #333;
+                border-radius: 6px;
+                border: 1px solid rgba(0, 0, 0, 0.1);
+                font-size: 12px;
+            }
+            
+            #status {
+                font-family: 'Segoe UI';
+                font-size: 14px;
+                font-weight: medium;
+                color: white;
+                padding: 3px;
+            }
+            
+            #infoFrame {
+                background-color: rgba(255, 255, 255, 0.1);
+                border-radius: 10px;
+                border: 1px solid rgba(255, 255, 255, 0.2);
+            }
+            
+            #infoTitle {
+                font-family: 'Segoe UI';
+                font-size: 14px;
+                font-weight: bold;
+                color: white;
+            }
+            
+            #infoText {
+                font-family: 'Segoe UI';
+                font-size: 12px;
+                color: rgba(255, 255, 255, 0.9);
+                line-height: 1.4;
+            }
+            
+            /* Стили для редактора списков */
+            #editorTitle {
+                font-family: 'Segoe UI';
+                font-size: 18px;
+                font-weight: bold;
+                color: white;
+                padding: 3px;
+            }
+            
+            #editorDescription {
+                font-family: 'Segoe UI';
+                font-size: 11px;
+                color: rgba(255, 255, 255, 0.8);
+                padding: 3px;
+            }
+            
+            QGroupBox {
+                font-family: 'Segoe UI';
+                font-size: 13px;
+                font-weight: bold;
+                color: white;
+                border: 1px solid rgba(255, 255, 255, 0.3);
+                border-radius: 8px;
+                margin-top: 10px;
+                padding-top: 10px;
+            }
+            
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 10px;
+                padding: 0 5px 0 5px;
+            }
+            
+            #domainInput, #domainView, #domainSearch {
+                font-family: 'Consolas', 'Monospace';
+                font-size: 11px;
+                padding: 6px;
+                border-radius: 5px;
+                background-color: rgba(255, 255, 255, 0.95);
+                border: 1px solid rgba(0, 0, 0, 0.2);
+                color: #333;
+            }
+            
+            #domainInput:focus, #domainView:focus, #domainSearch:focus {
+                border: 1px solid #2196F3;
+            }
+            
+            QPushButton {
+                font-family: 'Segoe UI';
+                font-size: 12px;
+                padding: 6px 12px;
+                border-radius: 5px;
+                border: none;
+                min-height: 25px;
+            }
+            
+            #addButton {
+                background-color: #4CAF50;
+                color: white;
+            }
+            
+            #addButton:hover {
+                background-color: #45a049;
+            }
+            
+            #clearInputButton {
+                background-color: #FF9800;
+                color: white;
+            }
+            
+            #clearInputButton:hover {
+                background-color: #F57C00;
+            }
+            
+            #refreshButton {
+                background-color: #2196F3;
+                color: white;
+            }
+            
+            #refreshButton:hover {
+                background-color: #1976D2;
+            }
+            
+            #clearListButton {
+                background-color: #F44336;
+                color: white;
+            }
+            
+            #clearListButton:hover {
+                background-color: #D32F2F;
+            }
+            
+            #saveButton {
+                background-color: #673AB7;
+                color: white;
+            }
+            
+            #saveButton:hover {
+                background-color: #5E35B1;
+            }
+            
+            #autoButton {
+                background-color: rgba(255, 255, 255, 0.2);
+                color: white;
+                border: 1px solid rgba(255, 255, 255, 0.4);
+            }
+            
+            #autoButton:hover {
+                background-color: rgba(255, 255, 255, 0.3);
+            }
+        """)
+    
+    def create_directories(self):
+        """Создает необходимые директории"""
+        directories = ['bin', 'lists']
+        for dir_name in directories:
+            if not os.path.exists(dir_name):
+                os.makedirs(dir_name)
+                print(f"Создана директория: {dir_name}")
+    
+    def load_features(self):
+        """Ищет стратегии и готовит автовыбор и подписки в фоновом потоке
+        
+        Пока поиск не закончен, выбор конфигурации и кнопки, которым нужен
+        каталог, недоступны.
+        """
+        for widget in (self.config_combo, self.connect_button, self.auto_button,
+                       self.diff_button, self.route_button):
+            widget.setEnabled(False)
+        self.status_label.setText("Поиск конфигураций...")
+        
+        def run():
+            from catalog import StrategyCatalog
+            from compiler import ListCompiler
+            from crystaldpi import read_state
+            from ranking import RankingCache
+            from subscriptions import SubscriptionManager, SubscriptionScheduler
+            
+            catalog = StrategyCatalog()
+            catalog.scan()
+            bat_files = catalog.names()
+            missing_files = [(display_name, filename) for display_name, filename in bat_files.items()
+                             if not os.path.exists(filename)]
+            if not bat_files:
+                missing_files.append(("стратегии", "general*.bat"))
+            subscriptions = SubscriptionManager()
+            self.features_loaded.emit({
+                "catalog": catalog,
+                "bat_files": bat_files,
+                "missing_files": missing_files,
+                "ranking_cache": RankingCache(),
+                "subscriptions": subscriptions,
+                "list_compiler": ListCompiler(extras=subscriptions.extras),
+                "scheduler": SubscriptionScheduler(subscriptions, self.on_subscriptions_refreshed),
+                "daemon": read_state(),
+            })
+        
+        threading.Thread(target=run, name="load-features", daemon=True).start()
+    
+    def on_features_loaded(self, features):
+        self.strategy_catalog = features["catalog"]
+        self.bat_files = features["bat_files"]
+        self.ranking_cache = features["ranking_cache"]
+        self.subscriptions = features["subscriptions"]
+        self.list_compiler = features["list_compiler"]
+        self.subscription_scheduler = features["scheduler"]
+        
+        for display_name, filename in self.bat_files.items():
+            self.config_combo.addItem(display_name, filename)
+        for widget in (self.config_combo, self.connect_button, self.auto_button,
+                       self.diff_button, self.route_button):
+            widget.setEnabled(True)
+        self.status_label.setText("Ожидание подключения...")
+        self.select_cached_best()
+        self.subscription_scheduler.start()
+        if features["daemon"] is not None:
+            self.show_daemon(features["daemon"])
+        self.on_bat_files_checked(features["missing_files"])
+    
+    def on_bat_files_checked(self, missing_files):
+        if missing_files:
+            msg = "Не найдены файлы:\n\n"
+            for display_name, filename in missing_files:
+                print(f"✗ Файл отсутствует: {filename}")
+                msg += f"• {display_name} ({filename})\n"
+            msg += "\nПроверьте наличие файлов."
+            
+            QMessageBox.warning(self, "Файлы не найдены", msg)
+    
+    def on_config_changed(self, index):
+        """Обработчик изменения выбранной конфигурации"""
+        self.current_bat_file = self.config_combo.currentData()
+        self.info_text.setText(
+            f"Выбран файл: {self.current_bat_file}\n"
+            "Нажмите кнопку для подключения"
+        )
+        print(f"Выбрана конфигурация: {self.config_combo.currentText()}, файл: {self.current_bat_file}")
+    
+    def select_cached_best(self):
+        """Выбирает лучшую стратегию по результатам прошлого автовыбора"""
+        best = self.ranking_cache.best(list(self.bat_files))
+        if best is None:
+            return
+        index = self.config_combo.findText(best.name)
+        if index >= 0:
+            self.config_combo.setCurrentIndex(index)
+            print(f"Выбрана лучшая известная конфигурация: {best.name}")
+    
+    def toggle_auto_select(self):
+        if self.ranking_worker is not None:
+            self.auto_button.setEnabled(False)
+            self.status_label.setText("Остановка автовыбора...")
+            self.ranking_worker.stop_requested = True
+        else:
+            self.start_auto_select()
+    
+    def start_auto_select(self):
+        """Проверяет все конфигурации по utils/targets.txt и выбирает лучшую"""
+        if self.is_connected:
+            QMessageBox.information(self, "Автовыбор", "Сначала отключитесь.")
+            return
+        from crystaldpi import read_state
+        state = read_state()
+        if state is not None:
+            self.show_daemon(state)
+            QMessageBox.information(self, "Автовыбор",
+                f'В фоне работает "{state["strategy"]}" (crystaldpi, PID {state["pid"]}).\n'
+                "Сначала остановите его: crystaldpi stop или кнопкой подключения.")
+            return
+        
+        from probe import TARGETS_FILE, parse_targets
+        try:
+            targets = parse_targets(TARGETS_FILE)
+        except OSError as e:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось прочитать {TARGETS_FILE}:\n{str(e)}")
+            return
+        
+        # Одинаковые по командной строке стратегии проверяются один раз
+        self.strategy_catalog.scan()
+        profiles = self.strategy_catalog.unique(self.bat_files)
+        duplicates = self.strategy_catalog.duplicates()
+        
+        if not targets or not profiles:
+            QMessageBox.warning(self, "Автовыбор", "Нет целей или конфигураций для проверки.")
+            return
+        
+        skipped = f" (дубликатов пропущено: {len(duplicates)})" if duplicates else ""
+        reply = QMessageBox.question(
+            self, "Автовыбор",
+            f"Будет проверено конфигураций: {len(profiles)}{skipped}, целей: {len(targets)}.\n"
+            "Это займет несколько минут. Продолжить?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes
+        )
+        if reply != QMessageBox.Yes:
+            return
+        
+        self.connect_button.setEnabled(False)
+        self.config_combo.setEnabled(False)
+        self.auto_button.setText("Остановить")
+        self.status_indicator.set_status("connecting")
+        
+        self.ranking_worker = RankingWorker(profiles, targets, self.log, self)
+        self.ranking_worker.progress.connect(self.on_ranking_progress)
+        self.ranking_worker.finished.connect(self.on_ranking_finished)
+        self.ranking_worker.start()
+    
+    def show_strategy_diff(self):
+        self.strategy_catalog.scan()
+        StrategyDiffDialog(self.strategy_catalog, self.config_combo.currentText(), self).exec_()
+    
+    def show_route(self):
+        self.strategy_catalog.scan()
+        RouteDialog(self.strategy_catalog, self.config_combo.currentText(), self).exec_()
+    
+    def on_ranking_progress(self, index, count, name):
+        self.status_label.setText(f"Автовыбор {index + 1}/{count}: {name}")
+    
+    def on_ranking_finished(self, scores):
+        self.ranking_worker = None
+        self.auto_button.setText("Автовыбор")
+        self.auto_button.setEnabled(True)
+        self.reset_connection_state()
+        
+        if not scores:
+            return
+        
+        self.ranking_cache.update(scores)
+        best = scores[0]
+        if not best.error and best.ok:
+            index = self.config_combo.findText(best.name)
+            if index >= 0:
+                self.config_combo.setCurrentIndex(index)
+        
+        RankingReportDialog(scores, self).exec_()
+    
+    def run_bat_file(self):
+        """Запускает winws.exe напрямую по разобранной стратегии"""
+        try:
+            if not os.path.exists(self.current_bat_file):
+                QMessageBox.critical(self, "Ошибка", 
+                    f"Файл {self.current_bat_file} не найден!")
+                raise FileNotFoundError(f"Файл {self.current_bat_file} не найден")
+            
+            profile = parse_strategy(self.current_bat_file)
+            
+            missing_files = profile.missing_files()
+            if missing_files:
+                msg = "Не найдены файлы стратегии:\n\n"
+                for path in missing_files:
+                    msg += f"• {os.path.relpath(path, profile.base_dir)}\n"
+                QMessageBox.critical(self, "Файлы не найдены", msg)
+                raise FileNotFoundError(f"Не найдено файлов: {len(missing_files)}")
+            
+            print(f"Запуск стратегии: {profile.path}")
+            print(f"Профилей: {len(profile.blocks)}, GameFilter: {profile.game_filter}")
+            
+            # План списков и сужение фильтра читают файлы - не в потоке интерфейса
+            threading.Thread(target=self.prepare_launch, args=(profile,),
+                             name="strategy-prepare", daemon=True).start()
+            
+        except StrategyError as e:
+            print(f"Ошибка разбора стратегии: {e}")
+            QMessageBox.warning(self, "Ошибка", 
+                f"Не удалось разобрать стратегию:\n{str(e)}")
+            raise
+    
+    def prepare_launch(self, profile):
+        """Фоновый поток: пути к скомпилированным спискам и аргументы winws"""
+        from wfilter import minimal_enabled, minimize_filter
+        try:
+            profile, jobs = self.list_compiler.plan(profile)
+            if debug_enabled() and profile.get_global("debug") is None:
+                profile.global_options.append(("debug", "1"))
+            # Исходные --wf-*: суженный фильтр пересчитывается при смене списков
+            global_options = list(profile.global_options)
+            if minimal_enabled():
+                print(minimize_filter(profile).summary())
+        except (OSError, StrategyError) as e:
+            self.launch_prepared.emit((None, None, None, e))
+            return
+        self.launch_prepared.emit((profile, jobs, global_options, None))
+    
+    def on_launch_prepared(self, payload):
+        from activity import ProfileActivity
+        from compiler import format_report
+        profile, jobs, global_options, error = payload
+        if error is not None:
+            print(f"Ошибка подготовки стратегии: {error}")
+            QMessageBox.warning(self, "Ошибка", f"Не удалось подготовить стратегию:\n{str(error)}")
+            self.reset_connection_state()
+            return
+        self.activity = ProfileActivity(profile)
+        
+        # Списки компилируются в рабочем потоке супервизора перед запуском winws
+        def before_start():
+            print(format_report(self.list_compiler.build(jobs)))
+            prepare_strategy(profile)
+        
+        self.running = (profile, jobs, before_start, global_options)
+        self.supervisor.start(profile.argv(), profile.bin_dir, before_start)
+    
+    def toggle_connection(self):
+        if not self.is_connected:
+            self.connect()
+        else:
+            self.disconnect()
+    
+    def connect(self):
+        if not self.is_connected:
+            self.status_indicator.set_status("connecting")
+            self.status_label.setText(f"Подключение: {self.config_combo.currentText()}...")
+            self.connect_button.setEnabled(False)
+            self.config_combo.setEnabled(False)
+            
+            # Второй winws рядом с запущенным из консоли (crystaldpi start) мешает обоим
+            from crystaldpi import read_state
+            state = read_state()
+            if state is not None:
+                reply = QMessageBox.question(
+                    self, 'Уже запущено',
+                    f'В фоне работает "{state["strategy"]}" (crystaldpi, PID {state["pid"]}).\n'
+                    f'Остановить его и подключить "{self.config_combo.currentText()}"?',
+                    QMessageBox.Yes | QMessageBox.No,
+                    QMessageBox.No
+                )
+                if reply == QMessageBox.Yes:
+                    self.stop_daemon(state)
+                else:
+                    self.reset_connection_state()
+                    self.show_daemon(state)
+                return
+            
+            self.complete_connection()
+    
+    def show_daemon(self, state):
+        """Показывает стратегию, запущенную в фоне из консоли"""
+        self.status_label.setText(f"Работает в фоне: {state['strategy']} (PID {state['pid']})")
+        self.info_text.setText(
+            f"Выбран файл: {self.current_bat_file}\n"
+            f"winws запущен командой crystaldpi start: перед подключением его нужно остановить"
+        )
+    
+    def stop_daemon(self, state):
+        """Останавливает консольный экземпляр через сокет управления в фоновом потоке"""
+        from crystaldpi import CliError, stop_instance
+        self.status_label.setText(f"Остановка фонового экземпляра: {state['strategy']}...")
+        
+        def run():
+            try:
+                stop_instance(state)
+            except CliError as e:
+                self.daemon_stopped.emit((state, e))
+                return
+            self.daemon_stopped.emit((state, None))
+        
+        threading.Thread(target=run, name="daemon-stop", daemon=True).start()
+    
+    def on_daemon_stopped(self, payload):
+        state, error = payload
+        if error is not None:
+            print(f"Не удалось остановить фоновый экземпляр: {error}")
+            self.reset_connection_state()
+            self.show_daemon(state)
+            QMessageBox.warning(self, "Внимание",
+                f"Не удалось остановить фоновый экземпляр:\n{str(error)}")
+            return
+        print(f"Фоновый экземпляр остановлен: {state['strategy']}")
+        self.complete_connection()
+    
+    def complete_connection(self):
+        try:
+            self.run_bat_file()
+        except Exception as e:
+            self.reset_connection_state()
+    
+    def on_winws_started(self, pid):
+        print(f"Конфигурация {self.config_combo.currentText()} запущена (PID: {pid})")
+        self.status_label.setText(f"Запуск winws: {self.config_combo.currentText()}...")
+    
+    def on_winws_ready(self, ready_ms):
+        """winws открыл WinDivert - обход действительно активен"""
+        name = self.config_combo.currentText()
+        self.ready_stats.record(name, ready_ms)
+        self.info_text.setText(
+            f"Выбран файл: {self.current_bat_file}\n"
+            f"Время запуска: {ready_ms} мс (медиана: {self.ready_stats.median(name)} мс)"
+        )
+        
+        self.is_connected = True
+        self.connect_button.set_connected(True)
+        self.status_indicator.set_status("connected")
+        self.status_label.setText(f"Подключено: {self.config_combo.currentText()}")
+        self.connect_button.setEnabled(True)
+        self.show_success_message()
+    
+    def apply_list_changes(self, path, since):
+        """Применяет сохраненный список к работающему winws без переподключения"""
+        if not self.is_connected or self.running is None:
+            return
+        profile, jobs, before_start, global_options = self.running
+        source = os.path.abspath(path)
+        outputs = sorted({job.output for job in jobs
+                          if source in (os.path.abspath(p) for p in job.inputs)})
+        if not outputs:
+            return
+        # Смена режима ipset включает или выключает блоки: суженный фильтр считается заново,
+        # а новый фильтр WinDivert winws получает только при перезапуске
+        from wfilter import minimal_enabled, minimize_filter
+        restart = False
+        if minimal_enabled():
+            argv = profile.argv()
+            profile.global_options = list(global_options)
+            print(minimize_filter(profile).summary())
+            restart = profile.argv() != argv
+        self.status_label.setText(f"Подключено: {self.config_combo.currentText()} (применение списков...)")
+        self.supervisor.apply_lists(outputs, since, profile.argv(), profile.bin_dir, before_start, restart)
+    
+    def on_subscriptions_refreshed(self, results):
+        """Вызывается из потока планировщика: пересборка списков, зависящих от подписок"""
+        from compiler import format_report
+        written_at = time.monotonic()
+        for result in results:
+            if result.modified:
+                try:
+                    compiled = self.list_compiler.refresh(result.subscription.cache_path)
+                    if compiled:
+                        print(format_report(compiled))
+                except OSError as e:
+                    print(f"Ошибка компиляции списков: {e}")
+        self.subscriptions_updated.emit((results, written_at))
+    
+    def on_subscriptions_updated(self, payload):
+        results, written_at = payload
+        targets = {result.subscription.target for result in results if result.modified}
+        for target in sorted(targets):
+            self.apply_list_changes(target, written_at)
+    
+    def on_lists_applied(self, result):
+        """winws работает с новой версией списков"""
+        if result.mode == "reload":
+            how = "перечитаны winws без перерыва"
+        else:
+            how = f"winws перезапущен, перерыв {result.gap_ms} мс"
+        counts = ", ".join(f"{os.path.basename(path)}: {count}" for path, count in result.loaded.items())
+        self.status_label.setText(f"Подключено: {self.config_combo.currentText()} (списки применены)")
+        self.info_text.setText(
+            f"Выбран файл: {self.current_bat_file}\n"
+            f"Списки обновлены: {how}" + (f"\nЗагружено: {counts}" if counts else "")
+        )
+    
+    def on_winws_failed(self, message):
+        self.reset_connection_state()
+        QMessageBox.warning(self, "Ошибка", 
+            f"Не удалось запустить winws.exe:\n{message}")
+    
+    def on_winws_exited(self, code):
+        if self.is_connected:
+            self.reset_connection_state()
+            QMessageBox.warning(self, "Внимание", 
+                f"Процесс winws.exe неожиданно завершился (код {code}).")
+    
+    def reset_connection_state(self):
+        self.is_connected = False
+        self.running = None
+        self.connect_button.set_connected(False)
+        self.status_indicator.set_status("disconnected")
+        self.status_label.setText("Ожидание подключения...")
+        self.connect_button.setEnabled(True)
+        self.config_combo.setEnabled(True)
+    
+    def disconnect(self):
+        if self.is_connected:
+            reply = QMessageBox.question(
+                self, 'Отключение',
+                f'Отключиться от "{self.config_combo.currentText()}"?\n'
+                f'Процесс winws.exe будет завершен.',
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
+            )
+            
+            if reply == QMessageBox.Yes:
+                self.status_indicator.set_status("connecting")
+                self.status_label.setText("Выполняется отключение...")
+                self.connect_button.setEnabled(False)
+                
+                self.supervisor.stop()
+    
+    def on_winws_stopped(self, stopped):
+        self.reset_connection_state()
+        
+        if stopped:
+            self.show_disconnect_message()
+        else:
+            QMessageBox.warning(self, "Внимание", 
+                "Не удалось полностью остановить процесс.\n"
+                "Проверьте диспетчер задач.")
+    
+    def show_success_message(self):
+        msg_box = QMessageBox()
+        msg_box.setWindowTitle("Подключение установлено")
+        msg_box.setText(f"✓ Соединение установлено!\nКонфигурация: {self.config_combo.currentText()}")
+        msg_box.setIcon(QMessageBox.Information)
+        msg_box.setStandardButtons(QMessageBox.Ok)
+        
+        msg_box.setStyleSheet("""
+            QMessageBox {
+                background-color: white;
+                font-family: 'Segoe UI';
+                border-radius: 8px;
+                font-size: 12px;
+            }
+            QMessageBox QLabel {
+                font-size: 12px;
+                color: #333;
+                padding: 8px;
+            }
+            QMessageBox QPushButton {
+                background-color: #4CAF50;
+                color: white;
+                border: none;
+                padding: 6px 15px;
+                border-radius: 4px;
+                font-size: 12px;
+                min-width: 70px;
+            }
+            QMessageBox QPushButton:hover {
+                background-color: #45a049;
+            }
+        """)
+        
+        msg_box.exec_()
+    
+    def show_disconnect_message(self):
+        msg_box = QMessageBox()
+        msg_box.setWindowTitle("Отключение выполнено")
+        msg_box.setText(
+            f"✓ Соединение разорвано!\n"
+            f"Конфигурация: {self.config_combo.currentText()}"
+        )
+        msg_box.setIcon(QMessageBox.Information)
+        msg_box.setStandardButtons(QMessageBox.Ok)
+        
+        msg_box.setStyleSheet("""
+            QMessageBox {
+                background-color: white;
+                font-family: 'Segoe UI';
+                border-radius: 8px;
+                font-size: 12px;
+            }
+            QMessageBox QLabel {
+                font-size: 12px;
+                color: #333;
+                padding: 8px;
+            }
+            QMessageBox QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border: none;
+                padding: 6px 15px;
+                border-radius: 4px;
+                font-size: 12px;
+                min-width: 70px;
+            }
+            QMessageBox QPushButton:hover {
+                background-color: #1976D2;
+            }
+        """)
+        
+        msg_box.exec_()
+    
+    def closeEvent(self, event):
+        if self.is_connected:
+            reply = QMessageBox.question(
+                self, 'Подтверждение',
+                f'Закрыть приложение?\n'
+                f'Конфигурация "{self.config_combo.currentText()}" будет отключена.',
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No
+            )
+            
+            if reply != QMessageBox.Yes:
+                event.ignore()
+                return
+        
+        # Фоновые задачи останавливаются только после подтверждения: при отмене все продолжает работать
+        if self.ranking_worker is not None:
+            self.ranking_worker.stop()
+        if self.subscription_scheduler is not None:
+            self.subscription_scheduler.stop()
+        
+        for tab in (self.general_list_tab, self.exclude_list_tab, self.ipset_list_tab):
+            tab.flush_pending()
+        self.log.flush()
+        
+        # winws мог быть запущен, но еще не сообщить о готовности; без процесса это ничего не делает
+        self.supervisor.shutdown(timeout=5)
+        event.accept()
+
+
+def main():
+    # winws.exe требует прав администратора, а запускаем мы его теперь напрямую
+    if not is_admin() and run_as_admin():
+        sys.exit(0)
+    
+    profile = StartupProfile() if "--profile-startup" in sys.argv else None
+    if profile is not None:
+        profile.mark("импорт")
+    
+    # Сообщения print попадают во вкладку "Журнал" (у exe без консоли stdout нет)
+    log = LogBuffer()
+    sys.stdout = LogWriter(log, sys.stdout)
+    sys.stderr = LogWriter(log, sys.stderr)
+    
+    app = QApplication(sys.argv)
+    app.setStyle('Fusion')
+    
+    window = ModernWindow(log)
+    if profile is not None:
+        profile.mark("создание окна")
+        
+        def on_first_paint():
+            profile.mark("первая отрисовка")
+            profile.report()
+            app.quit()
+        
+        # Замер завершается после первой отрисовки, чтобы его можно было повторять
+        window.first_painted.connect(on_first_paint, Qt.QueuedConnection)
+    window.show()
+    
+    sys.exit(app.exec_())
+
+if __name__ == "__main__":
+    # Пул процессов проверки IDN в собранном exe
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -1,295 +1,369 @@
-"""
-Простой сборщик EXE для CrystalDPI
-"""
-
-import sys
-import os
-import subprocess
-import shutil
-import tempfile
-
-def check_dependencies():
-    """Проверяет и устанавливает зависимости"""
-    print("Проверка зависимостей...")
-    
-    try:
-        import PyQt5
-        print("✓ PyQt5 установлен")
-    except ImportError:
-        print("Установка PyQt5...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "PyQt5"])
-    
-    try:
-        import PyInstaller
-        print("✓ PyInstaller установлен")
-    except ImportError:
-        print("Установка PyInstaller...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "pyinstaller"])
-
-def create_spec_file():
-    """Создает spec файл для сборки"""
-    spec_content = '''# -*- mode: python ; coding: utf-8 -*-
-
-block_cipher = None
-
-a = Analysis(
-    ['app.py'],
-    pathex=[],
-    binaries=[],
-    datas=[
-        # .bat файлы
-        ('general (ALT).bat', '.'),
-        ('general (ALT2).bat', '.'),
-        ('general (ALT3).bat', '.'),
-        ('general (ALT4).bat', '.'),
-        ('general (ALT5).bat', '.'),
-        ('general (ALT6).bat', '.'),
-        ('general (ALT7).bat', '.'),
-        ('general (ALT8).bat', '.'),
-        ('general (ALT9).bat', '.'),
-        ('general (ALT10).bat', '.'),
-        ('general (ALT11).bat', '.'),
-        # Папки
-        ('lists', 'lists'),
-        ('bin', 'bin')
-    ],
-    hiddenimports=[],
-    hookspath=[],
-    hooksconfig={},
-    runtime_hooks=[],
-    excludes=[],
-    win_no_prefer_redirects=False,
-    win_private_assemblies=False,
-    cipher=block_cipher,
-    noarchive=False,
-)
-
-pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
-
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='CrystalDPI',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon=None,
-)
-'''
-    
-    with open("CrystalDPI.spec", "w", encoding="utf-8") as f:
-        f.write(spec_content)
-    
-    print("✓ Создан spec файл")
-
-def rename_bat_files():
-    """Временно переименовывает .bat файлы без пробелов"""
-    original_files = [
-        "general (ALT).bat", "general (ALT2).bat", "general (ALT3).bat",
-        "general (ALT4).bat", "general (ALT5).bat", "general (ALT6).bat",
-        "general (ALT7).bat", "general (ALT8).bat", "general (ALT9).bat",
-        "general (ALT10).bat", "general (ALT11).bat"
-    ]
-    
-    renamed_files = [
-        "general_ALT.bat", "general_ALT2.bat", "general_ALT3.bat",
-        "general_ALT4.bat", "general_ALT5.bat", "general_ALT6.bat",
-        "general_ALT7.bat", "general_ALT8.bat", "general_ALT9.bat",
-        "general_ALT10.bat", "general_ALT11.bat"
-    ]
-    
-    # Создаем копии с новыми именами
-    for original, renamed in zip(original_files, renamed_files):
-        if os.path.exists(original):
-            shutil.copy2(original, renamed)
-            print(f"✓ Создана копия: {original} -> {renamed}")
-    
-    return renamed_files
-
-def modify_app_for_build():
-    """Модифицирует app.py для работы с переименованными файлами"""
-    with open("app.py", "r", encoding="utf-8") as f:
-        content = f.read()
-    
-    # Заменяем имена файлов в словаре
-    old_dict = """        self.bat_files = {
-            "general (ALT)": "general (ALT).bat",
-            "general (ALT2)": "general (ALT2).bat",
-            "general (ALT3)": "general (ALT3).bat",
-            "general (ALT4)": "general (ALT4).bat",
-            "general (ALT5)": "general (ALT5).bat",
-            "general (ALT6)": "general (ALT6).bat",
-            "general (ALT7)": "general (ALT7).bat",
-            "general (ALT8)": "general (ALT8).bat",
-            "general (ALT9)": "general (ALT9).bat",
-            "general (ALT10)": "general (ALT10).bat",
-            "general (ALT11)": "general (ALT11).bat"
-        }"""
-    
-    new_dict = """        self.bat_files = {
-            "general (ALT)": "general_ALT.bat",
-            "general (ALT2)": "general_ALT2.bat",
-            "general (ALT3)": "general_ALT3.bat",
-            "general (ALT4)": "general_ALT4.bat",
-            "general (ALT5)": "general_ALT5.bat",
-            "general (ALT6)": "general_ALT6.bat",
-            "general (ALT7)": "general_ALT7.bat",
-            "general (ALT8)": "general_ALT8.bat",
-            "general (ALT9)": "general_ALT9.bat",
-            "general (ALT10)": "general_ALT10.bat",
-            "general (ALT11)": "general_ALT11.bat"
-        }"""
-    
-    content = content.replace(old_dict, new_dict)
-    
-    with open("app_build.py", "w", encoding="utf-8") as f:
-        f.write(content)
-    
-    print("✓ Создан app_build.py с исправленными путями")
-
-def build_exe():
-    """Собирает EXE файл"""
-    print("\nЗапуск сборки EXE...")
-    
-    # Команда для PyInstaller
-    cmd = [
-        "pyinstaller",
-        "--onefile",
-        "--windowed",
-        "--name=CrystalDPI",
-        "--clean",
-        "--noconfirm",
-        "app_build.py"
-    ]
-    
-    try:
-        subprocess.run(cmd, check=True)
-        print("\n✓ Сборка успешно завершена!")
-        
-        # Проверяем наличие EXE файла
-        exe_path = os.path.join("dist", "CrystalDPI.exe")
-        if os.path.exists(exe_path):
-            size = os.path.getsize(exe_path) / (1024 * 1024)  # MB
-            print(f"\nEXE файл создан: {os.path.abspath(exe_path)}")
-            print(f"Размер файла: {size:.2f} MB")
-            
-            # Копируем EXE в текущую папку
-            shutil.copy2(exe_path, "CrystalDPI.exe")
-            print("✓ EXE файл скопирован в текущую папку")
-            
-            # Создаем README
-            create_readme()
-        else:
-            print("✗ EXE файл не найден!")
-            
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Ошибка при сборке: {e}")
-    except Exception as e:
-        print(f"✗ Неожиданная ошибка: {e}")
-
-def create_readme():
-    """Создает файл README"""
-    readme = """CrystalDPI - инструкция по установке
-
-1. Скопируйте все файлы в одну папку:
-   - CrystalDPI.exe
-   - Все .bat файлы (11 штук)
-   - Папки bin и lists (будут созданы автоматически)
-
-2. Запустите CrystalDPI.exe
-
-3. При первом запуске:
-   - Будут созданы папки bin и lists (если их нет)
-   - В lists будут созданы файлы list-general.txt и list-exclude.txt
-
-4. Использование:
-   - Вкладка "Подключение": выбор и запуск конфигураций
-   - Вкладка "Основной список": редактирование списка доменов
-   - Вкладка "Исключения": редактирование списка исключений
-
-Примечание: .bat файлы должны находиться в той же папке, что и EXE файл.
-"""
-    
-    with open("README.txt", "w", encoding="utf-8") as f:
-        f.write(readme)
-    
-    print("✓ Создан файл README.txt")
-
-def cleanup():
-    """Очистка временных файлов"""
-    files_to_remove = [
-        "CrystalDPI.spec",
-        "app_build.py",
-        "general_ALT.bat", "general_ALT2.bat", "general_ALT3.bat",
-        "general_ALT4.bat", "general_ALT5.bat", "general_ALT6.bat",
-        "general_ALT7.bat", "general_ALT8.bat", "general_ALT9.bat",
-        "general_ALT10.bat", "general_ALT11.bat"
-    ]
-    
-    folders_to_remove = ["build"]
-    
-    print("\nОчистка временных файлов...")
-    
-    for file in files_to_remove:
-        if os.path.exists(file):
-            os.remove(file)
-            print(f"✓ Удален: {file}")
-    
-    for folder in folders_to_remove:
-        if os.path.exists(folder):
-            shutil.rmtree(folder)
-            print(f"✓ Удалена папка: {folder}")
-
-def main():
-    print("=" * 60)
-    print("Сборщик EXE для CrystalDPI")
-    print("=" * 60)
-    
-    try:
-        # Шаг 1: Проверка зависимостей
-        check_dependencies()
-        
-        # Шаг 2: Создание временных копий .bat файлов
-        rename_bat_files()
-        
-        # Шаг 3: Модификация app.py
-        modify_app_for_build()
-        
-        # Шаг 4: Создание spec файла
-        create_spec_file()
-        
-        # Шаг 5: Сборка EXE
-        build_exe()
-        
-        # Шаг 6: Очистка
-        cleanup()
-        
-        print("\n" + "=" * 60)
-        print("Сборка успешно завершена!")
-        print("=" * 60)
-        
-        print("\nГотовые файлы:")
-        print("1. dist/CrystalDPI.exe - основной исполняемый файл")
-        print("2. CrystalDPI.exe - копия в текущей папке")
-        print("3. README.txt - инструкция по установке")
-        
-        input("\nНажмите Enter для выхода...")
-        
-    except Exception as e:
-        print(f"\n✗ Ошибка: {e}")
-        input("Нажмите Enter для выхода...")
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+"""
+Простой сборщик EXE для CrystalDPI
+"""
+
+import sys
+import os
+import subprocess
+import shutil
+import time
+
+from strategy import find_strategies
+
+def check_dependencies():
+    """Проверяет и устанавливает зависимости"""
+    print("Проверка зависимостей...")
+    
+    try:
+        import PyQt5
+        print("✓ PyQt5 установлен")
+    except ImportError:
+        print("Установка PyQt5...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "PyQt5"])
+    
+    try:
+        import PyInstaller
+        print("✓ PyInstaller установлен")
+    except ImportError:
+        print("Установка PyInstaller...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "pyinstaller"])
+
+# Модули Qt и библиотеки, которые приложение не использует (нужны только QtCore, QtGui, QtWidgets)
+EXCLUDES = [
+    "PyQt5.QtNetwork", "PyQt5.QtQml", "PyQt5.QtQuick", "PyQt5.QtQuickWidgets",
+    "PyQt5.QtWebEngine", "PyQt5.QtWebEngineCore", "PyQt5.QtWebEngineWidgets",
+    "PyQt5.QtWebChannel", "PyQt5.QtWebSockets", "PyQt5.QtMultimedia",
+    "PyQt5.QtMultimediaWidgets", "PyQt5.QtSql", "PyQt5.QtTest", "PyQt5.QtXml",
+    "PyQt5.QtXmlPatterns", "PyQt5.QtSvg", "PyQt5.QtPrintSupport", "PyQt5.QtOpenGL",
+    "PyQt5.QtBluetooth", "PyQt5.QtPositioning", "PyQt5.QtLocation", "PyQt5.QtSensors",
+    "PyQt5.QtSerialPort", "PyQt5.QtDBus", "PyQt5.QtDesigner", "PyQt5.QtHelp",
+    "PyQt5.QtNfc", "PyQt5.QtRemoteObjects", "PyQt5.QtTextToSpeech", "PyQt5.Qt3DCore",
+    "tkinter", "unittest", "pydoc", "doctest",
+]
+
+# Файлы Qt, которые не нужны окну на стилях Fusion: переводы, программный OpenGL,
+# плагины изображений, иконок, тем и сети. Остаются platforms/qwindows.dll и styles.
+QT_TRIM = [
+    "translations", "opengl32sw.dll", "d3dcompiler_", "libEGL.dll", "libGLESv2.dll",
+    "Qt5Network", "Qt5Qml", "Qt5Quick", "Qt5Svg", "Qt5DBus", "Qt5WebSockets",
+    "plugins/imageformats", "plugins/iconengines", "plugins/platformthemes",
+    "plugins/bearer", "plugins/generic", "plugins/printsupport",
+    "platforms/qminimal", "platforms/qoffscreen", "platforms/qwebgl",
+]
+
+# Рядом с exe кладутся стратегии и папки, которые программа ищет в рабочем каталоге
+RUNTIME_DATA = ["bin", "lists", "utils", "service.bat"]
+
+ONEFILE_EXE = os.path.join("dist", "CrystalDPI.exe")
+ONEDIR_EXE = os.path.join("dist", "CrystalDPI", "CrystalDPI.exe")
+# Консольный режим (crystaldpi start|stop|status|test|rank) собирается отдельным exe:
+# окно собрано без консоли и команды не разбирает
+CLI_NAME = "crystaldpi"
+ONEFILE_CLI_EXE = os.path.join("dist", CLI_NAME + ".exe")
+
+
+def create_spec_file(mode):
+    """Создает spec файл для сборки (mode: onefile или onedir)"""
+    if mode == "onedir":
+        # Байт-код собирается заранее (optimize=1), exe не распаковывает ничего при запуске
+        exe_args = "    [],\n    exclude_binaries=True,"
+        cli_args = "    [],\n    exclude_binaries=True,"
+        # optimize поддерживается PyInstaller начиная с 6.6
+        optimize = "\n    optimize=1,"
+        collect = '''
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    cli_exe,
+    cli.binaries,
+    cli.datas,
+    strip=False,
+    upx=False,
+    name='CrystalDPI',
+)
+'''
+    else:
+        exe_args = "    a.binaries,\n    a.datas,\n    [],"
+        cli_args = "    cli.binaries,\n    cli.datas,\n    [],"
+        optimize = ""
+        collect = ""
+
+    spec_content = f'''# -*- mode: python ; coding: utf-8 -*-
+
+QT_TRIM = {QT_TRIM!r}
+
+
+def keep(entry):
+    name = entry[0].replace("\\\\", "/")
+    return not any(part in name for part in QT_TRIM)
+
+
+a = Analysis(
+    ['app.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={{}},
+    runtime_hooks=[],
+    excludes={EXCLUDES!r},
+    noarchive=False,{optimize}
+)
+a.binaries = [entry for entry in a.binaries if keep(entry)]
+a.datas = [entry for entry in a.datas if keep(entry)]
+
+pyz = PYZ(a.pure, a.zipped_data)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+{exe_args}
+    name='CrystalDPI',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx={mode != "onedir"},
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    uac_admin=True,
+    icon=None,
+)
+
+cli = Analysis(
+    ['crystaldpi.py'],
+    pathex=[],
+    binaries=[],
+    datas=[],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={{}},
+    runtime_hooks=[],
+    excludes={EXCLUDES + ["PyQt5"]!r},
+    noarchive=False,{optimize}
+)
+
+cli_pyz = PYZ(cli.pure, cli.zipped_data)
+
+cli_exe = EXE(
+    cli_pyz,
+    cli.scripts,
+{cli_args}
+    name={CLI_NAME!r},
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx={mode != "onedir"},
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=True,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    uac_admin=True,
+    icon=None,
+)
+{collect}'''
+    
+    with open("CrystalDPI.spec", "w", encoding="utf-8") as f:
+        f.write(spec_content)
+    
+    print(f"✓ Создан spec файл ({mode})")
+
+def copy_runtime_files(target_dir):
+    """Копирует стратегии, bin и lists рядом с exe"""
+    for name in RUNTIME_DATA + list(find_strategies().values()):
+        if not os.path.exists(name):
+            continue
+        target = os.path.join(target_dir, name)
+        if os.path.isdir(name):
+            shutil.copytree(name, target, dirs_exist_ok=True)
+        else:
+            shutil.copy2(name, target)
+    print(f"✓ Стратегии и папки bin, lists скопированы в {target_dir}")
+
+def folder_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+def build_exe(mode="onefile"):
+    """Собирает EXE файл"""
+    print(f"\nЗапуск сборки EXE ({mode})...")
+    
+    # Команда для PyInstaller: все параметры в spec файле
+    cmd = [
+        sys.executable, "-m", "PyInstaller",
+        "--clean",
+        "--noconfirm",
+        "CrystalDPI.spec"
+    ]
+    
+    try:
+        subprocess.run(cmd, check=True)
+        print("\n✓ Сборка успешно завершена!")
+        
+        # Проверяем наличие EXE файла
+        exe_path = ONEDIR_EXE if mode == "onedir" else ONEFILE_EXE
+        if os.path.exists(exe_path):
+            target = os.path.dirname(exe_path) if mode == "onedir" else exe_path
+            size = folder_size(target) / (1024 * 1024)  # MB
+            print(f"\nEXE файл создан: {os.path.abspath(exe_path)}")
+            print(f"Размер {'папки' if mode == 'onedir' else 'файла'}: {size:.2f} MB")
+            
+            if mode == "onedir":
+                copy_runtime_files(os.path.dirname(exe_path))
+            else:
+                # Копируем EXE в текущую папку
+                shutil.copy2(exe_path, "CrystalDPI.exe")
+                if os.path.exists(ONEFILE_CLI_EXE):
+                    shutil.copy2(ONEFILE_CLI_EXE, CLI_NAME + ".exe")
+                print("✓ EXE файл скопирован в текущую папку")
+            
+            # Создаем README
+            create_readme()
+        else:
+            print("✗ EXE файл не найден!")
+            
+    except subprocess.CalledProcessError as e:
+        print(f"✗ Ошибка при сборке: {e}")
+    except Exception as e:
+        print(f"✗ Неожиданная ошибка: {e}")
+
+def measure_startup(exe_path, runs=5):
+    """Медиана времени от запуска exe до первой отрисовки окна (app --profile-startup), мс"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([exe_path, "--profile-startup"], cwd=os.path.dirname(exe_path) or ".",
+                       check=True, timeout=120)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+def compare_startup(runs=5):
+    """Сравнивает время запуска сборок onefile и onedir
+    
+    Запускать от администратора: иначе exe перезапустится через UAC и
+    замер будет неверным.
+    """
+    print(f"\nСравнение времени запуска (медиана из {runs})...")
+    results = {}
+    for mode, exe_path in (("onefile", ONEFILE_EXE), ("onedir", ONEDIR_EXE)):
+        if not os.path.exists(exe_path):
+            print(f"✗ {mode}: нет {exe_path}, соберите: python build_exe.py {mode}")
+            continue
+        results[mode] = measure_startup(exe_path, runs)
+        print(f"  {mode}: {results[mode]:.0f} мс")
+    if len(results) == 2:
+        print(f"  onedir быстрее на {results['onefile'] - results['onedir']:.0f} мс")
+    return results
+
+def create_readme():
+    """Создает файл README"""
+    readme = """CrystalDPI - инструкция по установке
+
+1. Скопируйте все файлы в одну папку:
+   - CrystalDPI.exe
+   - crystaldpi.exe (консольный режим, по желанию)
+   - Все файлы стратегий general*.bat (программа находит их сама)
+   - Папки bin и lists (будут созданы автоматически)
+
+2. Запустите CrystalDPI.exe
+
+3. При первом запуске:
+   - Будут созданы папки bin и lists (если их нет)
+   - В lists будут созданы файлы list-general.txt и list-exclude.txt
+
+4. Использование:
+   - Вкладка "Подключение": выбор и запуск конфигураций
+   - Вкладка "Основной список": редактирование списка доменов
+   - Вкладка "Исключения": редактирование списка исключений
+   - Без окна: crystaldpi.exe start ALT3 --detach, crystaldpi.exe status, crystaldpi.exe stop
+
+Примечание: .bat файлы должны находиться в той же папке, что и EXE файл.
+"""
+    
+    with open("README.txt", "w", encoding="utf-8") as f:
+        f.write(readme)
+    
+    print("✓ Создан файл README.txt")
+
+def cleanup():
+    """Очистка временных файлов"""
+    files_to_remove = ["CrystalDPI.spec"]
+    
+    folders_to_remove = ["build"]
+    
+    print("\nОчистка временных файлов...")
+    
+    for file in files_to_remove:
+        if os.path.exists(file):
+            os.remove(file)
+            print(f"✓ Удален: {file}")
+    
+    for folder in folders_to_remove:
+        if os.path.exists(folder):
+            shutil.rmtree(folder)
+            print(f"✓ Удалена папка: {folder}")
+
+def main():
+    args = sys.argv[1:]
+    command = args[0] if args else "onefile"
+    if command not in ("onefile", "onedir", "compare"):
+        print("Использование: python build_exe.py [onefile|onedir|compare [запусков]]")
+        return
+    
+    print("=" * 60)
+    print("Сборщик EXE для CrystalDPI")
+    print("=" * 60)
+    
+    try:
+        if command == "compare":
+            compare_startup(int(args[1]) if len(args) > 1 else 5)
+            return
+        
+        # Шаг 1: Проверка зависимостей
+        check_dependencies()
+        
+        # Шаг 2: Создание spec файла (стратегии программа находит сама при запуске)
+        create_spec_file(command)
+        
+        # Шаг 3: Сборка EXE
+        build_exe(command)
+        
+        # Шаг 4: Очистка
+        cleanup()
+        
+        print("\n" + "=" * 60)
+        print("Сборка успешно завершена!")
+        print("=" * 60)
+        
+        print("\nГотовые файлы:")
+        if command == "onedir":
+            print("1. dist/CrystalDPI/ - папка программы (CrystalDPI.exe, crystaldpi.exe, стратегии, bin, lists)")
+            print("2. README.txt - инструкция по установке")
+        else:
+            print("1. dist/CrystalDPI.exe - основной исполняемый файл")
+            print("2. dist/crystaldpi.exe - консольный режим")
+            print("3. CrystalDPI.exe, crystaldpi.exe - копии в текущей папке")
+            print("4. README.txt - инструкция по установке")
+        
+        input("\nНажмите Enter для выхода...")
+        
+    except Exception as e:
+        print(f"\n✗ Ошибка: {e}")
+        input("Нажмите Enter для выхода...")
+
+if __name__ == "__main__":
+    main()
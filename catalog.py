@@ -0,0 +1,340 @@
+"""
+Каталог стратегий: все general*.bat в каталоге, кэш разбора и поиск дубликатов
+"""
+
+import difflib
+import hashlib
+import json
+import os
+import sys
+
+from liststore import atomic_write
+from strategy import (PORT_OPTIONS, FilterBlock, StrategyError, StrategyProfile, find_strategies,
+                      load_game_filter, parse_strategy)
+
+CATALOG_CACHE = os.path.join("utils", "strategies.json")
+CACHE_VERSION = 2
+
+# Опции, которые winws накапливает (каждая добавляет файл); остальные перезаписываются
+MULTI_OPTIONS = {"hostlist", "hostlist-exclude", "ipset", "ipset-exclude"}
+
+
+def normalize_ports(value):
+    """"443,80,80" -> "80,443": порядок и повторы в списке портов не важны"""
+    parts = {part.strip() for part in value.split(",") if part.strip()}
+
+    def key(part):
+        start = part.split("-", 1)[0]
+        return (0, int(start), part) if start.isdigit() else (1, 0, part)
+
+    return ",".join(sorted(parts, key=key))
+
+
+def canonical_options(options):
+    """Опции в виде, не зависящем от порядка и повторов
+
+    Для перезаписываемых опций остается последнее значение (так их читает
+    winws), накапливаемые сортируются, списки портов нормализуются.
+    """
+    single = {}
+    multi = set()
+    for name, value in options:
+        if name in PORT_OPTIONS and value:
+            value = normalize_ports(value)
+        if name in MULTI_OPTIONS:
+            multi.add((name, value))
+        else:
+            single[name] = value
+    return sorted(list(single.items()) + list(multi), key=lambda option: (option[0], option[1] or ""))
+
+
+def canonical_form(profile):
+    """(глобальные опции, блоки) стратегии без несущественных различий
+
+    Порядок блоков важен (срабатывает первый подходящий), поэтому он
+    сохраняется; блок, полностью совпадающий с одним из предыдущих,
+    никогда не сработает и отбрасывается.
+    """
+    blocks = []
+    for block in profile.blocks:
+        options = canonical_options(block.options)
+        if options not in blocks:
+            blocks.append(options)
+    return canonical_options(profile.global_options), blocks
+
+
+def canonical_hash(profile):
+    data = json.dumps(canonical_form(profile), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def describe(profile):
+    """Строки стратегии для сравнения: по одной опции, пути относительно каталога"""
+    prefix = profile.base_dir.rstrip(os.sep) + os.sep
+
+    def line(name, value):
+        if value is None:
+            return f"--{name}"
+        return f"--{name}={value.replace(prefix, '')}"
+
+    global_options, blocks = canonical_form(profile)
+    lines = [line(name, value) for name, value in global_options]
+    for index, options in enumerate(blocks):
+        lines.append(f"# блок {index + 1}")
+        lines.extend(f"  {line(name, value)}" for name, value in options)
+    return lines
+
+
+class CatalogEntry:
+    """Стратегия из каталога: файл, хэш содержимого и разобранный профиль"""
+
+    def __init__(self, name, filename, path, sha256, profile=None, error=None):
+        self.name = name
+        self.filename = filename
+        self.path = path
+        self.sha256 = sha256
+        self.profile = profile
+        self.error = error
+        self._canonical = None
+
+    @property
+    def fingerprint(self):
+        """Хэш итоговой командной строки winws"""
+        return self.profile.fingerprint() if self.profile is not None else None
+
+    @property
+    def canonical(self):
+        """Хэш командной строки без несущественных различий"""
+        if self._canonical is None and self.profile is not None:
+            self._canonical = canonical_hash(self.profile)
+        return self._canonical
+
+    def __repr__(self):
+        return f"CatalogEntry({self.name!r}, {self.sha256[:8]})"
+
+
+class DuplicateGroup:
+    """Стратегии с одинаковой командной строкой; первая - оригинал"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        # exact - совпадают байт в байт после разбора, иначе различия несущественны
+        self.exact = len({entry.fingerprint for entry in entries}) == 1
+
+    @property
+    def original(self):
+        return self.entries[0]
+
+    @property
+    def duplicates(self):
+        return self.entries[1:]
+
+    def summary(self):
+        kind = "одинаковые" if self.exact else "различаются несущественно"
+        return f"{', '.join(entry.name for entry in self.entries)}: {kind}"
+
+
+class StrategyCatalog:
+    """Все стратегии general*.bat в каталоге
+
+    Каждый файл разбирается один раз: результат хранится в
+    utils/strategies.json по имени файла вместе с mtime, размером и
+    SHA-256 содержимого. При следующем запуске файл с тем же mtime и
+    размером не читается вовсе, а с другим mtime, но тем же содержимым -
+    читается, но не разбирается. Кэш сбрасывается при смене каталога или
+    режима игрового фильтра, от которых зависит разбор.
+    """
+
+    def __init__(self, base_dir=".", cache_path=CATALOG_CACHE):
+        self.base_dir = os.path.abspath(base_dir)
+        self.cache_path = cache_path
+        self.entries = {}
+        # Сколько файлов разобрано при последнем scan() (остальные взяты из кэша)
+        self.parsed = 0
+
+    # Кэш
+
+    def load_cache(self, game_filter):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (cache.get("version") != CACHE_VERSION or cache.get("base_dir") != self.base_dir
+                or cache.get("game_filter") != game_filter):
+            return {}
+        return cache.get("files", {})
+
+    def save_cache(self, game_filter, files):
+        data = {"version": CACHE_VERSION, "base_dir": self.base_dir,
+                "game_filter": game_filter, "files": files}
+        try:
+            atomic_write(self.cache_path, [json.dumps(data, ensure_ascii=False).encode("utf-8")])
+        except OSError as e:
+            print(f"Не удалось сохранить кэш стратегий: {e}")
+
+    # Сканирование
+
+    def scan(self):
+        """Перечитывает каталог; возвращает {название: CatalogEntry} в естественном порядке"""
+        game_filter = load_game_filter(self.base_dir)
+        cache = self.load_cache(game_filter)
+        files = {}
+        entries = {}
+        self.parsed = 0
+        for name, filename in find_strategies(self.base_dir).items():
+            path = os.path.join(self.base_dir, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            cached = cache.get(filename)
+            if cached is not None and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+                record = cached
+            else:
+                try:
+                    record = self._record(path, stat, cached, game_filter)
+                except OSError as e:
+                    print(f"Не удалось прочитать {filename}: {e}")
+                    continue
+            files[filename] = record
+            entries[name] = self._entry(name, filename, path, record, game_filter)
+
+        if files != cache:
+            self.save_cache(game_filter, files)
+        self.entries = entries
+        return entries
+
+    def _record(self, path, stat, cached, game_filter):
+        with open(path, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        record = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": sha256}
+        if cached is not None and cached["sha256"] == sha256:
+            # Файл только "потрогали": разбор прежний
+            for key in ("global_options", "blocks", "comments", "error"):
+                if key in cached:
+                    record[key] = cached[key]
+            return record
+
+        self.parsed += 1
+        try:
+            profile = parse_strategy(path, self.base_dir, game_filter)
+            record["global_options"] = profile.global_options
+            record["blocks"] = [block.options for block in profile.blocks]
+            record["comments"] = profile.comments
+        except StrategyError as e:
+            record["error"] = str(e)
+        return record
+
+    def _entry(self, name, filename, path, record, game_filter):
+        if record.get("error") is not None:
+            return CatalogEntry(name, filename, path, record["sha256"], error=record["error"])
+        blocks = [FilterBlock(index, [tuple(option) for option in options])
+                  for index, options in enumerate(record["blocks"])]
+        profile = StrategyProfile(name, path, self.base_dir,
+                                  [tuple(option) for option in record["global_options"]],
+                                  blocks, game_filter, record.get("comments"))
+        return CatalogEntry(name, filename, path, record["sha256"], profile)
+
+    # Запросы
+
+    def names(self):
+        """{название: имя файла} - как раньше ModernWindow.bat_files"""
+        return {name: entry.filename for name, entry in self.entries.items()}
+
+    def get(self, name):
+        """Стратегия по названию ("general (ALT3)", "ALT3") или имени файла"""
+        entry = self.entries.get(name) or self.entries.get(f"general ({name})")
+        if entry is None:
+            for candidate in self.entries.values():
+                if candidate.filename == name or candidate.path == os.path.abspath(name):
+                    return candidate
+        return entry
+
+    def profile(self, name):
+        """Разобранный профиль; StrategyError, если файл не разбирается или его нет"""
+        entry = self.get(name)
+        if entry is None:
+            raise StrategyError(f"стратегия {name} не найдена")
+        if entry.error is not None:
+            raise StrategyError(entry.error)
+        return entry.profile
+
+    def duplicate_groups(self):
+        """Группы стратегий с одинаковой (с точностью до несущественного) командной строкой"""
+        groups = {}
+        for entry in self.entries.values():
+            if entry.profile is not None:
+                groups.setdefault(entry.canonical, []).append(entry)
+        return [DuplicateGroup(entries) for entries in groups.values() if len(entries) > 1]
+
+    def duplicates(self):
+        """{название дубликата: название оригинала}"""
+        return {duplicate.name: group.original.name
+                for group in self.duplicate_groups() for duplicate in group.duplicates}
+
+    def unique(self, names=None):
+        """Профили без дубликатов (для ранжирования): остается первая стратегия каждой группы"""
+        seen = set()
+        profiles = []
+        for name, entry in self.entries.items():
+            if names is not None and name not in names:
+                continue
+            if entry.profile is None:
+                print(f"Пропуск {entry.filename}: {entry.error}")
+                continue
+            if entry.canonical in seen:
+                continue
+            seen.add(entry.canonical)
+            profiles.append(entry.profile)
+        return profiles
+
+    def diff(self, first, second, context=2):
+        """Различия двух стратегий в формате unified diff (список строк)"""
+        a, b = self.profile(first), self.profile(second)
+        return list(difflib.unified_diff(describe(a), describe(b), a.name, b.name,
+                                         n=context, lineterm=""))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Использование:\n"
+             "  python catalog.py list\n"
+             "  python catalog.py dupes\n"
+             "  python catalog.py diff <стратегия> <стратегия>")
+    if not argv:
+        print(usage)
+        return 2
+
+    catalog = StrategyCatalog()
+    catalog.scan()
+    command, args = argv[0], argv[1:]
+    try:
+        if command == "list":
+            duplicates = catalog.duplicates()
+            for name, entry in catalog.entries.items():
+                note = f" (ошибка: {entry.error})" if entry.error else ""
+                if name in duplicates:
+                    note = f" (дубликат {duplicates[name]})"
+                print(f"{name}: {entry.sha256[:12]}{note}")
+            print(f"Стратегий: {len(catalog.entries)}, разобрано заново: {catalog.parsed}")
+        elif command == "dupes":
+            groups = catalog.duplicate_groups()
+            for group in groups:
+                print(group.summary())
+            if not groups:
+                print("Дубликатов нет")
+        elif command == "diff" and len(args) == 2:
+            lines = catalog.diff(args[0], args[1])
+            print("\n".join(lines) if lines else "Стратегии не различаются")
+        else:
+            print(usage)
+            return 2
+    except StrategyError as e:
+        print(f"Ошибка: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
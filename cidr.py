@@ -0,0 +1,453 @@
+"""
+Компактный индекс CIDR-префиксов ipset-all / ipset-exclude с пакетным поиском
+"""
+
+import ipaddress
+import os
+import re
+import socket
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+# NumPy необязателен и загружается при построении первого индекса:
+# его импорт дольше, чем запуск окна программы
+numpy = None
+_numpy_loaded = False
+
+
+def _load_numpy():
+    global numpy, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+        _numpy_loaded = True
+    return numpy
+
+
+LISTS_DIR = "lists"
+IPSET_ALL = os.path.join(LISTS_DIR, "ipset-all.txt")
+IPSET_EXCLUDE = os.path.join(LISTS_DIR, "ipset-exclude.txt")
+
+_IP_RE = re.compile(r"(?<![\w.:])(?:\d{1,3}\.){3}\d{1,3}(?![\w.])|(?<![\w:])[0-9a-fA-F]{0,4}(?::[0-9a-fA-F]{0,4}){2,7}(?![\w:])")
+
+
+def read_networks(path):
+    """Читает ipset-файл; возвращает (сети, число некорректных строк)"""
+    networks = []
+    invalid = 0
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                networks.append(ipaddress.ip_network(line, strict=False))
+            except ValueError:
+                invalid += 1
+    return networks, invalid
+
+
+def flatten(ranges):
+    """Превращает вложенные диапазоны (start, end, id) в непересекающиеся отрезки
+
+    Префиксы CIDR либо не пересекаются, либо вложены друг в друга, поэтому
+    каждому адресу соответствует самый специфичный префикс. Результат -
+    отсортированные starts/ends/ids, пригодные для двоичного поиска.
+    """
+    starts, ends, ids = [], [], []
+
+    def emit(start, end, prefix_id):
+        if start > end:
+            return
+        if ids and ids[-1] == prefix_id and ends[-1] + 1 == start:
+            ends[-1] = end
+            return
+        starts.append(start)
+        ends.append(end)
+        ids.append(prefix_id)
+
+    # Одинаковое начало: сначала более широкий префикс (с большим концом)
+    ranges = sorted(ranges, key=lambda item: (item[0], -item[1]))
+    # Открытые префиксы (начало, конец, id): каждый следующий вложен в предыдущий
+    stack = []
+    position = None
+    for start, end, prefix_id in ranges:
+        if stack and stack[-1][0] == start and stack[-1][1] == end:
+            # Дубликат уже открытого префикса
+            continue
+        while stack and stack[-1][1] < start:
+            _, top_end, top_id = stack.pop()
+            emit(position, top_end, top_id)
+            position = top_end + 1
+        if stack:
+            emit(position, start - 1, stack[-1][2])
+        stack.append((start, end, prefix_id))
+        position = start
+    while stack:
+        _, top_end, top_id = stack.pop()
+        emit(position, top_end, top_id)
+        position = top_end + 1
+    return starts, ends, ids
+
+
+def to_ranges(networks, version):
+    """Диапазоны (start, end) сетей одной версии, отсортированные и слитые"""
+    ranges = sorted(
+        (int(n.network_address), int(n.broadcast_address)) for n in networks if n.version == version
+    )
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def subtract_ranges(ranges, excluded):
+    """Вычитает отсортированные слитые диапазоны excluded из ranges"""
+    result = []
+    j = 0
+    for start, end in ranges:
+        while j < len(excluded) and excluded[j][1] < start:
+            j += 1
+        k = j
+        while start <= end:
+            if k >= len(excluded) or excluded[k][0] > end:
+                result.append([start, end])
+                break
+            ex_start, ex_end = excluded[k]
+            if ex_start > start:
+                result.append([start, ex_start - 1])
+            start = max(start, ex_end + 1)
+            k += 1
+    return result
+
+
+def ranges_to_networks(ranges, version):
+    """Минимальный набор CIDR-префиксов, покрывающий диапазоны"""
+    address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    networks = []
+    for start, end in ranges:
+        networks.extend(ipaddress.summarize_address_range(address(start), address(end)))
+    return networks
+
+
+class RangeSet:
+    """Слитые диапазоны адресов одной версии: проверка покрытия и добавление за O(log n)"""
+
+    def __init__(self, ranges=()):
+        self.starts = [start for start, _ in ranges]
+        self.ends = [end for _, end in ranges]
+
+    def covers(self, start, end):
+        """Весь диапазон [start, end] внутри одного из слитых диапазонов"""
+        i = bisect_right(self.starts, start) - 1
+        return i >= 0 and self.ends[i] >= end
+
+    def add(self, start, end):
+        # Пересекающиеся и соседние диапазоны сливаются с новым
+        lo = bisect_left(self.ends, start - 1)
+        hi = bisect_right(self.starts, end + 1)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+
+def coalesce(networks, exclude=()):
+    """Сливает пересекающиеся и соседние префиксы и вычитает exclude"""
+    result = []
+    for version in (4, 6):
+        ranges = to_ranges(networks, version)
+        if exclude:
+            ranges = subtract_ranges(ranges, to_ranges(exclude, version))
+        result.extend(ranges_to_networks(ranges, version))
+    return result
+
+
+class _Family:
+    """Отрезки одного семейства адресов (IPv4 или IPv6)"""
+
+    def __init__(self, version, starts, ends, ids):
+        self.version = version
+        self.size = len(starts)
+        if version == 4:
+            self.starts = array("I", starts)
+            self.ends = array("I", ends)
+            self.ids = array("i", ids)
+        else:
+            # 128-битные адреса: списки int для bisect
+            self.starts = starts
+            self.ends = ends
+            self.ids = ids
+        if _load_numpy() is not None:
+            if version == 4:
+                # Представления тех же буферов, без копирования
+                self.np_starts = numpy.frombuffer(self.starts, dtype=numpy.uint32)
+                self.np_ends = numpy.frombuffer(self.ends, dtype=numpy.uint32)
+            else:
+                # Big-endian байты сравниваются так же, как 128-битные числа
+                self.np_starts = numpy.array([v.to_bytes(16, "big") for v in starts], dtype="S16")
+                self.np_ends = numpy.array([v.to_bytes(16, "big") for v in ends], dtype="S16")
+            self.np_ids = numpy.array(ids, dtype=numpy.int32)
+
+    def find(self, value):
+        """Индекс префикса для адреса-числа или -1"""
+        i = bisect_right(self.starts, value) - 1
+        if i >= 0 and value <= self.ends[i]:
+            return int(self.ids[i])
+        return -1
+
+    def find_many(self, values):
+        """Пакетный поиск: values - numpy-массив (uint32 или S16) или список int"""
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            starts, ends, ids = self.np_starts, self.np_ends, self.np_ids
+            result = numpy.full(len(values), -1, dtype=numpy.int32)
+            if not self.size:
+                return result
+            index = numpy.searchsorted(starts, values, side="right") - 1
+            valid = index >= 0
+            clipped = numpy.where(valid, index, 0)
+            hit = valid & (values <= ends[clipped])
+            result[hit] = ids[clipped[hit]]
+            return result
+        return array("i", (self.find(value) for value in values))
+
+
+class CidrIndex:
+    """Индекс префиксов: какой префикс покрывает адрес
+
+    Хранит отсортированные массивы начал и концов непересекающихся
+    отрезков (uint32 для IPv4, 128-битные значения для IPv6), поэтому
+    одиночный поиск - это один двоичный поиск, а пакетный с NumPy -
+    один вызов searchsorted на весь массив адресов.
+    """
+
+    def __init__(self, networks):
+        self.prefixes = []
+        ranges = {4: [], 6: []}
+        for network in networks:
+            prefix_id = len(self.prefixes)
+            self.prefixes.append(network)
+            ranges[network.version].append(
+                (int(network.network_address), int(network.broadcast_address), prefix_id)
+            )
+        self.v4 = _Family(4, *flatten(ranges[4]))
+        self.v6 = _Family(6, *flatten(ranges[6]))
+
+    @classmethod
+    def from_file(cls, path):
+        networks, invalid = read_networks(path)
+        index = cls(networks)
+        index.invalid = invalid
+        return index
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    def lookup(self, address):
+        """Возвращает покрывающий префикс (ip_network) или None"""
+        address = ipaddress.ip_address(address)
+        family = self.v4 if address.version == 4 else self.v6
+        prefix_id = family.find(int(address))
+        return self.prefixes[prefix_id] if prefix_id >= 0 else None
+
+    def __contains__(self, address):
+        return self.lookup(address) is not None
+
+    def lookup_ids(self, addresses):
+        """Пакетный поиск: индексы в self.prefixes (-1 - не покрыт)"""
+        v4_values, v6_values, versions = split_addresses(addresses)
+        if numpy is not None:
+            versions = numpy.array(versions, dtype=numpy.uint8)
+            result = numpy.full(len(versions), -1, dtype=numpy.int32)
+            for version, values, family in ((4, v4_values, self.v4), (6, v6_values, self.v6)):
+                if len(values):
+                    result[versions == version] = family.find_many(values)
+            return result.tolist()
+
+        found = {4: iter(self.v4.find_many(v4_values)), 6: iter(self.v6.find_many(v6_values))}
+        return [next(found[version]) for version in versions]
+
+    def lookup_ints(self, values):
+        """Пакетный поиск по уже разобранным IPv4-адресам (uint32-массив или список int)"""
+        if numpy is not None:
+            return self.v4.find_many(numpy.asarray(values, dtype=numpy.uint32))
+        return self.v4.find_many(values)
+
+    def lookup_many(self, addresses):
+        """Пакетный поиск: список префиксов (или None) в порядке адресов"""
+        return [self.prefixes[i] if i >= 0 else None for i in self.lookup_ids(addresses)]
+
+
+def _has_leading_zero(address):
+    """Есть ли в IPv4-адресе октет с ведущим нулем"""
+    if address[0] != "0" and ".0" not in address:
+        return False
+    return any(len(part) > 1 and part[0] == "0" for part in address.split("."))
+
+
+def split_addresses(addresses):
+    """Делит адреса на IPv4 и IPv6 и переводит их в форму для find_many
+
+    Возвращает (адреса IPv4, адреса IPv6, версия каждого исходного адреса).
+    """
+    v4, v6, versions = [], [], []
+    packed = _load_numpy() is not None
+    inet_pton, af_inet = socket.inet_pton, socket.AF_INET
+    for address in addresses:
+        if isinstance(address, str) and ":" not in address:
+            try:
+                raw = inet_pton(af_inet, address)
+            except OSError:
+                raw = None
+            # Ведущие нули ("010.0.0.1") inet_pton принимает не везде, а ipaddress
+            # их отвергает: такие адреса, как и ошибки, разбирает ipaddress
+            if raw is not None and not _has_leading_zero(address):
+                v4.append(raw if packed else int.from_bytes(raw, "big"))
+                versions.append(4)
+                continue
+        value = ipaddress.ip_address(address)
+        if value.version == 4:
+            v4.append(value.packed if packed else int(value))
+        else:
+            v6.append(value.packed if packed else int(value))
+        versions.append(value.version)
+
+    if packed:
+        v4 = numpy.frombuffer(b"".join(v4), dtype=">u4").astype(numpy.uint32)
+        v6 = numpy.array(v6, dtype="S16")
+    return v4, v6, versions
+
+
+class IpsetIndex:
+    """ipset-all вместе с ipset-exclude: покрыт ли адрес и не исключен ли он"""
+
+    def __init__(self, include, exclude=None):
+        self.include = include
+        self.exclude = exclude or CidrIndex([])
+
+    @classmethod
+    def load(cls, include_path=IPSET_ALL, exclude_path=IPSET_EXCLUDE):
+        include = CidrIndex.from_file(include_path)
+        exclude = CidrIndex.from_file(exclude_path) if exclude_path and os.path.exists(exclude_path) else None
+        return cls(include, exclude)
+
+    def lookup(self, address):
+        """Возвращает (префикс ipset или None, префикс исключения или None)"""
+        return self.include.lookup(address), self.exclude.lookup(address)
+
+    def is_covered(self, address):
+        prefix, excluded = self.lookup(address)
+        return prefix is not None and excluded is None
+
+    def lookup_many(self, addresses):
+        addresses = list(addresses)
+        return list(zip(self.include.lookup_many(addresses), self.exclude.lookup_many(addresses)))
+
+
+def extract_addresses(lines):
+    """Достает IP-адреса из строк журнала соединений"""
+    for line in lines:
+        for match in _IP_RE.finditer(line):
+            candidate = match.group(0)
+            try:
+                ipaddress.ip_address(candidate)
+            except ValueError:
+                continue
+            yield candidate
+
+
+def benchmark(include_path, exclude_path=IPSET_EXCLUDE, count=1_000_000):
+    """Замеряет загрузку индекса и скорость поиска (строки, числа, по одному)"""
+    start = time.perf_counter()
+    index = IpsetIndex.load(include_path, exclude_path)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    import random
+    rng = random.Random(1)
+    values = [rng.getrandbits(32) for _ in range(count)]
+    addresses = [socket.inet_ntoa(value.to_bytes(4, "big")) for value in values]
+
+    start = time.perf_counter()
+    index.include.lookup_ints(values)
+    ints_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = index.include.lookup_ids(addresses)
+    batch_s = time.perf_counter() - start
+
+    single = addresses[:min(count, 100_000)]
+    start = time.perf_counter()
+    for address in single:
+        index.include.lookup(address)
+    single_s = time.perf_counter() - start
+
+    hits = sum(1 for r in results if r >= 0)
+    print(f"Префиксов: {len(index.include)} (+{len(index.exclude)} исключений), "
+          f"отрезков IPv4: {index.include.v4.size}, IPv6: {index.include.v6.size}")
+    print(f"Загрузка: {load_ms:.1f} мс, NumPy: {'да' if numpy is not None else 'нет'}")
+    print(f"Пакетный поиск: {count / batch_s:,.0f} адресов/с ({count} адресов, совпадений {hits})")
+    print(f"Пакетный поиск по числам: {count / ints_s:,.0f} адресов/с")
+    print(f"Одиночный поиск: {len(single) / single_s:,.0f} адресов/с")
+    return {
+        "load_ms": load_ms,
+        "batch_per_s": count / batch_s,
+        "ints_per_s": count / ints_s,
+        "single_per_s": len(single) / single_s,
+    }
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Использование:\n"
+             "  python cidr.py lookup <ip> [ip ...]\n"
+             "  python cidr.py batch <файл журнала> [ipset]\n"
+             "  python cidr.py bench [ipset] [количество]")
+    if not argv:
+        print(usage)
+        return 2
+
+    command, args = argv[0], argv[1:]
+    if command == "lookup":
+        index = IpsetIndex.load()
+        for address, (prefix, excluded) in zip(args, index.lookup_many(args)):
+            if excluded is not None:
+                state = f"исключен ({excluded})"
+            elif prefix is not None:
+                state = f"покрыт ({prefix})"
+            else:
+                state = "не покрыт"
+            print(f"{address}: {state}")
+    elif command == "batch":
+        include_path = args[1] if len(args) > 1 else IPSET_ALL
+        index = IpsetIndex.load(include_path)
+        with open(args[0], "r", encoding="utf-8", errors="replace") as f:
+            addresses = list(extract_addresses(f))
+        start = time.perf_counter()
+        results = index.lookup_many(addresses)
+        elapsed = time.perf_counter() - start
+        covered = sum(1 for prefix, excluded in results if prefix is not None and excluded is None)
+        excluded = sum(1 for _, excluded in results if excluded is not None)
+        print(f"Адресов: {len(addresses)}, покрыто: {covered}, исключено: {excluded}, "
+              f"не покрыто: {len(addresses) - covered - excluded}, {elapsed * 1000:.1f} мс")
+    elif command == "bench":
+        include_path = args[0] if args else IPSET_ALL + ".backup"
+        count = int(args[1]) if len(args) > 1 else 1_000_000
+        benchmark(include_path, count=count)
+    else:
+        print(usage)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
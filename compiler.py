@@ -0,0 +1,354 @@
+"""
+Компиляция списков: минимизация hostlist и ipset перед загрузкой в winws
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+from cidr import coalesce, read_networks
+from liststore import atomic_write
+from strategy import LISTS_DIR, parse_strategy
+
+COMPILED_DIR = os.path.join(LISTS_DIR, "compiled")
+MANIFEST_FILE = "manifest.json"
+
+# Заглушка режима ipset "none" из service.bat: пустой ipset в winws означает "любой адрес"
+IPSET_NONE = "203.0.113.113/32"
+
+HOSTLIST_OPTIONS = {"hostlist", "hostlist-exclude"}
+IPSET_OPTIONS = {"ipset", "ipset-exclude"}
+
+
+def read_hostlist(path):
+    """Читает домены hostlist-файла в исходном порядке (без комментариев)"""
+    domains = []
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip().lower()
+            if line:
+                domains.append(line)
+    return domains
+
+
+class DomainTrie:
+    """Суффиксное дерево доменов по меткам справа налево
+
+    winws считает, что запись example.com покрывает и сам домен, и все
+    его поддомены; запись с префиксом ^ совпадает только с самим доменом.
+    Узлы дерева хранятся в хэш-таблице по полному суффиксу ("com",
+    "example.com"), поэтому проверка домена - это несколько поисков в
+    множестве по его родительским суффиксам, без обхода вложенных словарей.
+    """
+
+    def __init__(self, domains=()):
+        # Записи, покрывающие поддомены, и записи ^domain (только сам домен)
+        self.entries = set()
+        self.exact = set()
+        for domain in domains:
+            self.add(domain)
+
+    def add(self, domain):
+        if domain.startswith("^"):
+            self.exact.add(domain[1:].strip("."))
+        else:
+            self.entries.add(domain.strip("."))
+
+    def covers(self, domain, strict=False):
+        """Возвращает запись, которая покрывает домен, или None
+
+        strict=True не учитывает запись, равную самому домену.
+        """
+        entries = self.entries
+        if domain.startswith("^"):
+            domain = domain[1:]
+            # Сам домен: ^x покрыт записью x, но не наоборот
+            if domain in entries:
+                return domain
+            if not strict and domain in self.exact:
+                return "^" + domain
+        elif not strict:
+            if domain in entries:
+                return domain
+            if domain in self.exact:
+                return "^" + domain
+        position = domain.find(".")
+        while position != -1:
+            suffix = domain[position + 1:]
+            if suffix in entries:
+                return suffix
+            position = domain.find(".", position + 1)
+        return None
+
+    def __contains__(self, domain):
+        return self.covers(domain) is not None
+
+
+def minimize_domains(domains, exclude=()):
+    """Убирает дубликаты, поддомены уже указанных доменов и исключенные домены
+
+    Возвращает (оставшиеся домены в исходном порядке, число удаленных).
+    """
+    trie = DomainTrie(domains)
+    excluded = DomainTrie(exclude)
+    seen = set()
+    result = []
+    for domain in domains:
+        if domain in seen:
+            continue
+        seen.add(domain)
+        if trie.covers(domain, strict=True) is not None:
+            continue
+        # hostlist-exclude проверяется раньше hostlist: такие домены не совпадут никогда.
+        # ^x в исключениях убирает только сам x: запись x остается для его поддоменов
+        if exclude:
+            entry = excluded.covers(domain)
+            if entry is not None and (domain.startswith("^") or not entry.startswith("^")):
+                continue
+        result.append(domain)
+    return result, len(domains) - len(result)
+
+
+class CompileResult:
+    """Итог компиляции одного списка"""
+
+    def __init__(self, option, source, output, before, after, cached=False):
+        self.option = option
+        self.source = source
+        self.output = output
+        self.before = before
+        self.after = after
+        self.cached = cached
+
+    @property
+    def removed(self):
+        return self.before - self.after
+
+    def as_dict(self):
+        return {"option": self.option, "source": self.source, "before": self.before, "after": self.after}
+
+    def __repr__(self):
+        return (f"CompileResult({os.path.basename(self.source)!r}, "
+                f"{self.before} -> {self.after})")
+
+
+class CompileJob:
+    """Задание: список-источник, исключения и дополнительные списки (подписки)"""
+
+    def __init__(self, option, source, excludes, output, extras=()):
+        self.option = option
+        self.source = source
+        self.excludes = excludes
+        self.output = output
+        self.extras = list(extras)
+
+    @property
+    def inputs(self):
+        return [self.source] + list(self.excludes) + self.extras
+
+
+def _signature(paths):
+    """Размеры и времена изменения файлов - признак того, что их надо пересобрать"""
+    signature = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature[os.path.abspath(path)] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            signature[os.path.abspath(path)] = None
+    return signature
+
+
+def _write_lines(path, lines):
+    # winws может перечитать файл в любой момент: запись только через переименование
+    atomic_write(path, (line.encode("utf-8") + b"\n" for line in lines))
+
+
+class ListCompiler:
+    """Собирает минимизированные копии списков в lists/compiled
+
+    Для каждого hostlist/ipset профиля создается отдельный файл, из которого
+    удалены избыточные записи и записи, отмененные исключениями этого же
+    профиля (hostlist-exclude / ipset-exclude). Профиль стратегии получает
+    пути к скомпилированным файлам; исходные списки не изменяются.
+    Уже собранные файлы пересобираются только при изменении источников.
+
+    extras - функция, возвращающая {абсолютный путь списка: [файлы]}: записи
+    этих файлов (кэш подписок) добавляются к списку при компиляции.
+    """
+
+    def __init__(self, output_dir=None, extras=None):
+        self.output_dir = output_dir
+        self.extras = extras
+        # Каталоги, в которые уже собирались списки: по ним refresh ищет манифесты
+        self.output_dirs = set()
+
+    def _extras(self, source, known=None):
+        if self.extras is None:
+            return list(known or [])
+        return [path for path in self.extras().get(os.path.abspath(source), []) if os.path.exists(path)]
+
+    def _output_dir(self, profile):
+        output_dir = self.output_dir or os.path.join(profile.base_dir, COMPILED_DIR)
+        self.output_dirs.add(os.path.abspath(output_dir))
+        return output_dir
+
+    def _manifest_path(self, output_dir):
+        return os.path.join(output_dir, MANIFEST_FILE)
+
+    def load_manifest(self, output_dir):
+        try:
+            with open(self._manifest_path(output_dir), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, output_dir, manifest):
+        try:
+            data = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+            atomic_write(self._manifest_path(output_dir), [data])
+        except OSError as e:
+            print(f"Не удалось сохранить манифест списков: {e}")
+
+    def plan(self, profile):
+        """Возвращает (профиль с путями к скомпилированным спискам, задания)"""
+        output_dir = self._output_dir(profile)
+        compiled = profile.derive(profile.name, profile.blocks)
+        compiled.path = profile.path
+        jobs = {}
+
+        for block in compiled.blocks:
+            options = []
+            for name, value in block.options:
+                if value and (name in HOSTLIST_OPTIONS or name in IPSET_OPTIONS):
+                    excludes = []
+                    if name in ("hostlist", "ipset"):
+                        excludes = sorted(set(block.get_all(name + "-exclude")))
+                    job = self._job(name, value, excludes, output_dir, self._extras(value))
+                    jobs[job.output] = job
+                    value = job.output
+                options.append((name, value))
+            block.options = options
+        return compiled, list(jobs.values())
+
+    def _job(self, option, source, excludes, output_dir, extras=()):
+        stem, ext = os.path.splitext(os.path.basename(source))
+        if excludes:
+            key = "\0".join(os.path.abspath(path) for path in excludes)
+            stem += "." + hashlib.sha256(key.encode("utf-8")).hexdigest()[:8]
+        return CompileJob(option, source, excludes, os.path.join(output_dir, stem + (ext or ".txt")), extras)
+
+    def build(self, jobs, force=False):
+        """Собирает задания; возвращает список CompileResult"""
+        results = []
+        by_dir = {}
+        for job in jobs:
+            by_dir.setdefault(os.path.dirname(job.output), []).append(job)
+
+        for output_dir, dir_jobs in by_dir.items():
+            os.makedirs(output_dir, exist_ok=True)
+            manifest = self.load_manifest(output_dir)
+            for job in dir_jobs:
+                # Подписки могли появиться или удалиться после plan: состав берется на момент сборки
+                job.extras = self._extras(job.source, job.extras)
+                name = os.path.basename(job.output)
+                signature = _signature(job.inputs)
+                entry = manifest.get(name)
+                if (not force and entry and entry.get("inputs") == signature
+                        and os.path.exists(job.output)):
+                    results.append(CompileResult(job.option, job.source, job.output,
+                                                 entry["before"], entry["after"], cached=True))
+                    continue
+                result = self.compile_job(job)
+                manifest[name] = dict(result.as_dict(), inputs=signature, excludes=job.excludes,
+                                      extras=job.extras, compiled_at=time.time())
+                results.append(result)
+            self.save_manifest(output_dir, manifest)
+        return results
+
+    def compile_job(self, job):
+        if job.option in HOSTLIST_OPTIONS:
+            domains = read_hostlist(job.source)
+            for path in job.extras:
+                domains.extend(read_hostlist(path))
+            exclude = []
+            for path in job.excludes:
+                exclude.extend(read_hostlist(path))
+            lines, _ = minimize_domains(domains, exclude)
+            if domains and not lines:
+                # Пустой hostlist меняет смысл профиля; исключения и так применит winws
+                lines, _ = minimize_domains(domains)
+            before = len(domains)
+        else:
+            networks, invalid = read_networks(job.source)
+            # Пустой ipset и заглушка - режимы any и none: подписки их не меняют
+            if job.extras and networks and [str(network) for network in networks] != [IPSET_NONE]:
+                for path in job.extras:
+                    networks.extend(read_networks(path)[0])
+            exclude = []
+            for path in job.excludes:
+                exclude.extend(read_networks(path)[0])
+            compiled = coalesce(networks, exclude)
+            if networks and not compiled:
+                # Все адреса исключены: сохраняем режим "ни один адрес", а не "любой"
+                lines = [IPSET_NONE]
+            else:
+                lines = [str(network) for network in compiled]
+            before = len(networks) + invalid
+
+        _write_lines(job.output, lines)
+        return CompileResult(job.option, job.source, job.output, before, len(lines))
+
+    def compile_profile(self, profile, force=False):
+        """Компилирует списки стратегии; возвращает (новый профиль, результаты)"""
+        compiled, jobs = self.plan(profile)
+        return compiled, self.build(jobs, force)
+
+    def refresh(self, source):
+        """Пересобирает уже существующие файлы, зависящие от source (после сохранения)"""
+        if self.output_dir:
+            output_dirs = [os.path.abspath(self.output_dir)]
+        else:
+            # Путь источника ничего не говорит о каталоге сборки (кэш подписок лежит глубже)
+            output_dirs = sorted(self.output_dirs | {os.path.abspath(COMPILED_DIR)})
+        source = os.path.abspath(source)
+        jobs = []
+        for output_dir in output_dirs:
+            for name, entry in self.load_manifest(output_dir).items():
+                job = CompileJob(entry["option"], entry["source"], entry.get("excludes", []),
+                                 os.path.join(output_dir, name),
+                                 self._extras(entry["source"], entry.get("extras")))
+                if source in (os.path.abspath(path) for path in job.inputs):
+                    jobs.append(job)
+        return self.build(jobs)
+
+
+def format_report(results):
+    """Текстовый отчет о числе удаленных записей"""
+    lines = []
+    for result in results:
+        suffix = " (без изменений)" if result.cached else ""
+        lines.append(f"{os.path.basename(result.source)} [{result.option}]: "
+                     f"{result.before} -> {result.after}, удалено {result.removed}{suffix}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else "general.bat"
+    profile = parse_strategy(path)
+
+    start = time.perf_counter()
+    _, results = ListCompiler().compile_profile(profile, force="--force" in argv)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(format_report(results))
+    removed = sum(result.removed for result in results)
+    print(f"Списков: {len(results)}, удалено записей: {removed}, {elapsed:.0f} мс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,393 @@
+"""
+Консольный режим без интерфейса: crystaldpi start|stop|status|test|rank
+
+Модуль не импортирует Qt. Запущенный winws обслуживает этот же процесс:
+он пишет utils/crystaldpi.json (PID, стратегия, порт управления) и
+принимает команды status/stop через локальный TCP-сокет, так что
+остановить его или узнать состояние можно из другой консоли,
+планировщика задач или интерфейса.
+"""
+
+import json
+import os
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from liststore import atomic_write
+from strategy import StrategyError, parse_strategy, prepare_strategy
+from supervisor import StartupError, WinwsSupervisor
+from system import is_admin, process_alive, terminate_process
+from winwslog import LOG_FILE, rotation_enabled
+
+STATE_FILE = os.path.join("utils", "crystaldpi.json")
+CONTROL_HOST = "127.0.0.1"
+CONTROL_TIMEOUT = 5
+STOP_TIMEOUT = 10
+DETACH_TIMEOUT = 30
+
+COMMANDS = ("start", "stop", "status", "test", "rank")
+
+USAGE = """Использование:
+  crystaldpi start <стратегия> [--detach]   запустить winws (например: start ALT3)
+  crystaldpi stop                           остановить запущенный winws
+  crystaldpi status                         состояние
+  crystaldpi test [стратегия]               проверить цели из utils/targets.txt
+  crystaldpi rank [стратегия ...]           ранжировать стратегии по целям"""
+
+
+class CliError(Exception):
+    """Ошибка команды; текст показывается пользователю"""
+
+
+# Стратегии
+
+def find_strategy(name, base_dir="."):
+    """Путь к .bat по имени: "ALT3", "general (ALT3)" или имя файла"""
+    for candidate in (name, name + ".bat", f"general ({name}).bat"):
+        path = os.path.join(base_dir, candidate)
+        if os.path.isfile(path):
+            return path
+    wanted = name.lower()
+    for filename in sorted(os.listdir(base_dir)):
+        stem, ext = os.path.splitext(filename)
+        if ext.lower() != ".bat":
+            continue
+        short = stem[stem.find("(") + 1:stem.rfind(")")] if "(" in stem else stem
+        if wanted in (stem.lower(), short.lower()):
+            return os.path.join(base_dir, filename)
+    raise CliError(f"стратегия не найдена: {name}")
+
+
+def load_profile(path):
+    """Разбирает стратегию и готовит компиляцию списков; возвращает (профиль, before_start)"""
+    from compiler import ListCompiler, format_report
+    from subscriptions import SubscriptionManager
+    from wfilter import minimal_enabled, minimize_filter
+
+    profile = parse_strategy(path)
+    missing_files = profile.missing_files()
+    if missing_files:
+        names = ", ".join(os.path.relpath(p, profile.base_dir) for p in missing_files)
+        raise CliError(f"не найдены файлы стратегии: {names}")
+
+    compiler = ListCompiler(extras=SubscriptionManager().extras)
+    profile, jobs = compiler.plan(profile)
+    if minimal_enabled():
+        print(minimize_filter(profile).summary())
+
+    def before_start():
+        results = compiler.build(jobs)
+        if results:
+            print(format_report(results))
+        prepare_strategy(profile)
+
+    return profile, before_start
+
+
+# Файл состояния и управление
+
+def read_state(path=STATE_FILE):
+    """Состояние запущенного экземпляра или None (устаревший файл удаляется)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not process_alive(state.get("pid")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    return state
+
+
+def request(state, command, timeout=CONTROL_TIMEOUT):
+    """Отправляет команду запущенному экземпляру; возвращает ответ (dict)"""
+    message = json.dumps({"command": command, "token": state["token"]}) + "\n"
+    with socket.create_connection((CONTROL_HOST, state["port"]), timeout=timeout) as sock:
+        sock.sendall(message.encode("utf-8"))
+        data = sock.makefile("r", encoding="utf-8").readline()
+    if not data:
+        raise OSError("пустой ответ")
+    return json.loads(data)
+
+
+class ControlServer:
+    """Локальный сокет управления: одна JSON-строка запроса - одна строка ответа"""
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.token = secrets.token_hex(16)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind((CONTROL_HOST, 0))
+        self.sock.listen(4)
+        self.port = self.sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, name="crystaldpi-control", daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                try:
+                    conn.settimeout(CONTROL_TIMEOUT)
+                    line = conn.makefile("r", encoding="utf-8").readline()
+                    message = json.loads(line)
+                    if message.get("token") != self.token:
+                        reply = {"error": "неверный токен"}
+                    else:
+                        reply = self.handler(message.get("command"))
+                except (OSError, ValueError) as e:
+                    reply = {"error": str(e)}
+                try:
+                    conn.sendall((json.dumps(reply, ensure_ascii=False) + "\n").encode("utf-8"))
+                except OSError:
+                    pass
+
+    def close(self):
+        # На Linux закрытие не прерывает accept в потоке сокета: сначала shutdown
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+# Команды
+
+def require_admin():
+    if not is_admin():
+        raise CliError("winws требует прав администратора: запустите консоль от имени администратора")
+
+
+def cmd_start(args):
+    names = [arg for arg in args if not arg.startswith("--")]
+    if not names:
+        raise CliError("не указана стратегия")
+    state = read_state()
+    if state is not None:
+        raise CliError(f"уже запущено: {state['strategy']} (PID {state['pid']})")
+    path = find_strategy(names[0])
+    require_admin()
+    if "--detach" in args:
+        return detach(path)
+    return serve(path)
+
+
+def serve(path):
+    """Запускает winws и обслуживает его до stop, Ctrl+C или завершения winws"""
+    profile, before_start = load_profile(path)
+    supervisor = WinwsSupervisor()
+    if rotation_enabled():
+        # В фоновом режиме вывод winws иначе никуда не попадает
+        supervisor.log.set_rotation(LOG_FILE)
+    done = threading.Event()
+    exit_code = []
+
+    def on_event(event, value):
+        if event == "exited":
+            exit_code.append(value)
+            done.set()
+
+    supervisor.add_listener(on_event)
+    try:
+        ready_ms = supervisor.start_now(profile.argv(), profile.bin_dir, before_start)
+    except (StartupError, StrategyError, OSError) as e:
+        supervisor.shutdown(timeout=5)
+        raise CliError(str(e)) from None
+
+    started_at = time.time()
+
+    def handle(command):
+        if command == "stop":
+            done.set()
+            return {"ok": True}
+        if command == "status":
+            return {"ok": True, "strategy": profile.name, "winws_pid": supervisor.pid,
+                    "running": supervisor.is_running(), "ready_ms": ready_ms,
+                    "uptime": int(time.time() - started_at)}
+        return {"error": f"неизвестная команда: {command}"}
+
+    server = ControlServer(handle)
+    state = {"pid": os.getpid(), "winws_pid": supervisor.pid, "strategy": profile.name,
+             "path": os.path.abspath(path), "port": server.port, "token": server.token,
+             "started_at": started_at, "ready_ms": ready_ms}
+    atomic_write(STATE_FILE, [json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8")])
+
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), lambda *_: done.set())
+
+    print(f"Запущено: {profile.name}, winws готов за {ready_ms} мс (PID {supervisor.pid})")
+    try:
+        # Ожидание с таймаутом, чтобы Ctrl+C обрабатывался и на Windows
+        while not done.wait(0.5):
+            pass
+    finally:
+        server.close()
+        supervisor.shutdown(timeout=5)
+        supervisor.log.flush()
+        try:
+            os.remove(STATE_FILE)
+        except OSError:
+            pass
+    if exit_code:
+        print(f"winws завершился сам (код {exit_code[0]})")
+        return 1
+    print("Остановлено")
+    return 0
+
+
+def detach(path):
+    """Запускает себя в фоне без консоли и ждет готовности winws"""
+    if getattr(sys, "frozen", False):
+        # В сборке это консольный crystaldpi.exe (build_exe.py), а не окно CrystalDPI.exe
+        argv = [sys.executable, "start", path]
+    else:
+        argv = [sys.executable, os.path.abspath(__file__), "start", path]
+    kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    process = subprocess.Popen(argv, cwd=os.getcwd(), **kwargs)
+
+    deadline = time.monotonic() + DETACH_TIMEOUT
+    while time.monotonic() < deadline:
+        state = read_state()
+        if state is not None and state.get("pid") == process.pid:
+            print(f"Запущено в фоне: {state['strategy']} (PID {state['pid']}, winws {state['winws_pid']})")
+            return 0
+        if process.poll() is not None:
+            raise CliError(f"фоновый процесс завершился (код {process.returncode})")
+        time.sleep(0.1)
+    raise CliError("фоновый процесс не сообщил о запуске")
+
+
+def stop_instance(state, timeout=STOP_TIMEOUT):
+    """Останавливает запущенный экземпляр командой stop и ждет его завершения"""
+    try:
+        request(state, "stop")
+    except (OSError, ValueError):
+        # Процесс не отвечает: завершается принудительно вместе с winws
+        terminate_process(state.get("winws_pid"))
+        terminate_process(state["pid"])
+
+    deadline = time.monotonic() + timeout
+    while process_alive(state["pid"]) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    if process_alive(state["pid"]):
+        raise CliError(f"процесс не остановился (PID {state['pid']})")
+
+
+def cmd_stop(args):
+    state = read_state()
+    if state is None:
+        print("Не запущено")
+        return 0
+    stop_instance(state)
+    print(f"Остановлено: {state['strategy']}")
+    return 0
+
+
+def cmd_status(args):
+    state = read_state()
+    if state is None:
+        print("Не запущено")
+        return 3
+    try:
+        reply = request(state, "status")
+    except (OSError, ValueError) as e:
+        print(f"Процесс {state['pid']} не отвечает: {e}")
+        return 1
+    running = "работает" if reply.get("running") else "winws не работает"
+    print(f"{reply.get('strategy')}: {running} (PID {state['pid']}, winws {reply.get('winws_pid')}), "
+          f"запуск {reply.get('ready_ms')} мс, время работы {reply.get('uptime')} с")
+    return 0 if reply.get("running") else 1
+
+
+def cmd_test(args):
+    import probe
+
+    if not args:
+        return probe.main([probe.TARGETS_FILE])
+    from ranking import StrategyRanker
+
+    if read_state() is not None:
+        raise CliError("winws уже запущен: сначала выполните stop")
+    require_admin()
+    profile = parse_strategy(find_strategy(args[0]))
+    ranker = StrategyRanker(WinwsSupervisor(), probe.parse_targets(probe.TARGETS_FILE),
+                            rounds=1, prepare=prepare_strategy)
+    score = ranker.evaluate(profile)
+    print(format_score(score))
+    return 0 if not score.error and score.ok == score.total else 1
+
+
+def cmd_rank(args):
+    from probe import TARGETS_FILE, parse_targets
+    from ranking import RankingCache, StrategyRanker
+
+    if read_state() is not None:
+        raise CliError("winws уже запущен: сначала выполните stop")
+    require_admin()
+    if args:
+        profiles = [parse_strategy(find_strategy(name)) for name in args]
+    else:
+        # Одинаковые по командной строке стратегии проверяются один раз
+        from catalog import StrategyCatalog
+        catalog = StrategyCatalog()
+        catalog.scan()
+        profiles = catalog.unique()
+        for duplicate, original in catalog.duplicates().items():
+            print(f"Пропуск {duplicate}: совпадает с {original}")
+    targets = parse_targets(TARGETS_FILE)
+    if not profiles or not targets:
+        raise CliError("нет целей или стратегий для проверки")
+
+    supervisor = WinwsSupervisor()
+    ranker = StrategyRanker(supervisor, targets, prepare=prepare_strategy,
+                            on_progress=lambda i, n, name: print(f"[{i + 1}/{n}] {name}"))
+    try:
+        scores = ranker.rank(profiles)
+    finally:
+        supervisor.shutdown(timeout=5)
+    RankingCache().update(scores)
+
+    print()
+    for place, score in enumerate(scores, 1):
+        print(f"{place:>2}. {format_score(score)}")
+    return 0
+
+
+def format_score(score):
+    text = f"{score.name}: {score.ok}/{score.total}, p50={score.p50_ms} мс, p95={score.p95_ms} мс"
+    if score.error:
+        text += f", ошибка: {score.error}"
+    return text
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(USAGE)
+        return 2
+    command, args = argv[0], argv[1:]
+    try:
+        return globals()["cmd_" + command](args)
+    except (CliError, StrategyError, OSError) as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Слияние файла hosts с блоком из репозитория: точная разница и управляемый блок записей
+"""
+
+import os
+import sys
+import tempfile
+
+from ipset import DownloadError, fetch
+from liststore import atomic_write
+
+HOSTS_URL = "https://raw.githubusercontent.com/Flowseal/zapret-discord-youtube/refs/heads/main/.service/hosts"
+
+if os.name == "nt":
+    SYSTEM_HOSTS = os.path.join(os.environ.get("SystemRoot", r"C:\Windows"), "System32", "drivers", "etc", "hosts")
+else:
+    SYSTEM_HOSTS = "/etc/hosts"
+
+# Границы блока, которым управляет программа (ASCII: файл hosts обычно в кодировке ANSI);
+# все остальное в файле не трогается
+BEGIN_MARKER = "# >>> CrystalDPI managed block (do not edit)"
+END_MARKER = "# <<< CrystalDPI managed block"
+BACKUP_SUFFIX = ".crystaldpi.bak"
+
+
+def parse_hosts(lines):
+    """Записи hosts-файла как {имя: адрес} в порядке появления
+
+    Как и у системного резолвера, действует первая запись для имени.
+    """
+    entries = {}
+    for line in lines:
+        fields = line.split("#", 1)[0].split()
+        if len(fields) < 2:
+            continue
+        address = fields[0]
+        for name in fields[1:]:
+            entries.setdefault(name.lower(), address)
+    return entries
+
+
+def split_block(lines):
+    """Делит строки на (до блока, строки блока, после блока); блок None, если его нет"""
+    begin = end = None
+    for i, line in enumerate(lines):
+        text = line.strip()
+        if begin is None and text == BEGIN_MARKER:
+            begin = i
+        elif begin is not None and text == END_MARKER:
+            end = i
+            break
+    if begin is None or end is None:
+        return lines, None, []
+    return lines[:begin], lines[begin + 1:end], lines[end + 1:]
+
+
+class HostsDiff:
+    """Разница между hosts-файлом и записями из репозитория
+
+    missing - записей нет в файле совсем; changed - запись в блоке с другим
+    адресом; stale - запись в блоке, которой больше нет в репозитории;
+    conflicting - имя задано вне блока другим адресом (такие строки не
+    изменяются, только показываются); unmanaged - имя уже задано вне блока
+    тем же адресом (в блок не добавляется).
+    """
+
+    def __init__(self, upstream, block, outside):
+        self.missing = []
+        self.changed = []
+        self.conflicting = []
+        self.unmanaged = []
+        # Новое содержимое блока в порядке репозитория
+        self.entries = []
+        for name, address in upstream.items():
+            current = outside.get(name)
+            if current is not None:
+                if current == address:
+                    self.unmanaged.append(name)
+                else:
+                    self.conflicting.append((name, current, address))
+                continue
+            self.entries.append((address, name))
+            if name not in block:
+                self.missing.append((name, address))
+            elif block[name] != address:
+                self.changed.append((name, block[name], address))
+        self.stale = [(name, address) for name, address in block.items()
+                      if name not in upstream or name in outside]
+
+    @property
+    def up_to_date(self):
+        return not (self.missing or self.changed or self.stale)
+
+    def summary(self):
+        if self.up_to_date:
+            text = "Файл hosts актуален"
+        else:
+            text = (f"Нужно добавить: {len(self.missing)}, изменить: {len(self.changed)}, "
+                    f"удалить: {len(self.stale)}")
+        if self.conflicting:
+            text += f"\nЗаданы вне блока другим адресом: {len(self.conflicting)}"
+            for name, current, address in self.conflicting[:10]:
+                text += f"\n  {name}: {current} (в репозитории {address})"
+        return text
+
+
+class HostsFile:
+    """Файл hosts с управляемым блоком
+
+    Строки вне блока сохраняются байт в байт, включая переводы строк и
+    кодировку. Запись идет через временный файл и переименование, перед
+    первым изменением создается резервная копия. Повторное применение тех
+    же записей файл не меняет.
+    """
+
+    def __init__(self, path=SYSTEM_HOSTS):
+        self.path = path
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        if b"\r\n" in data:
+            self.newline = "\r\n"
+        else:
+            # Файл без переводов строк (пустой или из одной строки): системный перевод
+            self.newline = "\n" if b"\n" in data else os.linesep
+        # surrogateescape сохраняет байты в кодировке ANSI без изменений
+        self.text = data.decode("utf-8", errors="surrogateescape")
+        self.lines = self.text.splitlines()
+        self.before, self.block, self.after = split_block(self.lines)
+
+    def diff(self, upstream):
+        block = parse_hosts(self.block or [])
+        outside = parse_hosts(self.before)
+        for name, address in parse_hosts(self.after).items():
+            outside.setdefault(name, address)
+        return HostsDiff(upstream, block, outside)
+
+    def render(self, entries):
+        """Текст файла с новым блоком; без записей блок удаляется"""
+        lines = list(self.before)
+        if self.block is None or not entries:
+            # Пустая строка перед новым блоком добавляется и удаляется вместе с ним;
+            # у существующего блока окружение не меняется
+            while lines and not lines[-1].strip() and not self.after:
+                lines.pop()
+            if entries and lines and lines[-1].strip():
+                lines.append("")
+        if entries:
+            lines.append(BEGIN_MARKER)
+            lines.extend(f"{address} {name}" for address, name in entries)
+            lines.append(END_MARKER)
+        lines.extend(self.after)
+        return self.newline.join(lines) + self.newline if lines else ""
+
+    def apply(self, upstream, dry_run=False):
+        """Приводит блок к записям upstream; возвращает (HostsDiff, изменен ли файл)"""
+        diff = self.diff(upstream)
+        if self.block is None and not diff.entries:
+            # Блока нет и добавлять нечего: файл не переписывается даже ради пустых строк в конце
+            return diff, False
+        return diff, self._write(self.render(diff.entries), dry_run)
+
+    def remove(self, dry_run=False):
+        """Удаляет управляемый блок; возвращает True, если файл изменен"""
+        if self.block is None:
+            return False
+        return self._write(self.render([]), dry_run)
+
+    def _write(self, text, dry_run):
+        if text == self.text:
+            return False
+        if dry_run:
+            return True
+        data = text.encode("utf-8", errors="surrogateescape")
+        backup = self.path + BACKUP_SUFFIX
+        if os.path.exists(self.path) and not os.path.exists(backup):
+            with open(self.path, "rb") as f:
+                atomic_write(backup, [f.read()])
+        atomic_write(self.path, [data])
+        self.load()
+        return True
+
+
+def read_upstream(path):
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        return parse_hosts(f)
+
+
+def download_upstream(url=HOSTS_URL):
+    """Загружает записи hosts из репозитория; DownloadError при ошибке"""
+    fd, temp_path = tempfile.mkstemp(prefix="crystaldpi-hosts-", suffix=".txt")
+    os.close(fd)
+    try:
+        fetch(url, temp_path)
+        upstream = read_upstream(temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    if not upstream:
+        raise DownloadError("в загруженном файле нет записей")
+    return upstream
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Использование:\n"
+             "  python hosts.py diff|apply|remove [--hosts ФАЙЛ] [--source ФАЙЛ | --url URL]")
+    if not argv or argv[0] not in ("diff", "apply", "remove"):
+        print(usage)
+        return 2
+
+    command, args = argv[0], argv[1:]
+    options = dict(zip(args[::2], args[1::2]))
+    hosts = HostsFile(options.get("--hosts", SYSTEM_HOSTS))
+    try:
+        if command == "remove":
+            print("Блок удален" if hosts.remove() else "Блока нет в файле")
+            return 0
+        if "--source" in options:
+            upstream = read_upstream(options["--source"])
+        else:
+            upstream = download_upstream(options.get("--url", HOSTS_URL))
+        diff, changed = hosts.apply(upstream, dry_run=command == "diff")
+    except (DownloadError, OSError) as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+    print(diff.summary())
+    for name, address in diff.missing[:20]:
+        print(f"  + {address} {name}")
+    for name, old, new in diff.changed[:20]:
+        print(f"  ~ {name}: {old} -> {new}")
+    for name, address in diff.stale[:20]:
+        print(f"  - {address} {name}")
+    if command == "apply":
+        print("Файл hosts обновлен" if changed else "Файл hosts не изменен")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+"""
+Массовый импорт доменов и адресов в списки из файлов, буфера обмена, HAR и экспорта браузера
+"""
+
+import ipaddress
+import json
+import os
+import re
+import sys
+import time
+
+from compiler import DomainTrie
+from cidr import RangeSet, to_ranges
+from liststore import list_kind
+from validator import validate_batch
+
+# Сколько неверных строк показывать в отчете
+ERROR_SAMPLES = 50
+PROGRESS_STEP = 50000
+
+_PLAIN_DOMAIN_RE = re.compile(r"^[a-z0-9](?:[a-z0-9.-]*[a-z0-9])?$")
+_URL_RE = re.compile(r"""(?:https?|wss?|ftp)://[^\s"'<>\\]+""", re.I)
+_HOSTS_LINE_RE = re.compile(r"^\s*(?:0\.0\.0\.0|127\.0\.0\.1|::1?)\s+(\S+)")
+_CIDR_RE = re.compile(r"^[0-9a-f.:]+/\d{1,3}$")
+
+
+def host_from_url(url):
+    """Хост из URL без схемы, учетных данных, порта и пути"""
+    rest = url.split("://", 1)[-1]
+    for separator in "/?#":
+        rest = rest.split(separator, 1)[0]
+    rest = rest.rsplit("@", 1)[-1]
+    if rest.startswith("["):
+        return rest[1:].split("]", 1)[0]
+    if rest.count(":") == 1:
+        rest = rest.split(":", 1)[0]
+    return rest
+
+
+def normalize_entry(text, kind="hostlist"):
+    """Приводит строку к записи списка; возвращает '' для пустых строк и комментариев"""
+    text = text.strip()
+    if not text or text[0] in "#!;":
+        return ""
+    text = text.split("#", 1)[0].strip().lower()
+    if kind == "hostlist" and _PLAIN_DOMAIN_RE.match(text):
+        return text
+
+    match = _HOSTS_LINE_RE.match(text)
+    if match:
+        # Строка hosts-файла: берется имя, а не адрес
+        text = match.group(1)
+    elif text.startswith("||"):
+        # Правило блокировщика рекламы: ||example.com^
+        text = text[2:].split("^", 1)[0]
+    elif "://" in text or text.startswith("["):
+        text = host_from_url(text)
+    elif kind == "hostlist" and ("/" in text or text.count(":") == 1) and not _CIDR_RE.match(text):
+        # example.com/path или example.com:443; подсеть остается как есть и будет отклонена
+        text = host_from_url(text)
+    if kind == "hostlist":
+        if text.startswith("*."):
+            text = text[2:]
+        text = text.strip(".")
+    return text
+
+
+def read_text_lines(path):
+    """Построчное чтение текстового файла (txt, csv, hosts)"""
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            if "," in line and "://" in line:
+                # CSV-экспорт истории/паролей браузера: берутся только URL
+                yield from _URL_RE.findall(line)
+            else:
+                yield line
+
+
+def _walk_json(node):
+    """Все строки-URL из JSON (закладки Chrome, экспорт истории)"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, str) and "://" in node:
+            yield node
+
+
+def read_har(path):
+    """URL всех запросов из HAR-файла"""
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        data = json.load(f)
+    for entry in data.get("log", {}).get("entries", []):
+        url = entry.get("request", {}).get("url")
+        if url:
+            yield url
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        data = json.load(f)
+    yield from _walk_json(data)
+
+
+def read_html(path):
+    """URL из HTML-экспорта закладок (формат Netscape)"""
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            yield from _URL_RE.findall(line)
+
+
+def read_source(path):
+    """Выбирает способ чтения по расширению файла"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".har":
+        return read_har(path)
+    if ext == ".json":
+        return read_json(path)
+    if ext in (".html", ".htm"):
+        return read_html(path)
+    return read_text_lines(path)
+
+
+def read_text(text):
+    """Строки из текста (поле ввода, буфер обмена)"""
+    for line in text.splitlines():
+        if "://" in line and " " in line.strip():
+            yield from _URL_RE.findall(line)
+        else:
+            yield line
+
+
+class ImportReport:
+    """Итог импорта: новые записи и сводка по пропущенным"""
+
+    def __init__(self):
+        self.added = []
+        self.total = 0
+        self.duplicates = 0
+        self.covered = 0
+        self.converted = 0
+        self.invalid = 0
+        self.errors = []
+        self.elapsed_ms = 0
+
+    def add_error(self, line, message):
+        self.invalid += 1
+        if len(self.errors) < ERROR_SAMPLES:
+            self.errors.append((line, message))
+
+    def summary(self):
+        lines = [f"Обработано строк: {self.total}", f"Добавлено: {len(self.added)}"]
+        if self.duplicates:
+            lines.append(f"Дубликатов: {self.duplicates}")
+        if self.converted:
+            lines.append(f"IDN переведено в punycode: {self.converted}")
+        if self.covered:
+            lines.append(f"Уже покрыты родительским доменом или подсетью: {self.covered}")
+        if self.invalid:
+            lines.append(f"Неверных строк: {self.invalid}")
+        return "\n".join(lines)
+
+    def error_report(self):
+        text = "\n".join(f"{line} - {message}" for line, message in self.errors)
+        if self.invalid > len(self.errors):
+            text += f"\n... и еще {self.invalid - len(self.errors)}"
+        return text
+
+
+class BulkImporter:
+    """Нормализует, проверяет и отбирает только новые записи
+
+    Строки проверяются пакетно (validator.validate_batch), IDN переводятся
+    в punycode. Дубликаты отсекаются множеством, а домены, уже покрытые родительской
+    записью (в списке или среди импортируемых), - суффиксным деревом.
+    Для ipset вместо дерева - слитые диапазоны подсетей. Ошибки собираются в
+    один отчет; вызывающая сторона добавляет в файл только report.added.
+    """
+
+    def __init__(self, existing, kind="hostlist", on_progress=None, should_stop=None):
+        self.kind = kind
+        self.on_progress = on_progress
+        self.should_stop = should_stop
+        self.seen = set()
+        existing_entries = []
+        for line in existing:
+            entry = normalize_entry(line, kind)
+            if entry:
+                self.seen.add(entry)
+                existing_entries.append(entry)
+        if kind == "hostlist":
+            self.trie = DomainTrie(existing_entries)
+            self.ranges = None
+        else:
+            self.trie = None
+            networks = _networks(existing_entries)
+            # Слитые диапазоны списка: подсеть покрыта, если целиком внутри одного из них
+            self.ranges = {version: RangeSet(to_ranges(networks, version)) for version in (4, 6)}
+            self.networks = {str(network) for network in networks}
+
+    def run(self, lines):
+        report = ImportReport()
+        start = time.perf_counter()
+        seen = self.seen
+        candidates = []
+
+        for line in lines:
+            report.total += 1
+            if self.on_progress is not None and report.total % PROGRESS_STEP == 0:
+                self.on_progress(report.total)
+                if self.should_stop is not None and self.should_stop():
+                    break
+            entry = normalize_entry(line, self.kind)
+            if not entry:
+                report.total -= 1
+                continue
+            if entry in seen:
+                report.duplicates += 1
+                continue
+            seen.add(entry)
+            candidates.append(entry)
+
+        batch = validate_batch(candidates, self.kind)
+        for line, error in batch.errors:
+            report.add_error(line, error)
+        report.converted = batch.converted
+        valid = []
+        for entry, value in zip(candidates, batch.values):
+            if value is None:
+                continue
+            if value != entry:
+                # IDN в punycode: такая запись могла уже быть в списке
+                if value in seen:
+                    report.duplicates += 1
+                    continue
+                seen.add(value)
+            valid.append(value)
+
+        if self.kind == "hostlist":
+            self._filter_domains(valid, report)
+        else:
+            self._filter_networks(valid, report)
+        report.elapsed_ms = int((time.perf_counter() - start) * 1000)
+        return report
+
+    def _filter_domains(self, candidates, report):
+        # Сначала в дерево попадают все новые домены, чтобы родитель, идущий позже
+        # поддомена, тоже отсек его
+        trie = self.trie
+        for entry in candidates:
+            trie.add(entry)
+        for entry in candidates:
+            if trie.covers(entry, strict=True) is not None:
+                report.covered += 1
+            else:
+                report.added.append(entry)
+
+    def _filter_networks(self, candidates, report):
+        known = self.networks
+        networks = []
+        for entry in candidates:
+            network = ipaddress.ip_network(entry, strict=False)
+            canonical = str(network)
+            # 192.0.2.1 и 192.0.2.1/32 - одна и та же запись
+            if canonical in known:
+                report.duplicates += 1
+                continue
+            known.add(canonical)
+            networks.append(network)
+        # Широкие сети проверяются первыми и сразу добавляются в диапазоны, чтобы
+        # принятая /8 отсекла и /16, идущую в импорте раньше нее
+        accepted = set()
+        for network in sorted(networks, key=lambda network: network.prefixlen):
+            ranges = self.ranges[network.version]
+            start, end = int(network.network_address), int(network.broadcast_address)
+            if ranges.covers(start, end):
+                report.covered += 1
+            else:
+                ranges.add(start, end)
+                accepted.add(network)
+        report.added.extend(str(network) for network in networks if network in accepted)
+
+
+def _networks(entries):
+    networks = []
+    for entry in entries:
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            pass
+    return networks
+
+
+def import_files(paths, existing, kind="hostlist", **kwargs):
+    """Импортирует записи из файлов; возвращает ImportReport"""
+    def lines():
+        for path in paths:
+            yield from read_source(path)
+    return BulkImporter(existing, kind, **kwargs).run(lines())
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print("Использование: python importer.py <список> <файл> [файл ...]")
+        return 2
+
+    from liststore import ListStore
+    store = ListStore(argv[0])
+    report = import_files(argv[1:], store.lines(), list_kind(argv[0]))
+    store.append(report.added)
+    store.save()
+
+    print(report.summary())
+    if report.errors:
+        print("\nНеверные строки:\n" + report.error_report())
+    print(f"Время: {report.elapsed_ms} мс")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
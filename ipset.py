@@ -0,0 +1,306 @@
+"""
+Обновление ipset-all.txt из сети и переключение режимов ipset (loaded / none / any)
+"""
+
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+import zlib
+
+from cidr import IPSET_ALL, read_networks
+from compiler import IPSET_NONE
+from liststore import atomic_write, file_signature, replace_file
+from probe import USER_AGENT
+
+IPSET_URL = "https://raw.githubusercontent.com/Flowseal/zapret-discord-youtube/refs/heads/main/.service/ipset-service.txt"
+
+DOWNLOAD_TIMEOUT = 15
+CHUNK_SIZE = 64 * 1024
+
+# Режимы из service.bat: список загружен, "ни один адрес" (заглушка), "любой адрес" (пустой файл)
+MODE_LOADED = "loaded"
+MODE_NONE = "none"
+MODE_ANY = "any"
+MODES = (MODE_LOADED, MODE_NONE, MODE_ANY)
+# Порядок переключения, как в :ipset_switch
+NEXT_MODE = {MODE_LOADED: MODE_NONE, MODE_NONE: MODE_ANY, MODE_ANY: MODE_LOADED}
+
+
+class DownloadError(Exception):
+    """Файл не загружен; предыдущая версия не изменена"""
+
+
+class IpsetError(DownloadError):
+    """Обновление или переключение ipset не выполнено; файлы не изменены"""
+
+
+class Download:
+    """Загруженный файл и заголовки для следующего условного запроса"""
+
+    def __init__(self, size, etag, last_modified):
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+def fetch(url, temp_path, etag=None, last_modified=None, timeout=DOWNLOAD_TIMEOUT, should_stop=None):
+    """Условно загружает url в temp_path; возвращает Download или None (304)
+
+    Сервер получает If-None-Match / If-Modified-Since от прошлой загрузки
+    и может ответить 304 без тела. Тело запрашивается в gzip и
+    распаковывается на лету. При ошибке бросается DownloadError, а
+    частично записанный temp_path удаляется.
+    """
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, "Accept-Encoding": "gzip"})
+    if etag:
+        request.add_header("If-None-Match", etag)
+    if last_modified:
+        request.add_header("If-Modified-Since", last_modified)
+
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None
+        raise DownloadError(f"сервер ответил {e.code} {e.reason}") from None
+    except (urllib.error.URLError, OSError) as e:
+        raise DownloadError(f"не удалось загрузить: {getattr(e, 'reason', e)}") from None
+
+    directory = os.path.dirname(temp_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    gzipped = response.headers.get("Content-Encoding", "").lower() == "gzip"
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    received = 0
+    try:
+        with response, open(temp_path, "wb") as f:
+            while True:
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                f.write(decompressor.decompress(chunk) if decompressor else chunk)
+                if should_stop is not None and should_stop():
+                    raise DownloadError("загрузка отменена")
+            if decompressor is not None:
+                f.write(decompressor.flush())
+            f.flush()
+            os.fsync(f.fileno())
+        length = response.headers.get("Content-Length")
+        if length is not None and length.isdigit() and int(length) != received:
+            raise DownloadError(f"загрузка прервана: получено {received} из {length} байт")
+        if decompressor is not None and not decompressor.eof:
+            raise DownloadError("загрузка прервана: неполный gzip")
+    except (OSError, zlib.error) as e:
+        _remove(temp_path)
+        raise DownloadError(f"ошибка загрузки: {e}") from None
+    except DownloadError:
+        _remove(temp_path)
+        raise
+    return Download(received, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class UpdateResult:
+    """Итог обновления списка"""
+
+    def __init__(self, modified, path, added=0, removed=0, total=0, size=0, elapsed_ms=0):
+        self.modified = modified
+        self.path = path
+        self.added = added
+        self.removed = removed
+        self.total = total
+        self.size = size
+        self.elapsed_ms = elapsed_ms
+
+    def summary(self):
+        if not self.modified:
+            return "Список ipset не изменился на сервере"
+        return (f"Список ipset обновлен: подсетей {self.total}, "
+                f"добавлено {self.added}, удалено {self.removed} ({self.size} байт)")
+
+    def __repr__(self):
+        return f"UpdateResult(modified={self.modified}, +{self.added}, -{self.removed})"
+
+
+def detect_mode(path=IPSET_ALL):
+    """Режим по содержимому файла - для списков, измененных без этого модуля"""
+    networks, invalid = read_networks(path) if os.path.exists(path) else ([], 0)
+    if not networks and not invalid:
+        return MODE_ANY
+    if not invalid and [str(network) for network in networks] == [IPSET_NONE]:
+        return MODE_NONE
+    return MODE_LOADED
+
+
+class IpsetManager:
+    """Режим и обновление ipset-all.txt
+
+    Состояние хранится рядом со списком (ipset-all.state.json): режим,
+    ETag и Last-Modified последней загрузки и подпись файла списка. Если
+    подпись не совпала (файл изменили service.bat или редактор), режим
+    определяется заново по содержимому.
+
+    В режимах none и any загруженный список лежит в ipset-all.txt.backup,
+    как в service.bat; обновление тогда пишет в резервную копию и не
+    меняет текущий режим.
+    """
+
+    def __init__(self, path=IPSET_ALL, state_path=None, url=IPSET_URL, timeout=DOWNLOAD_TIMEOUT):
+        self.path = path
+        self.backup_path = path + ".backup"
+        self.state_path = state_path or os.path.splitext(path)[0] + ".state.json"
+        self.url = url
+        self.timeout = timeout
+
+    # Состояние
+
+    def load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, state):
+        state["signature"] = file_signature(self.path)
+        data = json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8")
+        try:
+            atomic_write(self.state_path, [data])
+        except OSError as e:
+            print(f"Не удалось сохранить состояние ipset: {e}")
+
+    def mode(self):
+        state = self.load_state()
+        signature = file_signature(self.path)
+        if state.get("mode") in MODES and state.get("signature") == (list(signature) if signature else None):
+            return state["mode"]
+        return detect_mode(self.path)
+
+    # Переключение режимов
+
+    def switch(self, mode=None):
+        """Переключает режим (по умолчанию - следующий, как в service.bat); возвращает новый"""
+        current = self.mode()
+        mode = mode or NEXT_MODE[current]
+        if mode not in MODES:
+            raise IpsetError(f"неизвестный режим ipset: {mode}")
+        if mode == current:
+            return mode
+
+        if mode == MODE_LOADED:
+            if not os.path.exists(self.backup_path):
+                raise IpsetError("нет сохраненного списка: сначала обновите ipset")
+            replace_file(self.backup_path, self.path)
+        else:
+            if current == MODE_LOADED and os.path.exists(self.path):
+                replace_file(self.path, self.backup_path)
+            atomic_write(self.path, [(IPSET_NONE + "\n").encode("ascii")] if mode == MODE_NONE else [])
+
+        state = self.load_state()
+        state["mode"] = mode
+        self.save_state(state)
+        return mode
+
+    # Обновление
+
+    def target(self, mode=None):
+        """Файл, в который попадет загруженный список"""
+        return self.path if (mode or self.mode()) == MODE_LOADED else self.backup_path
+
+    def update(self, force=False, should_stop=None):
+        """Загружает список, если он изменился на сервере; возвращает UpdateResult
+
+        Запрос условный (If-None-Match / If-Modified-Since). Ответ пишется во
+        временный файл, каждая строка проверяется как подсеть, и только
+        затем файл атомарно заменяет список. При любой ошибке старый список
+        остается нетронутым, а бросается DownloadError.
+        """
+        start = time.perf_counter()
+        state = self.load_state()
+        mode = self.mode()
+        target = self.target(mode)
+
+        conditional = not force and os.path.exists(target) and state.get("url") == self.url
+        temp_path = f"{target}.{os.getpid()}.download"
+        try:
+            download = fetch(self.url, temp_path,
+                             state.get("etag") if conditional else None,
+                             state.get("last_modified") if conditional else None,
+                             self.timeout, should_stop)
+            if download is None:
+                return UpdateResult(False, target, elapsed_ms=_elapsed_ms(start))
+
+            networks, invalid = read_networks(temp_path)
+            if invalid:
+                raise IpsetError(f"в загруженном списке неверных строк: {invalid}")
+            if not networks:
+                # Пустой файл включил бы режим "любой адрес"
+                raise IpsetError("загруженный список пуст")
+
+            old = set(read_networks(target)[0]) if os.path.exists(target) else set()
+            new = set(networks)
+            replace_file(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                _remove(temp_path)
+
+        state.update(mode=mode, url=self.url, etag=download.etag, last_modified=download.last_modified,
+                     updated_at=time.time(), count=len(new))
+        self.save_state(state)
+        return UpdateResult(True, target, len(new - old), len(old - new), len(new), download.size,
+                            _elapsed_ms(start))
+
+
+def _elapsed_ms(start):
+    return int((time.perf_counter() - start) * 1000)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Использование:\n"
+             "  python ipset.py status\n"
+             "  python ipset.py update [--force] [--url URL]\n"
+             "  python ipset.py switch [loaded|none|any]")
+    if not argv:
+        print(usage)
+        return 2
+
+    command, args = argv[0], argv[1:]
+    url = IPSET_URL
+    if "--url" in args:
+        url = args[args.index("--url") + 1]
+    manager = IpsetManager(url=url)
+    try:
+        if command == "status":
+            state = manager.load_state()
+            print(f"Режим: {manager.mode()}")
+            if state.get("updated_at"):
+                updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(state["updated_at"]))
+                print(f"Обновлен: {updated}, подсетей: {state.get('count')}")
+        elif command == "update":
+            result = manager.update(force="--force" in args)
+            print(result.summary())
+            print(f"Время: {result.elapsed_ms} мс")
+        elif command == "switch":
+            print(f"Режим: {manager.switch(args[0] if args else None)}")
+        else:
+            print(usage)
+            return 2
+    except DownloadError as e:
+        print(f"Ошибка: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""
+Хранилище строк списка (hostlist, ipset) для редактора без загрузки всего файла в виджет
+"""
+
+import operator
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import accumulate, repeat
+
+from validator import validate_line
+
+PAGE_SIZE = 512
+PAGE_CACHE = 64
+
+REPLACE_RETRIES = 10
+REPLACE_DELAY = 0.05
+
+_ORIGINAL = 0
+_ADDED = 1
+
+VALIDATORS = {
+    "hostlist": lambda text: validate_line(text, "hostlist"),
+    "ipset": lambda text: validate_line(text, "ipset"),
+}
+
+
+def list_kind(path):
+    """Тип списка по имени файла"""
+    return "ipset" if os.path.basename(path).startswith("ipset") else "hostlist"
+
+
+def index_lines(data):
+    """Смещения начала каждой строки и конца последней (array('Q'))"""
+    if not data:
+        return array("Q", [0])
+    lengths = map(operator.add, map(len, data.split(b"\n")), repeat(1))
+    offsets = array("Q", accumulate(lengths, initial=0))
+    # У последней строки нет перевода строки: либо она пустая, либо файл без \n в конце
+    offsets.pop()
+    if offsets[-1] != len(data):
+        offsets.append(len(data))
+    return offsets
+
+
+class ListStore:
+    """Строки файла как таблица фрагментов (piece table)
+
+    Исходный файл хранится одним блоком байтов с индексом смещений строк;
+    строки декодируются страницами по запросу. Правки не трогают исходные
+    данные: список фрагментов ссылается либо на диапазон исходных строк,
+    либо на добавленные строки. Поэтому вставка, удаление и сохранение
+    стоят O(число фрагментов), то есть растут с числом правок, а не с
+    размером списка.
+    """
+
+    def __init__(self, path, kind=None):
+        self.path = path
+        self.kind = kind or list_kind(path)
+        self.validator = VALIDATORS[self.kind]
+        # Номер версии растет при каждой правке и перечитывании файла
+        self.generation = 0
+        self.load()
+
+    def load(self):
+        """Перечитывает файл и сбрасывает правки"""
+        try:
+            with open(self.path, "rb") as f:
+                self._data = f.read()
+        except FileNotFoundError:
+            self._data = b""
+        if self._data.startswith(b"\xef\xbb\xbf"):
+            self._data = self._data[3:]
+        self._offsets = index_lines(self._data)
+        self._lower = None
+        self._newline = b"\r\n" if b"\r\n" in self._data[:4096] else b"\n"
+        self._added = []
+        self._pages = OrderedDict()
+        count = len(self._offsets) - 1
+        self._pieces = [[_ORIGINAL, 0, count]] if count else []
+        self._rebuild()
+        self.dirty = False
+        self.generation += 1
+        # Строки _added до _clean_added уже записаны на диск
+        self._clean_added = 0
+
+    def _rebuild(self):
+        """Пересчитывает начала фрагментов для двоичного поиска"""
+        self._starts = array("q")
+        total = 0
+        for piece in self._pieces:
+            self._starts.append(total)
+            total += piece[2]
+        self._count = total
+
+    def __len__(self):
+        return self._count
+
+    # Чтение
+
+    def _original_line(self, index):
+        page_number = index // PAGE_SIZE
+        page = self._pages.get(page_number)
+        if page is None:
+            first = page_number * PAGE_SIZE
+            last = min(first + PAGE_SIZE, len(self._offsets) - 1)
+            chunk = self._data[self._offsets[first]:self._offsets[last]]
+            page = chunk.decode("utf-8", errors="replace").split("\n")
+            page = [line.rstrip("\r") for line in page[:last - first]]
+            self._pages[page_number] = page
+            if len(self._pages) > PAGE_CACHE:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_number)
+        return page[index % PAGE_SIZE]
+
+    def _locate(self, row):
+        i = bisect_right(self._starts, row) - 1
+        return i, row - self._starts[i]
+
+    def row(self, row):
+        """Текст строки row"""
+        if not 0 <= row < self._count:
+            raise IndexError(row)
+        i, offset = self._locate(row)
+        kind, start, _ = self._pieces[i]
+        if kind == _ORIGINAL:
+            return self._original_line(start + offset)
+        return self._added[start + offset]
+
+    def __getitem__(self, row):
+        return self.row(row)
+
+    def __iter__(self):
+        for kind, start, count in self._pieces:
+            if kind == _ORIGINAL:
+                for index in range(start, start + count):
+                    yield self._original_line(index)
+            else:
+                yield from self._added[start:start + count]
+
+    def lines(self):
+        """Все строки списка; без правок файл декодируется одним вызовом"""
+        if not self._added and len(self._pieces) <= 1:
+            lines = self._data.decode("utf-8", errors="replace").split("\n")
+            lines = lines[:self._count]
+            if self._newline == b"\r\n":
+                lines = [line.rstrip("\r") for line in lines]
+            return lines
+        return list(self)
+
+    def validate(self, row):
+        """Текст ошибки строки или None"""
+        return self.validator(self.row(row))
+
+    def find(self, needle):
+        """Номера строк, содержащих needle (без учета регистра)"""
+        needle = needle.strip().lower()
+        if not needle:
+            return array("q", range(self._count))
+
+        # Исходные строки ищутся прямо в байтах файла, без декодирования всех строк
+        encoded = needle.encode("utf-8")
+        if self._lower is None:
+            self._lower = self._data.lower()
+        data = self._lower
+        hits = []
+        position = data.find(encoded)
+        while position != -1:
+            line = bisect_right(self._offsets, position) - 1
+            hits.append(line)
+            position = data.find(encoded, self._offsets[line + 1])
+
+        rows = array("q")
+        for (kind, start, count), first in zip(self._pieces, self._starts):
+            if kind == _ORIGINAL:
+                lo = bisect_left(hits, start)
+                hi = bisect_left(hits, start + count)
+                rows.extend(first + line - start for line in hits[lo:hi])
+            else:
+                for offset, text in enumerate(self._added[start:start + count]):
+                    if needle in text.lower():
+                        rows.append(first + offset)
+        return rows
+
+    # Изменение
+
+    def _split(self, row):
+        """Гарантирует, что фрагмент начинается с row; возвращает его индекс"""
+        if row >= self._count:
+            return len(self._pieces)
+        i, offset = self._locate(row)
+        if offset == 0:
+            return i
+        kind, start, count = self._pieces[i]
+        self._pieces[i:i + 1] = [[kind, start, offset], [kind, start + offset, count - offset]]
+        self._starts.insert(i + 1, self._starts[i] + offset)
+        return i + 1
+
+    def _modified(self):
+        self.dirty = True
+        self.generation += 1
+
+    def insert(self, row, lines):
+        """Вставляет строки перед row"""
+        lines = list(lines)
+        if not lines:
+            return
+        i = self._split(row)
+        start = len(self._added)
+        self._added.extend(lines)
+        last = self._pieces[i - 1] if i and i == len(self._pieces) else None
+        if last is not None and last[0] == _ADDED and last[1] + last[2] == start:
+            last[2] += len(lines)
+        else:
+            self._pieces.insert(i, [_ADDED, start, len(lines)])
+        self._rebuild()
+        self._modified()
+
+    def append(self, lines):
+        self.insert(self._count, lines)
+
+    def remove(self, row, count=1):
+        """Удаляет count строк начиная с row"""
+        count = min(count, self._count - row)
+        if count <= 0:
+            return
+        first = self._split(row)
+        last = self._split(row + count)
+        del self._pieces[first:last]
+        self._rebuild()
+        self._modified()
+
+    def remove_rows(self, rows):
+        """Удаляет набор строк (номера в любом порядке)"""
+        for row in sorted(set(rows), reverse=True):
+            self.remove(row)
+
+    def set(self, row, text):
+        """Заменяет текст строки"""
+        if self.row(row) == text:
+            return
+        i = self._split(row)
+        self._split(row + 1)
+        self._pieces[i] = [_ADDED, len(self._added), 1]
+        self._added.append(text)
+        self._rebuild()
+        self._modified()
+
+    def clear(self):
+        self._pieces = []
+        self._rebuild()
+        self._modified()
+
+    def changed_rows(self):
+        """Пары (номер строки, текст) для строк, добавленных или измененных после сохранения"""
+        for (kind, start, count), first in zip(self._pieces, self._starts):
+            if kind == _ADDED:
+                for offset, text in enumerate(self._added[start:start + count]):
+                    if start + offset >= self._clean_added:
+                        yield first + offset, text
+
+    # Сохранение
+
+    def snapshot(self):
+        """Содержимое файла списком фрагментов байтов
+
+        Исходные строки отдаются как memoryview без копирования, поэтому
+        снимок дешев и его можно записать из другого потока, пока редактор
+        продолжает изменять хранилище.
+        """
+        data = memoryview(self._data)
+        newline = self._newline
+        last = len(self._pieces) - 1
+        chunks = []
+        for index, (kind, start, count) in enumerate(self._pieces):
+            if kind == _ORIGINAL:
+                end = self._offsets[start + count]
+                chunks.append(data[self._offsets[start]:end])
+                if index < last and not self._data.endswith(b"\n", 0, end):
+                    chunks.append(newline)
+            else:
+                chunk = newline.join(line.encode("utf-8") for line in self._added[start:start + count])
+                chunks.append(chunk + newline if index < last else chunk)
+        return chunks
+
+    def mark_saved(self, generation):
+        """Отмечает, что снимок версии generation записан на диск"""
+        if generation == self.generation:
+            self.dirty = False
+            self._clean_added = len(self._added)
+
+    def save(self):
+        """Синхронно записывает список; возвращает число записанных байт"""
+        if not self.dirty:
+            return 0
+        generation = self.generation
+        written = atomic_write(self.path, self.snapshot())
+        self.mark_saved(generation)
+        return written
+
+
+def file_signature(path):
+    """Размер и время изменения файла или None, если файла нет"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def atomic_write(path, chunks, retries=REPLACE_RETRIES):
+    """Записывает файл через временный файл и атомарное переименование
+
+    Читатель (winws, редактор) видит либо старый, либо новый файл целиком.
+    На Windows замена может временно не удаваться, пока файл открыт другой
+    программой, поэтому она повторяется несколько раз.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    written = 0
+    try:
+        with open(temp_path, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        replace_file(temp_path, path, retries)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+def replace_file(source, path, retries=REPLACE_RETRIES):
+    """os.replace с повторами: на Windows файл может быть ненадолго занят"""
+    for attempt in range(retries):
+        try:
+            os.replace(source, path)
+            return
+        except PermissionError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(REPLACE_DELAY)
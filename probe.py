@@ -0,0 +1,374 @@
+"""
+Асинхронная проверка доступности адресов из utils/targets.txt
+"""
+
+import asyncio
+import re
+import socket
+import ssl
+import sys
+import time
+from urllib.parse import urlsplit
+
+TARGETS_FILE = "utils/targets.txt"
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_CONCURRENCY = 64
+# Порты, на которых проверяется доступность PING-целей (ICMP требует raw-сокетов)
+PING_PORTS = (443, 53)
+USER_AGENT = "CrystalDPI"
+
+_HAS_START_TLS = hasattr(asyncio.StreamWriter, "start_tls")
+_TARGET_RE = re.compile(r'^\s*(\w+)\s*=\s*"(.+)"\s*$')
+
+
+class Target:
+    """Одна цель из targets.txt"""
+
+    def __init__(self, name, url=None, ping_host=None):
+        self.name = name
+        self.url = url
+        self.ping_host = ping_host
+        self.scheme = self.host = self.path = None
+        self.port = None
+        if url:
+            parts = urlsplit(url)
+            self.scheme = parts.scheme.lower()
+            self.host = parts.hostname
+            self.port = parts.port or (443 if self.scheme == "https" else 80)
+            self.path = parts.path or "/"
+            if parts.query:
+                self.path += "?" + parts.query
+            if self.ping_host is None:
+                self.ping_host = self.host
+
+    @property
+    def kind(self):
+        return "http" if self.url else "ping"
+
+    @property
+    def tls(self):
+        return self.scheme == "https"
+
+    def __repr__(self):
+        return f"Target({self.name!r}, {self.url or 'PING:' + self.ping_host!r})"
+
+
+class ProbeResult:
+    """Результат проверки одной цели; времена в миллисекундах"""
+
+    def __init__(self, target):
+        self.target = target
+        self.ok = False
+        self.status = None
+        self.error = None
+        self.address = None
+        self.reused = False
+        self.dns_ms = None
+        self.connect_ms = None
+        self.tls_ms = None
+        self.ttfb_ms = None
+        self.total_ms = None
+
+    @property
+    def name(self):
+        return self.target.name
+
+    def as_dict(self):
+        return {
+            "name": self.target.name,
+            "kind": self.target.kind,
+            "ok": self.ok,
+            "status": self.status,
+            "error": self.error,
+            "address": self.address,
+            "reused": self.reused,
+            "dns_ms": self.dns_ms,
+            "connect_ms": self.connect_ms,
+            "tls_ms": self.tls_ms,
+            "ttfb_ms": self.ttfb_ms,
+            "total_ms": self.total_ms,
+        }
+
+    def __repr__(self):
+        state = "OK" if self.ok else f"FAIL {self.error}"
+        return f"ProbeResult({self.target.name!r}, {state}, {self.total_ms} мс)"
+
+
+def parse_targets(path=TARGETS_FILE):
+    """Разбирает targets.txt: Name = "https://..." или Name = "PING:1.2.3.4" """
+    targets = {}
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            match = _TARGET_RE.match(line)
+            if not match:
+                continue
+            name, value = match.groups()
+            if value.upper().startswith("PING:"):
+                targets[name] = Target(name, ping_host=value[5:].strip())
+            else:
+                targets[name] = Target(name, url=value)
+    return list(targets.values())
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+class ConnectionPool:
+    """Пул keep-alive соединений по (host, port, tls)"""
+
+    def __init__(self, max_idle_per_host=4):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+
+    def acquire(self, key):
+        connections = self._idle.get(key)
+        while connections:
+            reader, writer = connections.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    def release(self, key, reader, writer):
+        connections = self._idle.setdefault(key, [])
+        if len(connections) < self.max_idle_per_host and not writer.is_closing():
+            connections.append((reader, writer))
+        else:
+            writer.close()
+
+    async def close(self):
+        writers = [writer for connections in self._idle.values() for _, writer in connections]
+        self._idle.clear()
+        for writer in writers:
+            writer.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+
+
+class Prober:
+    """Параллельно проверяет цели: DNS, TCP connect, TLS и первый байт ответа
+
+    Каждая цель ограничена собственным таймаутом, поэтому полный прогон
+    длится примерно столько же, сколько самая медленная цель. DNS-ответы и
+    keep-alive соединения переиспользуются в пределах одного Prober; для
+    сравнения стратегий нужен новый Prober, иначе рукопожатия не повторятся.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, concurrency=DEFAULT_CONCURRENCY,
+                 ssl_context=None, ping_ports=PING_PORTS, timeouts=None):
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.ping_ports = ping_ports
+        self.ssl_context = ssl_context or ssl.create_default_context()
+        self.pool = ConnectionPool()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._dns_cache = {}
+
+    async def close(self):
+        await self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def resolve(self, host, port):
+        """Возвращает IP-адрес хоста (с кэшированием)"""
+        key = (host, port)
+        if key not in self._dns_cache:
+            loop = asyncio.get_running_loop()
+            infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            self._dns_cache[key] = infos[0][4][0]
+        return self._dns_cache[key]
+
+    async def sweep(self, targets):
+        """Проверяет все цели одновременно и возвращает результаты в исходном порядке"""
+        return await asyncio.gather(*(self.probe(target) for target in targets))
+
+    async def probe(self, target):
+        result = ProbeResult(target)
+        timeout = self.timeouts.get(target.name, self.timeout)
+        start = time.perf_counter()
+        async with self._semaphore:
+            try:
+                if target.kind == "http":
+                    await asyncio.wait_for(self._probe_http(target, result), timeout)
+                else:
+                    await asyncio.wait_for(self._probe_ping(target, result), timeout)
+            except asyncio.TimeoutError:
+                result.ok = False
+                result.error = "timeout"
+            except ssl.SSLError as e:
+                result.ok = False
+                result.error = f"tls: {e.reason or e}"
+            except (OSError, ValueError, EOFError) as e:
+                result.ok = False
+                result.error = str(e) or e.__class__.__name__
+        result.total_ms = _ms(start)
+        return result
+
+    async def _probe_http(self, target, result):
+        key = (target.host, target.port, target.tls)
+        connection = self.pool.acquire(key)
+
+        if connection is not None:
+            reader, writer = connection
+            result.reused = True
+        else:
+            start = time.perf_counter()
+            address = await self.resolve(target.host, target.port)
+            result.dns_ms = _ms(start)
+            result.address = address
+
+            start = time.perf_counter()
+            if target.tls and not _HAS_START_TLS:
+                # До Python 3.11 TLS не отделить от TCP: время попадет в connect_ms
+                reader, writer = await asyncio.open_connection(
+                    address, target.port, ssl=self.ssl_context, server_hostname=target.host
+                )
+                result.connect_ms = _ms(start)
+            else:
+                reader, writer = await asyncio.open_connection(address, target.port)
+                result.connect_ms = _ms(start)
+
+                if target.tls:
+                    start = time.perf_counter()
+                    await writer.start_tls(self.ssl_context, server_hostname=target.host)
+                    result.tls_ms = _ms(start)
+
+        try:
+            host_header = target.host
+            if target.port not in (80, 443):
+                host_header += f":{target.port}"
+            request = (
+                f"HEAD {target.path} HTTP/1.1\r\n"
+                f"Host: {host_header}\r\n"
+                f"User-Agent: {USER_AGENT}\r\n"
+                "Accept: */*\r\n"
+                "Connection: keep-alive\r\n\r\n"
+            )
+            start = time.perf_counter()
+            writer.write(request.encode("ascii"))
+            await writer.drain()
+            status_line = await reader.readline()
+            result.ttfb_ms = _ms(start)
+            if not status_line:
+                raise EOFError("соединение закрыто сервером")
+
+            parts = status_line.decode("latin-1").split()
+            result.status = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else None
+            keep_alive = parts[:1] == ["HTTP/1.1"]
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header.decode("latin-1").partition(":")
+                if name.strip().lower() == "connection" and value.strip().lower() == "close":
+                    keep_alive = False
+        except BaseException:
+            writer.close()
+            raise
+
+        # Любой HTTP-ответ означает, что рукопожатие и запрос прошли через DPI
+        result.ok = result.status is not None
+        if keep_alive:
+            self.pool.release(key, reader, writer)
+        else:
+            writer.close()
+
+    async def _probe_ping(self, target, result):
+        start = time.perf_counter()
+        address = await self.resolve(target.ping_host, self.ping_ports[0])
+        result.dns_ms = _ms(start)
+        result.address = address
+
+        async def connect(port):
+            started = time.perf_counter()
+            _, writer = await asyncio.open_connection(address, port)
+            elapsed = _ms(started)
+            writer.close()
+            return elapsed
+
+        tasks = [asyncio.ensure_future(connect(port)) for port in self.ping_ports]
+        errors = []
+        try:
+            for future in asyncio.as_completed(tasks):
+                try:
+                    result.connect_ms = await future
+                    result.ok = True
+                    return
+                except OSError as e:
+                    errors.append(str(e))
+        finally:
+            for task in tasks:
+                task.cancel()
+        raise OSError("; ".join(errors) or "нет соединения")
+
+
+def percentile(values, fraction):
+    """Перцентиль без интерполяции (values не обязаны быть отсортированы)"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * (len(values) - 1)))))
+    return values[index]
+
+
+def summarize(results):
+    """Сводка прогона: доля успешных и p50/p95 полного времени"""
+    times = [r.total_ms for r in results if r.ok]
+    total = len(results)
+    return {
+        "total": total,
+        "ok": len(times),
+        "success_rate": len(times) / total if total else 0.0,
+        "p50_ms": percentile(times, 0.5),
+        "p95_ms": percentile(times, 0.95),
+    }
+
+
+async def sweep_async(targets, **kwargs):
+    async with Prober(**kwargs) as prober:
+        return await prober.sweep(targets)
+
+
+def run_sweep(targets, **kwargs):
+    """Синхронная обертка: один полный прогон целей в новом цикле событий"""
+    return asyncio.run(sweep_async(targets, **kwargs))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else TARGETS_FILE
+    targets = parse_targets(path)
+    print(f"Целей: {len(targets)}")
+
+    start = time.perf_counter()
+    results = run_sweep(targets)
+    elapsed = _ms(start)
+
+    width = max((len(t.name) for t in targets), default=10)
+    for r in results:
+        state = "OK  " if r.ok else "FAIL"
+        timings = " ".join(
+            f"{label}={value}" for label, value in (
+                ("dns", r.dns_ms), ("tcp", r.connect_ms), ("tls", r.tls_ms), ("ttfb", r.ttfb_ms)
+            ) if value is not None
+        )
+        detail = r.status if r.ok else r.error
+        print(f"{r.name:<{width}}  {state}  {r.total_ms:>8} мс  {timings}  {detail or ''}")
+
+    summary = summarize(results)
+    print(f"\nУспешно: {summary['ok']}/{summary['total']}, "
+          f"p50: {summary['p50_ms']} мс, p95: {summary['p95_ms']} мс, прогон: {elapsed} мс")
+    return 0 if summary["ok"] == summary["total"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Автоматический выбор стратегии: прогон целей под каждой конфигурацией
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from probe import run_sweep, percentile
+from supervisor import StartupError
+
+RANKING_CACHE = os.path.join("utils", "ranking.json")
+
+
+class StrategyScore:
+    """Результат проверки одной стратегии"""
+
+    def __init__(self, name, path, content_hash):
+        self.name = name
+        self.path = path
+        self.content_hash = content_hash
+        self.ok = 0
+        self.total = 0
+        self.p50_ms = None
+        self.p95_ms = None
+        self.ready_ms = None
+        self.error = None
+        self.failed_targets = []
+        self.tested_at = time.time()
+
+    @property
+    def success_rate(self):
+        return self.ok / self.total if self.total else 0.0
+
+    def sort_key(self):
+        """Больше успешных целей, затем меньше p50, затем меньше p95"""
+        return (
+            -self.success_rate,
+            self.p50_ms if self.p50_ms is not None else float("inf"),
+            self.p95_ms if self.p95_ms is not None else float("inf"),
+        )
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "path": self.path,
+            "hash": self.content_hash,
+            "ok": self.ok,
+            "total": self.total,
+            "p50_ms": self.p50_ms,
+            "p95_ms": self.p95_ms,
+            "ready_ms": self.ready_ms,
+            "error": self.error,
+            "failed_targets": self.failed_targets,
+            "tested_at": self.tested_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        score = cls(data["name"], data.get("path"), data.get("hash"))
+        for key in ("ok", "total", "p50_ms", "p95_ms", "ready_ms", "error", "tested_at"):
+            if key in data:
+                setattr(score, key, data[key])
+        score.failed_targets = data.get("failed_targets", [])
+        return score
+
+    def __repr__(self):
+        return (f"StrategyScore({self.name!r}, {self.ok}/{self.total}, "
+                f"p50={self.p50_ms}, p95={self.p95_ms})")
+
+
+def file_hash(path):
+    """SHA-256 содержимого файла стратегии"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def profile_hash(profile):
+    """Хэш стратегии: содержимое файла или, для сгенерированных, командная строка"""
+    if profile.path:
+        return file_hash(profile.path)
+    return profile.fingerprint()
+
+
+def score_results(score, rounds):
+    """Заполняет score по списку прогонов (каждый - список ProbeResult)"""
+    times = []
+    failed = set()
+    score.ok = score.total = 0
+    for results in rounds:
+        for result in results:
+            score.total += 1
+            if result.ok:
+                score.ok += 1
+                times.append(result.total_ms)
+            else:
+                failed.add(result.name)
+    score.p50_ms = percentile(times, 0.5)
+    score.p95_ms = percentile(times, 0.95)
+    score.failed_targets = sorted(failed)
+    return score
+
+
+class StrategyRanker:
+    """Поочередно запускает winws с каждой стратегией и прогоняет цели
+
+    prepare(profile) вызывается перед запуском winws; on_progress(index,
+    count, name) - перед проверкой очередной стратегии; should_stop()
+    позволяет прервать ранжирование между стратегиями.
+    """
+
+    def __init__(self, supervisor, targets, rounds=2, probe_options=None,
+                 prepare=None, on_progress=None, should_stop=None):
+        self.supervisor = supervisor
+        self.prepare = prepare
+        self.targets = targets
+        self.rounds = rounds
+        self.probe_options = probe_options or {}
+        self.on_progress = on_progress
+        self.should_stop = should_stop
+
+    def evaluate(self, profile, rounds=None, targets=None):
+        """Проверяет одну стратегию и возвращает StrategyScore"""
+        score = StrategyScore(profile.name, profile.path, profile_hash(profile))
+        rounds = rounds or self.rounds
+        targets = targets or self.targets
+
+        missing_files = profile.missing_files()
+        if missing_files:
+            score.error = f"не найдены файлы: {len(missing_files)}"
+            return score
+
+        before_start = None
+        if self.prepare is not None:
+            before_start = lambda: self.prepare(profile)
+
+        try:
+            score.ready_ms = self.supervisor.start_now(profile.argv(), profile.bin_dir, before_start)
+            # Новый Prober на каждый прогон: рукопожатия должны проходить через DPI заново
+            sweeps = [run_sweep(targets, **self.probe_options) for _ in range(rounds)]
+            score_results(score, sweeps)
+        except (StartupError, OSError) as e:
+            score.error = str(e).splitlines()[0]
+        finally:
+            self.supervisor.stop_now()
+        return score
+
+    def rank(self, profiles):
+        """Проверяет все стратегии и возвращает их от лучшей к худшей"""
+        scores = []
+        for index, profile in enumerate(profiles):
+            if self.should_stop is not None and self.should_stop():
+                break
+            if self.on_progress is not None:
+                self.on_progress(index, len(profiles), profile.name)
+            score = self.evaluate(profile)
+            print(f"Стратегия {profile.name}: {score.ok}/{score.total}, "
+                  f"p50={score.p50_ms} мс, p95={score.p95_ms} мс{', ' + score.error if score.error else ''}")
+            scores.append(score)
+        return sort_scores(scores)
+
+
+def sort_scores(scores):
+    return sorted(scores, key=lambda score: score.sort_key())
+
+
+class RankingCache:
+    """Последние результаты ранжирования (utils/ranking.json)"""
+
+    def __init__(self, path=RANKING_CACHE):
+        self.path = path
+        self.scores = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for item in data.get("scores", []):
+                score = StrategyScore.from_dict(item)
+                self.scores[score.name] = score
+        except (OSError, ValueError, KeyError):
+            self.scores = {}
+
+    def update(self, scores):
+        for score in scores:
+            self.scores[score.name] = score
+        self.save()
+
+    def save(self):
+        data = {"scores": [score.as_dict() for score in sort_scores(self.scores.values())]}
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"Не удалось сохранить результаты ранжирования: {e}")
+
+    def is_current(self, score):
+        """Проверяет, что файл стратегии не менялся после проверки"""
+        try:
+            return score.path is not None and file_hash(score.path) == score.content_hash
+        except OSError:
+            return False
+
+    def best(self, names=None):
+        """Лучшая стратегия из кэша, актуальная для текущих файлов"""
+        for score in sort_scores(self.scores.values()):
+            if names is not None and score.name not in names:
+                continue
+            if score.error or not score.ok:
+                continue
+            if self.is_current(score):
+                return score
+        return None
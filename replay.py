@@ -0,0 +1,713 @@
+"""
+Разбор записей трафика (pcap/pcapng): имена хостов из TLS ClientHello и QUIC Initial
+
+Хосты из записи прогоняются через маршрутизатор стратегии (router.py):
+видно, какие блоки срабатывают и какие хосты не покрыты ни одним списком.
+Непокрытые хосты можно сразу добавить в список через импорт (importer.py).
+"""
+
+import collections
+import gzip
+import hashlib
+import hmac
+import socket
+import struct
+import sys
+import time
+
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.exceptions import InvalidTag
+except ImportError:
+    Cipher = None
+
+from router import Query, Router
+
+CHUNK_SIZE = 4 * 1024 * 1024
+# Незавершенных ClientHello (TCP-сегменты, CRYPTO-кадры QUIC) держится не больше
+MAX_PENDING = 10000
+MAX_CLIENT_HELLO = 64 * 1024
+TOP_HOSTS = 50
+
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": "<", b"\xa1\xb2\xc3\xd4": ">",
+    # Наносекундные метки времени
+    b"\x4d\x3c\xb2\xa1": "<", b"\xa1\xb2\x3c\x4d": ">",
+}
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 1
+PCAPNG_PB = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+# Сырой IP без заголовка канального уровня
+LINKTYPES_RAW = {12, 14, 101, 228, 229}
+ETHERTYPES_VLAN = {0x8100, 0x88A8, 0x9100}
+IPV6_EXTENSIONS = {0, 43, 60}
+
+# Версии QUIC: соль начальных ключей и префикс меток HKDF
+QUIC_VERSIONS = {
+    0x00000001: (bytes.fromhex("38762cf7f55934b34d179ae6a4c80cadccbb7f0a"), b"quic "),
+    0x6B3343CF: (bytes.fromhex("0dede3def700a6db819381be6e269dcbf9bd2ed9"), b"quicv2 "),
+    0xFF00001D: (bytes.fromhex("afbfec289993d24c9e9786f19c6111e04390a899"), b"quic "),
+}
+QUIC_V2 = 0x6B3343CF
+STUN_COOKIE = b"\x21\x12\xa4\x42"
+# Запрос IP discovery голосового канала Discord: тип 1, длина 70
+DISCORD_DISCOVERY = b"\x00\x01\x00\x46"
+
+
+class CaptureError(Exception):
+    """Файл не является записью pcap/pcapng или поврежден"""
+
+
+# Чтение записи
+
+class _Stream:
+    """Буфер чтения файла порциями; срезы отдаются как memoryview без копирования"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.data = b""
+        self.view = memoryview(self.data)
+        self.pos = 0
+
+    def ensure(self, size):
+        """True, если с текущей позиции доступно size байт"""
+        while len(self.data) - self.pos < size:
+            chunk = self.f.read(max(self.chunk_size, size))
+            if not chunk:
+                return False
+            # Переносится только хвост текущей порции; выданные срезы ссылаются на старый буфер
+            self.data = self.data[self.pos:] + chunk
+            self.view = memoryview(self.data)
+            self.pos = 0
+        return True
+
+    def take(self, size):
+        if not self.ensure(size):
+            raise CaptureError("запись обрывается посреди пакета")
+        start = self.pos
+        self.pos += size
+        return self.view[start:self.pos]
+
+
+def _truncated():
+    # Запись, прерванная на середине пакета (остановленный tcpdump), разбирается до обрыва
+    print("Запись обрывается посреди пакета: последний пакет пропущен")
+
+
+def _pcap_packets(stream, order):
+    header = stream.take(20)
+    linktype = struct.unpack_from(order + "I", header, 16)[0] & 0xFFFF
+    record = struct.Struct(order + "IIII")
+    while stream.ensure(16):
+        _, _, captured, _ = record.unpack_from(stream.view, stream.pos)
+        if not stream.ensure(16 + captured):
+            _truncated()
+            return
+        stream.take(16)
+        yield linktype, stream.take(captured)
+
+
+def _pcapng_packets(stream):
+    order = "<"
+    interfaces = []
+    first = True
+    while stream.ensure(8):
+        block_type, length = struct.unpack_from(order + "II", stream.view, stream.pos)
+        if block_type == PCAPNG_SHB:
+            # Порядок байт задается каждым заголовком секции
+            if not stream.ensure(12):
+                break
+            magic = bytes(stream.view[stream.pos + 8:stream.pos + 12])
+            order = "<" if magic == b"\x4d\x3c\x2b\x1a" else ">"
+            length = struct.unpack_from(order + "I", stream.view, stream.pos + 4)[0]
+            interfaces = []
+        elif first:
+            raise CaptureError("нет заголовка секции pcapng")
+        first = False
+        if length < 12 or length % 4:
+            raise CaptureError(f"некорректная длина блока pcapng: {length}")
+        if not stream.ensure(length):
+            _truncated()
+            return
+        block = stream.take(length)
+        if block_type == PCAPNG_EPB:
+            interface, _, _, captured = struct.unpack_from(order + "IIII", block, 8)
+            if interface < len(interfaces):
+                yield interfaces[interface], block[28:28 + captured]
+        elif block_type == PCAPNG_SPB:
+            if interfaces:
+                original = struct.unpack_from(order + "I", block, 8)[0]
+                yield interfaces[0], block[12:12 + min(original, length - 16)]
+        elif block_type == PCAPNG_PB:
+            interface, _, _, _, captured = struct.unpack_from(order + "HHIII", block, 8)
+            if interface < len(interfaces):
+                yield interfaces[interface], block[28:28 + captured]
+        elif block_type == PCAPNG_IDB:
+            interfaces.append(struct.unpack_from(order + "H", block, 8)[0])
+
+
+def read_packets(f):
+    """Пакеты записи: (тип канального уровня, memoryview с кадром)"""
+    stream = _Stream(f)
+    if not stream.ensure(4):
+        return
+    magic = bytes(stream.view[:4])
+    if magic in PCAP_MAGIC:
+        stream.take(4)
+        yield from _pcap_packets(stream, PCAP_MAGIC[magic])
+    elif struct.unpack("<I", magic)[0] == PCAPNG_SHB:
+        yield from _pcapng_packets(stream)
+    else:
+        raise CaptureError("неизвестный формат записи (ожидается pcap или pcapng)")
+
+
+def open_capture(path):
+    if path == "-":
+        return sys.stdin.buffer
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def ip_packet(linktype, frame):
+    """memoryview с IP-пакетом внутри кадра или None"""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(frame) < 14:
+            return None
+        offset = 12
+        ethertype = (frame[12] << 8) | frame[13]
+        while ethertype in ETHERTYPES_VLAN and len(frame) >= offset + 6:
+            offset += 4
+            ethertype = (frame[offset] << 8) | frame[offset + 1]
+        if ethertype != 0x0800 and ethertype != 0x86DD:
+            return None
+        return frame[offset + 2:]
+    if linktype in LINKTYPES_RAW:
+        return frame
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        return frame[4:]
+    if linktype == LINKTYPE_LINUX_SLL:
+        return frame[16:]
+    if linktype == LINKTYPE_LINUX_SLL2:
+        return frame[20:]
+    return None
+
+
+def transport(packet):
+    """(протокол, адрес источника, адрес назначения, полезная нагрузка IP) или None
+
+    Адреса - memoryview на байты заголовка; фрагменты, кроме первого, пропускаются.
+    """
+    if len(packet) < 20:
+        return None
+    version = packet[0] >> 4
+    if version == 4:
+        header = (packet[0] & 0x0F) * 4
+        if (packet[6] & 0x1F) or packet[7]:
+            return None
+        total = (packet[2] << 8) | packet[3]
+        end = total if header <= total <= len(packet) else len(packet)
+        return packet[9], packet[12:16], packet[16:20], packet[header:end]
+    if version == 6 and len(packet) >= 40:
+        protocol = packet[6]
+        offset = 40
+        while protocol in IPV6_EXTENSIONS and len(packet) >= offset + 8:
+            protocol = packet[offset]
+            offset += (packet[offset + 1] + 1) * 8
+        if protocol == 44 and len(packet) >= offset + 8:
+            # Фрагмент: только первый и только если за ним сразу TCP/UDP
+            if ((packet[offset + 2] << 8) | packet[offset + 3]) & 0xFFF8:
+                return None
+            protocol = packet[offset]
+            offset += 8
+        end = 40 + ((packet[4] << 8) | packet[5])
+        return protocol, packet[8:24], packet[24:40], packet[offset:min(end, len(packet))]
+    return None
+
+
+# TLS ClientHello
+
+def client_hello_sni(data):
+    """SNI из сообщения ClientHello (с заголовком рукопожатия) или None
+
+    data - bytes или memoryview; неполное или поврежденное сообщение дает None.
+    """
+    try:
+        if data[0] != 1:
+            return None
+        end = min(4 + ((data[1] << 16) | (data[2] << 8) | data[3]), len(data))
+        offset = 4 + 2 + 32
+        offset += 1 + data[offset]
+        offset += 2 + ((data[offset] << 8) | data[offset + 1])
+        offset += 1 + data[offset]
+        extensions_end = min(offset + 2 + ((data[offset] << 8) | data[offset + 1]), end)
+        offset += 2
+        while offset + 4 <= extensions_end:
+            extension = (data[offset] << 8) | data[offset + 1]
+            length = (data[offset + 2] << 8) | data[offset + 3]
+            offset += 4
+            if extension == 0:
+                # server_name: длина списка, тип имени (0 - host_name), длина имени
+                if data[offset + 2] != 0:
+                    return None
+                size = (data[offset + 3] << 8) | data[offset + 4]
+                name = bytes(data[offset + 5:offset + 5 + size])
+                if len(name) != size:
+                    return None
+                return name.decode("ascii", "replace").lower().rstrip(".") or None
+            offset += length
+    except IndexError:
+        return None
+    return None
+
+
+def udp_l7(payload):
+    """Протокол первого пакета UDP для --filter-l7 (кроме QUIC) или None"""
+    if len(payload) == 74 and payload[:4] == DISCORD_DISCOVERY:
+        return "discord"
+    if len(payload) >= 20 and payload[0] < 0x40 and payload[4:8] == STUN_COOKIE:
+        return "stun"
+    return None
+
+
+def tls_record_size(payload):
+    """Размер записи TLS с ClientHello в начале сегмента (с заголовком) или 0"""
+    if len(payload) < 6 or payload[0] != 0x16 or payload[1] != 3 or payload[5] != 1:
+        return 0
+    return 5 + ((payload[3] << 8) | payload[4])
+
+
+# QUIC Initial
+
+def _hkdf_expand_label(secret, label, length):
+    info = struct.pack(">HB", length, 6 + len(label)) + b"tls13 " + label + b"\x00"
+    # Для длины до 32 байт достаточно первого блока HKDF-Expand
+    return hmac.new(secret, info + b"\x01", hashlib.sha256).digest()[:length]
+
+
+def quic_initial_keys(version, dcid):
+    """(ключ, IV, ключ защиты заголовка) клиентских Initial-пакетов"""
+    salt, prefix = QUIC_VERSIONS[version]
+    initial = hmac.new(salt, bytes(dcid), hashlib.sha256).digest()
+    client = _hkdf_expand_label(initial, b"client in", 32)
+    return (_hkdf_expand_label(client, prefix + b"key", 16),
+            _hkdf_expand_label(client, prefix + b"iv", 12),
+            _hkdf_expand_label(client, prefix + b"hp", 16))
+
+
+def _varint(data, offset):
+    first = data[offset]
+    size = 1 << (first >> 6)
+    value = first & 0x3F
+    for i in range(1, size):
+        value = (value << 8) | data[offset + i]
+    return value, offset + size
+
+
+def quic_initial_header(payload):
+    """(версия, DCID, смещение номера пакета, конец пакета) для клиентского Initial или None"""
+    if len(payload) < 7 or not payload[0] & 0x80:
+        return None
+    version = struct.unpack_from(">I", payload, 1)[0]
+    if version not in QUIC_VERSIONS:
+        return None
+    packet_type = (payload[0] >> 4) & 3
+    if packet_type != (1 if version == QUIC_V2 else 0):
+        return None
+    try:
+        offset = 5
+        dcid = payload[offset + 1:offset + 1 + payload[offset]]
+        offset += 1 + payload[offset]
+        offset += 1 + payload[offset]
+        token, offset = _varint(payload, offset)
+        offset += token
+        length, offset = _varint(payload, offset)
+    except IndexError:
+        return None
+    if offset + length > len(payload) or length < 20:
+        return None
+    return version, dcid, offset, offset + length
+
+
+def quic_decrypt_initial(payload, keys, header):
+    """Расшифрованные кадры Initial-пакета или None"""
+    version, dcid, pn_offset, end = header
+    key, iv, hp = keys
+    sample = bytes(payload[pn_offset + 4:pn_offset + 20])
+    encryptor = Cipher(algorithms.AES(hp), modes.ECB()).encryptor()
+    mask = encryptor.update(sample) + encryptor.finalize()
+    first = payload[0] ^ (mask[0] & 0x0F)
+    pn_length = (first & 3) + 1
+    pn = bytes(b ^ m for b, m in zip(payload[pn_offset:pn_offset + pn_length], mask[1:]))
+    aad = bytes([first]) + bytes(payload[1:pn_offset]) + pn
+    nonce = bytearray(iv)
+    for i, b in enumerate(pn):
+        nonce[12 - pn_length + i] ^= b
+    try:
+        return AESGCM(key).decrypt(bytes(nonce), bytes(payload[pn_offset + pn_length:end]), aad)
+    except InvalidTag:
+        return None
+
+
+def quic_crypto_frames(frames):
+    """[(смещение, данные)] кадров CRYPTO; разбор останавливается на незнакомом кадре"""
+    result = []
+    offset = 0
+    try:
+        while offset < len(frames):
+            frame = frames[offset]
+            if frame in (0x00, 0x01):
+                offset += 1
+            elif frame in (0x02, 0x03):
+                offset += 1
+                for _ in range(2):
+                    _, offset = _varint(frames, offset)
+                count, offset = _varint(frames, offset)
+                _, offset = _varint(frames, offset)
+                for _ in range(2 * count + (3 if frame == 0x03 else 0)):
+                    _, offset = _varint(frames, offset)
+            elif frame == 0x06:
+                start, offset = _varint(frames, offset + 1)
+                length, offset = _varint(frames, offset)
+                result.append((start, frames[offset:offset + length]))
+                offset += length
+            else:
+                break
+    except IndexError:
+        pass
+    return result
+
+
+class _CryptoStream:
+    """Поток CRYPTO одного соединения QUIC: ClientHello из частей в любом порядке"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.parts = {}
+
+    def add(self, start, data):
+        if start > len(self.data):
+            self.parts[start] = bytes(data)
+            return
+        if start + len(data) > len(self.data):
+            self.data += data[len(self.data) - start:]
+        # Части, пришедшие раньше времени, присоединяются, как только до них дошла очередь
+        merged = True
+        while merged and self.parts:
+            merged = False
+            for part_start in list(self.parts):
+                if part_start <= len(self.data):
+                    part = self.parts.pop(part_start)
+                    if part_start + len(part) > len(self.data):
+                        self.data += part[len(self.data) - part_start:]
+                    merged = True
+
+    def message(self):
+        """Собранный ClientHello или None, если пока не хватает частей"""
+        data = self.data
+        if len(data) >= 4 and len(data) >= 4 + int.from_bytes(data[1:4], "big"):
+            return memoryview(data)
+        return None
+
+
+# Разбор записи
+
+class ReplayStats:
+    """Итог разбора записи"""
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.tcp_flows = 0
+        self.udp_flows = 0
+        self.tls = 0
+        self.quic = 0
+        # Initial-пакеты QUIC, которые нечем расшифровать (нет cryptography)
+        self.quic_skipped = 0
+        # (хост или None, IP, порт, протокол, l7) -> число соединений
+        self.connections = collections.Counter()
+
+    def queries(self):
+        """[(Query, число соединений)] для маршрутизатора"""
+        return [(Query(host, ip, port, proto, l7), count)
+                for (host, ip, port, proto, l7), count in self.connections.items()]
+
+
+class CaptureReplay:
+    """Потоковый разбор записи: ClientHello TLS и QUIC, соединения без имени хоста
+
+    Пакеты не копируются: кадр, IP-пакет и полезная нагрузка - срезы
+    memoryview буфера чтения. Почти все пакеты отсеиваются по нескольким
+    байтам заголовка; копируются только ClientHello, разбитые на части.
+    Соединение - поток от клиента (TCP с SYN или первый пакет UDP), у
+    которого имя хоста ищется в первом ClientHello.
+    """
+
+    def __init__(self):
+        self.stats = ReplayStats()
+        # Поток TCP -> (следующий seq, собранные байты, размер записи)
+        self._tcp_pending = {}
+        # DCID -> (ключи, _CryptoStream)
+        self._quic_pending = {}
+        self._quic_done = set()
+        # (протокол, адрес источника, адрес назначения, порты) потоков от клиента
+        self._flows = set()
+        self._named = set()
+        # Поток UDP -> l7 первого пакета (stun, discord)
+        self._udp_l7 = {}
+
+    def run(self, f):
+        start = time.perf_counter()
+        stats = self.stats
+        for linktype, frame in read_packets(f):
+            stats.packets += 1
+            stats.bytes += len(frame)
+            packet = ip_packet(linktype, frame)
+            if packet is None:
+                continue
+            parsed = transport(packet)
+            if parsed is None:
+                continue
+            protocol, source, destination, segment = parsed
+            if protocol == 6 and len(segment) >= 20:
+                self._tcp(source, destination, segment)
+            elif protocol == 17 and len(segment) >= 8:
+                self._udp(source, destination, segment)
+        self._finish()
+        stats.elapsed = time.perf_counter() - start
+        return stats
+
+    def _tcp(self, source, destination, segment):
+        key = ("tcp", bytes(source), bytes(destination), bytes(segment[0:4]))
+        if segment[13] & 0x12 == 0x02:
+            # SYN без ACK - новое соединение от клиента
+            if key not in self._flows:
+                self._flows.add(key)
+                self.stats.tcp_flows += 1
+            return
+        payload = segment[(segment[12] >> 4) * 4:]
+        if not payload:
+            return
+        pending = self._tcp_pending.get(key)
+        if pending is not None:
+            next_seq, data, size = pending
+            if struct.unpack_from(">I", segment, 4)[0] != next_seq:
+                return
+            data += payload
+            if len(data) < size:
+                self._tcp_pending[key] = ((next_seq + len(payload)) & 0xFFFFFFFF, data, size)
+                return
+            del self._tcp_pending[key]
+            self._hello(key, client_hello_sni(memoryview(data)[5:size]), "tls")
+            return
+        size = tls_record_size(payload)
+        if not size or key in self._named:
+            return
+        if len(payload) >= size:
+            self._hello(key, client_hello_sni(payload[5:size]), "tls")
+        elif size <= MAX_CLIENT_HELLO and len(self._tcp_pending) < MAX_PENDING:
+            seq = struct.unpack_from(">I", segment, 4)[0]
+            self._tcp_pending[key] = ((seq + len(payload)) & 0xFFFFFFFF, bytearray(payload), size)
+
+    def _udp(self, source, destination, segment):
+        ports = bytes(segment[0:4])
+        key = ("udp", bytes(source), bytes(destination), ports)
+        if key not in self._flows:
+            if ("udp", key[2], key[1], ports[2:] + ports[:2]) in self._flows:
+                # Ответ сервера
+                return
+            self._flows.add(key)
+            self.stats.udp_flows += 1
+            l7 = udp_l7(segment[8:])
+            if l7 is not None:
+                self._udp_l7[key] = l7
+                return
+        payload = segment[8:]
+        if not payload or not payload[0] & 0x80 or key in self._named:
+            return
+        header = quic_initial_header(payload)
+        if header is None:
+            return
+        dcid = bytes(header[1])
+        if dcid in self._quic_done:
+            return
+        if Cipher is None:
+            self.stats.quic_skipped += 1
+            return
+        pending = self._quic_pending.get(dcid)
+        if pending is None:
+            if len(self._quic_pending) >= MAX_PENDING:
+                return
+            pending = self._quic_pending[dcid] = (quic_initial_keys(header[0], dcid), _CryptoStream())
+        keys, stream = pending
+        frames = quic_decrypt_initial(payload, keys, header)
+        if frames is None:
+            return
+        for start, data in quic_crypto_frames(frames):
+            if start + len(data) <= MAX_CLIENT_HELLO:
+                stream.add(start, data)
+        message = stream.message()
+        if message is not None:
+            self._quic_done.add(dcid)
+            del self._quic_pending[dcid]
+            self._hello(key, client_hello_sni(message), "quic")
+
+    def _hello(self, key, host, l7):
+        if key in self._named:
+            return
+        self._named.add(key)
+        if l7 == "tls":
+            self.stats.tls += 1
+        else:
+            self.stats.quic += 1
+        self._count(key, host, l7)
+
+    def _count(self, key, host, l7=None):
+        proto, _, destination, ports = key
+        family = socket.AF_INET if len(destination) == 4 else socket.AF_INET6
+        ip = socket.inet_ntop(family, destination)
+        self.stats.connections[(host, ip, (ports[2] << 8) | ports[3], proto, l7)] += 1
+
+    def _finish(self):
+        # Соединения без имени хоста проверяются только по адресу и порту
+        for key in self._flows - self._named:
+            self._count(key, None, self._udp_l7.get(key))
+
+
+def replay(paths):
+    """Разбирает записи; возвращает ReplayStats"""
+    replayer = CaptureReplay()
+    for path in paths:
+        with open_capture(path) as f:
+            replayer.run(f)
+    return replayer.stats
+
+
+class CoverageReport:
+    """Маршруты соединений записи: счетчики по блокам и непокрытые хосты"""
+
+    def __init__(self, stats, router):
+        self.stats = stats
+        self.router = router
+        self.block_counts = collections.Counter()
+        self.uncaptured = 0
+        self.unhandled = 0
+        # Хост -> число соединений: покрытые (блок стратегии) и нет
+        self.covered = collections.Counter()
+        self.uncovered = collections.Counter()
+        queries = stats.queries()
+        routes = router.route_many([query for query, _ in queries])
+        for (query, count), route in zip(queries, routes):
+            if not route.captured:
+                self.uncaptured += count
+            elif route.block is None:
+                self.unhandled += count
+            else:
+                self.block_counts[route.block] += count
+            if query.host:
+                if route.block is not None:
+                    self.covered[query.host] += count
+                elif route.captured:
+                    self.uncovered[query.host] += count
+
+    def uncovered_hosts(self):
+        """Непокрытые хосты, начиная с самых частых; хост, который хоть раз покрыт, не входит"""
+        return [host for host, _ in self.uncovered.most_common() if host not in self.covered]
+
+    def format(self, top=TOP_HOSTS):
+        stats = self.stats
+        megabytes = stats.bytes / (1024 * 1024)
+        speed = megabytes / stats.elapsed if stats.elapsed else 0
+        lines = [
+            f"Пакетов: {stats.packets}, {megabytes:.1f} МБ за {stats.elapsed:.1f} с ({speed:.1f} МБ/с)",
+            f"Соединений: TCP {stats.tcp_flows}, UDP {stats.udp_flows}; "
+            f"имя хоста из TLS: {stats.tls}, из QUIC: {stats.quic}",
+        ]
+        if stats.quic_skipped:
+            lines.append(f"QUIC Initial без расшифровки: {stats.quic_skipped} (не установлен cryptography)")
+        for index in range(len(self.router.rules)):
+            lines.append(f"Блок {index + 1}: {self.block_counts.get(index, 0)} "
+                         f"({self.router.block_summary(index)})")
+        lines.append(f"Без обработки: {self.unhandled}, не перехватывается: {self.uncaptured}")
+        uncovered = self.uncovered_hosts()
+        lines.append(f"Хостов: покрыто {len(self.covered)}, не покрыто {len(uncovered)}")
+        for host in uncovered[:top]:
+            lines.append(f"  {host}: {self.uncovered[host]}")
+        if len(uncovered) > top:
+            lines.append(f"  ... еще {len(uncovered) - top}")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Использование:\n"
+             "  python replay.py <запись.pcap|.pcapng[.gz]|->... [--strategy ИМЯ] [--raw]\n"
+             "                   [--export ФАЙЛ] [--add СПИСОК]\n"
+             "  --export - записать непокрытые хосты в файл, --add - импортировать их в список")
+    options = {}
+    paths = []
+    args = iter(argv)
+    for arg in args:
+        if arg in ("--strategy", "--export", "--add"):
+            options[arg] = next(args, None)
+        elif arg == "--raw":
+            options[arg] = True
+        else:
+            paths.append(arg)
+    if not paths or None in options.values():
+        print(usage)
+        return 2
+
+    from catalog import StrategyCatalog
+    from compiler import ListCompiler
+    from strategy import StrategyError
+    catalog = StrategyCatalog()
+    catalog.scan()
+    try:
+        profile = catalog.profile(options.get("--strategy", "general"))
+    except StrategyError as e:
+        print(f"Ошибка: {e}")
+        return 1
+    if "--raw" not in options:
+        compiler = ListCompiler()
+        profile, jobs = compiler.plan(profile)
+        compiler.build(jobs)
+
+    try:
+        stats = replay(paths)
+    except (OSError, CaptureError, EOFError) as e:
+        print(f"Ошибка: {e}")
+        return 1
+    report = CoverageReport(stats, Router(profile))
+    print(f"Стратегия: {profile.name}")
+    print(report.format())
+
+    hosts = report.uncovered_hosts()
+    if "--export" in options:
+        with open(options["--export"], "w", encoding="utf-8") as f:
+            f.writelines(host + "\n" for host in hosts)
+        print(f"Записано хостов: {len(hosts)} в {options['--export']}")
+    if "--add" in options:
+        from importer import BulkImporter
+        from liststore import ListStore, list_kind
+        store = ListStore(options["--add"])
+        import_report = BulkImporter(store.lines(), list_kind(options["--add"])).run(hosts)
+        store.append(import_report.added)
+        store.save()
+        print(import_report.summary())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""
+Маршрутизация соединений по блокам стратегии: какой блок --new обработает хост:порт
+
+Повторяет порядок выбора профиля winws: блоки проверяются по очереди,
+срабатывает первый подходящий по протоколу и порту, --filter-l7, спискам
+исключений, hostlist и ipset.
+"""
+
+import ipaddress
+import sys
+import time
+from bisect import bisect_right
+
+from activity import block_summary
+from cidr import CidrIndex, read_networks
+from compiler import DomainTrie, read_hostlist
+
+# Протоколы --filter-l7, которые можно определить по порту и имени хоста
+L7_BY_PORT = {("tcp", 80): "http", ("udp", 443): "quic"}
+DEFAULT_PORT = 443
+
+
+class PortSet:
+    """Список портов winws ("80,443,1024-65535") с поиском за O(log n)"""
+
+    def __init__(self, value):
+        self.value = value
+        ranges = []
+        for part in (value or "").split(","):
+            part = part.strip()
+            if not part:
+                continue
+            start, _, end = part.partition("-")
+            try:
+                ranges.append((int(start), int(end or start)))
+            except ValueError:
+                continue
+        ranges.sort()
+        self.starts = [start for start, _ in ranges]
+        self.ends = [end for _, end in ranges]
+
+    def __contains__(self, port):
+        i = bisect_right(self.starts, port) - 1
+        return i >= 0 and port <= self.ends[i]
+
+
+class Query:
+    """Соединение для проверки: имя хоста и/или IP, порт, протокол, l7"""
+
+    def __init__(self, host=None, ip=None, port=DEFAULT_PORT, proto="tcp", l7=None):
+        self.host = host.lower().strip(".") if host else None
+        self.ip = ip
+        self.port = port
+        self.proto = proto
+        # Явно указанный l7 показывается в запросе, угаданный - нет
+        self.explicit_l7 = l7
+        self.l7 = l7 or guess_l7(proto, port, self.host)
+
+    def __str__(self):
+        host = self.host or ""
+        if self.ip:
+            address = f"[{self.ip}]" if ":" in self.ip else self.ip
+            host = f"{host}@{address}" if host else address
+        return f"{host}:{self.port}/{self.proto}" + (f"/{self.explicit_l7}" if self.explicit_l7 else "")
+
+
+def guess_l7(proto, port, host):
+    """Протокол для --filter-l7, если он не указан в запросе"""
+    l7 = L7_BY_PORT.get((proto, port))
+    if l7 is None and proto == "tcp" and host:
+        # Имя хоста winws узнает из SNI
+        l7 = "tls"
+    return l7 or "unknown"
+
+
+def _is_ip(text):
+    try:
+        ipaddress.ip_address(text)
+        return True
+    except ValueError:
+        return False
+
+
+def parse_query(text):
+    """"discord.media:2053", "host@1.2.3.4:443/udp", "[::1]:80/tcp/http" -> Query
+
+    ValueError, если строка не разбирается.
+    """
+    text = text.strip()
+    address, *rest = text.split("/")
+    if len(rest) > 2:
+        raise ValueError(f"лишние части в запросе: {text}")
+    proto = rest[0].lower() if rest and rest[0] else "tcp"
+    if proto not in ("tcp", "udp"):
+        raise ValueError(f"неизвестный протокол {proto}")
+    l7 = rest[1].lower() if len(rest) > 1 and rest[1] else None
+
+    host, _, ip = address.rpartition("@") if "@" in address else ("", "", address)
+    port = DEFAULT_PORT
+    if ip.startswith("["):
+        ip, _, tail = ip[1:].partition("]")
+        if tail:
+            port = tail.lstrip(":")
+    elif ip.count(":") == 1:
+        ip, port = ip.split(":")
+    try:
+        port = int(port)
+    except ValueError:
+        raise ValueError(f"некорректный порт {port}") from None
+    if not 0 < port < 65536:
+        raise ValueError(f"некорректный порт {port}")
+
+    if not host and not _is_ip(ip):
+        # Вместо адреса указано имя хоста
+        host, ip = ip, ""
+    if ip and not _is_ip(ip):
+        raise ValueError(f"некорректный IP-адрес {ip}")
+    if not host and not ip:
+        raise ValueError("не указан ни хост, ни IP-адрес")
+    return Query(host or None, ip or None, port, proto, l7)
+
+
+class Route:
+    """Итог маршрутизации: номер блока (с нуля) или None и причина"""
+
+    def __init__(self, query, block=None, reason="", captured=True, rejections=None):
+        self.query = query
+        self.block = block
+        self.reason = reason
+        # False - пакет не проходит фильтр WinDivert (--wf-tcp/--wf-udp) и не попадает в winws
+        self.captured = captured
+        # [(номер блока, причина отказа)] - только при explain=True
+        self.rejections = rejections or []
+
+    def describe(self):
+        if not self.captured:
+            return "не перехватывается (" + self.reason + ")"
+        if self.block is None:
+            return "без обработки: ни один блок не подошел"
+        return f"блок {self.block + 1}" + (f" ({self.reason})" if self.reason else "")
+
+
+class _Rule:
+    """Условия одного блока в виде, удобном для быстрой проверки"""
+
+    def __init__(self, block, load_hostlist, load_ipset):
+        self.index = block.index
+        self.summary = block_summary(block)
+        tcp, udp = block.tcp_ports, block.udp_ports
+        # winws: если указан только --filter-tcp, udp в блок не попадает, и наоборот
+        self.ports = {
+            "tcp": PortSet(tcp) if tcp else (None if not udp else False),
+            "udp": PortSet(udp) if udp else (None if not tcp else False),
+        }
+        l7 = block.l7
+        self.l7 = {part.strip() for part in l7.split(",")} if l7 else None
+        self.l3 = block.get("filter-l3")
+
+        include = [load_hostlist(path) for path in block.get_all("hostlist") + block.get_all("hostlist-auto")]
+        domains = ",".join(value or "" for value in block.get_all("hostlist-domains"))
+        if domains:
+            include.append(DomainTrie(domain.strip().lower() for domain in domains.split(",") if domain.strip()))
+        self.hostlists = include or None
+        self.host_excludes = [load_hostlist(path) for path in block.get_all("hostlist-exclude")]
+        # Пустой ipset в winws означает "любой адрес"
+        ipsets = [index for index in (load_ipset(path) for path in block.get_all("ipset")) if len(index)]
+        self.ipsets = ipsets or None
+        self.ip_excludes = [load_ipset(path) for path in block.get_all("ipset-exclude")]
+
+    def check(self, query, ip_hit, host_hit):
+        """(причина отказа или None, совпавшая запись hostlist/ipset)
+
+        ip_hit(index) и host_hit(trie) - поиск адреса и хоста запроса.
+        """
+        ports = self.ports[query.proto]
+        if ports is False:
+            return f"не {query.proto}", None
+        if ports is not None and query.port not in ports:
+            return f"порт {query.port} не входит в filter-{query.proto}={ports.value}", None
+        if self.l3 and query.ip:
+            version = "ipv6" if ":" in query.ip else "ipv4"
+            if version not in self.l3:
+                return f"filter-l3={self.l3}", None
+        if self.l7 is not None and query.l7 not in self.l7:
+            return f"{query.l7} не входит в filter-l7={','.join(sorted(self.l7))}", None
+
+        if query.ip:
+            for index in self.ip_excludes:
+                prefix = ip_hit(index)
+                if prefix is not None:
+                    return f"IP в ipset-exclude ({prefix})", None
+        if query.host:
+            for trie in self.host_excludes:
+                entry = host_hit(trie)
+                if entry is not None:
+                    return f"хост в hostlist-exclude ({entry})", None
+
+        matched = None
+        if self.hostlists is not None:
+            if not query.host:
+                return "нет имени хоста для hostlist", None
+            for trie in self.hostlists:
+                matched = host_hit(trie)
+                if matched is not None:
+                    break
+            else:
+                return "хост не входит в hostlist", None
+        if self.ipsets is not None:
+            if not query.ip:
+                return "нет IP-адреса для ipset", None
+            for index in self.ipsets:
+                prefix = ip_hit(index)
+                if prefix is not None:
+                    matched = matched or str(prefix)
+                    break
+            else:
+                return "IP не входит в ipset", None
+        return None, matched
+
+
+class Router:
+    """Выбор блока стратегии для соединений без запуска winws
+
+    Списки читаются один раз на файл (общий для нескольких блоков файл
+    не дублируется). route() объясняет решение для одного запроса,
+    route_many() обрабатывает пакет: IP-адреса ищутся во всех ipset
+    одним пакетным поиском CidrIndex, результаты проверки хостов по
+    спискам запоминаются, поэтому повторяющиеся хосты почти бесплатны.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self._hostlists = {}
+        self._ipsets = {}
+        self.wf = {"tcp": PortSet(profile.wf_tcp) if profile.wf_tcp else None,
+                   "udp": PortSet(profile.wf_udp) if profile.wf_udp else None}
+        self.rules = [_Rule(block, self._load_hostlist, self._load_ipset) for block in profile.blocks]
+
+    def _load_hostlist(self, path):
+        trie = self._hostlists.get(path)
+        if trie is None:
+            try:
+                trie = DomainTrie(read_hostlist(path))
+            except OSError as e:
+                print(f"Не удалось прочитать {path}: {e}")
+                trie = DomainTrie()
+            self._hostlists[path] = trie
+        return trie
+
+    def _load_ipset(self, path):
+        index = self._ipsets.get(path)
+        if index is None:
+            try:
+                index = CidrIndex(read_networks(path)[0])
+            except OSError as e:
+                print(f"Не удалось прочитать {path}: {e}")
+                index = CidrIndex([])
+            self._ipsets[path] = index
+        return index
+
+    def _captured(self, query):
+        ports = self.wf[query.proto]
+        if ports is None:
+            return f"нет --wf-{query.proto}"
+        if query.port not in ports:
+            return f"порт {query.port} не входит в wf-{query.proto}={ports.value}"
+        return None
+
+    def route(self, query, explain=False):
+        """Route для одного запроса (Query или строка)"""
+        if isinstance(query, str):
+            query = parse_query(query)
+        reason = self._captured(query)
+        if reason is not None:
+            return Route(query, reason=reason, captured=False)
+
+        def ip_hit(index):
+            return index.lookup(query.ip)
+
+        def host_hit(trie):
+            return trie.covers(query.host)
+
+        rejections = []
+        for rule in self.rules:
+            rejected, matched = rule.check(query, ip_hit, host_hit)
+            if rejected is None:
+                return Route(query, rule.index, matched or "", rejections=rejections)
+            if explain:
+                rejections.append((rule.index, rejected))
+        return Route(query, rejections=rejections)
+
+    def route_many(self, queries):
+        """Список Route в порядке запросов; queries - Query или строки"""
+        queries = [parse_query(query) if isinstance(query, str) else query for query in queries]
+        positions = {}
+        addresses = []
+        for query in queries:
+            if query.ip and query.ip not in positions:
+                positions[query.ip] = len(addresses)
+                addresses.append(query.ip)
+        # Для каждого ipset - префиксы всех адресов пакета одним поиском
+        found = {}
+        if addresses:
+            for index in self._ipsets.values():
+                if len(index):
+                    found[id(index)] = index.lookup_ids(addresses)
+        host_cache = {}
+
+        results = []
+        for query in queries:
+            reason = self._captured(query)
+            if reason is not None:
+                results.append(Route(query, reason=reason, captured=False))
+                continue
+            position = positions.get(query.ip)
+
+            def ip_hit(index, position=position):
+                ids = found.get(id(index))
+                if ids is None:
+                    return None
+                prefix_id = ids[position]
+                return index.prefixes[prefix_id] if prefix_id >= 0 else None
+
+            def host_hit(trie, host=query.host):
+                key = (id(trie), host)
+                if key not in host_cache:
+                    host_cache[key] = trie.covers(host)
+                return host_cache[key]
+
+            for rule in self.rules:
+                rejected, matched = rule.check(query, ip_hit, host_hit)
+                if rejected is None:
+                    results.append(Route(query, rule.index, matched or ""))
+                    break
+            else:
+                results.append(Route(query))
+        return results
+
+    def block_summary(self, index):
+        return self.rules[index].summary
+
+
+def read_queries(path):
+    """Строки запросов из файла ("-" - стандартный ввод), без пустых и комментариев"""
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8-sig", errors="replace")
+    try:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def format_route(route, router, explain=False):
+    lines = [f"{route.query}: {route.describe()}"]
+    if route.block is not None:
+        lines.append(f"  {router.block_summary(route.block)}")
+    if explain:
+        lines.extend(f"  блок {index + 1}: {reason}" for index, reason in route.rejections)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Использование:\n"
+             "  python router.py <стратегия> <хост[@ip]:порт[/tcp|udp[/l7]]>... [--explain] [--raw]\n"
+             "  python router.py <стратегия> --file <файл|-> [--raw]\n"
+             "  --raw - исходные списки вместо скомпилированных (lists/compiled)")
+    args = [arg for arg in argv if not arg.startswith("--")]
+    path = None
+    if "--file" in argv:
+        index = argv.index("--file")
+        path = argv[index + 1] if index + 1 < len(argv) else None
+        if path in args:
+            args.remove(path)
+    if not args or (len(args) < 2 and not path):
+        print(usage)
+        return 2
+
+    from catalog import StrategyCatalog
+    from compiler import ListCompiler
+    from strategy import StrategyError
+    catalog = StrategyCatalog()
+    catalog.scan()
+    try:
+        profile = catalog.profile(args[0])
+    except StrategyError as e:
+        print(f"Ошибка: {e}")
+        return 1
+    if "--raw" not in argv:
+        # Те же списки, что получит winws при подключении
+        compiler = ListCompiler()
+        profile, jobs = compiler.plan(profile)
+        compiler.build(jobs)
+
+    start = time.perf_counter()
+    router = Router(profile)
+    load_ms = (time.perf_counter() - start) * 1000
+    try:
+        queries = [parse_query(text) for text in (read_queries(path) if path else args[1:])]
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}")
+        return 1
+
+    explain = "--explain" in argv
+    if explain:
+        routes = [router.route(query, explain=True) for query in queries]
+        elapsed = 0
+    else:
+        start = time.perf_counter()
+        routes = router.route_many(queries)
+        elapsed = time.perf_counter() - start
+
+    if path:
+        counts = {}
+        for route in routes:
+            key = route.block if route.captured else "wf"
+            counts[key] = counts.get(key, 0) + 1
+        for index in range(len(router.rules)):
+            print(f"Блок {index + 1}: {counts.get(index, 0)} ({router.block_summary(index)})")
+        print(f"Без обработки: {counts.get(None, 0)}, не перехватывается: {counts.get('wf', 0)}")
+        print(f"Запросов: {len(routes)}, загрузка списков {load_ms:.1f} мс, "
+              f"маршрутизация {elapsed * 1000:.1f} мс")
+    else:
+        for route in routes:
+            print(format_route(route, router, explain))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
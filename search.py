@@ -0,0 +1,218 @@
+"""
+Поиск новых стратегий по сетке параметров с отсевом слабых кандидатов
+"""
+
+import itertools
+import os
+import sys
+
+from strategy import parse_strategy, write_strategy, prepare_strategy
+from probe import parse_targets, TARGETS_FILE
+from ranking import StrategyRanker, sort_scores
+from supervisor import WinwsSupervisor
+
+# Режимы десинхронизации, которые встречаются в general*.bat
+DESYNC_MODES = [
+    "fake", "multisplit", "multidisorder", "fake,multisplit",
+    "fake,multidisorder", "fake,fakedsplit", "fake,hostfakesplit",
+]
+
+DEFAULT_GRID = {
+    "dpi-desync": DESYNC_MODES,
+    "dpi-desync-repeats": ["6", "11"],
+    "dpi-desync-fooling": ["ts", "badseq", "md5sig"],
+    "dpi-desync-split-pos": ["1", "2,midsld"],
+    "dpi-desync-split-seqovl": [None, "568", "681"],
+    # Файл фейкового ClientHello в bin (--dpi-desync-fake-tls)
+    "payload": [
+        "tls_clienthello_www_google_com.bin",
+        "tls_clienthello_4pda_to.bin",
+        "tls_clienthello_max_ru.bin",
+    ],
+}
+
+# Стадии последовательного отсева: (число HTTP-целей или None - все, прогонов, таймаут)
+DEFAULT_STAGES = [(3, 1, 2.0), (6, 1, 3.0), (None, 2, 5.0)]
+KEEP_FRACTION = 1 / 3
+
+_FAKE_MODES = {"fake", "fakedsplit", "fakeddisorder", "hostfakesplit"}
+_SPLIT_MODES = {"multisplit", "multidisorder", "fakedsplit", "fakeddisorder"}
+
+
+def desync_options(params, bin_dir):
+    """Превращает набор параметров в опции winws, отбрасывая неприменимые
+
+    Например, --dpi-desync-fooling и --dpi-desync-repeats имеют смысл
+    только для режимов с фейками, а позиция разреза - только для split.
+    Благодаря этому разные точки сетки не дают одинаковых кандидатов.
+    """
+    modes = set(params["dpi-desync"].split(","))
+    has_fake = bool(modes & _FAKE_MODES)
+    has_split = bool(modes & _SPLIT_MODES)
+    payload = params.get("payload")
+    payload_path = os.path.join(bin_dir, payload) if payload else None
+
+    options = [("dpi-desync", params["dpi-desync"])]
+    if has_fake:
+        options.append(("dpi-desync-repeats", params["dpi-desync-repeats"]))
+        options.append(("dpi-desync-fooling", params["dpi-desync-fooling"]))
+        if payload_path:
+            options.append(("dpi-desync-fake-tls", payload_path))
+    if has_split:
+        options.append(("dpi-desync-split-pos", params["dpi-desync-split-pos"]))
+        seqovl = params.get("dpi-desync-split-seqovl")
+        if seqovl and "multisplit" in modes:
+            options.append(("dpi-desync-split-seqovl", seqovl))
+            if payload_path:
+                options.append(("dpi-desync-split-seqovl-pattern", payload_path))
+    return options
+
+
+def is_tcp_desync_block(block):
+    """TCP-блоки, к которым применяются параметры поиска"""
+    return block.tcp_ports is not None and block.get("dpi-desync") is not None
+
+
+def apply_options(block, options):
+    """Заменяет опции --dpi-desync* блока, сохраняя фильтры и списки"""
+    kept = [(name, value) for name, value in block.options if not name.startswith("dpi-desync")]
+    block.options = kept + list(options)
+
+
+def generate_candidates(base, grid=None, limit=None):
+    """Строит профили-кандидаты на основе base по сетке параметров"""
+    grid = grid or DEFAULT_GRID
+    keys = list(grid)
+    seen = set()
+    candidates = []
+
+    for values in itertools.product(*(grid[key] for key in keys)):
+        params = dict(zip(keys, values))
+        options = desync_options(params, base.bin_dir)
+        signature = tuple(options)
+        if signature in seen:
+            continue
+        seen.add(signature)
+
+        candidate = base.derive(f"{base.name} #{len(candidates) + 1}", base.blocks)
+        for block in candidate.blocks:
+            if is_tcp_desync_block(block):
+                apply_options(block, options)
+        candidate.search_params = params
+        candidates.append(candidate)
+        if limit is not None and len(candidates) >= limit:
+            break
+    return candidates
+
+
+class StrategySearch:
+    """Последовательный отсев (successive halving) кандидатов
+
+    На первой стадии каждый кандидат проверяется парой быстрых целей с
+    коротким таймаутом; на следующие стадии проходит лучшая треть, и только
+    финалисты получают полный прогон utils/targets.txt.
+    """
+
+    def __init__(self, supervisor, targets, stages=None, keep_fraction=KEEP_FRACTION,
+                 prepare=None, on_progress=None, should_stop=None):
+        self.supervisor = supervisor
+        self.targets = targets
+        self.stages = stages or DEFAULT_STAGES
+        self.keep_fraction = keep_fraction
+        self.prepare = prepare
+        self.on_progress = on_progress
+        self.should_stop = should_stop
+
+    def stage_targets(self, count):
+        if count is None:
+            return self.targets
+        http_targets = [t for t in self.targets if t.kind == "http"]
+        return (http_targets or self.targets)[:count]
+
+    def run(self, candidates):
+        """Возвращает оценки финалистов от лучшего к худшему"""
+        survivors = list(candidates)
+        scores = []
+
+        for stage, (target_count, rounds, timeout) in enumerate(self.stages):
+            ranker = StrategyRanker(
+                self.supervisor, self.stage_targets(target_count), rounds=rounds,
+                probe_options={"timeout": timeout}, prepare=self.prepare,
+                should_stop=self.should_stop,
+            )
+            scores = []
+            for index, candidate in enumerate(survivors):
+                if self.should_stop is not None and self.should_stop():
+                    return sort_scores(scores)
+                if self.on_progress is not None:
+                    self.on_progress(stage, index, len(survivors), candidate.name)
+                score = ranker.evaluate(candidate)
+                score.profile = candidate
+                scores.append(score)
+
+            scores = [score for score in sort_scores(scores) if score.ok]
+            print(f"Стадия {stage + 1}: проверено {len(survivors)}, прошли {len(scores)}")
+            if stage == len(self.stages) - 1 or not scores:
+                break
+
+            keep = max(1, int(len(scores) * self.keep_fraction))
+            survivors = [score.profile for score in scores[:keep]]
+
+        return scores
+
+
+def next_export_path(base_dir, prefix="general (SEARCH"):
+    """Свободное имя вида "general (SEARCHn).bat" """
+    number = 1
+    while True:
+        suffix = "" if number == 1 else str(number)
+        path = os.path.join(base_dir, f"{prefix}{suffix}).bat")
+        if not os.path.exists(path):
+            return path
+        number += 1
+
+
+def export_winners(scores, base_dir, count=1):
+    """Сохраняет лучших кандидатов как новые файлы стратегий"""
+    paths = []
+    for score in scores[:count]:
+        path = next_export_path(base_dir)
+        write_strategy(score.profile, path)
+        print(f"Сохранена стратегия: {path} ({score.ok}/{score.total}, p50={score.p50_ms} мс)")
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    base_path = argv[0] if argv else "general (ALT).bat"
+    export_count = int(argv[1]) if len(argv) > 1 else 1
+
+    base = parse_strategy(base_path)
+    targets = parse_targets(TARGETS_FILE)
+    candidates = generate_candidates(base)
+    print(f"База: {base.name}, кандидатов: {len(candidates)}, целей: {len(targets)}")
+
+    def progress(stage, index, count, name):
+        print(f"[стадия {stage + 1}] {index + 1}/{count}: {name}")
+
+    supervisor = WinwsSupervisor()
+    try:
+        search = StrategySearch(supervisor, targets, prepare=prepare_strategy, on_progress=progress)
+        scores = search.run(candidates)
+    finally:
+        supervisor.shutdown(timeout=5)
+
+    if not scores:
+        print("Ни один кандидат не прошел проверку")
+        return 1
+
+    for score in scores[:10]:
+        print(f"{score.name}: {score.ok}/{score.total}, p50={score.p50_ms} мс, "
+              f"p95={score.p95_ms} мс, {score.profile.search_params}")
+    export_winners(scores, base.base_dir, export_count)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,423 @@
+"""
+Разбор стратегий zapret (general*.bat) в структурированный профиль
+"""
+
+import hashlib
+import os
+import re
+import subprocess
+
+BIN_DIR = "bin"
+LISTS_DIR = "lists"
+WINWS_EXE = "winws.exe"
+
+GAME_FILTER_FLAG = os.path.join("utils", "game_filter.enabled")
+GAME_FILTER_ENABLED = "1024-65535"
+GAME_FILTER_DISABLED = "12"
+
+# Опции winws, которые действуют на весь процесс, а не на отдельный профиль
+GLOBAL_OPTIONS = {
+    "wf-l3", "wf-tcp", "wf-udp", "wf-raw", "wf-raw-part", "wf-filter-lan",
+    "wf-save", "ssid-filter", "nlm-filter", "debug", "ipcache-lifetime",
+    "ipcache-hostname", "ctrack-timeouts", "ctrack-disable",
+}
+
+# Опции со списками портов, в которые подставляется %GameFilter%
+PORT_OPTIONS = {"wf-tcp", "wf-udp", "filter-tcp", "filter-udp"}
+
+# Опции, значение которых всегда является путем к файлу
+FILE_OPTIONS = {
+    "hostlist", "hostlist-exclude", "hostlist-auto", "hostlist-auto-debug",
+    "ipset", "ipset-exclude",
+}
+
+_VAR_RE = re.compile(r"%(\w+)%")
+_DIGITS_RE = re.compile(r"(\d+)")
+
+
+class StrategyError(Exception):
+    """Ошибка разбора файла стратегии"""
+
+
+class FilterBlock:
+    """Один профиль winws, отделенный от соседних опцией --new"""
+
+    def __init__(self, index, options):
+        self.index = index
+        # Список пар (имя, значение) в исходном порядке; значение может быть None
+        self.options = options
+
+    def get(self, name, default=None):
+        """Возвращает последнее значение опции"""
+        value = default
+        for option_name, option_value in self.options:
+            if option_name == name:
+                value = option_value
+        return value
+
+    def get_all(self, name):
+        """Возвращает все значения опции"""
+        return [value for option_name, value in self.options if option_name == name]
+
+    @property
+    def tcp_ports(self):
+        return self.get("filter-tcp")
+
+    @property
+    def udp_ports(self):
+        return self.get("filter-udp")
+
+    @property
+    def l7(self):
+        return self.get("filter-l7")
+
+    def files(self):
+        """Возвращает пути ко всем файлам, на которые ссылается профиль"""
+        return [value for name, value in self.options if is_file_option(name, value)]
+
+    def argv(self):
+        return [format_option(name, value) for name, value in self.options]
+
+    def __repr__(self):
+        return f"FilterBlock({self.index}, {self.argv()!r})"
+
+
+class StrategyProfile:
+    """Структурированное представление стратегии winws"""
+
+    def __init__(self, name, path, base_dir, global_options, blocks, game_filter, comments=None):
+        self.name = name
+        self.path = path
+        self.base_dir = base_dir
+        self.global_options = global_options
+        self.blocks = blocks
+        self.game_filter = game_filter
+        # Строки "::" из заголовка .bat (кроме строки шаблона), для записи обратно
+        self.comments = comments or []
+
+    @property
+    def bin_dir(self):
+        return os.path.join(self.base_dir, BIN_DIR)
+
+    @property
+    def executable(self):
+        return os.path.join(self.bin_dir, WINWS_EXE)
+
+    def get_global(self, name, default=None):
+        value = default
+        for option_name, option_value in self.global_options:
+            if option_name == name:
+                value = option_value
+        return value
+
+    @property
+    def wf_tcp(self):
+        return self.get_global("wf-tcp")
+
+    @property
+    def wf_udp(self):
+        return self.get_global("wf-udp")
+
+    def args(self):
+        """Аргументы winws без имени исполняемого файла"""
+        args = [format_option(name, value) for name, value in self.global_options]
+        for i, block in enumerate(self.blocks):
+            if i:
+                args.append("--new")
+            args.extend(block.argv())
+        return args
+
+    def argv(self):
+        """Полная командная строка для запуска winws списком аргументов"""
+        return [self.executable] + self.args()
+
+    def files(self):
+        """Возвращает все файлы (списки, payload), нужные стратегии"""
+        files = [self.executable]
+        for name, value in self.global_options:
+            if is_file_option(name, value):
+                files.append(value)
+        for block in self.blocks:
+            for path in block.files():
+                if path not in files:
+                    files.append(path)
+        return files
+
+    def missing_files(self):
+        """Возвращает файлы, которых нет на диске"""
+        return [path for path in self.files() if not os.path.isfile(path)]
+
+    def uses_tcp_timestamps(self):
+        """Нужны ли стратегии включенные TCP timestamps (fooling=ts)"""
+        for block in self.blocks:
+            for fooling in block.get_all("dpi-desync-fooling"):
+                if fooling and "ts" in fooling.split(","):
+                    return True
+        return False
+
+    def fingerprint(self):
+        """SHA-256 итоговой командной строки winws"""
+        return hashlib.sha256("\0".join(self.args()).encode("utf-8")).hexdigest()
+
+    def derive(self, name, blocks):
+        """Новый профиль с теми же глобальными опциями и другими блоками"""
+        blocks = [FilterBlock(i, list(block.options)) for i, block in enumerate(blocks)]
+        return StrategyProfile(name, None, self.base_dir, list(self.global_options),
+                               blocks, self.game_filter)
+
+    def __repr__(self):
+        return f"StrategyProfile({self.name!r}, blocks={len(self.blocks)})"
+
+
+def is_file_option(name, value):
+    """Проверяет, указывает ли значение опции на файл"""
+    if value is None:
+        return False
+    if name in FILE_OPTIONS:
+        return True
+    # Payload-опции принимают и файл, и hex-строку (0x...), и спецзначения вроде "!"
+    if value.startswith("0x") or value == "!":
+        return False
+    return os.path.isabs(value)
+
+
+def format_option(name, value):
+    if value is None:
+        return f"--{name}"
+    return f"--{name}={value}"
+
+
+def load_game_filter(base_dir):
+    """Возвращает значение %GameFilter% так же, как service.bat load_game_filter"""
+    if os.path.exists(os.path.join(base_dir, GAME_FILTER_FLAG)):
+        return GAME_FILTER_ENABLED
+    return GAME_FILTER_DISABLED
+
+
+def read_command_line(path):
+    """Читает .bat файл и возвращает склеенную строку запуска winws.exe"""
+    return _read_bat(path)[0]
+
+
+def _read_bat(path):
+    """(строка запуска winws.exe, комментарии :: перед ней)"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        lines = f.read().splitlines()
+
+    command = None
+    comments = []
+    for line in lines:
+        stripped = line.strip()
+        if command is None:
+            if stripped.startswith("::"):
+                if stripped not in TEMPLATE_COMMENTS:
+                    comments.append(stripped)
+                continue
+            if WINWS_EXE not in stripped.lower():
+                continue
+            command = ""
+        if stripped.endswith("^"):
+            command += stripped[:-1] + " "
+        else:
+            command += stripped
+            break
+
+    if command is None:
+        raise StrategyError(f"В файле {path} не найден запуск {WINWS_EXE}")
+
+    # Отрезаем "start ... winws.exe" вместе с закрывающей кавычкой
+    position = command.lower().find(WINWS_EXE)
+    command = command[position + len(WINWS_EXE):]
+    if command.startswith('"'):
+        command = command[1:]
+    return command, comments
+
+
+def split_command_line(command):
+    """Делит строку на аргументы по правилам cmd: кавычки и экранирование ^"""
+    args = []
+    current = []
+    in_quotes = False
+    has_token = False
+    i = 0
+    while i < len(command):
+        char = command[i]
+        if char == '"':
+            in_quotes = not in_quotes
+            has_token = True
+        elif char == "^" and not in_quotes and i + 1 < len(command):
+            i += 1
+            current.append(command[i])
+            has_token = True
+        elif char in " \t" and not in_quotes:
+            if has_token:
+                args.append("".join(current))
+                current = []
+                has_token = False
+        else:
+            current.append(char)
+            has_token = True
+        i += 1
+    if has_token:
+        args.append("".join(current))
+    return args
+
+
+def expand_variables(text, variables):
+    """Подставляет %BIN%, %LISTS%, %GameFilter% и другие известные переменные"""
+    def replace(match):
+        return variables.get(match.group(1), match.group(0))
+    return _VAR_RE.sub(replace, text)
+
+
+def parse_option(arg):
+    """Превращает "--name=value" в пару (name, value)"""
+    if not arg.startswith("--"):
+        raise StrategyError(f"Неожиданный аргумент: {arg}")
+    name, sep, value = arg[2:].partition("=")
+    return name, (value if sep else None)
+
+
+def parse_strategy(path, base_dir=None, game_filter=None):
+    """Разбирает .bat файл стратегии в StrategyProfile"""
+    path = os.path.abspath(path)
+    if base_dir is None:
+        base_dir = os.path.dirname(path)
+    if game_filter is None:
+        game_filter = load_game_filter(base_dir)
+
+    variables = {
+        "BIN": os.path.join(base_dir, BIN_DIR) + os.sep,
+        "LISTS": os.path.join(base_dir, LISTS_DIR) + os.sep,
+        "GameFilter": game_filter,
+    }
+
+    global_options = []
+    blocks = []
+    block_options = []
+
+    command, comments = _read_bat(path)
+    for raw in split_command_line(command):
+        arg = expand_variables(raw, variables)
+        if arg == "--new":
+            blocks.append(FilterBlock(len(blocks), block_options))
+            block_options = []
+            continue
+        name, value = parse_option(arg)
+        if name in GLOBAL_OPTIONS:
+            global_options.append((name, value))
+        else:
+            block_options.append((name, value))
+
+    if block_options:
+        blocks.append(FilterBlock(len(blocks), block_options))
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    return StrategyProfile(name, path, base_dir, global_options, blocks, game_filter, comments)
+
+
+def _natural_key(text):
+    """general (ALT2) раньше general (ALT10)"""
+    text = os.path.splitext(text)[0].lower().replace("(", "").replace(")", "").strip()
+    return [int(part) if part.isdigit() else part for part in _DIGITS_RE.split(text)]
+
+
+def find_strategies(base_dir="."):
+    """Стратегии general*.bat в каталоге: {название: имя файла} в естественном порядке"""
+    try:
+        filenames = os.listdir(base_dir)
+    except OSError:
+        return {}
+    strategies = {}
+    for filename in sorted(filenames, key=_natural_key):
+        stem, ext = os.path.splitext(filename)
+        if ext.lower() == ".bat" and stem.lower().startswith("general"):
+            strategies[stem] = filename
+    return strategies
+
+
+def enable_tcp_timestamps():
+    """Включает TCP timestamps, нужные для --dpi-desync-fooling=ts"""
+    try:
+        subprocess.run(
+            'netsh interface tcp set global timestamps=enabled',
+            shell=True,
+            capture_output=True,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+        )
+    except Exception as e:
+        print(f"Не удалось включить TCP timestamps: {e}")
+
+
+def prepare_strategy(profile):
+    """Подготовка системы перед запуском winws со стратегией"""
+    if profile.uses_tcp_timestamps():
+        enable_tcp_timestamps()
+
+
+BAT_TEMPLATE = """@echo off
+chcp 65001 > nul
+:: 65001 - UTF-8
+{comments}
+cd /d "%~dp0"
+call service.bat status_zapret
+call service.bat check_updates
+call service.bat load_game_filter
+echo:
+
+set "BIN=%~dp0bin\\"
+set "LISTS=%~dp0lists\\"
+cd /d %BIN%
+
+start "zapret: %~n0" /min "%BIN%winws.exe" {command}
+"""
+
+# Комментарии, которые to_bat пишет сам
+TEMPLATE_COMMENTS = {line for line in BAT_TEMPLATE.splitlines() if line.startswith("::")}
+
+
+def _bat_value(profile, name, value):
+    """Обратная подстановка переменных для записи значения в .bat"""
+    if name in PORT_OPTIONS:
+        return ",".join(
+            "%GameFilter%" if port == profile.game_filter else port
+            for port in value.split(",")
+        )
+    for variable, directory in (("BIN", BIN_DIR), ("LISTS", LISTS_DIR)):
+        prefix = os.path.join(profile.base_dir, directory) + os.sep
+        if value.startswith(prefix):
+            return f'"%{variable}%{value[len(prefix):]}"'
+    if value == "!":
+        return "^!"
+    return value
+
+
+def _bat_options(profile, options):
+    parts = []
+    for name, value in options:
+        if value is None:
+            parts.append(f"--{name}")
+        else:
+            parts.append(f"--{name}={_bat_value(profile, name, value)}")
+    return " ".join(parts)
+
+
+def to_bat(profile):
+    """Возвращает текст .bat файла в формате general*.bat"""
+    lines = [_bat_options(profile, profile.global_options)]
+    for i, block in enumerate(profile.blocks):
+        line = _bat_options(profile, block.options)
+        if i < len(profile.blocks) - 1:
+            line += " --new"
+        lines.append(line)
+    comments = "".join(comment + "\n" for comment in profile.comments)
+    return BAT_TEMPLATE.format(comments=comments, command=" ^\n".join(lines))
+
+
+def write_strategy(profile, path):
+    """Сохраняет профиль как .bat файл стратегии (с CRLF, как остальные)"""
+    with open(path, "w", encoding="utf-8", newline="\r\n") as f:
+        f.write(to_bat(profile))
+    profile.path = os.path.abspath(path)
+    profile.name = os.path.splitext(os.path.basename(path))[0]
+    return profile.path
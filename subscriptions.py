@@ -0,0 +1,327 @@
+"""
+Подписки на списки: несколько внешних источников на каждый список и их фоновое обновление
+"""
+
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from importer import BulkImporter, read_text_lines
+from ipset import DownloadError, fetch
+from liststore import atomic_write, list_kind
+from strategy import LISTS_DIR
+
+SUBSCRIPTIONS_FILE = os.path.join(LISTS_DIR, "subscriptions.json")
+CACHE_DIR = os.path.join(LISTS_DIR, "subscriptions")
+STATE_FILE = "state.json"
+
+DEFAULT_INTERVAL = 24 * 3600
+# Разброс времени обновления, чтобы клиенты не обращались к серверу одновременно
+JITTER = 0.1
+START_DELAY = 60
+RETRY_DELAY = 30 * 60
+# Доля неверных строк, при которой ответ считается не списком (страница ошибки и т.п.)
+MAX_INVALID_SHARE = 0.5
+
+
+class Subscription:
+    """Внешний источник записей для списка target"""
+
+    def __init__(self, name, url, target, enabled=True, cache_dir=CACHE_DIR):
+        self.name = name
+        self.url = url
+        self.target = target
+        self.enabled = enabled
+        self.kind = list_kind(target)
+        self.id = hashlib.sha256(url.encode("utf-8")).hexdigest()[:12]
+        self.cache_path = os.path.join(cache_dir, f"{self.kind}-{self.id}.txt")
+
+    def __repr__(self):
+        return f"Subscription({self.name!r}, {self.url!r} -> {self.target!r})"
+
+
+class RefreshResult:
+    """Итог обновления одного источника"""
+
+    def __init__(self, subscription, modified=False, added=0, removed=0, total=0,
+                 invalid=0, size=0, error=None):
+        self.subscription = subscription
+        self.modified = modified
+        self.added = added
+        self.removed = removed
+        self.total = total
+        self.invalid = invalid
+        self.size = size
+        self.error = error
+
+    def summary(self):
+        name = self.subscription.name
+        if self.error is not None:
+            return f"{name}: ошибка ({self.error}), используется кэш"
+        if not self.modified:
+            return f"{name}: без изменений"
+        text = f"{name}: записей {self.total}, добавлено {self.added}, удалено {self.removed}"
+        if self.invalid:
+            text += f", пропущено неверных {self.invalid}"
+        return text
+
+
+class SubscriptionManager:
+    """Источники из lists/subscriptions.json и их кэш в lists/subscriptions
+
+    Формат файла подписок:
+        {"interval_hours": 24,
+         "sources": [{"name": "...", "url": "https://...",
+                      "target": "lists/list-general.txt", "enabled": true}]}
+
+    Каждый источник загружается условным запросом в свой файл кэша уже
+    нормализованным и без дубликатов. Эти файлы не смешиваются со списками
+    пользователя: ListCompiler добавляет их к target при компиляции
+    (extras), поэтому у каждой записи остается источник (provenance), а при
+    отсутствии сети используется последний успешно загруженный кэш.
+    """
+
+    def __init__(self, config_path=SUBSCRIPTIONS_FILE, cache_dir=CACHE_DIR):
+        self.config_path = config_path
+        self.cache_dir = cache_dir
+        self.state_path = os.path.join(cache_dir, STATE_FILE)
+        self._lock = threading.Lock()
+        self.interval = DEFAULT_INTERVAL
+        self.subscriptions = []
+        self.load()
+
+    def load(self):
+        """Перечитывает файл подписок (его отсутствие - нет подписок)"""
+        try:
+            with open(self.config_path, "r", encoding="utf-8-sig") as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            config = {}
+        except (OSError, ValueError) as e:
+            print(f"Не удалось прочитать {self.config_path}: {e}")
+            config = {}
+
+        self.interval = float(config.get("interval_hours", DEFAULT_INTERVAL / 3600)) * 3600
+        self.subscriptions = []
+        for source in config.get("sources", []):
+            if not source.get("url") or not source.get("target"):
+                print(f"Подписка без url или target пропущена: {source}")
+                continue
+            self.subscriptions.append(Subscription(
+                source.get("name") or source["url"], source["url"], source["target"],
+                source.get("enabled", True), self.cache_dir
+            ))
+        return self.subscriptions
+
+    # Состояние
+
+    def load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, state):
+        data = json.dumps(state, ensure_ascii=False, indent=2).encode("utf-8")
+        try:
+            atomic_write(self.state_path, [data])
+        except OSError as e:
+            print(f"Не удалось сохранить состояние подписок: {e}")
+
+    def extras(self):
+        """{абсолютный путь списка: [файлы кэша]} для ListCompiler"""
+        result = {}
+        for subscription in self.subscriptions:
+            if subscription.enabled and os.path.exists(subscription.cache_path):
+                result.setdefault(os.path.abspath(subscription.target), []).append(subscription.cache_path)
+        return result
+
+    # Обновление
+
+    def _next_time(self, now, delay):
+        return now + delay * random.uniform(1 - JITTER, 1 + JITTER)
+
+    def due(self, now=None):
+        """Источники, которые пора обновить"""
+        now = time.time() if now is None else now
+        state = self.load_state()
+        return [subscription for subscription in self.subscriptions
+                if subscription.enabled and state.get(subscription.id, {}).get("next_at", 0) <= now]
+
+    def next_due(self):
+        """Время (time.time()) ближайшего обновления или None, если источников нет"""
+        state = self.load_state()
+        times = [state.get(subscription.id, {}).get("next_at", 0)
+                 for subscription in self.subscriptions if subscription.enabled]
+        return min(times) if times else None
+
+    def refresh(self, subscription, force=False, should_stop=None):
+        """Обновляет один источник; ошибки не бросаются, а попадают в результат"""
+        with self._lock:
+            state = self.load_state()
+            entry = state.get(subscription.id, {})
+            now = time.time()
+            try:
+                result = self._refresh(subscription, entry, force, should_stop)
+                entry["error"] = None
+                entry["next_at"] = self._next_time(now, self.interval)
+            except (DownloadError, OSError) as e:
+                result = RefreshResult(subscription, error=str(e))
+                entry["error"] = str(e)
+                entry["next_at"] = self._next_time(now, RETRY_DELAY)
+            entry.update(name=subscription.name, url=subscription.url,
+                         target=subscription.target, checked_at=now)
+            state[subscription.id] = entry
+            self.save_state(state)
+            return result
+
+    def _refresh(self, subscription, entry, force, should_stop):
+        cache_path = subscription.cache_path
+        conditional = not force and os.path.exists(cache_path) and entry.get("url") == subscription.url
+        temp_path = f"{cache_path}.{os.getpid()}.download"
+        try:
+            download = fetch(subscription.url, temp_path,
+                             entry.get("etag") if conditional else None,
+                             entry.get("last_modified") if conditional else None,
+                             should_stop=should_stop)
+            if download is None:
+                return RefreshResult(subscription, total=entry.get("count", 0))
+
+            # Формат источника любой, который понимает импорт: домены, hosts, правила ||x^, URL
+            report = BulkImporter([], subscription.kind).run(read_text_lines(temp_path))
+            if not report.added:
+                raise DownloadError("в загруженном списке нет записей")
+            if report.invalid > MAX_INVALID_SHARE * report.total:
+                raise DownloadError(f"в загруженном списке неверных строк: {report.invalid} из {report.total}")
+
+            old = set(read_cache(cache_path))
+            new = report.added
+            new_set = set(new)
+            # Кэш перезаписывается только при изменении: иначе winws зря перечитает список
+            modified = new_set != old
+            if modified:
+                atomic_write(cache_path, ["\n".join(new).encode("utf-8"), b"\n"])
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        entry.update(etag=download.etag, last_modified=download.last_modified,
+                     updated_at=time.time(), count=len(new))
+        return RefreshResult(subscription, modified=modified, added=len(new_set - old),
+                             removed=len(old - new_set), total=len(new), invalid=report.invalid,
+                             size=download.size)
+
+    def refresh_due(self, should_stop=None, force=False):
+        """Обновляет источники, которым пора; возвращает список RefreshResult"""
+        results = []
+        for subscription in (self.subscriptions if force else self.due()):
+            if not subscription.enabled:
+                continue
+            if should_stop is not None and should_stop():
+                break
+            results.append(self.refresh(subscription, force, should_stop))
+        return results
+
+    def provenance(self, entry):
+        """Имена источников, в кэше которых есть запись"""
+        entry = entry.strip().lower()
+        return [subscription.name for subscription in self.subscriptions
+                if entry in set(read_cache(subscription.cache_path))]
+
+
+def read_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+class SubscriptionScheduler:
+    """Обновляет подписки в фоновом потоке по расписанию
+
+    Первая проверка выполняется через start_delay после запуска, поэтому
+    ни запуск программы, ни подключение не ждут сеть. Время следующего
+    обновления каждого источника хранится в состоянии со случайным
+    разбросом. on_refresh(results) вызывается из фонового потока, если
+    хотя бы один источник изменился.
+    """
+
+    def __init__(self, manager, on_refresh=None, start_delay=START_DELAY):
+        self.manager = manager
+        self.on_refresh = on_refresh
+        self.start_delay = start_delay
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="subscriptions", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def refresh_now(self):
+        """Будит планировщик для внеочередной проверки"""
+        self._wake.set()
+
+    def _run(self):
+        self._wake.wait(self.start_delay * random.uniform(1, 1 + JITTER))
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                results = self.manager.refresh_due(should_stop=self._stop.is_set)
+                for result in results:
+                    print(f"Подписка {result.summary()}")
+                if self.on_refresh is not None and any(result.modified for result in results):
+                    self.on_refresh(results)
+            except Exception as e:
+                print(f"Ошибка обновления подписок: {e}")
+
+            next_due = self.manager.next_due()
+            delay = RETRY_DELAY if next_due is None else max(next_due - time.time(), 1)
+            self._wake.wait(min(delay, RETRY_DELAY))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Использование:\n"
+             "  python subscriptions.py status\n"
+             "  python subscriptions.py refresh [--force]\n"
+             "  python subscriptions.py why <домен или адрес>")
+    if not argv:
+        print(usage)
+        return 2
+
+    manager = SubscriptionManager()
+    command, args = argv[0], argv[1:]
+    if command == "status":
+        state = manager.load_state()
+        for subscription in manager.subscriptions:
+            entry = state.get(subscription.id, {})
+            flag = "" if subscription.enabled else " (отключена)"
+            print(f"{subscription.name}{flag} -> {subscription.target}: записей {entry.get('count', 0)}")
+            if entry.get("error"):
+                print(f"  последняя ошибка: {entry['error']}")
+    elif command == "refresh":
+        for result in manager.refresh_due(force="--force" in args):
+            print(result.summary())
+    elif command == "why" and args:
+        names = manager.provenance(args[0])
+        print(", ".join(names) if names else "нет ни в одной подписке")
+    else:
+        print(usage)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
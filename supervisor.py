@@ -0,0 +1,500 @@
+"""
+Управление процессом winws.exe вне потока интерфейса
+"""
+
+import collections
+import json
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+
+from winwslog import LogBuffer
+
+# Строка, которую winws печатает после открытия WinDivert
+READY_MARKERS = ("windivert initialized. capture is started",)
+
+READY_POLL_INTERVAL = 0.2
+TAIL_LINES = 50
+# Сколько ждать дочитывания вывода завершившегося winws (его последние строки - причина ошибки)
+OUTPUT_DRAIN_TIMEOUT = 1
+
+# winws перечитывает hostlist/ipset при изменении времени модификации файла
+# и сообщает об этом строкой "Loaded 123 hosts from <файл>" ("ip/subnets" для ipset)
+LIST_LOADED_RE = re.compile(r"\bloaded (\d+) [\w/ ]+? from (.+?)\s*$", re.I)
+# Сколько ждать перечитывания списков, прежде чем перезапустить winws
+LIST_RELOAD_TIMEOUT = 3
+
+
+class ProcessBackend:
+    """Интерфейс запуска и завершения процессов"""
+
+    def spawn(self, argv, cwd=None):
+        """Запускает процесс и возвращает его объект"""
+        raise NotImplementedError
+
+    def pid(self, process):
+        raise NotImplementedError
+
+    def output(self, process):
+        """Возвращает поток строк вывода процесса или None"""
+        return None
+
+    def poll(self, process):
+        """Возвращает код завершения или None, если процесс еще работает"""
+        raise NotImplementedError
+
+    def wait(self, process, timeout=None):
+        """Ждет завершения процесса; возвращает код или None по таймауту"""
+        raise NotImplementedError
+
+    def terminate(self, process):
+        raise NotImplementedError
+
+    def kill(self, process):
+        raise NotImplementedError
+
+
+class PopenBackend(ProcessBackend):
+    """Процессы через subprocess.Popen; завершение через хэндл процесса"""
+
+    def __init__(self, capture_output=True):
+        self.capture_output = capture_output
+
+    def spawn(self, argv, cwd=None):
+        kwargs = {}
+        if self.capture_output:
+            kwargs.update(
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                encoding="utf-8",
+                errors="replace",
+            )
+        if os.name == "nt":
+            if self.capture_output:
+                kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+            else:
+                # Аналог start /min: отдельная свернутая консоль без захвата фокуса
+                startupinfo = subprocess.STARTUPINFO()
+                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+                startupinfo.wShowWindow = 7  # SW_SHOWMINNOACTIVE
+                kwargs["creationflags"] = subprocess.CREATE_NEW_CONSOLE
+                kwargs["startupinfo"] = startupinfo
+        return subprocess.Popen(argv, cwd=cwd, **kwargs)
+
+    def pid(self, process):
+        return process.pid
+
+    def output(self, process):
+        return process.stdout
+
+    def poll(self, process):
+        return process.poll()
+
+    def wait(self, process, timeout=None):
+        try:
+            return process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def terminate(self, process):
+        # На Windows это TerminateProcess по хэндлу, без tasklist/taskkill
+        process.terminate()
+
+    def kill(self, process):
+        process.kill()
+
+
+class StartupError(Exception):
+    """winws не вышел в рабочее состояние"""
+
+
+class WinwsSession:
+    """Состояние одного запущенного процесса winws"""
+
+    def __init__(self, process, pid, cwd=None):
+        self.process = process
+        self.pid = pid
+        self.cwd = cwd
+        self.started_at = time.monotonic()
+        self.ready_at = None
+        self.exit_code = None
+        self.ready = threading.Event()
+        self.exited = threading.Event()
+        # Вывод прочитан до конца (или его нет)
+        self.output_done = threading.Event()
+        self.stopping = False
+        # Последние строки вывода - для сообщения об ошибке запуска
+        self.tail = collections.deque(maxlen=TAIL_LINES)
+        # Загруженные списки: путь -> (число записей, время загрузки)
+        self.lists = {}
+        self.lists_changed = threading.Condition()
+
+    @property
+    def ready_ms(self):
+        if self.ready_at is None:
+            return None
+        return int((self.ready_at - self.started_at) * 1000)
+
+    def mark_ready(self):
+        if not self.ready.is_set():
+            self.ready_at = time.monotonic()
+            self.ready.set()
+
+    def list_key(self, path):
+        return os.path.normcase(os.path.abspath(os.path.join(self.cwd or "", path)))
+
+    def mark_list_loaded(self, path, count):
+        with self.lists_changed:
+            self.lists[self.list_key(path)] = (count, time.monotonic())
+            self.lists_changed.notify_all()
+
+    def wait_lists_loaded(self, paths, since, timeout):
+        """Ждет, пока winws перечитает все paths после момента since
+
+        Возвращает {путь: число записей} или None по таймауту.
+        """
+        keys = {self.list_key(path): path for path in paths}
+        deadline = time.monotonic() + timeout
+        with self.lists_changed:
+            while True:
+                loaded = {path: self.lists[key][0] for key, path in keys.items()
+                          if key in self.lists and self.lists[key][1] >= since}
+                if len(loaded) == len(keys):
+                    return loaded
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.exited.is_set():
+                    return None
+                self.lists_changed.wait(min(READY_POLL_INTERVAL, remaining))
+
+
+class ListApplyResult:
+    """Итог применения измененных списков к работающему winws
+
+    mode - "reload" (winws перечитал файлы сам, обход не прерывался) или
+    "restart" (winws перезапущен); gap_ms - время без обхода;
+    loaded - {путь: число записей} из вывода winws, если он его сообщил.
+    """
+
+    def __init__(self, mode, gap_ms, loaded=None, pid=None):
+        self.mode = mode
+        self.gap_ms = gap_ms
+        self.loaded = loaded or {}
+        self.pid = pid
+
+    def __repr__(self):
+        return f"ListApplyResult({self.mode!r}, {self.gap_ms} мс)"
+
+
+class WinwsSupervisor:
+    """Запускает и останавливает ровно один процесс winws в фоновом потоке
+
+    Все операции ставятся в очередь и выполняются рабочим потоком, а о
+    результате сообщается слушателям: callback(event, value), где event -
+    "started" (pid), "ready" (мс до готовности), "stopped" (bool),
+    "exited" (код), "applied" (ListApplyResult) или "failed" (текст).
+    Слушатели вызываются из рабочего потока или потоков наблюдения за
+    процессом.
+
+    Готовность определяется по строке winws о запуске захвата WinDivert
+    или по успешной проверке ready_check, если она передана. Если winws
+    завершается раньше, запуск сразу считается неудачным.
+
+    Весь вывод winws попадает в кольцевой буфер log (LogBuffer), общий для
+    всех запусков.
+    """
+
+    def __init__(self, backend=None, stop_timeout=5, ready_timeout=10, ready_check=None, log=None):
+        self.backend = backend or PopenBackend()
+        self.log = log if log is not None else LogBuffer()
+        self.stop_timeout = stop_timeout
+        self.ready_timeout = ready_timeout
+        self.ready_check = ready_check
+        self.session = None
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="winws-supervisor", daemon=True)
+        self._worker.start()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def _notify(self, event, value):
+        for callback in list(self._listeners):
+            try:
+                callback(event, value)
+            except Exception as e:
+                print(f"Ошибка обработчика события {event}: {e}")
+
+    @property
+    def process(self):
+        session = self.session
+        return session.process if session is not None else None
+
+    @property
+    def pid(self):
+        session = self.session
+        return session.pid if session is not None else None
+
+    def is_running(self):
+        session = self.session
+        return session is not None and not session.exited.is_set()
+
+    def is_ready(self):
+        session = self.session
+        return self.is_running() and session.ready.is_set()
+
+    # Асинхронный интерфейс для GUI
+
+    def start(self, argv, cwd=None, before_start=None):
+        """Ставит в очередь запуск winws (предыдущий процесс будет остановлен)"""
+        self._queue.put(("start", (argv, cwd, before_start)))
+
+    def stop(self):
+        """Ставит в очередь остановку winws"""
+        self._queue.put(("stop", None))
+
+    def apply_lists(self, paths, since, argv, cwd=None, before_start=None, restart=False):
+        """Ставит в очередь применение списков, измененных после since (time.monotonic)"""
+        self._queue.put(("apply", (paths, since, argv, cwd, before_start, restart)))
+
+    def shutdown(self, timeout=None):
+        """Синхронно останавливает winws и рабочий поток (при выходе из программы)"""
+        self._queue.put(("quit", None))
+        self._worker.join(timeout)
+        return self.stop_now()
+
+    def _run(self):
+        while True:
+            command, args = self._queue.get()
+            if command == "quit":
+                break
+            try:
+                if command == "start":
+                    self._notify("ready", self.start_now(*args))
+                elif command == "stop":
+                    self._notify("stopped", self.stop_now())
+                elif command == "apply":
+                    result = self.apply_lists_now(*args)
+                    if result is not None:
+                        self._notify("applied", result)
+            except Exception as e:
+                print(f"Ошибка супервизора winws ({command}): {e}")
+                self._notify("failed", str(e))
+
+    # Синхронный интерфейс (рабочий поток, консольный режим)
+
+    def spawn_now(self, argv, cwd=None, before_start=None):
+        """Запускает winws и возвращает сессию, не дожидаясь готовности"""
+        session = self.session
+        if session is not None and not self.stop_now():
+            # Второй winws рядом с незавершенным не запускаем: WinDivert уже занят
+            raise StartupError(f"предыдущий winws не завершился (PID: {session.pid})")
+        if before_start is not None:
+            before_start()
+
+        with self._lock:
+            process = self.backend.spawn(argv, cwd)
+            session = WinwsSession(process, self.backend.pid(process), cwd)
+            self.session = session
+
+        print(f"winws запущен (PID: {session.pid})")
+        self._notify("started", session.pid)
+
+        output = self.backend.output(process)
+        if output is not None:
+            threading.Thread(
+                target=self._read_output, args=(session, output),
+                name=f"winws-output-{session.pid}", daemon=True
+            ).start()
+        else:
+            session.output_done.set()
+        threading.Thread(
+            target=self._watch, args=(session,), name=f"winws-watch-{session.pid}", daemon=True
+        ).start()
+        return session
+
+    def start_now(self, argv, cwd=None, before_start=None):
+        """Запускает winws и ждет готовности; возвращает время запуска в мс"""
+        session = self.spawn_now(argv, cwd, before_start)
+        self.wait_ready(session)
+        print(f"winws готов за {session.ready_ms} мс (PID: {session.pid})")
+        return session.ready_ms
+
+    def wait_ready(self, session, timeout=None):
+        """Ждет готовности сессии или бросает StartupError"""
+        if timeout is None:
+            timeout = self.ready_timeout
+        deadline = session.started_at + timeout
+
+        while not session.ready.is_set():
+            if session.exited.is_set():
+                raise StartupError(self._describe_exit(session))
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stop_now()
+                raise StartupError(f"winws не сообщил о готовности за {timeout} с")
+            if self.ready_check is not None:
+                try:
+                    if self.ready_check():
+                        session.mark_ready()
+                        break
+                except Exception as e:
+                    print(f"Ошибка проверки готовности: {e}")
+            session.ready.wait(min(READY_POLL_INTERVAL, remaining))
+
+        if session.exited.is_set():
+            raise StartupError(self._describe_exit(session))
+
+    def apply_lists_now(self, paths, since, argv, cwd=None, before_start=None, restart=False,
+                        timeout=LIST_RELOAD_TIMEOUT):
+        """Доводит измененные списки до работающего winws
+
+        Сначала ждет, что winws сам перечитает файлы (без перерыва в обходе).
+        Если за timeout этого не произошло - например, вывод winws не
+        захватывается или файл не понадобился ни одному пакету, - winws
+        перезапускается с теми же аргументами. restart - аргументы изменились
+        (например, фильтр WinDivert), winws перезапускается сразу.
+        Возвращает ListApplyResult или None, если winws не запущен.
+        """
+        session = self.session
+        if session is None or not session.ready.is_set() or session.exited.is_set():
+            return None
+
+        if restart:
+            print("Аргументы winws изменились, перезапуск")
+        else:
+            loaded = session.wait_lists_loaded(paths, since, timeout)
+            if loaded is not None:
+                print(f"winws перечитал списки: {loaded}")
+                return ListApplyResult("reload", 0, loaded, session.pid)
+            print("winws не сообщил о перечитывании списков, перезапуск")
+        stopped_at = time.monotonic()
+        session = self.spawn_now(argv, cwd, before_start)
+        self.wait_ready(session)
+        gap_ms = int((session.ready_at - stopped_at) * 1000)
+        loaded = session.wait_lists_loaded(paths, stopped_at, 0) or {}
+        print(f"winws перезапущен, перерыв {gap_ms} мс (PID: {session.pid})")
+        return ListApplyResult("restart", gap_ms, loaded, session.pid)
+
+    def _describe_exit(self, session):
+        message = f"winws завершился при запуске (код {session.exit_code})"
+        if session.tail:
+            message += ":\n" + "\n".join(session.tail)
+        return message
+
+    def stop_now(self, timeout=None):
+        """Завершает запущенный winws; возвращает True, если процесс остановлен"""
+        with self._lock:
+            session = self.session
+            if session is None:
+                return True
+            session.stopping = True
+
+        if timeout is None:
+            timeout = self.stop_timeout
+        process = session.process
+
+        try:
+            if self.backend.poll(process) is None:
+                self.backend.terminate(process)
+                if self.backend.wait(process, timeout) is None:
+                    print(f"winws не завершился за {timeout} с, принудительное завершение (PID: {session.pid})")
+                    self.backend.kill(process)
+                    if self.backend.wait(process, timeout) is None:
+                        print(f"Не удалось завершить winws (PID: {session.pid})")
+                        return False
+        except OSError as e:
+            # Процесс мог завершиться сам между poll и terminate
+            if self.backend.poll(process) is None:
+                print(f"Ошибка при завершении winws (PID: {session.pid}): {e}")
+                return False
+
+        with self._lock:
+            if self.session is session:
+                self.session = None
+        print(f"winws завершен (PID: {session.pid})")
+        return True
+
+    def _read_output(self, session, output):
+        """Читает вывод winws и ищет в нем признаки готовности"""
+        try:
+            for line in output:
+                line = line.rstrip()
+                if not line:
+                    continue
+                self.log.append(line)
+                session.tail.append(line)
+                if not session.ready.is_set() and is_ready_line(line):
+                    session.mark_ready()
+                loaded = parse_list_loaded(line)
+                if loaded is not None:
+                    session.mark_list_loaded(*loaded)
+        except (OSError, ValueError):
+            pass
+        finally:
+            session.output_done.set()
+
+    def _watch(self, session):
+        """Сообщает о самостоятельном завершении winws"""
+        session.exit_code = self.backend.wait(session.process)
+        # Процесс мог завершиться раньше, чем прочитаны его последние строки
+        session.output_done.wait(OUTPUT_DRAIN_TIMEOUT)
+        session.exited.set()
+        # Будим ожидание готовности, если процесс умер при запуске
+        was_ready = session.ready.is_set()
+        session.ready.set()
+        with self._lock:
+            if self.session is not session or session.stopping:
+                return
+            self.session = None
+        if was_ready:
+            print(f"winws завершился сам (код: {session.exit_code})")
+            self._notify("exited", session.exit_code)
+
+
+def is_ready_line(line):
+    """Проверяет, сообщает ли строка winws о запуске захвата пакетов"""
+    return any(marker in line for marker in READY_MARKERS)
+
+
+def parse_list_loaded(line):
+    """(путь, число записей) из строки winws о загрузке списка или None"""
+    match = LIST_LOADED_RE.search(line)
+    if match is None:
+        return None
+    return match.group(2), int(match.group(1))
+
+
+class ReadyStats:
+    """Время до готовности winws по каждой стратегии (utils/ready_times.json)"""
+
+    def __init__(self, path, keep=20):
+        self.path = path
+        self.keep = keep
+        self.samples = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.samples = json.load(f)
+        except (OSError, ValueError):
+            self.samples = {}
+
+    def record(self, name, ready_ms):
+        samples = self.samples.setdefault(name, [])
+        samples.append(ready_ms)
+        del samples[:-self.keep]
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.samples, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"Не удалось сохранить статистику запуска: {e}")
+
+    def median(self, name):
+        samples = sorted(self.samples.get(name, []))
+        if not samples:
+            return None
+        return samples[len(samples) // 2]
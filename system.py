@@ -0,0 +1,67 @@
+"""
+Системные функции Windows, общие для интерфейса и консольного режима (без Qt)
+"""
+
+import ctypes
+import os
+import signal
+import subprocess
+import sys
+
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+STILL_ACTIVE = 259
+
+
+def is_admin():
+    """Проверяет, запущено ли приложение с правами администратора"""
+    try:
+        return bool(ctypes.windll.shell32.IsUserAnAdmin())
+    except AttributeError:
+        return True
+
+
+def run_as_admin():
+    """Перезапускает приложение с запросом прав администратора (UAC)"""
+    if getattr(sys, 'frozen', False):
+        params = subprocess.list2cmdline(sys.argv[1:])
+    else:
+        params = subprocess.list2cmdline([os.path.abspath(sys.argv[0])] + sys.argv[1:])
+
+    result = ctypes.windll.shell32.ShellExecuteW(
+        None, "runas", sys.executable, params, os.getcwd(), 1
+    )
+    return result > 32
+
+
+def process_alive(pid):
+    """Проверяет, что процесс с таким PID еще работает"""
+    if not pid:
+        return False
+    if os.name == "nt":
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return False
+            return code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def terminate_process(pid):
+    """Завершает процесс по PID (на Windows - TerminateProcess); False, если его уже нет"""
+    try:
+        os.kill(pid, signal.SIGTERM)
+        return True
+    except (ProcessLookupError, PermissionError, OSError):
+        return False
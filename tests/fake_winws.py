@@ -0,0 +1,49 @@
+"""
+Заменитель winws для тестов супервизора: печатает те же строки, что и winws
+
+--hostlist=ФАЙЛ / --ipset=ФАЙЛ - списки; при изменении времени модификации
+файла печатается "Loaded N hosts from ФАЙЛ" (как winws при перечитывании).
+--no-reload - списки не перечитываются; --fail=КОД - завершиться до готовности.
+"""
+
+import os
+import sys
+import time
+
+
+def count_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def main(argv):
+    lists = {}
+    reload = True
+    for arg in argv:
+        name, _, value = arg.partition("=")
+        if name in ("--hostlist", "--ipset"):
+            lists[value] = ("hosts" if name == "--hostlist" else "ip/subnets", None)
+        elif name == "--no-reload":
+            reload = False
+        elif name == "--fail":
+            print("error opening windivert", flush=True)
+            return int(value)
+
+    for path, (kind, _) in list(lists.items()):
+        lists[path] = (kind, os.stat(path).st_mtime_ns)
+        print(f"Loaded {count_lines(path)} {kind} from {path}", flush=True)
+    print("windivert initialized. capture is started.", flush=True)
+
+    while True:
+        time.sleep(0.05)
+        if not reload:
+            continue
+        for path, (kind, mtime) in list(lists.items()):
+            current = os.stat(path).st_mtime_ns
+            if current != mtime:
+                lists[path] = (kind, current)
+                print(f"Loaded {count_lines(path)} {kind} from {path}", flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,119 @@
+import gzip
+import os
+import shutil
+
+import pytest
+
+from activity import ProfileActivity, analyze, format_report, local_minute, main
+from strategy import parse_strategy
+
+SEARCH = "desync profile search for tcp target=1.2.3.4:443 l7proto=tls ssid='' hostname='a.com'"
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "winws-debug.log")
+
+STRATEGY = (
+    'start "zapret" /min "%BIN%winws.exe" --wf-tcp=80,443 --wf-udp=443 ^\n'
+    '--filter-tcp=443 --hostlist-exclude="%LISTS%list-exclude.txt" --hostlist="%LISTS%list-general.txt" '
+    '--dpi-desync=fake --new ^\n'
+    '--filter-udp=443 --dpi-desync=fake --new ^\n'
+    '--filter-tcp=80 --dpi-desync=fake\n'
+)
+
+
+@pytest.fixture
+def profile(tmp_path):
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "lists").mkdir()
+    (tmp_path / "lists" / "list-general.txt").write_text("discord.com\ndiscord.gg\nyoutube.com\nunused.example\n")
+    (tmp_path / "lists" / "list-exclude.txt").write_text("status.discord.com\n")
+    (tmp_path / "general.bat").write_text(STRATEGY)
+    return parse_strategy(str(tmp_path / "general.bat"))
+
+
+def test_analyze_debug_log(profile):
+    # Журнал собран из строк форматов winws.exe (desync profile search, [список] include/exclude ...)
+    activity = analyze([FIXTURE], profile)
+
+    assert activity.events == 7
+    # Исключенный хост достался профилю 0 (пустой профиль по умолчанию), 8443 - не найден
+    assert activity.unmatched == 2
+    assert dict(activity.block_hits) == {0: 3, 1: 1, 2: 1}
+    # Совпавшая запись - положительная проверка включающего списка, а не исключающего
+    assert dict(activity.entry_hits[0]) == {"discord.com": 1, "youtube.com": 1, "discord.gg": 1}
+    assert activity.host_hits[1] == {"rr1.googlevideo.com": 1}
+    assert activity.prune_candidates(0) == ["unused.example"]
+    # Порт берется из target=, в том числе для IPv6
+    assert activity.port_hits[0] == {443: 3}
+    assert activity.port_hits[None] == {443: 1, 8443: 1}
+    assert activity.port_hits[2] == {80: 1}
+
+    rows = activity.snapshot()
+    assert [row["hits"] for row in rows] == [3, 1, 1]
+    assert rows[0]["last_hit"] == "00:01" and rows[1]["last_hit"] == "23:59"
+    assert rows[0]["summary"] == "tcp 443, hostlist=list-general.txt, hostlist-exclude=list-exclude.txt"
+    assert activity.summary().endswith("23:58-00:01")
+
+
+def test_rollup_crosses_midnight(profile):
+    activity = analyze([FIXTURE], profile)
+    assert activity.rollup() == [("23:58", 3), ("23:59", 1), ("00:00", 2), ("00:01", 1)]
+    assert activity.rollup(block=0, minutes=2) == [("00:00", 0), ("00:01", 1)]
+
+
+def test_gzip_log_and_report(profile, tmp_path):
+    path = str(tmp_path / "winws-debug.log.gz")
+    with open(FIXTURE, "rb") as source, gzip.open(path, "wb") as target:
+        shutil.copyfileobj(source, target)
+
+    report = format_report(analyze([path], profile), prune=True)
+    assert "Блок 1: 3 (tcp 443, hostlist=list-general.txt, hostlist-exclude=list-exclude.txt)" in report
+    assert "не совпали ни разу: 1 записей" in report
+    assert "    unused.example" in report
+    assert "без профиля, порты: 443 1, 8443 1" in report
+
+
+def test_rollup_keeps_only_last_day():
+    activity = ProfileActivity()
+
+    def hit(minute):
+        activity.feed(SEARCH, minute)
+        activity.feed("desync profile 1 matches", minute)
+
+    # 22:00, 23:59, затем следующие сутки: 00:00, 21:59, 22:00, 22:01
+    day = 24 * 60
+    for minute in (22 * 60, 23 * 60 + 59, day, day + 21 * 60 + 59, day + 22 * 60, day + 22 * 60 + 1):
+        hit(minute)
+
+    assert activity.rollup() == [("21:59", 1), ("22:00", 1), ("22:01", 1)]
+    assert [label for label, _ in activity.rollup(minutes=day)] == ["23:59", "00:00", "21:59", "22:00", "22:01"]
+    assert min(activity.minutes) > activity.last_at - day
+
+
+def test_feed_entry_uses_local_minute():
+    activity = ProfileActivity()
+    timestamp = 1_700_000_000
+    activity.feed_entry((timestamp, "winws", SEARCH))
+    activity.feed_entry((timestamp, "app", "desync profile 1 matches"))
+    activity.feed_entry((timestamp, "winws", "desync profile 1 matches"))
+    assert activity.block_hits == {0: 1}
+    assert list(activity.minutes) == [local_minute(timestamp)]
+
+
+def test_default_and_unknown_profiles_are_unmatched(profile):
+    activity = ProfileActivity(profile)
+    for number in (0, 1, 4, 3):
+        activity.feed(SEARCH)
+        activity.feed(f"desync profile {number} matches")
+    # 0 - профиль по умолчанию, 4 - больше числа блоков стратегии
+    assert activity.unmatched == 2
+    assert dict(activity.block_hits) == {0: 1, 2: 1}
+
+    activity = ProfileActivity()
+    activity.feed(SEARCH)
+    activity.feed("desync profile 0 matches")
+    assert activity.unmatched == 1 and not activity.block_hits
+
+
+def test_cli(capsys):
+    assert main([FIXTURE]) == 0
+    assert "Соединений: 7, без профиля: 2" in capsys.readouterr().out
+    assert main([]) == 2
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from catalog import StrategyCatalog, canonical_options, normalize_ports
+
+HEADER = 'start "zapret" /min "%BIN%winws.exe" '
+FIRST = (HEADER + '--wf-tcp=80,443 --wf-udp=443 ^\n'
+         '--filter-tcp=443,80 --hostlist="%LISTS%list-general.txt" --hostlist="%LISTS%list-exclude.txt" '
+         '--dpi-desync=fake --dpi-desync-repeats=6 --new ^\n'
+         '--filter-udp=443 --dpi-desync=fake\n')
+# Та же стратегия: другой порядок опций, портов и файлов hostlist
+REORDERED = (HEADER + '--wf-udp=443 --wf-tcp=443,80 ^\n'
+             '--dpi-desync-repeats=6 --hostlist="%LISTS%list-exclude.txt" --dpi-desync=fake '
+             '--filter-tcp=80,443 --hostlist="%LISTS%list-general.txt" --new ^\n'
+             '--dpi-desync=fake --filter-udp=443\n')
+OTHER = (HEADER + '--wf-tcp=80,443 ^\n'
+         '--filter-tcp=443 --dpi-desync=split --new ^\n'
+         '--filter-tcp=443 --dpi-desync=split --new ^\n'
+         '--filter-tcp=80 --dpi-desync=fake\n')
+
+
+@pytest.fixture
+def base_dir(tmp_path):
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "lists").mkdir()
+    (tmp_path / "utils").mkdir()
+    (tmp_path / "general.bat").write_text(FIRST)
+    (tmp_path / "general (ALT).bat").write_text(REORDERED)
+    (tmp_path / "general (ALT2).bat").write_text(OTHER)
+    # Повторный блок не меняет стратегию: первый такой же блок срабатывает раньше
+    (tmp_path / "general (ALT3).bat").write_text(OTHER.replace("--new ^\n--filter-tcp=443 --dpi-desync=split ", "", 1))
+    return tmp_path
+
+
+def catalog(base_dir):
+    catalog = StrategyCatalog(str(base_dir), str(base_dir / "utils" / "strategies.json"))
+    catalog.scan()
+    return catalog
+
+
+def test_normalize_ports():
+    assert normalize_ports("443,80,80, 1024-65535,50000") == "80,443,1024-65535,50000"
+    assert normalize_ports("443,%GameFilter%,80") == "80,443,%GameFilter%"
+
+
+def test_canonical_options():
+    options = [("dpi-desync", "fake"), ("hostlist", "b.txt"), ("filter-tcp", "443,80"),
+               ("dpi-desync", "split"), ("hostlist", "a.txt"), ("hostlist", "b.txt"), ("filter-tcp", "80")]
+    # Перезаписываемые опции - последнее значение, hostlist накапливается без повторов
+    assert canonical_options(options) == [("dpi-desync", "split"), ("filter-tcp", "80"),
+                                          ("hostlist", "a.txt"), ("hostlist", "b.txt")]
+    assert canonical_options([("wf-tcp", "443,80")]) == canonical_options([("wf-tcp", "80,443,443")])
+
+
+def test_duplicate_groups(base_dir):
+    strategies = catalog(base_dir)
+    groups = strategies.duplicate_groups()
+    assert [[entry.name for entry in group.entries] for group in groups] == [
+        ["general", "general (ALT)"], ["general (ALT2)", "general (ALT3)"]]
+    # Командные строки различаются, но не по существу
+    assert not groups[0].exact and not groups[1].exact
+    assert strategies.duplicates() == {"general (ALT)": "general", "general (ALT3)": "general (ALT2)"}
+    assert [profile.name for profile in strategies.unique()] == ["general", "general (ALT2)"]
+    assert strategies.diff("general", "ALT") == []
+    assert any(line.startswith("-  --dpi-desync=split") for line in strategies.diff("ALT2", "general"))
+
+
+def test_exact_copy(base_dir):
+    (base_dir / "general (ALT4).bat").write_text(FIRST)
+    strategies = catalog(base_dir)
+    assert strategies.duplicates()["general (ALT4)"] == "general"
+    assert strategies.get("ALT4").fingerprint == strategies.get("general").fingerprint
+
+
+def test_cache_reuse(base_dir):
+    assert catalog(base_dir).parsed == 4
+    assert catalog(base_dir).parsed == 0
+
+    # Другое mtime при том же содержимом: файл читается, но не разбирается
+    path = base_dir / "general (ALT).bat"
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    strategies = catalog(base_dir)
+    assert strategies.parsed == 0
+    assert strategies.duplicates()["general (ALT)"] == "general"
+    assert catalog(base_dir).parsed == 0
+
+    path.write_text(OTHER)
+    strategies = catalog(base_dir)
+    assert strategies.parsed == 1
+    # Оригинал группы - первая стратегия в естественном порядке
+    assert strategies.duplicates()["general (ALT2)"] == "general (ALT)"
+
+
+def test_cache_reset_by_game_filter(base_dir):
+    catalog(base_dir)
+    (base_dir / "utils" / "game_filter.enabled").write_text("")
+    assert catalog(base_dir).parsed == 4
@@ -0,0 +1,81 @@
+import ipaddress
+import random
+
+import pytest
+
+from cidr import CidrIndex, RangeSet, flatten
+
+
+def brute_force(networks, address):
+    """Самый длинный префикс, покрывающий адрес, перебором"""
+    best = None
+    for network in networks:
+        if address in network and (best is None or network.prefixlen > best.prefixlen):
+            best = network
+    return best
+
+
+def random_networks(rng, version, count):
+    bits = 32 if version == 4 else 128
+    # Все префиксы внутри одной /120 (/24 для IPv4), чтобы они часто вкладывались
+    base = (10 << 24) if version == 4 else (0x2001_0db8 << 96)
+    networks = set()
+    for _ in range(count):
+        prefix = rng.randint(bits - 8, bits - 2)
+        offset = rng.getrandbits(8) & ~((1 << (bits - prefix)) - 1)
+        networks.add(ipaddress.ip_network((base + offset, prefix)))
+    return base, list(networks)
+
+
+def test_nested_prefix_with_same_end():
+    index = CidrIndex([ipaddress.ip_network("0.0.0.64/26"), ipaddress.ip_network("0.0.0.96/27")])
+    assert index.lookup("0.0.0.96") == ipaddress.ip_network("0.0.0.96/27")
+    assert index.lookup("0.0.0.64") == ipaddress.ip_network("0.0.0.64/26")
+
+
+@pytest.mark.parametrize("version", [4, 6])
+def test_lookup_matches_brute_force(version):
+    rng = random.Random(version)
+    for _ in range(100):
+        base, networks = random_networks(rng, version, rng.randint(1, 20))
+        index = CidrIndex(networks)
+        addresses = [ipaddress.ip_address(base + offset) for offset in range(256)]
+        expected = [brute_force(networks, address) for address in addresses]
+        assert [index.lookup(address) for address in addresses] == expected
+        assert index.lookup_many([str(address) for address in addresses]) == expected
+
+
+@pytest.mark.parametrize("address", ["10.0.0.1", "0.0.0.0", "10.0.0.0", "010.0.0.1", "10.0.0.01",
+                                     "10.00.0.1", "1.2.3", "10.1", "1.2.3.4.5", "1.2.3.256",
+                                     " 10.0.0.1", "10.0.0.1 ", "0x0a.0.0.1", "::ffff:10.0.0.1"])
+def test_batch_and_single_lookup_agree(address):
+    index = CidrIndex([ipaddress.ip_network("10.0.0.0/8"), ipaddress.ip_network("::ffff:0:0/96")])
+    try:
+        expected = index.lookup(address)
+    except ValueError:
+        # Адрес, который не разбирает одиночный поиск, отвергается и в пакете
+        with pytest.raises(ValueError):
+            index.lookup_many([address])
+    else:
+        assert index.lookup_many([address]) == [expected]
+
+
+def test_flatten_skips_exact_duplicates():
+    starts, ends, ids = flatten([(0, 255, 0), (0, 255, 1), (16, 31, 2)])
+    assert list(zip(starts, ends, ids)) == [(0, 15, 0), (16, 31, 2), (32, 255, 0)]
+
+
+def test_range_set_matches_brute_force():
+    rng = random.Random(3)
+    ranges = RangeSet()
+    covered = set()
+    for _ in range(300):
+        start = rng.randrange(200)
+        end = start + rng.randrange(8)
+        expected = all(value in covered for value in range(start, end + 1))
+        # Соседние диапазоны слиты, поэтому покрытие совпадает с перебором
+        assert ranges.covers(start, end) == expected
+        ranges.add(start, end)
+        covered.update(range(start, end + 1))
+        assert all(a <= b for a, b in zip(ranges.starts, ranges.ends))
+        assert all(b + 1 < a for a, b in zip(ranges.starts[1:], ranges.ends))
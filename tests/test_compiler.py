@@ -0,0 +1,120 @@
+import ipaddress
+import os
+
+from cidr import coalesce
+from compiler import IPSET_NONE, ListCompiler, minimize_domains
+from strategy import parse_strategy
+
+STRATEGY = ('start "zapret" /min "%BIN%winws.exe" --wf-tcp=443 --filter-tcp=443 '
+            '--hostlist="%LISTS%list-general.txt" --dpi-desync=fake\n')
+
+
+def make_tree(tmp_path):
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "lists" / "subscriptions").mkdir(parents=True)
+    (tmp_path / "lists" / "list-general.txt").write_text("a.com\n")
+    (tmp_path / "general.bat").write_text(STRATEGY)
+    return parse_strategy(str(tmp_path / "general.bat"))
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().split()
+
+
+def networks(*texts):
+    return [ipaddress.ip_network(text) for text in texts]
+
+
+def test_refresh_finds_manifest_for_subscription_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    profile = make_tree(tmp_path)
+    extras = {}
+    compiler = ListCompiler(extras=lambda: extras)
+    _, jobs = compiler.plan(profile)
+    compiler.build(jobs)
+
+    # Подписка добавлена после подключения: кэш лежит в lists/subscriptions
+    cache = tmp_path / "lists" / "subscriptions" / "hostlist-1.txt"
+    cache.write_text("b.com\nc.com\n")
+    extras[os.path.abspath(tmp_path / "lists" / "list-general.txt")] = [str(cache)]
+
+    results = compiler.refresh(str(cache))
+    assert [result.after for result in results] == [3]
+    assert read_lines(jobs[0].output) == ["a.com", "b.com", "c.com"]
+
+    # Перезапуск с заданиями, составленными до подписки, не откатывает список
+    assert [result.cached for result in compiler.build(jobs)] == [True]
+    assert read_lines(jobs[0].output) == ["a.com", "b.com", "c.com"]
+
+
+def test_refresh_without_plan_uses_default_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    profile = make_tree(tmp_path)
+    cache = tmp_path / "lists" / "subscriptions" / "hostlist-1.txt"
+    cache.write_text("b.com\n")
+    extras = {os.path.abspath(tmp_path / "lists" / "list-general.txt"): [str(cache)]}
+    _, jobs = ListCompiler(extras=lambda: extras).compile_profile(profile)
+
+    cache.write_text("b.com\nd.com\n")
+    results = ListCompiler(extras=lambda: extras).refresh(str(cache))
+    assert [result.after for result in results] == [3]
+    assert read_lines(jobs[0].output) == ["a.com", "b.com", "d.com"]
+
+
+def test_minimize_domains():
+    domains = ["a.com", "www.a.com", "b.a.com", "a.com", "^x.org", "x.org", "^a.com",
+               "c.net", "sub.c.net", "e.org", "w.e.org", "^f.org", "g.org"]
+    lines, removed = minimize_domains(domains, ["c.net", "^e.org", "^f.org", "h.g.org"])
+    # Родитель поглощает поддомены и ^-записи; c.net исключен вместе с поддоменами
+    assert lines == ["a.com", "x.org", "e.org", "g.org"]
+    assert removed == len(domains) - 4
+    assert minimize_domains(["^a.com", "^a.com", "b.com"]) == (["^a.com", "b.com"], 1)
+
+
+def test_coalesce():
+    assert coalesce(networks("10.0.0.0/25", "10.0.0.128/25", "10.1.0.0/16", "10.1.5.0/24",
+                             "2001:db8::/33", "2001:db8:8000::/33")) == \
+        networks("10.0.0.0/24", "10.1.0.0/16", "2001:db8::/32")
+    # Исключение вырезает дыру, оставшееся покрывается минимумом префиксов
+    assert coalesce(networks("10.0.0.0/24"), networks("10.0.0.64/26", "192.168.0.0/16")) == \
+        networks("10.0.0.0/26", "10.0.0.128/25")
+    assert coalesce(networks("10.0.0.0/24"), networks("10.0.0.0/8")) == []
+
+
+def test_build_applies_excludes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "bin").mkdir()
+    lists = tmp_path / "lists"
+    lists.mkdir()
+    (lists / "list-general.txt").write_text("a.com\nwww.a.com\nb.com\nc.com\n")
+    (lists / "list-exclude.txt").write_text("b.com\n")
+    (lists / "ipset-all.txt").write_text("10.0.0.0/25\n10.0.0.128/25\n192.168.0.0/24\n")
+    (lists / "ipset-exclude.txt").write_text("10.0.0.64/26\n192.168.0.0/16\n")
+    (tmp_path / "general.bat").write_text(
+        'start "zapret" /min "%BIN%winws.exe" --wf-tcp=443 --filter-tcp=443 '
+        '--hostlist-exclude="%LISTS%list-exclude.txt" --hostlist="%LISTS%list-general.txt" --new '
+        '--ipset-exclude="%LISTS%ipset-exclude.txt" --ipset="%LISTS%ipset-all.txt" --dpi-desync=fake\n')
+    compiler = ListCompiler()
+    profile, jobs = compiler.plan(parse_strategy(str(tmp_path / "general.bat")))
+    results = {os.path.basename(result.source): (result.before, result.after) for result in compiler.build(jobs)}
+
+    hostlist, ipset = profile.blocks[0].get("hostlist"), profile.blocks[1].get("ipset")
+    assert read_lines(hostlist) == ["a.com", "c.com"]
+    assert read_lines(ipset) == ["10.0.0.0/26", "10.0.0.128/25"]
+    assert results["list-general.txt"] == (4, 2) and results["ipset-all.txt"] == (3, 2)
+    # Исключения остаются в профиле: их применяет winws
+    assert profile.blocks[0].get("hostlist-exclude").endswith("list-exclude.txt")
+
+
+def test_all_addresses_excluded_keeps_none_mode(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "lists").mkdir()
+    (tmp_path / "lists" / "ipset-all.txt").write_text("10.0.0.0/24\n")
+    (tmp_path / "lists" / "ipset-exclude.txt").write_text("10.0.0.0/8\n")
+    (tmp_path / "general.bat").write_text(
+        'start "zapret" /min "%BIN%winws.exe" --wf-tcp=443 --filter-tcp=443 '
+        '--ipset-exclude="%LISTS%ipset-exclude.txt" --ipset="%LISTS%ipset-all.txt" --dpi-desync=fake\n')
+    profile, _ = ListCompiler().compile_profile(parse_strategy(str(tmp_path / "general.bat")))
+    assert read_lines(profile.blocks[0].get("ipset")) == [IPSET_NONE]
@@ -0,0 +1,89 @@
+import json
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from crystaldpi import CliError, ControlServer, read_state, request, stop_instance
+
+
+@pytest.fixture
+def child():
+    """Процесс, изображающий фоновый экземпляр; завершение сразу собирается"""
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    threading.Thread(target=process.wait, daemon=True).start()
+    yield process
+    process.kill()
+
+
+def write_state(tmp_path, state):
+    path = tmp_path / "crystaldpi.json"
+    path.write_text(json.dumps(state), encoding="utf-8")
+    return str(path)
+
+
+def test_read_state_removes_stale_file(tmp_path, child):
+    path = write_state(tmp_path, {"pid": child.pid, "strategy": "ALT"})
+    assert read_state(path)["strategy"] == "ALT"
+
+    child.kill()
+    child.wait()
+    assert read_state(path) is None
+    assert not (tmp_path / "crystaldpi.json").exists()
+    assert read_state(path) is None
+
+
+def test_stop_instance_uses_control_socket(child):
+    commands = []
+
+    def handle(command):
+        commands.append(command)
+        if command == "stop":
+            child.terminate()
+        return {"ok": True, "strategy": "ALT"}
+
+    server = ControlServer(handle)
+    try:
+        state = {"pid": child.pid, "winws_pid": None, "strategy": "ALT",
+                 "port": server.port, "token": server.token}
+        assert request(state, "status")["strategy"] == "ALT"
+        assert request(dict(state, token="wrong"), "status") == {"error": "неверный токен"}
+        stop_instance(state, timeout=5)
+    finally:
+        server.close()
+    assert commands == ["status", "stop"]
+    assert child.poll() is not None
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_control_server_close_stops_listening():
+    server = ControlServer(lambda command: {"ok": True})
+    server.close()
+    server._thread.join(1)
+    assert not server._thread.is_alive()
+
+
+def test_stop_instance_terminates_silent_process(child):
+    # Сокет управления не отвечает: процесс завершается принудительно
+    state = {"pid": child.pid, "winws_pid": child.pid, "strategy": "ALT",
+             "port": closed_port(), "token": "token"}
+    stop_instance(state, timeout=5)
+    assert child.poll() is not None
+
+
+def test_stop_instance_reports_stuck_process(child):
+    server = ControlServer(lambda command: {"ok": True})
+    try:
+        state = {"pid": child.pid, "winws_pid": None, "strategy": "ALT",
+                 "port": server.port, "token": server.token}
+        with pytest.raises(CliError, match="не остановился"):
+            stop_instance(state, timeout=0.3)
+    finally:
+        server.close()
@@ -0,0 +1,105 @@
+import os
+
+from hosts import BACKUP_SUFFIX, BEGIN_MARKER, END_MARKER, HostsFile
+
+UPSTREAM = {"discord.gg": "1.2.3.4", "discord.media": "5.6.7.8"}
+
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_apply_is_idempotent(tmp_path):
+    path = str(tmp_path / "hosts")
+    original = b"127.0.0.1 localhost\r\n# comment\r\n"
+    write(path, original)
+
+    diff, changed = HostsFile(path).apply(UPSTREAM)
+    assert changed and len(diff.missing) == 2
+    data = read(path)
+    assert data == original + (f"\r\n{BEGIN_MARKER}\r\n1.2.3.4 discord.gg\r\n5.6.7.8 discord.media\r\n"
+                               f"{END_MARKER}\r\n").encode("ascii")
+    assert read(path + BACKUP_SUFFIX) == original
+
+    diff, changed = HostsFile(path).apply(UPSTREAM)
+    assert not changed and diff.up_to_date
+    assert read(path) == data
+
+
+def test_no_block_and_nothing_missing_leaves_file_alone(tmp_path):
+    path = str(tmp_path / "hosts")
+    original = b"127.0.0.1 localhost\n1.2.3.4 discord.gg\n5.6.7.8 discord.media\n\n"
+    write(path, original)
+
+    diff, changed = HostsFile(path).apply(UPSTREAM)
+    assert not changed
+    assert sorted(diff.unmanaged) == ["discord.gg", "discord.media"]
+    assert read(path) == original
+    assert not os.path.exists(path + BACKUP_SUFFIX)
+
+
+def test_block_is_updated_in_place(tmp_path):
+    path = str(tmp_path / "hosts")
+    write(path, ("127.0.0.1 localhost\n"
+                 f"{BEGIN_MARKER}\n1.1.1.1 discord.gg\n9.9.9.9 old.example\n{END_MARKER}\n"
+                 "10.0.0.1 router.lan\n").encode("ascii"))
+
+    diff, changed = HostsFile(path).apply(UPSTREAM)
+    assert changed
+    assert diff.changed == [("discord.gg", "1.1.1.1", "1.2.3.4")]
+    assert diff.stale == [("old.example", "9.9.9.9")]
+    assert read(path).decode("ascii") == (
+        "127.0.0.1 localhost\n"
+        f"{BEGIN_MARKER}\n1.2.3.4 discord.gg\n5.6.7.8 discord.media\n{END_MARKER}\n"
+        "10.0.0.1 router.lan\n")
+
+
+def test_conflicting_entries_outside_block_are_kept(tmp_path):
+    path = str(tmp_path / "hosts")
+    write(path, b"0.0.0.0 discord.gg\n")
+
+    diff, changed = HostsFile(path).apply(UPSTREAM)
+    assert changed
+    assert diff.conflicting == [("discord.gg", "0.0.0.0", "1.2.3.4")]
+    hosts = HostsFile(path)
+    assert hosts.lines[0] == "0.0.0.0 discord.gg"
+    assert hosts.block == ["5.6.7.8 discord.media"]
+
+
+def test_remove_restores_original_bytes(tmp_path):
+    path = str(tmp_path / "hosts")
+    # Байты в кодировке ANSI вне блока сохраняются как есть
+    original = "127.0.0.1 localhost # локальный\r\n".encode("cp1251")
+    write(path, original)
+
+    hosts = HostsFile(path)
+    hosts.apply(UPSTREAM)
+    assert hosts.remove()
+    assert read(path) == original
+    assert not HostsFile(path).remove()
+
+
+def test_file_without_newline_uses_system_newline(tmp_path):
+    path = str(tmp_path / "hosts")
+    write(path, b"127.0.0.1 localhost")
+
+    HostsFile(path).apply(UPSTREAM)
+    text = read(path).decode("ascii")
+    assert text.startswith("127.0.0.1 localhost" + os.linesep)
+    assert text.endswith(END_MARKER + os.linesep)
+
+
+def test_dry_run_does_not_write(tmp_path):
+    path = str(tmp_path / "hosts")
+    write(path, b"127.0.0.1 localhost\n")
+
+    diff, changed = HostsFile(path).apply(UPSTREAM, dry_run=True)
+    assert changed and len(diff.missing) == 2
+    assert read(path) == b"127.0.0.1 localhost\n"
+    assert not os.path.exists(path + BACKUP_SUFFIX)
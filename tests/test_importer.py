@@ -0,0 +1,40 @@
+from importer import BulkImporter
+
+
+def run(existing, lines, kind="ipset"):
+    return BulkImporter(existing, kind).run(lines)
+
+
+def test_network_covered_by_broader_existing_prefix():
+    # Самый специфичный префикс адреса - /30, но /16 покрыта /8
+    report = run(["10.0.0.0/8", "10.0.0.0/30"], ["10.0.0.0/16", "10.0.0.1", "11.0.0.0/16"])
+    assert report.added == ["11.0.0.0/16"]
+    assert report.covered == 2
+
+
+def test_network_covered_by_merged_neighbours():
+    report = run(["10.0.0.0/9", "10.128.0.0/9"], ["10.0.0.0/8", "2001:db8::/48"])
+    assert report.added == ["2001:db8::/48"]
+    assert report.covered == 1
+
+
+def test_networks_in_same_import_cover_each_other():
+    # Подсеть идет раньше своей родительской сети - отсекается все равно
+    report = run([], ["11.1.0.0/16", "11.0.0.0/8", "11.2.3.4", "12.0.0.0/24", "2001:db8:1::/48",
+                      "2001:db8::/32"])
+    assert report.added == ["11.0.0.0/8", "12.0.0.0/24", "2001:db8::/32"]
+    assert report.covered == 3
+
+
+def test_network_duplicates_and_partial_overlap():
+    report = run(["192.0.2.1/32", "10.0.0.0/24"], ["192.0.2.1", "10.0.0.0/23"])
+    assert report.duplicates == 1
+    # /23 покрыта лишь наполовину - добавляется
+    assert report.added == ["10.0.0.0/23"]
+
+
+def test_domains_covered_by_parent():
+    report = run(["discord.com"], ["cdn.discord.com", "discord.gg", "media.discord.gg", "new.example"],
+                 kind="hostlist")
+    assert report.added == ["discord.gg", "new.example"]
+    assert report.covered == 2
@@ -0,0 +1,167 @@
+import gzip
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from compiler import IPSET_NONE
+from ipset import (MODE_ANY, MODE_LOADED, MODE_NONE, DownloadError, IpsetError, IpsetManager,
+                   fetch)
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+BODY = b"1.1.1.0/24\n8.8.8.0/24\n2001:db8::/32\n"
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Ответы по пути запроса; тело можно отдать короче заявленного Content-Length"""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if self.path == "/missing":
+            self.send_error(404)
+            return
+
+        body = self.server.body
+        headers = {"ETag": ETAG, "Last-Modified": LAST_MODIFIED}
+        if self.path.startswith("/gzip"):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        length = len(body)
+        if self.path.endswith("/short"):
+            # Соединение рвется посреди тела
+            body = body[:len(body) // 2]
+        if self.path.endswith("/truncated"):
+            # Без Content-Length: конец тела - закрытие соединения
+            body = body[:len(body) // 2]
+            length = None
+
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if length is not None:
+            self.send_header("Content-Length", str(length))
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.requests = []
+    server.body = BODY
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_plain(server, tmp_path):
+    temp_path = str(tmp_path / "sub" / "ipset.download")
+    download = fetch(server.url + "/list", temp_path)
+    with open(temp_path, "rb") as f:
+        assert f.read() == BODY
+    assert download.size == len(BODY)
+    assert download.etag == ETAG and download.last_modified == LAST_MODIFIED
+    assert server.requests[0][1]["Accept-Encoding"] == "gzip"
+
+
+def test_fetch_not_modified(server, tmp_path):
+    temp_path = str(tmp_path / "ipset.download")
+    assert fetch(server.url + "/list", temp_path, etag=ETAG, last_modified=LAST_MODIFIED) is None
+    assert not os.path.exists(temp_path)
+    headers = server.requests[0][1]
+    assert headers["If-None-Match"] == ETAG
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+
+
+def test_fetch_gzip(server, tmp_path):
+    server.body = BODY * 1000
+    temp_path = str(tmp_path / "ipset.download")
+    download = fetch(server.url + "/gzip", temp_path)
+    with open(temp_path, "rb") as f:
+        assert f.read() == server.body
+    # size - полученные (сжатые) байты
+    assert download.size == len(gzip.compress(server.body))
+    assert download.size < len(server.body)
+
+
+@pytest.mark.parametrize("path", ["/short", "/gzip/short", "/gzip/truncated"])
+def test_fetch_short_body(server, tmp_path, path):
+    server.body = BODY * 1000
+    temp_path = str(tmp_path / "ipset.download")
+    with pytest.raises(DownloadError, match="загрузка прервана"):
+        fetch(server.url + path, temp_path)
+    assert not os.path.exists(temp_path)
+
+
+def test_fetch_http_error(server, tmp_path):
+    with pytest.raises(DownloadError, match="404"):
+        fetch(server.url + "/missing", str(tmp_path / "ipset.download"))
+
+
+def test_fetch_cancelled(server, tmp_path):
+    temp_path = str(tmp_path / "ipset.download")
+    with pytest.raises(DownloadError, match="отменена"):
+        fetch(server.url + "/list", temp_path, should_stop=lambda: True)
+    assert not os.path.exists(temp_path)
+
+
+def loaded_manager(server, tmp_path):
+    # Без файла списка режим - "любой адрес", загрузка пошла бы в резервную копию
+    path = tmp_path / "ipset-all.txt"
+    path.write_text("9.9.9.0/24\n")
+    return IpsetManager(str(path), url=server.url + "/list")
+
+
+def test_update_is_conditional_and_keeps_list_on_error(server, tmp_path):
+    manager = loaded_manager(server, tmp_path)
+    path = manager.path
+    result = manager.update()
+    assert result.modified and result.total == 3
+    assert (result.added, result.removed) == (3, 1)
+    assert manager.mode() == MODE_LOADED
+
+    # Второй запрос идет с ETag и получает 304
+    assert not manager.update().modified
+    assert server.requests[-1][1]["If-None-Match"] == ETAG
+
+    manager.url = server.url + "/short"
+    with pytest.raises(DownloadError):
+        manager.update(force=True)
+    with open(path, "rb") as f:
+        assert f.read() == BODY
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".download")] == []
+
+
+def test_update_rejects_invalid_lines(server, tmp_path):
+    server.body = b"1.1.1.0/24\nnot-a-network\n"
+    manager = loaded_manager(server, tmp_path)
+    with pytest.raises(IpsetError, match="неверных строк: 1"):
+        manager.update()
+    with open(manager.path, encoding="ascii") as f:
+        assert f.read() == "9.9.9.0/24\n"
+
+
+def test_switch_cycles_modes(server, tmp_path):
+    manager = loaded_manager(server, tmp_path)
+    manager.update()
+    assert manager.switch() == MODE_NONE
+    with open(manager.path, encoding="ascii") as f:
+        assert f.read().strip() == IPSET_NONE
+    assert manager.switch() == MODE_ANY
+    assert os.path.getsize(manager.path) == 0
+    assert manager.switch() == MODE_LOADED
+    with open(manager.path, "rb") as f:
+        assert f.read() == BODY
@@ -0,0 +1,210 @@
+import asyncio
+import datetime
+import ipaddress
+import socket
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from probe import Prober, Target, parse_targets, percentile, run_sweep, summarize
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.server.requests.append((self.path, self.headers.get("Host"), self.headers.get("User-Agent")))
+        self.send_response(404 if self.path == "/missing" else 200)
+        self.send_header("Content-Length", "0")
+        if self.path == "/close":
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(ssl_context=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.requests = []
+    if ssl_context is not None:
+        server.socket = ssl_context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def http_server():
+    server = serve()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def certificate(tmp_path):
+    """Самоподписанный сертификат для 127.0.0.1: (сертификат, ключ)"""
+    x509 = pytest.importorskip("cryptography.x509")
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]),
+                           critical=False)
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .sign(key, hashes.SHA256()))
+    cert_path = tmp_path / "cert.pem"
+    key_path = tmp_path / "key.pem"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                           serialization.NoEncryption()))
+    return str(cert_path), str(key_path)
+
+
+@pytest.fixture
+def https_server(certificate):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(*certificate)
+    server = serve(context)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def silent_server():
+    """Принимает соединения и ничего не отвечает"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    accepted = []
+
+    def run():
+        while True:
+            try:
+                accepted.append(listener.accept()[0])
+            except OSError:
+                return
+
+    threading.Thread(target=run, daemon=True).start()
+    yield listener.getsockname()[1]
+    listener.close()
+    for connection in accepted:
+        connection.close()
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def url(server, path="/", scheme="http"):
+    return f"{scheme}://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def run(coroutine_factory, **kwargs):
+    async def main():
+        async with Prober(**kwargs) as prober:
+            return await coroutine_factory(prober)
+    return asyncio.run(main())
+
+
+def test_http_keep_alive_reuses_connection(http_server):
+    target = Target("local", url=url(http_server, "/generate_204?x=1"))
+
+    async def probe_twice(prober):
+        return [await prober.probe(target), await prober.probe(target)]
+
+    first, second = run(probe_twice)
+    assert first.ok and first.status == 200
+    assert not first.reused and first.dns_ms is not None and first.connect_ms is not None
+    assert second.ok and second.reused and second.connect_ms is None
+    port = http_server.server_address[1]
+    assert http_server.requests[0] == ("/generate_204?x=1", f"127.0.0.1:{port}", "CrystalDPI")
+
+
+def test_connection_close_is_not_pooled(http_server):
+    target = Target("local", url=url(http_server, "/close"))
+
+    async def probe_twice(prober):
+        return [await prober.probe(target), await prober.probe(target)]
+
+    first, second = run(probe_twice)
+    assert first.ok and second.ok
+    assert not second.reused
+
+
+def test_any_http_status_counts_as_reachable(http_server):
+    result = run(lambda prober: prober.probe(Target("missing", url=url(http_server, "/missing"))))
+    assert result.ok and result.status == 404
+
+
+def test_https_measures_tls(https_server, certificate):
+    context = ssl.create_default_context(cafile=certificate[0])
+    result = run(lambda prober: prober.probe(Target("tls", url=url(https_server, scheme="https"))),
+                 ssl_context=context)
+    assert result.ok, result.error
+    assert result.status == 200
+    assert result.tls_ms is not None
+
+
+def test_untrusted_certificate_is_tls_error(https_server):
+    result = run(lambda prober: prober.probe(Target("tls", url=url(https_server, scheme="https"))))
+    assert not result.ok
+    assert result.error.startswith("tls:")
+
+
+def test_silent_server_times_out(silent_server):
+    target = Target("silent", url=f"http://127.0.0.1:{silent_server}/")
+    result = run(lambda prober: prober.probe(target), timeouts={"silent": 0.3})
+    assert not result.ok and result.error == "timeout"
+    assert result.total_ms < 2000
+
+
+def test_refused_connection_fails(http_server):
+    results = run_sweep([Target("closed", url=f"http://127.0.0.1:{closed_port()}/"),
+                         Target("open", url=url(http_server))], timeout=2)
+    assert [result.name for result in results] == ["closed", "open"]
+    assert not results[0].ok and results[0].error
+    assert results[1].ok
+
+
+def test_ping_uses_first_open_port(http_server):
+    port = http_server.server_address[1]
+    result = run(lambda prober: prober.probe(Target("ping", ping_host="127.0.0.1")),
+                 ping_ports=(closed_port(), port))
+    assert result.ok and result.connect_ms is not None
+
+    result = run(lambda prober: prober.probe(Target("ping", ping_host="127.0.0.1")),
+                 ping_ports=(closed_port(),))
+    assert not result.ok
+
+
+def test_parse_targets(tmp_path):
+    path = tmp_path / "targets.txt"
+    path.write_text('# comment\nDiscord = "https://discord.com"\nDNS = "PING:1.1.1.1"\n'
+                    'Discord = "https://discord.gg/app"\nbroken line\n', encoding="utf-8")
+    targets = parse_targets(str(path))
+    assert [(t.name, t.kind) for t in targets] == [("Discord", "http"), ("DNS", "ping")]
+    assert targets[0].host == "discord.gg" and targets[0].port == 443 and targets[0].path == "/app"
+    assert targets[1].ping_host == "1.1.1.1"
+
+
+def test_summarize():
+    assert percentile([5, None, 1, 3], 0.5) == 3
+    assert percentile([], 0.5) is None
+    results = run_sweep([])
+    assert summarize(results)["success_rate"] == 0.0
@@ -0,0 +1,181 @@
+import io
+import socket
+import struct
+
+import pytest
+
+from replay import (CaptureError, CaptureReplay, client_hello_sni, quic_crypto_frames,
+                    quic_initial_header, quic_initial_keys)
+
+CLIENT = socket.inet_aton("192.168.1.10")
+SERVER = socket.inet_aton("203.0.113.5")
+SERVER_IP = "203.0.113.5"
+
+# Начальные ключи клиента из RFC 9001 (приложение A.1) и RFC 9369 (приложение A.1)
+RFC_DCID = bytes.fromhex("8394c8f03e515708")
+RFC_KEYS = {
+    0x00000001: ("1f369613dd76d5467730efcbe3b1a22d", "fa044b2f42a3fd3b46fb255c",
+                 "9f50449e04a0e810283a1e9933adedd2"),
+    0x6B3343CF: ("8b1a0bc121284290a29e0971b5cd045d", "91f73e2351d8fa91660e909f",
+                 "45b95e15235d6f45a6b19cbcb0294ba9"),
+}
+
+
+def client_hello(host, padding=600):
+    """Сообщение ClientHello (с заголовком рукопожатия) с SNI и расширением padding"""
+    name = host.encode()
+    server_name = struct.pack(">HBH", len(name) + 3, 0, len(name)) + name
+    extensions = (struct.pack(">HH", 0, len(server_name)) + server_name
+                  + struct.pack(">HH", 0x15, padding) + bytes(padding))
+    body = (b"\x03\x03" + bytes(32) + b"\x00" + b"\x00\x02\x13\x01" + b"\x01\x00"
+            + struct.pack(">H", len(extensions)) + extensions)
+    return b"\x01" + len(body).to_bytes(3, "big") + body
+
+
+def tls_record(message):
+    return b"\x16\x03\x01" + struct.pack(">H", len(message)) + message
+
+
+def ipv4(protocol, payload, source=CLIENT, destination=SERVER):
+    header = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 20 + len(payload), 0, 0, 64, protocol, 0,
+                         source, destination)
+    return header + payload
+
+
+def ethernet(packet):
+    return bytes(6) + bytes(6) + b"\x08\x00" + packet
+
+
+def tcp(seq, payload=b"", flags=0x18, sport=50000, dport=443):
+    return ipv4(6, struct.pack(">HHIIBBHHH", sport, dport, seq, 0, 0x50, flags, 65535, 0, 0) + payload)
+
+
+def udp(payload, sport=50001, dport=443):
+    return ipv4(17, struct.pack(">HHHH", sport, dport, 8 + len(payload), 0) + payload)
+
+
+def quic_varint(value):
+    return struct.pack(">H", 0x4000 | value)
+
+
+def crypto_frame(offset, data):
+    return b"\x06" + quic_varint(offset) + quic_varint(len(data)) + data
+
+
+def quic_initial(version, dcid, pn, frames):
+    """Клиентский Initial-пакет: шифрование и защита заголовка по RFC 9001 (раздел 5)"""
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    key, iv, hp = quic_initial_keys(version, dcid)
+    # Клиент дополняет Initial кадрами PADDING
+    plaintext = frames + bytes(max(0, 1100 - len(frames)))
+    packet_type = 1 if version == 0x6B3343CF else 0
+    pn_bytes = struct.pack(">H", pn)
+    header = (bytes([0xC0 | (packet_type << 4) | (len(pn_bytes) - 1)]) + struct.pack(">I", version)
+              + bytes([len(dcid)]) + dcid + b"\x00" + b"\x00"
+              + quic_varint(len(pn_bytes) + len(plaintext) + 16) + pn_bytes)
+    nonce = bytearray(iv)
+    for i, b in enumerate(pn_bytes):
+        nonce[12 - len(pn_bytes) + i] ^= b
+    packet = bytearray(header + AESGCM(key).encrypt(bytes(nonce), plaintext, header))
+
+    pn_offset = len(header) - len(pn_bytes)
+    sample = bytes(packet[pn_offset + 4:pn_offset + 20])
+    encryptor = Cipher(algorithms.AES(hp), modes.ECB()).encryptor()
+    mask = encryptor.update(sample) + encryptor.finalize()
+    packet[0] ^= mask[0] & 0x0F
+    for i in range(len(pn_bytes)):
+        packet[pn_offset + i] ^= mask[1 + i]
+    return bytes(packet)
+
+
+def pcap(frames):
+    data = struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1)
+    for frame in frames:
+        data += struct.pack("<IIII", 0, 0, len(frame), len(frame)) + frame
+    return data
+
+
+def pcapng(frames):
+    def block(block_type, body):
+        body += bytes(-len(body) % 4)
+        return struct.pack("<II", block_type, 12 + len(body)) + body + struct.pack("<I", 12 + len(body))
+
+    data = block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1))
+    data += block(1, struct.pack("<HHI", 1, 0, 65535))
+    for frame in frames:
+        data += block(6, struct.pack("<IIIII", 0, 0, 0, len(frame), len(frame)) + frame)
+    return data
+
+
+def capture_frames():
+    """TCP ClientHello на трех сегментах (seq переходит через 2^32) и QUIC с кадрами CRYPTO не по порядку"""
+    record = tls_record(client_hello("split.example.com"))
+    first, second, third = record[:100], record[100:300], record[300:]
+    # После второго сегмента номер последовательности переходит через 2^32
+    seq = (0xFFFFFFFF - len(first) - 100) & 0xFFFFFFFF
+    frames = [
+        tcp(seq - 1, flags=0x02),
+        tcp(seq, first),
+        tcp(seq + len(first), second),
+        tcp((seq + len(first) + len(second)) & 0xFFFFFFFF, third),
+    ]
+
+    dcid = bytes.fromhex("0011223344556677")
+    hello = client_hello("quic.example.com")
+    # Вторая половина ClientHello приходит в первом пакете
+    frames.append(udp(quic_initial(1, dcid, 0, crypto_frame(400, hello[400:]))))
+    frames.append(udp(quic_initial(1, dcid, 1, crypto_frame(0, hello[:400]))))
+    return [ethernet(frame) for frame in frames]
+
+
+def run(data):
+    return CaptureReplay().run(io.BytesIO(data))
+
+
+@pytest.mark.parametrize("version", sorted(RFC_KEYS))
+def test_quic_initial_keys_match_rfc(version):
+    key, iv, hp = quic_initial_keys(version, RFC_DCID)
+    assert (key.hex(), iv.hex(), hp.hex()) == RFC_KEYS[version]
+
+
+@pytest.mark.parametrize("version", sorted(RFC_KEYS))
+def test_quic_initial_decrypts_crypto_frames(version):
+    pytest.importorskip("cryptography")
+    from replay import quic_decrypt_initial
+
+    hello = client_hello("v.example.com")
+    packet = quic_initial(version, RFC_DCID, 7, crypto_frame(0, hello))
+    header = quic_initial_header(packet)
+    assert header[0] == version and bytes(header[1]) == RFC_DCID
+    frames = quic_decrypt_initial(packet, quic_initial_keys(version, RFC_DCID), header)
+    [(start, data)] = quic_crypto_frames(frames)
+    assert start == 0 and client_hello_sni(data) == "v.example.com"
+
+
+@pytest.mark.parametrize("writer", [pcap, pcapng])
+def test_split_client_hello(writer):
+    pytest.importorskip("cryptography")
+    stats = run(writer(capture_frames()))
+    assert stats.packets == 6
+    assert (stats.tcp_flows, stats.udp_flows, stats.tls, stats.quic) == (1, 1, 1, 1)
+    assert stats.connections == {
+        ("split.example.com", SERVER_IP, 443, "tcp", "tls"): 1,
+        ("quic.example.com", SERVER_IP, 443, "udp", "quic"): 1,
+    }
+
+
+@pytest.mark.parametrize("writer", [pcap, pcapng])
+def test_truncated_capture(writer, capsys):
+    data = writer([ethernet(tcp(1, flags=0x02)), ethernet(tcp(2, tls_record(client_hello("cut.example.com"))))])
+    stats = run(data[:-50])
+    # Оборванный последний пакет пропускается, соединение остается без имени хоста
+    assert stats.packets == 1
+    assert stats.connections == {(None, SERVER_IP, 443, "tcp", None): 1}
+    assert "обрывается" in capsys.readouterr().out
+
+
+def test_unknown_format():
+    with pytest.raises(CaptureError):
+        run(b"not a capture file")
@@ -0,0 +1,100 @@
+import pytest
+
+from router import PortSet, Router, parse_query
+from strategy import parse_strategy
+
+STRATEGY = (
+    'start "zapret" /min "%BIN%winws.exe" --wf-tcp=80,443,2053 --wf-udp=443,50000-50100 ^\n'
+    '--filter-udp=50000-50100 --filter-l7=discord,stun --dpi-desync=fake --new ^\n'
+    '--filter-tcp=443 --hostlist-exclude="%LISTS%list-exclude.txt" --hostlist="%LISTS%list-general.txt" '
+    '--dpi-desync=fake --new ^\n'
+    '--filter-tcp=443,2053 --ipset="%LISTS%ipset-all.txt" --dpi-desync=fake --new ^\n'
+    '--filter-tcp=80 --ipset="%LISTS%ipset-empty.txt" --dpi-desync=fake\n'
+)
+
+# Запрос -> (блок или None, перехватывается ли)
+EXPECTED = {
+    "www.youtube.com:443": (1, True),
+    # hostlist-exclude проверяется раньше hostlist: хост уходит в блок с ipset
+    "status.discord.com@104.16.1.1:443": (2, True),
+    "status.discord.com:443": (None, True),
+    "discord.com@104.16.1.1:443": (1, True),
+    "104.16.1.1:2053": (2, True),
+    "1.2.3.4:2053": (None, True),
+    # Пустой ipset означает любой адрес, а хост без адреса ipset не мешает
+    "1.2.3.4:80": (3, True),
+    "example.org:80": (3, True),
+    "1.2.3.4:50010/udp/stun": (0, True),
+    "1.2.3.4:50010/udp": (None, True),
+    "discord.com:443/udp": (None, True),
+    "1.2.3.4:8080": (None, False),
+    "1.2.3.4:5000/udp": (None, False),
+}
+
+
+@pytest.fixture
+def router(tmp_path):
+    (tmp_path / "bin").mkdir()
+    lists = tmp_path / "lists"
+    lists.mkdir()
+    (lists / "list-general.txt").write_text("discord.com\nyoutube.com\n")
+    (lists / "list-exclude.txt").write_text("status.discord.com\n")
+    (lists / "ipset-all.txt").write_text("104.16.0.0/12\n")
+    (lists / "ipset-empty.txt").write_text("")
+    (tmp_path / "general.bat").write_text(STRATEGY)
+    return Router(parse_strategy(str(tmp_path / "general.bat")))
+
+
+def test_port_set():
+    ports = PortSet("80,443, 1024-65535,bad")
+    assert [port in ports for port in (80, 81, 443, 1023, 1024, 65535)] == [True, False, True, False, True, True]
+
+
+def test_parse_query():
+    query = parse_query("host@[::1]:80/tcp/http")
+    assert (query.host, query.ip, query.port, query.proto, query.l7) == ("host", "::1", 80, "tcp", "http")
+    assert parse_query("discord.media:2053").l7 == "tls"
+    assert parse_query("1.2.3.4:443/udp").l7 == "quic"
+    for text in ("a.com:0", "a.com:443/sctp", "1.2.3.4@x:443", "a.com:443/tcp/tls/x"):
+        with pytest.raises(ValueError):
+            parse_query(text)
+
+
+@pytest.mark.parametrize("text", sorted(EXPECTED))
+def test_route(router, text):
+    route = router.route(text)
+    assert (route.block, route.captured) == EXPECTED[text]
+
+
+def test_route_many_matches_route(router):
+    texts = sorted(EXPECTED) * 2
+    routes = router.route_many(texts)
+    assert [(route.block, route.captured, route.reason) for route in routes] == \
+        [(route.block, route.captured, route.reason) for route in map(router.route, texts)]
+
+
+def test_rejection_reasons(router):
+    route = router.route("status.discord.com:443", explain=True)
+    assert route.rejections == [
+        (0, "не tcp"),
+        (1, "хост в hostlist-exclude (status.discord.com)"),
+        (2, "нет IP-адреса для ipset"),
+        (3, "порт 443 не входит в filter-tcp=80"),
+    ]
+    route = router.route("1.2.3.4:50010/udp", explain=True)
+    assert route.rejections[0] == (0, "unknown не входит в filter-l7=discord,stun")
+    assert router.route("1.2.3.4:2053", explain=True).rejections[2] == (2, "IP не входит в ipset")
+    assert router.route("www.youtube.com:443").reason == "youtube.com"
+    assert router.route("1.2.3.4:8080").reason == "порт 8080 не входит в wf-tcp=80,443,2053"
+
+
+def test_rule_check(router):
+    rule = router.rules[1]
+    query = parse_query("music.youtube.com:443")
+    # Результат поиска подставляется снаружи: так route_many подменяет его пакетным
+    assert rule.check(query, lambda index: None, lambda trie: trie.covers(query.host)) == (None, "youtube.com")
+    assert rule.check(query, lambda index: None, lambda trie: None) == ("хост не входит в hostlist", None)
+    assert rule.check(parse_query("music.youtube.com:80"), None, None)[0] == \
+        "порт 80 не входит в filter-tcp=443"
+    # Пустой ipset не попадает в условия блока
+    assert router.rules[3].ipsets is None
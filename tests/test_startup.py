@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули функций, которые не нужны для первой отрисовки окна
+FEATURE_MODULES = ("catalog", "compiler", "ranking", "subscriptions", "importer", "ipset",
+                   "router", "wfilter", "activity", "probe", "numpy", "concurrent.futures.process")
+
+# Время импорта замеряет app.py --profile-startup (этап "импорт")
+LOADED_MODULES = "import sys\nimport app\nprint(' '.join(sorted(sys.modules)))\n"
+
+
+def import_app():
+    """Импорт app в чистом интерпретаторе: загруженные модули"""
+    pytest.importorskip("PyQt5.QtWidgets")
+    output = subprocess.run([sys.executable, "-c", LOADED_MODULES], cwd=ROOT, capture_output=True,
+                            text=True, check=True, env=dict(os.environ, QT_QPA_PLATFORM="offscreen")).stdout
+    return set(output.splitlines()[-1].split())
+
+
+def test_import_app_skips_feature_modules():
+    modules = import_app()
+    assert sorted(modules.intersection(FEATURE_MODULES)) == []
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+from catalog import StrategyCatalog
+from strategy import (GAME_FILTER_DISABLED, GAME_FILTER_ENABLED, StrategyError, find_strategies,
+                      parse_strategy, read_command_line, split_command_line, to_bat)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUNDLED = list(find_strategies(ROOT).values())
+
+
+# Стратегии, которые отличаются числом блоков или режимом третьего блока
+BLOCKS = {
+    "general (ALT5).bat": (5, "syndata,multidisorder"),
+    "general (ALT3).bat": (8, "fake,hostfakesplit"),
+    "general (FAKE TLS AUTO).bat": (8, "fake,multidisorder"),
+    "general (SIMPLE FAKE).bat": (8, "fake"),
+}
+
+
+def read_bat(filename):
+    with open(os.path.join(ROOT, filename), "rb") as f:
+        return f.read().decode("utf-8")
+
+
+@pytest.mark.parametrize("filename", BUNDLED)
+def test_to_bat_round_trip(filename):
+    profile = parse_strategy(os.path.join(ROOT, filename), game_filter=GAME_FILTER_DISABLED)
+    assert to_bat(profile).replace("\n", "\r\n") == read_bat(filename)
+
+
+def test_header_comments_survive_catalog_cache(tmp_path):
+    catalog = StrategyCatalog(ROOT, str(tmp_path / "strategies.json"))
+    catalog.scan()
+    # Второй каталог берет разбор из кэша
+    catalog = StrategyCatalog(ROOT, str(tmp_path / "strategies.json"))
+    catalog.scan()
+    assert catalog.parsed == 0
+    profile = catalog.profile("ALT5")
+    assert profile.comments == [":: NOT RECOMMENDED"]
+    assert to_bat(profile).replace("\n", "\r\n") == read_bat("general (ALT5).bat")
+
+
+@pytest.mark.parametrize("filename", BUNDLED)
+def test_parse_bundled(filename):
+    profile = parse_strategy(os.path.join(ROOT, filename), game_filter=GAME_FILTER_DISABLED)
+    blocks, desync = BLOCKS.get(filename, (8, None))
+    assert len(profile.blocks) == blocks
+    if desync is not None:
+        assert profile.blocks[2].get("dpi-desync") == desync
+    assert [block.index for block in profile.blocks] == list(range(blocks))
+    assert profile.args().count("--new") == blocks - 1
+    # Все глобальные опции - только фильтр WinDivert, блоки начинаются с условий
+    assert [name for name, _ in profile.global_options] == ["wf-tcp", "wf-udp"]
+    assert profile.wf_udp == "443,19294-19344,50000-50100," + GAME_FILTER_DISABLED
+    assert all(block.options[0][0].startswith("filter-") for block in profile.blocks)
+    for block in profile.blocks:
+        for path in block.files():
+            assert os.path.isabs(path) and "%" not in path
+
+
+def test_parse_general_values():
+    profile = parse_strategy(os.path.join(ROOT, "general.bat"), game_filter=GAME_FILTER_ENABLED)
+    lists = os.path.join(ROOT, "lists") + os.sep
+    bin_dir = os.path.join(ROOT, "bin") + os.sep
+    assert profile.name == "general"
+    assert profile.wf_tcp == "80,443,2053,2083,2087,2096,8443,1024-65535"
+    assert profile.blocks[0].argv() == [
+        "--filter-udp=443", f"--hostlist={lists}list-general.txt", f"--hostlist-exclude={lists}list-exclude.txt",
+        f"--ipset-exclude={lists}ipset-exclude.txt", "--dpi-desync=fake", "--dpi-desync-repeats=6",
+        f"--dpi-desync-fake-quic={bin_dir}quic_initial_www_google_com.bin",
+    ]
+    assert profile.blocks[1].l7 == "discord,stun"
+    assert profile.blocks[2].get("hostlist-domains") == "discord.media"
+    assert profile.blocks[7].udp_ports == "1024-65535"
+    assert profile.blocks[7].get("dpi-desync-cutoff") == "n2"
+    assert profile.argv()[0] == os.path.join(ROOT, "bin", "winws.exe")
+
+
+def test_continuation_and_quoting(tmp_path):
+    path = tmp_path / "general (TEST).bat"
+    path.write_text(
+        "@echo off\n"
+        ":: start winws.exe --wf-tcp=1 - комментарий не считается запуском\n"
+        'set "BIN=%~dp0bin\\"\n'
+        'start "zapret: %~n0" /min "%BIN%winws.exe" --wf-tcp=80,%GameFilter% ^\n'
+        '   --filter-tcp=80 --hostlist="%LISTS%my list.txt" --new ^\n'
+        '--filter-udp=%GameFilter% --dpi-desync-fake-unknown-udp="%BIN%a.bin" --payload=%UNKNOWN% --new ^\n'
+        "--filter-tcp=443 --dpi-desync=fake --dpi-desync-fooling=^\"md5sig^\" --debug\n"
+        "--filter-tcp=1 --после-конца-команды\n"
+    )
+    assert read_command_line(str(path)).startswith(" --wf-tcp=80,%GameFilter%  --filter-tcp=80")
+    profile = parse_strategy(str(path), game_filter=GAME_FILTER_ENABLED)
+    assert profile.wf_tcp == "80,1024-65535"
+    assert [block.argv() for block in profile.blocks] == [
+        ["--filter-tcp=80", f"--hostlist={tmp_path / 'lists' / 'my list.txt'}"],
+        ["--filter-udp=1024-65535", f"--dpi-desync-fake-unknown-udp={tmp_path / 'bin' / 'a.bin'}",
+         "--payload=%UNKNOWN%"],
+        ["--filter-tcp=443", "--dpi-desync=fake", '--dpi-desync-fooling="md5sig"'],
+    ]
+    # Глобальная опция в последнем блоке все равно остается глобальной
+    assert profile.global_options[-1] == ("debug", None)
+
+
+def test_split_command_line():
+    assert split_command_line('--a="x y" --b=^"q^" --c=1^^2  --d=%BIN%"f.bin" --e') == \
+        ["--a=x y", '--b="q"', "--c=1^2", "--d=%BIN%f.bin", "--e"]
+
+
+def test_parse_errors(tmp_path):
+    path = tmp_path / "general.bat"
+    path.write_text("@echo off\n:: winws.exe\necho nothing\n")
+    with pytest.raises(StrategyError):
+        parse_strategy(str(path))
+    path.write_text('start "" "winws.exe" --wf-tcp=443 stray\n')
+    with pytest.raises(StrategyError):
+        parse_strategy(str(path))
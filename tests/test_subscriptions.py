@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from subscriptions import DEFAULT_INTERVAL, JITTER, RETRY_DELAY, SubscriptionManager, read_cache
+
+BODY = b"# blocklist\ndiscord.com\n0.0.0.0 youtube.com\n||rutracker.org^\n"
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Список из server.body; ETag зависит от содержимого"""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path == "/missing":
+            self.send_error(404)
+            return
+        body = self.server.body
+        etag = '"' + hashlib.sha256(body).hexdigest()[:8] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.requests = []
+    server.body = BODY
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def manager(server, tmp_path):
+    target = str(tmp_path / "lists" / "list-general.txt")
+    config = {"interval_hours": 12, "sources": [
+        {"name": "blocklist", "url": server.url + "/list", "target": target},
+        {"name": "missing", "url": server.url + "/missing", "target": target},
+    ]}
+    config_path = tmp_path / "subscriptions.json"
+    config_path.write_text(json.dumps(config))
+    return SubscriptionManager(str(config_path), str(tmp_path / "cache"))
+
+
+def assert_next_at(entry, delay):
+    offset = entry["next_at"] - entry["checked_at"]
+    assert delay * (1 - JITTER) <= offset <= delay * (1 + JITTER)
+
+
+def test_refresh_and_not_modified(server, manager):
+    subscription = manager.subscriptions[0]
+    result = manager.refresh(subscription)
+    assert result.error is None and result.modified
+    assert (result.total, result.added, result.removed) == (3, 3, 0)
+    assert read_cache(subscription.cache_path) == ["discord.com", "youtube.com", "rutracker.org"]
+    assert manager.interval == 12 * 3600 != DEFAULT_INTERVAL
+    assert_next_at(manager.load_state()[subscription.id], manager.interval)
+
+    # Повторный запрос условный: сервер отвечает 304, кэш не трогается
+    mtime = os.stat(subscription.cache_path).st_mtime_ns
+    result = manager.refresh(subscription)
+    assert server.requests[-1][1]["If-None-Match"] == manager.load_state()[subscription.id]["etag"]
+    assert not result.modified and result.total == 3
+    assert result.summary() == "blocklist: без изменений"
+    assert os.stat(subscription.cache_path).st_mtime_ns == mtime
+
+    # force - без условного запроса
+    manager.refresh(subscription, force=True)
+    assert "If-None-Match" not in server.requests[-1][1]
+
+
+def test_cache_written_only_on_change(server, manager):
+    subscription = manager.subscriptions[0]
+    manager.refresh(subscription)
+    stat = os.stat(subscription.cache_path)
+    os.utime(subscription.cache_path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 1_000_000_000))
+    mtime = os.stat(subscription.cache_path).st_mtime_ns
+
+    # Новый ETag, но те же записи в другом порядке и с повтором
+    server.body = b"||rutracker.org^\nyoutube.com\ndiscord.com\nDiscord.com\n"
+    result = manager.refresh(subscription)
+    assert not result.modified
+    assert os.stat(subscription.cache_path).st_mtime_ns == mtime
+
+    server.body = b"discord.com\nyoutube.com\nexample.org\n"
+    result = manager.refresh(subscription)
+    assert result.modified and (result.added, result.removed) == (1, 1)
+    assert os.stat(subscription.cache_path).st_mtime_ns != mtime
+    assert manager.provenance("Example.org") == ["blocklist"]
+    assert manager.provenance("rutracker.org") == []
+
+
+def test_mostly_invalid_response_keeps_cache(server, manager):
+    subscription = manager.subscriptions[0]
+    manager.refresh(subscription)
+    # Страница ошибки вместо списка: одна строка похожа на домен, остальные нет
+    server.body = b"<html>\n<title>Access denied</title>\n<p>try again later</p>\nexample.com\n</html>\n"
+    result = manager.refresh(subscription)
+    assert "неверных строк" in result.error
+    assert result.summary().endswith("используется кэш")
+    assert read_cache(subscription.cache_path) == ["discord.com", "youtube.com", "rutracker.org"]
+
+    server.body = b"<html>\n<body>not found</body>\n"
+    assert manager.refresh(subscription).error == "в загруженном списке нет записей"
+    assert not [name for name in os.listdir(os.path.dirname(subscription.cache_path)) if name.endswith(".download")]
+
+
+def test_retry_after_download_error(manager):
+    results = manager.refresh_due()
+    assert [result.error is None for result in results] == [True, False]
+    assert "404" in results[1].error
+
+    state = manager.load_state()
+    failed = manager.subscriptions[1]
+    assert state[failed.id]["error"] == results[1].error
+    # После ошибки повтор через RETRY_DELAY, а не через полный интервал
+    assert_next_at(state[failed.id], RETRY_DELAY)
+    assert manager.next_due() == state[failed.id]["next_at"]
+    assert manager.due() == []
+    assert manager.due(time.time() + RETRY_DELAY * (1 + JITTER) + 1) == [failed]
+    assert manager.extras() == {os.path.abspath(manager.subscriptions[0].target):
+                                [manager.subscriptions[0].cache_path]}
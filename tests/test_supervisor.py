@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+
+import pytest
+
+from supervisor import (PopenBackend, ProcessBackend, StartupError, WinwsSupervisor,
+                        is_ready_line, parse_list_loaded)
+
+FAKE_WINWS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_winws.py")
+
+
+def winws_argv(*args):
+    return [sys.executable, FAKE_WINWS] + list(args)
+
+
+@pytest.fixture
+def supervisor():
+    events = []
+    supervisor = WinwsSupervisor(PopenBackend(), stop_timeout=5, ready_timeout=10)
+    supervisor.add_listener(lambda event, value: events.append((event, value)))
+    supervisor.events = events
+    yield supervisor
+    supervisor.shutdown(timeout=5)
+
+
+@pytest.fixture
+def hostlist(tmp_path):
+    path = tmp_path / "list-general.txt"
+    path.write_text("a.com\nb.com\n")
+    return str(path)
+
+
+def touch_lines(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+    # Время модификации должно измениться даже на файловых системах с грубым разрешением
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_ready_marker_and_loaded_lists(supervisor, hostlist):
+    ready_ms = supervisor.start_now(winws_argv(f"--hostlist={hostlist}"))
+    assert ready_ms is not None and ready_ms >= 0
+    assert supervisor.is_ready()
+    assert supervisor.session.lists[supervisor.session.list_key(hostlist)][0] == 2
+    assert any(is_ready_line(line) for line in supervisor.session.tail)
+    assert ("started", supervisor.pid) in supervisor.events
+
+
+def test_exit_before_ready_is_startup_error(supervisor):
+    with pytest.raises(StartupError) as error:
+        supervisor.start_now(winws_argv("--fail=3"))
+    assert "код 3" in str(error.value)
+    assert "error opening windivert" in str(error.value)
+    assert not supervisor.is_running()
+
+
+def test_apply_lists_reload_without_restart(supervisor, hostlist):
+    argv = winws_argv(f"--hostlist={hostlist}")
+    supervisor.start_now(argv)
+    pid = supervisor.pid
+
+    since = time.monotonic()
+    touch_lines(hostlist, ["a.com", "b.com", "c.com"])
+    result = supervisor.apply_lists_now([hostlist], since, argv, timeout=10)
+
+    assert result.mode == "reload"
+    assert result.loaded == {hostlist: 3}
+    assert supervisor.pid == pid
+
+
+def test_apply_lists_restarts_when_not_reloaded(supervisor, hostlist):
+    argv = winws_argv(f"--hostlist={hostlist}", "--no-reload")
+    supervisor.start_now(argv)
+    first = supervisor.session
+
+    since = time.monotonic()
+    touch_lines(hostlist, ["a.com"])
+    result = supervisor.apply_lists_now([hostlist], since, argv, timeout=0.5)
+
+    assert result.mode == "restart"
+    assert result.gap_ms >= 0
+    assert result.pid != first.pid and supervisor.pid == result.pid
+    assert first.exited.is_set()
+    assert supervisor.session.lists[supervisor.session.list_key(hostlist)][0] == 1
+
+
+def test_apply_lists_forced_restart(supervisor, hostlist):
+    argv = winws_argv(f"--hostlist={hostlist}")
+    supervisor.start_now(argv)
+    first_pid = supervisor.pid
+    calls = []
+
+    result = supervisor.apply_lists_now([hostlist], time.monotonic(), argv,
+                                        before_start=lambda: calls.append(1), restart=True)
+    assert result.mode == "restart"
+    assert result.pid != first_pid
+    assert calls == [1]
+
+
+def test_async_start_and_stop(supervisor, hostlist):
+    supervisor.start(winws_argv(f"--hostlist={hostlist}"))
+    deadline = time.monotonic() + 10
+    while not any(event == "ready" for event, _ in supervisor.events) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert supervisor.is_ready()
+
+    process = supervisor.process
+    assert supervisor.stop_now()
+    assert process.poll() is not None
+    assert supervisor.session is None
+    # Остановленный по запросу процесс не считается упавшим
+    time.sleep(0.2)
+    assert not any(event == "exited" for event, _ in supervisor.events)
+
+
+def test_spawn_over_stuck_process_is_startup_error(supervisor, hostlist, monkeypatch):
+    supervisor.start_now(winws_argv(f"--hostlist={hostlist}"))
+    stuck = supervisor.session
+
+    # Процесс не реагирует ни на terminate, ни на kill
+    monkeypatch.setattr(supervisor.backend, "terminate", lambda process: None)
+    monkeypatch.setattr(supervisor.backend, "kill", lambda process: None)
+    supervisor.stop_timeout = 0.2
+    started = len(supervisor.events)
+
+    with pytest.raises(StartupError) as error:
+        supervisor.spawn_now(winws_argv(f"--hostlist={hostlist}"))
+    assert str(stuck.pid) in str(error.value)
+    assert supervisor.session is stuck
+    assert not any(event == "started" for event, _ in supervisor.events[started:])
+
+
+def test_parse_list_loaded():
+    assert parse_list_loaded("Loaded 12 hosts from lists/list-general.txt") == ("lists/list-general.txt", 12)
+    assert parse_list_loaded("loaded 3 ip/subnets from C:\\zapret\\lists\\ipset-all.txt ") == \
+        ("C:\\zapret\\lists\\ipset-all.txt", 3)
+    assert parse_list_loaded("windivert initialized. capture is started.") is None
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(NotImplementedError):
+        ProcessBackend().spawn(["winws.exe"])
+    assert ProcessBackend().output(None) is None
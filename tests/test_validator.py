@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from validator import check, validate_batch
+
+# Части строк: метки, разделители и то, что делает строку не доменом
+PIECES = ["a", "b", "z", "0", "9", "_", "-", "--", ".", ".", "..", "^", "xn--", "xn--p1ai",
+          "com", "ru", "q", " ", "1.2.3.4", "/24", "::1", "#", "A"]
+
+
+def expected(lines, list_kind):
+    """Построчная проверка, с которой должна совпадать пакетная"""
+    values, errors = [], []
+    for line in lines:
+        value, error = check(line, list_kind)
+        values.append(value)
+        if error is not None:
+            errors.append((line, error))
+    return values, errors
+
+
+def assert_same(lines, list_kind="hostlist"):
+    batch = validate_batch(lines, list_kind)
+    values, errors = expected(lines, list_kind)
+    assert batch.values == values
+    assert sorted(batch.errors) == sorted(errors)
+
+
+def test_batch_matches_check_on_random_lines():
+    rng = random.Random(1)
+    lines = ["".join(rng.choice(PIECES) for _ in range(rng.randint(0, 8))) for _ in range(20000)]
+    assert_same(lines)
+    # Строки уже в нижнем регистре - значения берутся без повторного деления текста
+    assert_same([line.lower() for line in lines])
+    assert_same(lines, "ipset")
+
+
+@pytest.mark.parametrize("line", [
+    "a" * 63 + ".com", "a" * 64 + ".com", "a-" * 31 + "a.com", "^" + "a" * 63 + ".com",
+    "b." * 125 + "com", "b." * 125 + "comx", "xn--" + "a" * 59, "a.xn--" + "a" * 59,
+    "a.xn--" + "a" * 60, "a.b", "a.bc", "-a.com", "a-.com", "a.-com", "a.com-", "^a.com",
+    "a^b.com", ".a.com", "a.com.", "", "  ", "Discord.COM", "t.co", "a_b.com", "a.c_m",
+])
+def test_batch_edge_cases(line):
+    assert_same(["discord.com", line, "youtube.com"])
+
+
+def test_line_with_newline_is_checked_alone():
+    batch = validate_batch(["discord.com\nyoutube.com", "discord.gg"])
+    assert batch.values == [None, "discord.gg"]
+    assert len(batch.errors) == 1
+
+
+def test_batch_rejects_among_many_domains():
+    # Скорость замеряет python validator.py bench
+    rng = random.Random(2)
+    alphabet = "abcdefghijklmnopqrstuvwxyz0123456789"
+    lines = ["".join(rng.choice(alphabet) for _ in range(rng.randint(5, 14))) + rng.choice([".com", ".net", ".ru"])
+             for _ in range(5000)]
+    lines[1000] = "1.2.3.4"
+    lines[2000] = "bad domain"
+
+    batch = validate_batch(lines)
+    assert batch.errors == [("bad domain", "неверный домен")]
+    assert batch.values[1000] == "1.2.3.4"
+    assert batch.values[2000] is None
+    assert batch.values[:1000] == lines[:1000]
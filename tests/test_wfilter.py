@@ -0,0 +1,112 @@
+import random
+
+import pytest
+
+from cidr import subtract_ranges
+from compiler import IPSET_NONE
+from strategy import parse_strategy
+from wfilter import FilterPlan, format_ranges, intersect_ranges, is_disabled, merge_ranges, parse_ranges
+
+
+@pytest.fixture
+def make_profile(tmp_path):
+    (tmp_path / "bin").mkdir()
+    lists = tmp_path / "lists"
+    lists.mkdir()
+    (lists / "list-general.txt").write_text("discord.com\n")
+    (lists / "ipset-all.txt").write_text("104.16.0.0/12\n")
+    (lists / "ipset-none.txt").write_text(IPSET_NONE + "\n")
+
+    def make_profile(wf, *blocks):
+        path = tmp_path / "general.bat"
+        path.write_text(f'start "zapret" /min "%BIN%winws.exe" {wf} ^\n' +
+                        " --new ^\n".join(block + " --dpi-desync=fake" for block in blocks) + "\n")
+        return parse_strategy(str(path))
+    return make_profile
+
+
+def ports(ranges):
+    return {port for start, end in ranges for port in range(start, end + 1)}
+
+
+def random_ranges(rng):
+    return merge_ranges([start, start + rng.randrange(10)] for start in
+                        (rng.randint(1, 100) for _ in range(rng.randint(0, 5))))
+
+
+def test_merge_ranges():
+    assert merge_ranges([[5, 10], [1, 3], [4, 4], [20, 30], [25, 40], [41, 41]]) == [[1, 10], [20, 41]]
+    assert parse_ranges("443,80,50000-50100,444") == [[80, 80], [443, 444], [50000, 50100]]
+    assert format_ranges([[80, 80], [443, 444]]) == "80,443-444"
+
+
+def test_range_algebra_matches_sets():
+    rng = random.Random(5)
+    for _ in range(500):
+        a, b = random_ranges(rng), random_ranges(rng)
+        assert ports(merge_ranges(a + b)) == ports(a) | ports(b)
+        assert ports(intersect_ranges(a, b)) == ports(a) & ports(b)
+        assert ports(subtract_ranges(a, b)) == ports(a) - ports(b)
+
+
+def test_unhandled_ports_are_dropped(make_profile):
+    plan = FilterPlan(make_profile("--wf-tcp=80,443,2053,8443 --wf-udp=443,50000-50100",
+                                   '--filter-tcp=443 --hostlist="%LISTS%list-general.txt"',
+                                   "--filter-udp=443,1000"))
+    assert plan.changed
+    assert plan.args() == ["--wf-tcp=443", "--wf-udp=443"]
+    assert plan.unhandled == {"tcp": [[80, 80], [2053, 2053], [8443, 8443]], "udp": [[50000, 50100]]}
+    assert plan.uncaptured == [(1, "udp", [[1000, 1000]])]
+    assert plan.saved_ports() == 104
+
+
+def test_shadowed_by_unconditional_block(make_profile):
+    plan = FilterPlan(make_profile("--wf-tcp=80,443",
+                                   "--filter-tcp=443",
+                                   '--filter-tcp=443 --hostlist="%LISTS%list-general.txt"',
+                                   '--filter-tcp=80,443 --hostlist="%LISTS%list-general.txt"',
+                                   # Блок с условием не забирает соединения у следующих
+                                   '--filter-tcp=80 --ipset="%LISTS%ipset-all.txt"'))
+    assert plan.unreachable == [(1, "все его соединения забирают предыдущие блоки")]
+
+
+def test_block_without_filter_takes_everything(make_profile):
+    plan = FilterPlan(make_profile("--wf-tcp=80,443 --wf-udp=443", "--dpi-desync-repeats=2", "--filter-udp=443"))
+    assert not plan.changed
+    assert plan.unreachable == [(1, "все его соединения забирают предыдущие блоки")]
+
+
+def test_ipset_none_block_is_disabled(make_profile):
+    profile = make_profile("--wf-tcp=80,443 --wf-udp=443,50000-50100",
+                           '--filter-tcp=443 --hostlist="%LISTS%list-general.txt"',
+                           '--filter-udp=50000-50100 --ipset="%LISTS%ipset-none.txt"')
+    assert [is_disabled(block) for block in profile.blocks] == [False, True]
+    plan = FilterPlan(profile)
+    assert plan.unreachable == [(1, "ipset в режиме none (только заглушка)")]
+    # Порты выключенного блока не считаются нужными; udp без блоков не перехватывается совсем
+    assert plan.args() == ["--wf-tcp=443"]
+    assert [name for name, _ in plan.global_options()].count("wf-udp") == 0
+
+
+def test_wf_raw_is_kept(make_profile):
+    plan = FilterPlan(make_profile('--wf-raw="tcp" --wf-tcp=80,443', "--filter-tcp=443"))
+    assert not plan.changed
+    assert plan.global_options() == plan.profile.global_options
+
+
+def test_global_options_never_widen(make_profile):
+    rng = random.Random(7)
+    for _ in range(100):
+        wf = {proto: random_ranges(rng) for proto in ("tcp", "udp")}
+        blocks = []
+        for _ in range(rng.randint(1, 4)):
+            options = [f"--filter-{proto}={format_ranges(ranges)}"
+                       for proto, ranges in (("tcp", random_ranges(rng)), ("udp", random_ranges(rng))) if ranges]
+            if rng.random() < 0.5:
+                options.append('--hostlist="%LISTS%list-general.txt"')
+            blocks.append(" ".join(options) or "--dpi-desync-repeats=2")
+        profile = make_profile(" ".join(f"--wf-{proto}={format_ranges(ranges)}"
+                                        for proto, ranges in wf.items() if ranges), *blocks)
+        options = dict(FilterPlan(profile).global_options())
+        for proto in ("tcp", "udp"):
+            assert ports(parse_ranges(options.get("wf-" + proto))) <= ports(wf[proto])
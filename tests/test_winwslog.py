@@ -0,0 +1,97 @@
+import gzip
+import os
+import time
+
+from winwslog import LogBuffer, LogRotator, format_entry
+
+# 14 символов и перевод строки, но 28 байт в UTF-8
+LINE = "строка журнала\n"
+
+
+def wait_compressed(path, count):
+    """Ждет, пока поток сжатия создаст count архивов и уберет временные файлы"""
+    directory = os.path.dirname(path)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        names = os.listdir(directory)
+        if (not any(name.endswith((".rotating", ".tmp")) for name in names)
+                and sum(name.endswith(".gz") for name in names) >= count):
+            return sorted(names)
+        time.sleep(0.01)
+    raise AssertionError(f"журнал не сжат: {os.listdir(directory)}")
+
+
+def read_gz(path):
+    with gzip.open(path, "rb") as f:
+        return f.read().decode("utf-8").replace(os.linesep, "\n")
+
+
+def test_since_tracks_dropped_lines():
+    log = LogBuffer(capacity=5)
+    for i in range(12):
+        log.append(f"line {i}")
+
+    lines, seq, dropped = log.since(0)
+    assert [text for _, _, text in lines] == [f"line {i}" for i in range(7, 12)]
+    assert (seq, dropped) == (12, 7)
+    assert len(log) == 5
+
+    lines, seq, dropped = log.since(10)
+    assert [text for _, _, text in lines] == ["line 10", "line 11"] and dropped == 0
+    assert log.since(12) == ([], 12, 0)
+
+    # limit отдает самые новые строки, остальные считаются пропущенными
+    lines, _, dropped = log.since(0, limit=2)
+    assert [text for _, _, text in lines] == ["line 10", "line 11"] and dropped == 10
+    lines, _, dropped = log.since(8, limit=1)
+    assert [text for _, _, text in lines] == ["line 11"] and dropped == 3
+
+
+def test_rotation_counts_bytes(tmp_path):
+    path = str(tmp_path / "logs" / "winws.log")
+    rotator = LogRotator(path, max_bytes=100, keep=2)
+    # 4 строки - 60 символов, но 112 байт: файл ротируется
+    for _ in range(4):
+        rotator.write(LINE)
+    assert wait_compressed(path, 1) == ["winws.log", "winws.log.1.gz"]
+    assert read_gz(path + ".1.gz") == LINE * 4
+    assert os.path.getsize(path) == 0
+
+    rotator.write("после ротации\n")
+    rotator.close()
+    with open(path, "rb") as f:
+        assert f.read().decode("utf-8").replace(os.linesep, "\n") == "после ротации\n"
+
+
+def test_rotation_keeps_newest(tmp_path):
+    path = str(tmp_path / "winws.log")
+    rotator = LogRotator(path, max_bytes=100, keep=2)
+    for batch in range(3):
+        for _ in range(4):
+            rotator.write(f"{batch} {LINE}")
+        wait_compressed(path, min(batch + 1, 2))
+    rotator.close()
+    assert sorted(os.listdir(tmp_path)) == ["winws.log", "winws.log.1.gz", "winws.log.2.gz"]
+    assert read_gz(path + ".1.gz") == f"2 {LINE}" * 4
+    assert read_gz(path + ".2.gz") == f"1 {LINE}" * 4
+
+
+def test_rotator_continues_existing_file(tmp_path):
+    path = tmp_path / "winws.log"
+    path.write_bytes(LINE.encode("utf-8") * 3)
+    rotator = LogRotator(str(path), max_bytes=100, keep=2)
+    # Размер уже записанного файла учитывается в байтах: хватает одной строки
+    rotator.write(LINE)
+    assert wait_compressed(str(path), 1)
+    rotator.close()
+
+
+def test_buffer_writes_rotated_log(tmp_path):
+    path = str(tmp_path / "winws.log")
+    log = LogBuffer()
+    log.set_rotation(path)
+    log.append("windivert initialized. capture is started.")
+    log.flush()
+    log.set_rotation(None)
+    with open(path, "r", encoding="utf-8") as f:
+        assert f.read() == format_entry(log.lines()[0]) + "\n"
@@ -0,0 +1,239 @@
+"""
+Минимальный фильтр WinDivert (--wf-tcp/--wf-udp) по портам блоков стратегии
+
+Стратегии перечисляют перехватываемые порты отдельно от --filter-tcp/udp
+блоков, и WinDivert часто забирает у системы пакеты, которые потом не
+обрабатывает ни один блок. Каждый перехваченный пакет проходит через
+winws, поэтому лишние порты - лишняя нагрузка на процессор.
+"""
+
+import os
+import sys
+
+from cidr import subtract_ranges
+from compiler import IPSET_NONE
+from router import PortSet
+from winwslog import set_flag
+
+# Сужение фильтра при запуске включается файлом-флагом, как игровой фильтр
+WF_FLAG = os.path.join("utils", "wf_minimal.enabled")
+ALL_PORTS = [[1, 65535]]
+PROTOCOLS = ("tcp", "udp")
+# Условия блока кроме портов: блок без них срабатывает на любом соединении своих портов
+CONDITION_OPTIONS = {
+    "hostlist", "hostlist-domains", "hostlist-auto", "hostlist-exclude",
+    "ipset", "ipset-ip", "ipset-exclude", "ipset-exclude-ip", "filter-l7", "filter-l3",
+}
+
+
+def minimal_enabled(base_dir="."):
+    return os.path.exists(os.path.join(base_dir, WF_FLAG))
+
+
+def set_minimal_enabled(enabled, base_dir="."):
+    set_flag(os.path.join(base_dir, WF_FLAG), enabled)
+
+
+def merge_ranges(ranges):
+    """Отсортированные непересекающиеся диапазоны [start, end]; соседние сливаются"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def parse_ranges(value):
+    ports = PortSet(value)
+    return merge_ranges([start, end] for start, end in zip(ports.starts, ports.ends))
+
+
+def intersect_ranges(ranges, other):
+    return subtract_ranges(ranges, subtract_ranges(ranges, other))
+
+
+def format_ranges(ranges):
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+
+def count_ports(ranges):
+    return sum(end - start + 1 for start, end in ranges)
+
+
+def block_ports(block):
+    """{протокол: диапазоны} портов, на которые срабатывает блок"""
+    tcp, udp = block.tcp_ports, block.udp_ports
+    if not tcp and not udp:
+        return {"tcp": ALL_PORTS, "udp": ALL_PORTS}
+    # Как в router.py: блок только с --filter-tcp не получает udp, и наоборот
+    return {"tcp": parse_ranges(tcp) if tcp else [], "udp": parse_ranges(udp) if udp else []}
+
+
+def is_unconditional(block):
+    return not any(name in CONDITION_OPTIONS for name, _ in block.options)
+
+
+def is_placeholder_ipset(path):
+    """Содержит ли ipset только заглушку IPSET_NONE (режим ipset "none" в service.bat)"""
+    found = False
+    try:
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                if line not in (IPSET_NONE, IPSET_NONE.split("/")[0]):
+                    return False
+                found = True
+    except OSError:
+        return False
+    return found
+
+
+def is_disabled(block):
+    """Блок с ipset, в котором только заглушка: адрес из документационной сети не встретится"""
+    ipsets = block.get_all("ipset")
+    return bool(ipsets) and all(is_placeholder_ipset(path) for path in ipsets)
+
+
+class FilterPlan:
+    """Перехватываемые порты стратегии: текущие, нужные блокам и лишние
+
+    minimal - пересечение нужных и текущих: фильтр только сужается, порты,
+    которые сейчас не перехватываются, не добавляются. Предупреждения:
+    unreachable - блоки, которые не сработают никогда (ipset в режиме none,
+    порты не перехватываются или целиком забраны предыдущими блоками без
+    условий) - их порты не считаются нужными,
+    uncaptured - порты блоков вне фильтра, unhandled - перехватываемые
+    порты, которые не обрабатывает ни один блок.
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        # --wf-raw задает фильтр WinDivert целиком, сужать нечего
+        self.raw = profile.get_global("wf-raw") is not None
+        self.current = {proto: parse_ranges(profile.get_global("wf-" + proto)) for proto in PROTOCOLS}
+        self.needed = {proto: [] for proto in PROTOCOLS}
+        self.unreachable = []
+        self.uncaptured = []
+        # Порты, которые забирают предыдущие блоки без условий
+        shadow = {proto: [] for proto in PROTOCOLS}
+
+        for block in profile.blocks:
+            if is_disabled(block):
+                self.unreachable.append((block.index, "ipset в режиме none (только заглушка)"))
+                continue
+            ports = block_ports(block)
+            reachable = {}
+            for proto in PROTOCOLS:
+                self.needed[proto] = merge_ranges(self.needed[proto] + ports[proto])
+                reachable[proto] = intersect_ranges(ports[proto], self.current[proto])
+            if not any(reachable.values()):
+                self.unreachable.append((block.index, "его порты не перехватываются"))
+                continue
+            for proto in PROTOCOLS:
+                missing = subtract_ranges(ports[proto], self.current[proto])
+                if missing and ports[proto] is not ALL_PORTS:
+                    self.uncaptured.append((block.index, proto, missing))
+            if not any(subtract_ranges(reachable[proto], shadow[proto]) for proto in PROTOCOLS):
+                self.unreachable.append((block.index, "все его соединения забирают предыдущие блоки"))
+            if is_unconditional(block):
+                for proto in PROTOCOLS:
+                    shadow[proto] = merge_ranges(shadow[proto] + reachable[proto])
+
+        self.minimal = {proto: intersect_ranges(self.needed[proto], self.current[proto]) for proto in PROTOCOLS}
+        self.unhandled = {proto: subtract_ranges(self.current[proto], self.needed[proto]) for proto in PROTOCOLS}
+
+    @property
+    def changed(self):
+        return not self.raw and any(self.unhandled.values()) and any(self.minimal.values())
+
+    def saved_ports(self):
+        return sum(count_ports(ranges) for ranges in self.unhandled.values())
+
+    def global_options(self):
+        """Глобальные опции профиля с суженными --wf-tcp/--wf-udp"""
+        if not self.changed:
+            return list(self.profile.global_options)
+        options = []
+        for name, value in self.profile.global_options:
+            proto = name[3:] if name in ("wf-tcp", "wf-udp") else None
+            if proto is None:
+                options.append((name, value))
+            elif self.minimal[proto]:
+                options.append((name, format_ranges(self.minimal[proto])))
+        return options
+
+    def args(self):
+        """Аргументы --wf-* для командной строки winws"""
+        return [f"--wf-{proto}={format_ranges(self.minimal[proto])}"
+                for proto in PROTOCOLS if self.minimal[proto]]
+
+    def summary(self):
+        """Одна строка для журнала запуска"""
+        if not self.changed:
+            return "Фильтр WinDivert: лишних портов нет"
+        return f"Фильтр WinDivert: {' '.join(self.args())} (лишних портов: {self.saved_ports()})"
+
+    def report(self):
+        lines = []
+        if self.raw:
+            lines.append("Фильтр задан --wf-raw: порты не сужаются")
+        for proto in PROTOCOLS:
+            current = format_ranges(self.current[proto]) or "нет"
+            lines.append(f"wf-{proto}: {current} -> {format_ranges(self.minimal[proto]) or 'нет'}")
+            if self.unhandled[proto]:
+                lines.append(f"  перехватываются, но не обрабатываются: {format_ranges(self.unhandled[proto])}")
+        for index, proto, ranges in self.uncaptured:
+            lines.append(f"Блок {index + 1}: порты {proto} {format_ranges(ranges)} не перехватываются")
+        for index, reason in self.unreachable:
+            lines.append(f"Блок {index + 1} не сработает никогда: {reason}")
+        if self.changed:
+            lines.append(f"Лишних портов: {self.saved_ports()}")
+        else:
+            lines.append("Лишних портов нет")
+        return lines
+
+
+def minimize_filter(profile):
+    """Сужает --wf-tcp/--wf-udp профиля до портов его блоков; возвращает FilterPlan"""
+    plan = FilterPlan(profile)
+    profile.global_options = plan.global_options()
+    return plan
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Использование:\n"
+             "  python wfilter.py <стратегия> [стратегия...]\n"
+             "  python wfilter.py on|off - сужать фильтр при каждом запуске")
+    if not argv:
+        print(usage)
+        return 2
+    if argv[0] in ("on", "off"):
+        set_minimal_enabled(argv[0] == "on")
+        print("Сужение фильтра WinDivert " + ("включено" if argv[0] == "on" else "выключено"))
+        return 0
+
+    from catalog import StrategyCatalog
+    from strategy import StrategyError
+    catalog = StrategyCatalog()
+    catalog.scan()
+    for name in argv:
+        try:
+            profile = catalog.profile(name)
+        except StrategyError as e:
+            print(f"Ошибка: {e}")
+            return 1
+        plan = FilterPlan(profile)
+        print(f"{profile.name}:")
+        print("\n".join("  " + line for line in plan.report()))
+        if plan.changed:
+            print("  " + " ".join(plan.args()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
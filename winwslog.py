@@ -0,0 +1,232 @@
+"""
+Журнал вывода winws: кольцевой буфер строк и необязательная запись на диск со сжатием
+"""
+
+import collections
+import gzip
+import itertools
+import os
+import shutil
+import threading
+import time
+
+LOG_LINES = 20000
+LOG_DIR = "logs"
+LOG_FILE = os.path.join(LOG_DIR, "winws.log")
+# Запись журнала на диск и отладочный вывод winws включаются файлами-флагами,
+# как игровой фильтр в service.bat
+LOG_FLAG = os.path.join("utils", "winws_log.enabled")
+DEBUG_FLAG = os.path.join("utils", "winws_debug.enabled")
+ROTATE_BYTES = 5 * 1024 * 1024
+ROTATE_KEEP = 5
+# Буфер файла сбрасывается на диск не чаще раза в секунду
+FLUSH_INTERVAL = 1.0
+
+
+def rotation_enabled(base_dir="."):
+    return os.path.exists(os.path.join(base_dir, LOG_FLAG))
+
+
+def set_rotation_enabled(enabled, base_dir="."):
+    set_flag(os.path.join(base_dir, LOG_FLAG), enabled)
+
+
+def debug_enabled(base_dir="."):
+    """Запускать ли winws с --debug (нужно для статистики активности профилей)"""
+    return os.path.exists(os.path.join(base_dir, DEBUG_FLAG))
+
+
+def set_debug_enabled(enabled, base_dir="."):
+    set_flag(os.path.join(base_dir, DEBUG_FLAG), enabled)
+
+
+def set_flag(path, enabled):
+    if enabled:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8"):
+            pass
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class LogRotator:
+    """Пишет строки в файл; при превышении max_bytes сжимает его в .1.gz
+
+    Сжатие выполняется в отдельном потоке, поэтому поток чтения вывода
+    winws только дописывает строки в буферизованный файл. Хранится keep
+    сжатых файлов: winws.log.1.gz - самый новый.
+    """
+
+    def __init__(self, path=LOG_FILE, max_bytes=ROTATE_BYTES, keep=ROTATE_KEEP):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self._compress_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Файл открыт в двоичном режиме: размер считается в байтах, как на диске
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+        self._flushed_at = time.monotonic()
+
+    def write(self, text):
+        data = text.replace("\n", os.linesep).encode("utf-8", "replace")
+        self._file.write(data)
+        self._size += len(data)
+        if self._size >= self.max_bytes:
+            self.rotate()
+        elif time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._flushed_at = time.monotonic()
+
+    def rotate(self):
+        self._file.close()
+        pending = f"{self.path}.{time.monotonic_ns()}.rotating"
+        os.replace(self.path, pending)
+        self._file = open(self.path, "ab")
+        self._size = 0
+        threading.Thread(target=self._compress, args=(pending,), name="winws-log-gzip", daemon=True).start()
+
+    def _compress(self, pending):
+        # Файлы сжимаются по одному и по порядку ротации
+        with self._compress_lock:
+            try:
+                for index in range(self.keep - 1, 0, -1):
+                    source = f"{self.path}.{index}.gz"
+                    if os.path.exists(source):
+                        os.replace(source, f"{self.path}.{index + 1}.gz")
+                with open(pending, "rb") as source, gzip.open(f"{self.path}.1.gz.tmp", "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.replace(f"{self.path}.1.gz.tmp", f"{self.path}.1.gz")
+                os.remove(pending)
+            except OSError as e:
+                print(f"Не удалось сжать журнал {pending}: {e}")
+
+    def close(self):
+        self._file.close()
+
+
+class LogBuffer:
+    """Последние capacity строк журнала с порядковыми номерами
+
+    Запись (append) идет из потоков чтения вывода, чтение - порциями через
+    since(seq): читатель получает только новые строки и узнает, сколько
+    он пропустил, если отстал больше чем на capacity. Память ограничена
+    capacity строками при любой скорости вывода.
+    """
+
+    def __init__(self, capacity=LOG_LINES):
+        self.capacity = capacity
+        self._lines = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        # Номер следующей строки
+        self._seq = 0
+        self._rotator = None
+        self._listeners = []
+
+    def __len__(self):
+        return len(self._lines)
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def append(self, text, source="winws"):
+        entry = (time.time(), source, text)
+        error = None
+        with self._lock:
+            self._lines.append(entry)
+            self._seq += 1
+            if self._rotator is not None:
+                try:
+                    self._rotator.write(format_entry(entry) + "\n")
+                except OSError as e:
+                    error = e
+                    self._rotator = None
+        # print вне блокировки: sys.stdout может сам писать в этот журнал (LogWriter)
+        if error is not None:
+            print(f"Запись журнала на диск отключена: {error}")
+        for callback in self._listeners:
+            try:
+                callback(entry)
+            except Exception as e:
+                print(f"Ошибка обработчика журнала: {e}")
+
+    def add_listener(self, callback):
+        """callback(entry) для каждой новой строки; вызывается из пишущего потока"""
+        self._listeners.append(callback)
+
+    def since(self, seq, limit=None):
+        """(строки после seq, новый seq, число пропущенных строк)"""
+        with self._lock:
+            available = len(self._lines)
+            first = self._seq - available
+            dropped = max(first - seq, 0)
+            start = max(seq, first) - first
+            if limit is not None and available - start > limit:
+                dropped += available - start - limit
+                start = available - limit
+            return list(itertools.islice(self._lines, start, None)), self._seq, dropped
+
+    def lines(self):
+        with self._lock:
+            return list(self._lines)
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+
+    def set_rotation(self, path=LOG_FILE, max_bytes=ROTATE_BYTES, keep=ROTATE_KEEP):
+        """Включает (path) или выключает (None) запись журнала на диск"""
+        rotator = LogRotator(path, max_bytes, keep) if path else None
+        with self._lock:
+            previous, self._rotator = self._rotator, rotator
+        if previous is not None:
+            previous.close()
+
+    def flush(self):
+        with self._lock:
+            if self._rotator is not None:
+                self._rotator.flush()
+
+
+def format_entry(entry):
+    timestamp, source, text = entry
+    return f"{time.strftime('%H:%M:%S', time.localtime(timestamp))} {source}: {text}"
+
+
+class LogWriter:
+    """Поток вывода для sys.stdout: строки print попадают в журнал
+
+    В собранном exe без консоли sys.stdout равен None, и без этого
+    сообщения программы терялись бы.
+    """
+
+    def __init__(self, log, stream=None, source="app"):
+        self.log = log
+        self.stream = stream
+        self.source = source
+        self._partial = ""
+
+    def write(self, text):
+        if self.stream is not None:
+            try:
+                self.stream.write(text)
+            except (OSError, ValueError):
+                self.stream = None
+        *lines, self._partial = (self._partial + text).split("\n")
+        for line in lines:
+            if line.strip():
+                self.log.append(line.rstrip(), self.source)
+        return len(text)
+
+    def flush(self):
+        if self.stream is not None:
+            try:
+                self.stream.flush()
+            except (OSError, ValueError):
+                self.stream = None